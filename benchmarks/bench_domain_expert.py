@@ -0,0 +1,75 @@
+"""
+Benchmark for DomainKnowledgeBase lookups.
+
+Builds a synthetic knowledge base of N entries (one JSONL file) and reports
+index build time, cold load time from the pickled index, and per-query latency.
+
+    python benchmarks/bench_domain_expert.py --entries 20000 --queries 2000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.tools.domain_expert_tool import DomainKnowledgeBase
+
+DOMAINS = ["fintech", "ecommerce", "healthcare", "gaming", "logistics", "education", "iot", "media"]
+TOPICS = ["security", "scalability", "privacy", "compliance", "latency", "deployment", "monitoring", "caching"]
+
+
+def make_corpus(directory: str, entries: int, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(5000)]
+    with open(os.path.join(directory, "corpus.jsonl"), "w") as f:
+        for i in range(entries):
+            domain, topic = rng.choice(DOMAINS), rng.choice(TOPICS)
+            words = " ".join(rng.choices(vocabulary, k=60))
+            f.write(json.dumps({"title": f"{domain} {topic} {i}", "content": f"{domain} {topic} guidance {words}"}) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        make_corpus(directory, args.entries)
+
+        start = time.perf_counter()
+        DomainKnowledgeBase(directory).refresh(force=True)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        kb = DomainKnowledgeBase(directory)
+        kb.refresh(force=True)
+        load_s = time.perf_counter() - start
+
+        rng = random.Random(11)
+        queries = [f"{rng.choice(DOMAINS)} {rng.choice(TOPICS)} term{rng.randrange(5000)}" for _ in range(args.queries)]
+        kb.reload_interval = float("inf")
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            kb.search(query)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        print(json.dumps({
+            "entries": args.entries,
+            "build_seconds": round(build_s, 3),
+            "cached_load_seconds": round(load_s, 3),
+            "query_ms_p50": round(statistics.median(timings), 4),
+            "query_ms_p95": round(timings[int(len(timings) * 0.95) - 1], 4),
+            "query_ms_max": round(timings[-1], 4),
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Import-time benchmark for server and worker cold start.
+
+Imports each module in a fresh interpreter under ``python -X importtime`` and
+reports the median cumulative import time over several runs together with the
+slowest nested imports. Exits with status 1 if a module is over its budget, so
+it can gate CI:
+
+    python benchmarks/bench_import_time.py --runs 5
+    python benchmarks/bench_import_time.py --module src.tools.registry=0.05
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Cumulative import time budgets in seconds
+DEFAULT_BUDGETS = {
+    "src.mcp_server.main": 0.8,
+    "src.tools.registry": 0.05,
+}
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def measure(module: str) -> dict:
+    """Imports ``module`` once in a fresh interpreter; returns cumulative and per-import times."""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, PYTHONDONTWRITEBYTECODE="1")
+    # Run outside the repo so the server's log and workspace directories end up in a scratch dir
+    with tempfile.TemporaryDirectory() as cwd:
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=cwd, env=env, capture_output=True, text=True
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+    imports = {}
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            imports[match.group(4)] = int(match.group(2)) / 1e6
+    return {"total": imports[module], "imports": imports}
+
+
+def run(module: str, runs: int, top: int) -> dict:
+    samples = [measure(module) for _ in range(runs)]
+    totals = [sample["total"] for sample in samples]
+    last = samples[-1]["imports"]
+    slowest = sorted((name for name in last if name != module), key=last.get, reverse=True)[:top]
+    return {
+        "module": module,
+        "import_seconds_median": round(statistics.median(totals), 4),
+        "import_seconds_min": round(min(totals), 4),
+        "slowest_imports": {name: round(last[name], 4) for name in slowest},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest nested imports to report")
+    parser.add_argument("--module", action="append", default=[],
+                        help="MODULE=BUDGET_SECONDS; replaces the default modules when given")
+    args = parser.parse_args()
+
+    budgets = dict(DEFAULT_BUDGETS)
+    if args.module:
+        budgets = {}
+        for spec in args.module:
+            module, _, budget = spec.partition("=")
+            budgets[module] = float(budget) if budget else float("inf")
+
+    results, over_budget = [], []
+    for module, budget in budgets.items():
+        result = run(module, args.runs, args.top)
+        result["budget_seconds"] = budget
+        result["within_budget"] = result["import_seconds_median"] <= budget
+        if not result["within_budget"]:
+            over_budget.append(module)
+        results.append(result)
+
+    print(json.dumps(results, indent=2))
+    if over_budget:
+        print(f"Over import-time budget: {', '.join(over_budget)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""
+End-to-end load test of the MCP server.
+
+Serves the FastAPI app with uvicorn in this process, backed by an in-memory
+Redis (fakeredis) or ``--redis-url``, and drives ``--jobs`` synthetic jobs
+through the whole human-in-the-loop flow, ``--concurrency`` at a time:
+
+    POST /start_project -> poll /status -> POST select_idea -> poll ->
+    POST select_design -> poll -> POST approve -> poll until COMPLETED
+
+Agents answer from an LLM cassette (see src/utils/cassette.py) after its replay
+latency, so no Ollama, GPU or network is needed. By default the answers come
+from a synthetic cassette with one valid answer per agent, replayed directly by
+the agents (``--agents cassette``); ``--agents real`` runs the real ReAct agents
+with LLM_BACKEND=replay instead, which needs a cassette recorded from them.
+
+Reports throughput, p50/p95/p99 latency per endpoint and per workflow state
+(from the job traces), server event-loop lag and memory growth as JSON.
+``--output`` saves the report as a baseline and ``--compare`` exits with status
+1 if a later run regresses past ``--threshold``:
+
+    python benchmarks/bench_load.py --jobs 40 --concurrency 10 --output load_baseline.json
+    python benchmarks/bench_load.py --jobs 40 --concurrency 10 --compare load_baseline.json
+"""
+import os
+import sys
+import gc
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Answer per agent in the synthetic cassette, matched by the marker CassetteAgent puts in its prompt
+SYNTHETIC_ANSWERS = {
+    "idea_generation": [{"title": "Task tracker", "description": "Tracks tasks"},
+                        {"title": "Habit tracker", "description": "Tracks habits"}],
+    "architect": {"modifications_required": False},
+    "analyzer": {"requirements": ["REST API", "persistence"], "technologies": ["python", "sqlite"]},
+    "designer": [{"architecture": {"style": "monolith"}, "api_spec": "GET /tasks", "project_plan": ["build"]},
+                 {"architecture": {"style": "services"}, "api_spec": "GET /tasks", "project_plan": ["build"]}],
+    "evaluator": [{"architecture": {"style": "monolith"}, "score": 8, "pros": ["simple"], "cons": []},
+                  {"architecture": {"style": "services"}, "score": 6, "pros": ["scales"], "cons": ["complex"]}],
+    "builder": {"status": "success", "files_created": ["app.py"]},
+    "sentinel": {"issues_found": False, "report": "", "summary": "No issues found."},
+    "refactoring": {"status": "success", "message": "Nothing to fix.", "changes_made": []},
+    "integrator": {"status": "success", "message": "Integrated."},
+    "doc_writer": {"status": "success", "files_created": ["README.md"]},
+    "infrastructure": {"iac_code": "resource \"null_resource\" \"app\" {}", "explanation": "One instance."},
+    "deployment": {"status": "success", "message": "Deployed.", "deployment_url": "http://localhost:8080"},
+    "retrospection": {"job_outcome": "success", "insights": "Smooth run.", "agent_specific_feedback": {}},
+    "prompt_optimizer": {"optimized_prompts": {}, "explanation": "No changes needed."},
+    "refinement": {"action_type": "modify_context", "modifications": {}, "next_state_suggestion": "DESIGNING",
+                   "explanation": "Re-design."},
+}
+# Agents run on codellama; the rest on llama3
+CODE_AGENTS = {"builder", "refactoring"}
+PERCENTILES = (50, 95, 99)
+# The server writes logs and workspace files to its cwd; the harness moves it to a scratch dir
+REPO_CWD = os.getcwd()
+
+
+def agent_model(name: str) -> str:
+    return "codellama" if name in CODE_AGENTS else "llama3"
+
+
+def agent_marker(name: str) -> str:
+    return f"agent:{name}\n"
+
+
+def write_synthetic_cassette(path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for name, answer in SYNTHETIC_ANSWERS.items():
+            f.write(json.dumps({
+                "model": agent_model(name),
+                "contains": agent_marker(name),
+                "text": f"Thought: I have the answer\nFinal Answer: {json.dumps(answer)}",
+                "generation_info": {"prompt_eval_count": 800, "eval_count": 120},
+                "latency": 0.05,
+            }) + "\n")
+
+
+def install_cassette_agents(main, cassette) -> None:
+    """Replaces every agent with one that answers its task from the cassette, skipping the ReAct loop."""
+    from src.agents.base_agent import BaseAgent
+
+    def make(name: str, schema: Optional[dict]):
+        class CassetteAgent:
+            output_schema = schema
+            budget_report = None
+            run_structured = BaseAgent.run_structured
+
+            def __init__(self):
+                import logging
+                self.logger = logging.getLogger(f"agent.cassette.{name}")
+
+            def run(self, task: str) -> Dict[str, Any]:
+                interaction = cassette.replay(agent_model(name), agent_marker(name) + task)
+                return {"input": task, "output": interaction["text"]}
+
+        CassetteAgent.__name__ = f"Cassette{name.title().replace('_', '')}Agent"
+        return CassetteAgent
+
+    for name in list(main.AGENT_MAPPING):
+        schema = None
+        try:
+            schema = getattr(main.AGENT_MAPPING[name], "output_schema", None)
+        except Exception as e:
+            print(f"warning: could not load agent {name}: {e}", file=sys.stderr)
+        main.AGENT_MAPPING[name] = make(name, schema)
+
+
+def percentiles(samples: List[float]) -> Dict[str, Any]:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    result = {"count": len(ordered)}
+    for p in PERCENTILES:
+        result[f"p{p}_ms"] = round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 3)
+    result["max_ms"] = round(ordered[-1] * 1000, 3)
+    return result
+
+
+class ServerThread:
+    """Runs the app under uvicorn on its own event loop in a background thread."""
+
+    def __init__(self, app, port: int, executor):
+        import uvicorn
+        # The harness installs the worker pool itself and skips the Ollama pool's health checks
+        config = uvicorn.Config(app, host="127.0.0.1", port=port, lifespan="off", log_level="warning",
+                                access_log=False)
+        self.server = uvicorn.Server(config)
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(executor)
+        self.thread = threading.Thread(target=self.loop.run_until_complete, args=(self.server.serve(),),
+                                       name="load-test-server", daemon=True)
+        self.lag: List[float] = []
+        self._probing = True
+
+    def start(self) -> str:
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        asyncio.run_coroutine_threadsafe(self._probe_lag(), self.loop)
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def _probe_lag(self, interval: float = 0.01) -> None:
+        # How late a sleep on the server loop wakes up is how long other callbacks blocked it
+        while self._probing:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.lag.append(max(0.0, time.perf_counter() - start - interval))
+
+    def stop(self) -> None:
+        self._probing = False
+        self.server.should_exit = True
+        self.thread.join(10)
+
+
+class LoadDriver:
+    def __init__(self, base_url: str, args):
+        self.base_url = base_url
+        self.args = args
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.job_seconds: List[float] = []
+        self.outcomes: Dict[str, int] = {}
+        self.job_ids: List[str] = []
+
+    async def request(self, client, method: str, endpoint: str, url: str, **kwargs) -> Optional[Dict]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            return None
+        self.latencies.setdefault(endpoint, []).append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            return None
+        return response.json()
+
+    async def wait_for(self, client, job_id: str, states: set, deadline: float) -> str:
+        while time.perf_counter() < deadline:
+            status = await self.request(client, "GET", "GET /status/{job_id}", f"/status/{job_id}")
+            state = (status or {}).get("state")
+            if state in states or state == "ERROR":
+                return state
+            await asyncio.sleep(self.args.poll_interval)
+        return "TIMEOUT"
+
+    async def run_job(self, client, index: int) -> None:
+        started = time.perf_counter()
+        deadline = started + self.args.job_timeout
+        state = "START_FAILED"
+        started_job = await self.request(client, "POST", "POST /start_project", "/start_project",
+                                         params={"prompt": f"Build synthetic project {index}"}, json=[])
+        if started_job:
+            job_id = started_job["job_id"]
+            self.job_ids.append(job_id)
+            steps = [
+                ("IDEA_SELECTION", "POST /jobs/{job_id}/select_idea", f"/jobs/{job_id}/select_idea?idea_index=0"),
+                ("DESIGN_SELECTION", "POST /jobs/{job_id}/select_design",
+                 f"/jobs/{job_id}/select_design?design_index=0"),
+                ("PENDING_APPROVAL", "POST /jobs/{job_id}/approve", f"/jobs/{job_id}/approve"),
+            ]
+            for waiting_state, endpoint, url in steps:
+                state = await self.wait_for(client, job_id, {waiting_state}, deadline)
+                if state != waiting_state:
+                    break
+                if await self.request(client, "POST", endpoint, url) is None:
+                    state = "HITL_FAILED"
+                    break
+            else:
+                state = await self.wait_for(client, job_id, {"COMPLETED"}, deadline)
+        self.outcomes[state] = self.outcomes.get(state, 0) + 1
+        self.job_seconds.append(time.perf_counter() - started)
+
+    async def run(self) -> float:
+        import httpx
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        limits = httpx.Limits(max_connections=self.args.concurrency * 2)
+
+        async def bounded(client, index):
+            async with semaphore:
+                await self.run_job(client, index)
+
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=60) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(bounded(client, i) for i in range(self.args.jobs)))
+            return time.perf_counter() - start
+
+    async def collect_state_latencies(self, settle_seconds: float) -> Dict[str, List[float]]:
+        """Per-state durations from the job traces, once the last workflow runs have finished."""
+        import httpx
+        from src.utils.metrics import JOBS_IN_FLIGHT
+        deadline = time.perf_counter() + settle_seconds
+        while JOBS_IN_FLIGHT.labels().get() > 0 and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        states: Dict[str, List[float]] = {}
+
+        def walk(spans):
+            for span in spans:
+                if span["name"].startswith("state ") and span.get("duration_ms") is not None:
+                    states.setdefault(span["name"][6:], []).append(span["duration_ms"] / 1000)
+                walk(span.get("children", []))
+
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=60) as client:
+            for job_id in self.job_ids:
+                trace = await self.request(client, "GET", "GET /jobs/{job_id}/trace", f"/jobs/{job_id}/trace")
+                walk((trace or {}).get("spans", []))
+        return states
+
+
+def rss_mb() -> float:
+    import psutil
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def compare(report: Dict, baseline: Dict, threshold: float, min_ms: float) -> List[str]:
+    """Regressions of ``report`` against ``baseline``: p95 latencies and lag up, throughput down."""
+    regressions = []
+
+    def check_latency(name: str, new: Optional[Dict], old: Optional[Dict], key: str = "p95_ms") -> None:
+        if not new or not old or key not in new or key not in old:
+            return
+        if new[key] > max(old[key] * (1 + threshold), old[key] + min_ms):
+            regressions.append(f"{name} {key}: {old[key]} -> {new[key]}")
+
+    for group in ("endpoints", "states"):
+        for name, stats in report[group].items():
+            check_latency(f"{group}.{name}", stats, baseline.get(group, {}).get(name))
+    check_latency("job_seconds", report["job_seconds"], baseline.get("job_seconds"))
+    check_latency("event_loop_lag", report["event_loop_lag"], baseline.get("event_loop_lag"), "p99_ms")
+    old_rate = baseline.get("throughput", {}).get("jobs_per_second")
+    new_rate = report["throughput"]["jobs_per_second"]
+    if old_rate and new_rate < old_rate * (1 - threshold):
+        regressions.append(f"throughput.jobs_per_second: {old_rate} -> {new_rate}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--agents", choices=("cassette", "real"), default="cassette")
+    parser.add_argument("--cassette", help="Cassette to replay (default: a synthetic one)")
+    parser.add_argument("--latency", default="lognormal:0.05:0.5",
+                        help="Replay latency per LLM call: recorded, none, fixed:S, uniform:A:B, lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay-match", choices=("exact", "sequence"), default="sequence",
+                        help="Replay of unrecorded prompts; recorded real-agent prompts embed the recording run's job ids")
+    parser.add_argument("--redis-url", help="Use this Redis instead of an in-memory one (its keys are not cleared)")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--job-timeout", type=float, default=120.0)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Keep the server's and httpx's INFO logs")
+    parser.add_argument("--output", help="Write the report to this file (a baseline for --compare)")
+    parser.add_argument("--compare", help="Baseline report to compare against; exits 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="Allowed relative regression (p95 of a few dozen jobs is noisy)")
+    parser.add_argument("--min-ms", type=float, default=2.0, help="Latency changes below this are never regressions")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    cassette_path = args.cassette
+    if cassette_path is None:
+        cassette_path = os.path.join(workdir, "synthetic.jsonl")
+        write_synthetic_cassette(cassette_path)
+    # Read by Settings when the server module is imported
+    os.environ.update({
+        "LLM_BACKEND": "replay",
+        "LLM_CASSETTE_PATH": os.path.abspath(cassette_path),
+        "LLM_REPLAY_LATENCY": args.latency,
+        "LLM_REPLAY_SEED": str(args.seed),
+        "LLM_REPLAY_MATCH": args.replay_match,
+        "TRACE_EXPORT_PATH": "",
+        "MONITOR_OBSERVATION_SECONDS": "0",
+        "ENABLE_AUTH": "false",
+    })
+    os.chdir(workdir)
+
+    import logging
+    import src.mcp_server.main as server_main
+    from src.utils.cassette import get_cassette
+    if not args.verbose:
+        # A log line per request and state transition would dominate the measurements
+        logging.disable(logging.INFO)
+
+    if args.redis_url:
+        server_main.redis_client = server_main.InstrumentedRedis.from_url(args.redis_url, decode_responses=True)
+    else:
+        import fakeredis
+        server_main.redis_client = fakeredis.FakeRedis(decode_responses=True)
+    if args.agents == "cassette":
+        install_cassette_agents(server_main, get_cassette())
+
+    gc.collect()
+    rss_start, objects_start = rss_mb(), len(gc.get_objects())
+    server = ServerThread(server_main.app, args.port, server_main.worker_pool)
+    driver = LoadDriver(server.start(), args)
+    try:
+        elapsed = asyncio.run(driver.run())
+        rss_after_load = rss_mb()
+        states = asyncio.run(driver.collect_state_latencies(settle_seconds=30))
+    finally:
+        server.stop()
+    gc.collect()
+    rss_end = rss_mb()
+
+    requests_made = sum(len(samples) for samples in driver.latencies.values())
+    report = {
+        "config": {k: getattr(args, k) for k in ("jobs", "concurrency", "agents", "latency", "seed", "poll_interval")},
+        "throughput": {
+            "seconds": round(elapsed, 3),
+            "jobs_per_second": round(args.jobs / elapsed, 3),
+            "requests_per_second": round(requests_made / elapsed, 2),
+        },
+        "outcomes": driver.outcomes,
+        "job_seconds": percentiles(driver.job_seconds),
+        "endpoints": {
+            name: {**percentiles(samples), "errors": driver.errors.get(name, 0)}
+            for name, samples in sorted(driver.latencies.items())
+        },
+        "states": {name: percentiles(samples) for name, samples in sorted(states.items())},
+        "event_loop_lag": percentiles(server.lag),
+        "memory": {
+            "rss_start_mb": round(rss_start, 1),
+            "rss_after_load_mb": round(rss_after_load, 1),
+            "rss_end_mb": round(rss_end, 1),
+            "rss_growth_mb": round(rss_end - rss_start, 1),
+            "gc_objects_growth": len(gc.get_objects()) - objects_start,
+        },
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output if os.path.isabs(args.output) else os.path.join(REPO_CWD, args.output), "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        path = args.compare if os.path.isabs(args.compare) else os.path.join(REPO_CWD, args.compare)
+        with open(path) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print(f"warning: baseline was run with {baseline.get('config')}", file=sys.stderr)
+        regressions = compare(report, baseline, args.threshold, args.min_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark for the logging pipeline.
+
+Compares synchronous handlers with the queued pipeline set up by setup_logging:
+producer throughput (records/s on the calling thread), end-to-end throughput
+(until every record is on disk) and event-loop stall while an async handler logs
+a burst of records.
+
+    python benchmarks/bench_logging.py --records 50000
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.logging_config import setup_logging, flush_logging, stop_log_listener
+
+
+def measure_throughput(logger: logging.Logger, records: int) -> dict:
+    start = time.perf_counter()
+    for i in range(records):
+        logger.info("Processing job %s in state %s with api_key=%s", f"job_{i}", "BUILDING", "k-123",
+                    extra={"job_id": f"job_{i}", "state": "BUILDING"})
+    produced = time.perf_counter() - start
+    flush_logging(timeout=120)
+    written = time.perf_counter() - start
+    return {
+        "producer_records_per_s": round(records / produced),
+        "end_to_end_records_per_s": round(records / written),
+    }
+
+
+async def measure_stall(logger: logging.Logger, records: int, chunk: int = 200) -> dict:
+    """Ticks every 1ms while another task logs ``records`` in chunks; reports tick lateness."""
+    lateness = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            expected = time.perf_counter() + 0.001
+            await asyncio.sleep(0.001)
+            lateness.append(max(time.perf_counter() - expected, 0.0))
+
+    async def burst():
+        for i in range(0, records, chunk):
+            for j in range(i, min(i + chunk, records)):
+                logger.info("Request completed: GET /status/job_%d - Status: 200 - Duration: %.2fms", j, 1.5)
+            await asyncio.sleep(0)
+        done.set()
+
+    await asyncio.gather(ticker(), burst())
+    flush_logging(timeout=120)
+    lateness.sort()
+    return {
+        "loop_stall_ms_p50": round(statistics.median(lateness) * 1000, 3),
+        "loop_stall_ms_p99": round(lateness[int(len(lateness) * 0.99) - 1] * 1000, 3),
+        "loop_stall_ms_max": round(lateness[-1] * 1000, 3),
+    }
+
+
+def run(mode: str, records: int) -> dict:
+    with tempfile.TemporaryDirectory() as log_dir:
+        setup_logging(log_dir, use_queue=(mode == "queued"))
+        logger = logging.getLogger("mcp_server")
+        result = {"mode": mode}
+        result.update(measure_throughput(logger, records))
+        result.update(asyncio.run(measure_stall(logger, records)))
+        stop_log_listener()
+        return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=50000)
+    args = parser.parse_args()
+
+    # The console handler would otherwise dominate; send it to /dev/null
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        results = [run(mode, args.records) for mode in ("sync", "queued")]
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""
+Microbenchmarks for the tools and utilities on the hot path.
+
+Covers ASTAnalysisTool (snippet actions and project summaries, cold and
+cached), PDFReaderTool, FileSystemTool read/write/list, IngestionTool directory
+copies, JsonFormatter.format, SystemModifier.validate_* and the job JSON round
+trip the workflow manager makes on every state. Each runs on synthetic fixtures
+generated at several sizes, up to 100k-line repositories, 500-page PDFs and
+1000-entry job contexts (``large``).
+
+Reports ops/s (from the fastest of repeated runs, next to the median) and, from one extra run under
+tracemalloc, peak traced memory and the allocated blocks still alive after it.
+``--save`` stores the results as the baseline; later runs compare against it
+and exit with status 1 if a case got slower or allocates more than
+``--threshold`` allows. Ops/s are compared relative to a fixed calibration
+workload timed next to each case (the median of several samples, and only when
+the machine's speed changed by more than their spread), so a busier or slower
+machine is not taken for a regression:
+
+    python benchmarks/bench_micro.py --save
+    python benchmarks/bench_micro.py --sizes small,medium,large --filter ast
+    python benchmarks/bench_micro.py --threshold 0.2
+
+Baselines are machine specific; save one on the machine that compares.
+"""
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_ROOT)
+
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "micro_baseline.json")
+
+# Fixture dimensions per size
+SIZES = {
+    "small": {"repo_lines": 1_000, "code_lines": 100, "pdf_pages": 5, "file_bytes": 10_000,
+              "list_entries": 100, "ingest_files": 20, "context_items": 10},
+    "medium": {"repo_lines": 10_000, "code_lines": 1_000, "pdf_pages": 50, "file_bytes": 1_000_000,
+               "list_entries": 1_000, "ingest_files": 200, "context_items": 100},
+    "large": {"repo_lines": 100_000, "code_lines": 10_000, "pdf_pages": 500, "file_bytes": 20_000_000,
+              "list_entries": 10_000, "ingest_files": 2_000, "context_items": 1_000},
+}
+# Peak memory changes below this are never regressions
+MIN_PEAK_KIB = 64
+# Calibration samples taken on each side of a case's timing
+CALIBRATION_SAMPLES = 5
+
+
+@dataclass
+class Case:
+    name: str
+    size: str
+    run: Callable[[], Any]
+    # Called before every run, outside the timing (e.g. to drop a cache)
+    reset: Optional[Callable[[], None]] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}[{self.size}]"
+
+
+# Fixtures
+
+def python_module(index: int, lines: int, modules: int) -> str:
+    """A module of about ``lines`` lines importing and calling into its neighbours."""
+    out = [f"import os\nfrom pkg import mod_{(index + 1) % modules}\n"
+           f"from pkg.mod_{(index + 2) % modules} import helper_0\n\n"]
+    count = 4
+    i = 0
+    while count < lines:
+        out.append(
+            f"class Model{i}(object):\n"
+            f"    limit = {i}\n\n"
+            f"    def method_{i}(self, value):\n"
+            f"        total = helper_0(value) + mod_{(index + 1) % modules}.helper_{i % 3}(value)\n"
+            f"        return os.path.join(str(total), str(self.limit))\n\n\n"
+            f"def helper_{i}(value):\n"
+            f"    return [value * n for n in range({i % 10 + 1})]\n\n\n"
+        )
+        count += 12
+        i += 1
+    return "".join(out)
+
+
+def write_repo(root: str, lines: int, lines_per_module: int = 200) -> None:
+    modules = max(1, lines // lines_per_module)
+    pkg = os.path.join(root, "pkg")
+    os.makedirs(pkg, exist_ok=True)
+    with open(os.path.join(pkg, "__init__.py"), "w") as f:
+        f.write("")
+    for i in range(modules):
+        with open(os.path.join(pkg, f"mod_{i}.py"), "w") as f:
+            f.write(python_module(i, min(lines, lines_per_module), modules))
+
+
+def tool_code(lines: int, base: str = "BaseTool") -> str:
+    header = (
+        "from typing import ClassVar\nfrom langchain_community.tools import BaseTool\n"
+        "from src.agents.base_agent import BaseAgent\n\nGENERATED_PROMPT = 'You are generated.'\n\n"
+        f"class GeneratedComponent({base}):\n"
+        "    name: ClassVar[str] = 'Generated'\n    description: ClassVar[str] = 'Generated for benchmarks'\n\n"
+        "    def __init__(self):\n        super().__init__()\n\n"
+        "    def _run(self, tool_input: str) -> str:\n        return self.step_0(tool_input)\n\n"
+    )
+    body = []
+    for i in range(max(0, (lines - 14) // 4)):
+        body.append(f"    def step_{i}(self, value):\n        items = [value] * {i % 7 + 1}\n"
+                    f"        return ''.join(items)\n\n")
+    return header + "".join(body)
+
+
+def write_pdf(path: str, pages: int, lines_per_page: int = 40) -> None:
+    """A minimal uncompressed PDF with ``lines_per_page`` lines of text per page."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # pages, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page in range(pages):
+        text = "".join(
+            f"(Page {page} line {line}: the quick brown fox jumps over the lazy dog) Tj T* "
+            for line in range(lines_per_page))
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {text}ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_number = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_number)
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def text_file(path: str, size: int) -> None:
+    line = "the quick brown fox jumps over the lazy dog 0123456789\n"
+    with open(path, "w") as f:
+        f.write(line * (size // len(line) + 1))
+
+
+def job_data(items: int) -> Dict[str, Any]:
+    """A job as the workflow manager stores it after building, with ``items`` ideas, designs and files."""
+    return {
+        "job_id": "job_1",
+        "state": "STATIC_ANALYSIS",
+        "trace_id": "0" * 32,
+        "context": {
+            "initial_prompt": "Build a task tracker with a REST API",
+            "generated_ideas": [{"title": f"Idea {i}", "description": "An idea " * 20} for i in range(items)],
+            "selected_idea": {"title": "Idea 0", "description": "An idea " * 20},
+            "designer_results": [
+                {"architecture": {"components": [f"service_{j}" for j in range(10)]},
+                 "api_spec": "GET /tasks\nPOST /tasks\n" * 10, "project_plan": [f"step {j}" for j in range(10)]}
+                for _ in range(items)
+            ],
+            "build_result": {"status": "success",
+                             "files": {f"src/module_{i}.py": python_module(i, 40, items) for i in range(items)}},
+            "budget_exhausted": [],
+        },
+    }
+
+
+# Cases
+
+def tool_cases(size: str, dims: Dict[str, int], workspace: str) -> List[Case]:
+    from src.tools import ast_tool
+    from src.tools.ast_tool import ASTAnalysisTool
+    from src.tools.pdf_reader_tool import PDFReaderTool
+    from src.tools.tools import FileSystemTool
+    from src.tools.ingestion_tool import IngestionTool
+
+    base = os.path.join(workspace, size)
+    write_repo(os.path.join(base, "repo"), dims["repo_lines"])
+    write_pdf(os.path.join(base, "doc.pdf"), dims["pdf_pages"])
+    text_file(os.path.join(base, "data.txt"), dims["file_bytes"])
+    listing = os.path.join(base, "listing")
+    os.makedirs(listing)
+    for i in range(dims["list_entries"]):
+        open(os.path.join(listing, f"entry_{i}.txt"), "w").close()
+    source = os.path.join(os.path.dirname(workspace), f"ingest_{size}")
+    for i in range(dims["ingest_files"]):
+        directory = os.path.join(source, f"dir_{i % 10}")
+        os.makedirs(directory, exist_ok=True)
+        text_file(os.path.join(directory, f"file_{i}.txt"), 4096 + i)
+
+    ast_tool_ = ASTAnalysisTool()
+    snippet = json.dumps({"action": "find_functions", "code": tool_code(dims["code_lines"])})
+    summary = json.dumps({"action": "project_summary", "path": f"{size}/repo"})
+    fs = FileSystemTool()
+    middle = dims["file_bytes"] // 55 // 2
+    ingestion = IngestionTool()
+    copy = json.dumps({"source_path": source, "destination_filename": f"copies/{size}"})
+    content = "x" * dims["file_bytes"]
+
+    def drop_graph_cache():
+        with ast_tool._graph_cache_lock:
+            ast_tool._graph_cache.clear()
+
+    return [
+        Case("ast.find_functions", size, lambda: ast_tool_._run(snippet)),
+        Case("ast.project_summary.cold", size, lambda: ast_tool_._run(summary), reset=drop_graph_cache),
+        Case("ast.project_summary.cached", size, lambda: ast_tool_._run(summary)),
+        Case("pdf.read", size, lambda: PDFReaderTool()._run(os.path.join(base, "doc.pdf"))),
+        Case("fs.read", size, lambda: fs._run(json.dumps(
+            {"action": "read", "args": {"file_path": f"{size}/data.txt"}}))),
+        Case("fs.read_lines", size, lambda: fs._run(json.dumps(
+            {"action": "read", "args": {"file_path": f"{size}/data.txt",
+                                        "start_line": middle, "end_line": middle + 100}}))),
+        Case("fs.write", size, lambda: fs._run(json.dumps(
+            {"action": "write", "args": {"file_path": f"{size}/written.txt", "content": content}}))),
+        Case("fs.list", size, lambda: fs._run(json.dumps({"action": "list", "args": {"path": f"{size}/listing"}}))),
+        Case("ingestion.copy_dir", size, lambda: ingestion._run(copy),
+             reset=lambda: shutil.rmtree(os.path.join(workspace, "copies", size), ignore_errors=True)),
+    ]
+
+
+def utility_cases(size: str, dims: Dict[str, int], workspace: str) -> List[Case]:
+    from src.utils.logging_config import JsonFormatter
+    from src.system_modifier import SystemModifier
+
+    formatter = JsonFormatter()
+    context = job_data(dims["context_items"])["context"]
+    record = logging.getLogger("mcp_server").makeRecord(
+        "mcp_server", logging.INFO, __file__, 1, "Job %s transitioning from %s to %s with api_key=%s",
+        ("job_1", "BUILDING", "STATIC_ANALYSIS", "k-123"), None,
+        extra={"job_id": "job_1", "state": "BUILDING", "context": context})
+
+    base = os.path.join(os.path.dirname(workspace), f"modifier_{size}")
+    for directory in ("tools", "agents"):
+        os.makedirs(os.path.join(base, "src", directory))
+    modifier = SystemModifier(base)
+    tool = tool_code(dims["code_lines"])
+    agent = tool_code(dims["code_lines"], base="BaseAgent")
+
+    data = job_data(dims["context_items"])
+
+    return [
+        Case("logging.json_format", size, lambda: formatter.format(record)),
+        Case("modifier.validate_python_code", size, lambda: modifier.validate_python_code(tool)),
+        Case("modifier.validate_class_structure", size, lambda: modifier.validate_class_structure(tool, "BaseTool")),
+        Case("modifier.validate_tool_code", size, lambda: modifier.validate_tool_code(tool)),
+        Case("modifier.validate_agent_code", size, lambda: modifier.validate_agent_code(agent)),
+        # What the workflow manager does with the job on every state: redis get/loads, dumps/set
+        Case("workflow.job_round_trip", size, lambda: json.loads(json.dumps(data))),
+    ]
+
+
+# Measurement
+
+def calibrate(samples: int = CALIBRATION_SAMPLES, runs: int = 20) -> List[float]:
+    """
+    Ops/s of a fixed pure-Python workload, to tell a slower machine from slower
+    code: ``samples`` values, each the fastest of ``runs`` runs.
+    """
+    payload = {"items": [{"id": i, "name": f"item {i}", "tags": ["a", "b"]} for i in range(200)]}
+    values = []
+    for _ in range(samples):
+        best = float("inf")
+        for _ in range(runs):
+            start = time.perf_counter()
+            json.loads(json.dumps(payload))
+            sorted(str(i) for i in range(2000))
+            best = min(best, time.perf_counter() - start)
+        values.append(1 / best)
+    return values
+
+
+def measure(case: Case, min_time: float, min_runs: int, max_runs: int) -> Dict[str, Any]:
+    gc.collect()
+    calibration = calibrate()
+    if case.reset:
+        case.reset()
+    # Warm-up; the tools report failures as strings, which would time the error path
+    result = case.run()
+    if isinstance(result, str) and result.startswith(("Error", "An error occurred")):
+        raise RuntimeError(f"{case.key} failed: {result}")
+    times = []
+    started = time.perf_counter()
+    while len(times) < max_runs and (len(times) < min_runs or time.perf_counter() - started < min_time):
+        if case.reset:
+            case.reset()
+        start = time.perf_counter()
+        case.run()
+        times.append(time.perf_counter() - start)
+    # Machine speed drifts on shared hosts; sample it on both sides of the timing. The median
+    # resists outliers, and the spread says how small a speed change the calibration can resolve
+    calibration += calibrate()
+    calibration_median = statistics.median(calibration)
+
+    if case.reset:
+        case.reset()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    case.run()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    # The fastest run is the one least disturbed by the rest of the machine; it sets ops/s
+    best = min(times)
+    return {
+        "name": case.name,
+        "size": case.size,
+        "runs": len(times),
+        "min_ms": round(best * 1000, 4),
+        "median_ms": round(statistics.median(times) * 1000, 4),
+        "ops_per_sec": round(1 / best, 2) if best > 0 else None,
+        "calibration": round(calibration_median, 2),
+        "calibration_noise": round((max(calibration) - min(calibration)) / calibration_median, 4),
+        "peak_kib": round(peak / 1024, 1),
+        "retained_blocks": retained,
+    }
+
+
+def compare(results: List[Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """
+    Cases slower or with a larger peak than the baseline allows.
+
+    Ops/s are divided by how much faster the machine ran the calibration workload
+    than for the baseline, unless that difference is within the calibration's own
+    noise (then they are compared as measured); the threshold applies to the
+    change that is left.
+    """
+    regressions = []
+    for result in results:
+        old = baseline.get(f"{result['name']}[{result['size']}]")
+        if not old:
+            continue
+        speed = result["calibration"] / old["calibration"] if old.get("calibration") else 1.0
+        if abs(speed - 1) <= max(result.get("calibration_noise", 0.0), old.get("calibration_noise", 0.0)):
+            speed = 1.0
+        if old.get("ops_per_sec") and result["ops_per_sec"]:
+            change = result["ops_per_sec"] / speed / old["ops_per_sec"] - 1
+            if change < -threshold:
+                regressions.append(f"{result['name']}[{result['size']}] ops/s: {old['ops_per_sec']} -> "
+                                   f"{result['ops_per_sec']} ({change:+.1%} adjusted for machine speed {speed:.2f}x)")
+        if result["peak_kib"] > max(old["peak_kib"] * (1 + threshold), old["peak_kib"] + MIN_PEAK_KIB):
+            regressions.append(f"{result['name']}[{result['size']}] peak KiB: {old['peak_kib']} -> {result['peak_kib']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="small,medium", help=f"Comma-separated, from {list(SIZES)}")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds to repeat each case for")
+    parser.add_argument("--min-runs", type=int, default=3)
+    parser.add_argument("--max-runs", type=int, default=10000)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="Store the results as the baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=0.3, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    unknown = set(sizes) - set(SIZES)
+    if unknown:
+        parser.error(f"Unknown sizes: {sorted(unknown)}")
+
+    # Generated code logs validation failures; nothing else should
+    logging.disable(logging.CRITICAL)
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench_micro_") as scratch:
+        # The tools resolve paths against ./workspace
+        os.chdir(scratch)
+        workspace = os.path.join(scratch, "workspace")
+        os.makedirs(workspace)
+        try:
+            for size in sizes:
+                cases = tool_cases(size, SIZES[size], workspace) + utility_cases(size, SIZES[size], workspace)
+                for case in cases:
+                    if args.filter in case.name:
+                        results.append(measure(case, args.min_time, args.min_runs, args.max_runs))
+                        print(f"{case.key}: {results[-1]['ops_per_sec']} ops/s", file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+    print(json.dumps(results, indent=2))
+
+    if args.save:
+        saved = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                saved = json.load(f)
+        saved.update({f"{r['name']}[{r['size']}]": r for r in results})
+        with open(args.baseline, "w") as f:
+            json.dump(saved, f, indent=2, sort_keys=True)
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save to store one", file=sys.stderr)
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
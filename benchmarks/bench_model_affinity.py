@@ -0,0 +1,80 @@
+"""
+Benchmark for model-affinity batching on a single inference host.
+
+Starts a FakeOllamaServer that keeps one model resident and takes
+``--load-seconds`` to load another, then sends ``--requests`` generate calls
+for a mix of ``llama3`` and ``codellama`` from ``--concurrency`` threads
+through an OllamaHostPool, once without the scheduler and once with it.
+Reports throughput, model loads (swaps) and the worst wait per mode:
+
+    python benchmarks/bench_model_affinity.py --requests 120 --concurrency 16
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.fake_ollama import FakeOllamaServer
+from src.utils.ollama_pool import OllamaHostPool
+
+MODELS = ["llama3", "codellama"]
+
+
+def run(args, batch_max_wait: Optional[float]) -> dict:
+    rng = random.Random(5)
+    models = [rng.choice(MODELS) for _ in range(args.requests)]
+    with FakeOllamaServer(models=MODELS, max_loaded_models=1, load_seconds=args.load_seconds,
+                          token_seconds=args.token_seconds, num_parallel=args.num_parallel) as server:
+        pool = OllamaHostPool([server.url], num_parallel=args.num_parallel, batch_max_wait=batch_max_wait)
+
+        def call(model: str) -> float:
+            start = time.perf_counter()
+            with pool.acquire(model) as host:
+                response = pool.session.post(f"{host.url}/api/generate", json={"model": model, "prompt": "hi"},
+                                             stream=True, timeout=60)
+                response.raise_for_status()
+                for _ in response.iter_lines():
+                    pass
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            latencies = sorted(executor.map(call, models))
+        elapsed = time.perf_counter() - start
+        return {
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(args.requests / elapsed, 2),
+            "model_loads": server.stats["loads"],
+            "latency_s_p50": round(latencies[len(latencies) // 2], 3),
+            "latency_s_max": round(latencies[-1], 3),
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=120)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--num-parallel", type=int, default=4)
+    parser.add_argument("--load-seconds", type=float, default=0.2)
+    parser.add_argument("--token-seconds", type=float, default=0.002)
+    parser.add_argument("--max-wait", type=float, default=2.0)
+    args = parser.parse_args()
+
+    unscheduled = run(args, None)
+    batched = run(args, args.max_wait)
+    print(json.dumps({
+        "requests": args.requests,
+        "unscheduled": unscheduled,
+        "batched": batched,
+        "speedup": round(unscheduled["seconds"] / batched["seconds"], 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,22 @@ Begin your analysis. The user's request and current system context are in the in
 """
 
 class ArchitectAgent(BaseAgent):
+    output_schema = {
+        "type": "object",
+        "required": ["modifications_required"],
+        "properties": {
+            "modifications_required": {"type": "boolean"},
+            "plan": {
+                "type": "object",
+                "properties": {
+                    "new_tools": {"type": "object"},
+                    "new_agents": {"type": "object"},
+                    "mcp_modifications": {"type": "array", "items": {"type": "string"}},
+                },
+            },
+        },
+    }
+
     def __init__(self):
         tools = [ALL_TOOLS["filesystem"]]
         # Ideal model: A model strong in code generation, reasoning about code, and understanding system architecture.
@@ -1,9 +1,21 @@
+import time
+import json
 import logging
-from typing import List, Optional
-from langchain_community.llms import Ollama
+from typing import Any, Dict, List, Optional
+# Routes every call through the inference host pool; named Ollama as it is a drop-in subclass
+from src.utils.pooled_ollama import PooledOllama as Ollama
 from langchain.agents import AgentExecutor, create_react_agent
 from langchain_core.prompts import PromptTemplate
 from langchain.callbacks.base import BaseCallbackHandler
+from src.utils.metrics import LLM_CALL_SECONDS, LLM_TOKENS
+from src.utils.tracing import get_tracer, current_span
+from src.utils.usage import UsageRecord, record_usage, token_cost
+from src.utils.resilience import is_transient
+from src.utils.config import get_settings
+from src.utils.budget import (
+    BUDGET_EXHAUSTED, STOPPED_OUTPUT, AgentBudget, AgentBudgetExceeded, deadline_scope, remaining_seconds
+)
+from src.utils.structured_output import STRUCTURED_OUTPUTS, OutputSchemaError, output_text, parse_output
 
 # Configure logging
 logging.basicConfig(
@@ -11,32 +23,148 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+def _token_counts(response) -> Dict[str, int]:
+    """Prompt/completion token counts reported by the provider, if any."""
+    usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+    counts = {
+        "prompt": usage.get("prompt_tokens"),
+        "completion": usage.get("completion_tokens"),
+    }
+    # Ollama reports its counts per generation
+    for generations in getattr(response, "generations", None) or []:
+        for generation in generations:
+            info = getattr(generation, "generation_info", None) or {}
+            if "prompt_eval_count" in info:
+                counts["prompt"] = (counts["prompt"] or 0) + info["prompt_eval_count"]
+            if "eval_count" in info:
+                counts["completion"] = (counts["completion"] or 0) + info["eval_count"]
+    return {kind: count for kind, count in counts.items() if count is not None}
+
 class AgentCallbackHandler(BaseCallbackHandler):
-    def __init__(self, agent_name: str):
+    def __init__(self, agent_name: str, model_name: str = "unknown"):
         self.agent_name = agent_name
+        self.model_name = model_name
         self.logger = logging.getLogger(f"agent.{agent_name}")
+        # run_id -> [start time, span, first token time]
+        self._llm_started: Dict = {}
+        self.begin_run()
+
+    def begin_run(self) -> None:
+        """Resets the usage collected for the next BaseAgent.run call."""
+        self.usage = UsageRecord(agent=self.agent_name, model=self.model_name)
+        self._first_token_latencies: List[float] = []
+        self._step_mark = time.perf_counter()
+
+    def end_run(self, attempts: int, duration: float, status: str) -> UsageRecord:
+        usage = self.usage
+        usage.attempts = attempts
+        usage.duration_seconds = round(duration, 6)
+        usage.status = status
+        usage.llm_seconds = round(usage.llm_seconds, 6)
+        if self._first_token_latencies:
+            usage.time_to_first_token = round(sum(self._first_token_latencies) / len(self._first_token_latencies), 6)
+        usage.cost = token_cost(self.model_name, usage.prompt_tokens, usage.completion_tokens)
+        return usage
+
+    def _end_step(self) -> None:
+        now = time.perf_counter()
+        self.usage.step_seconds.append(round(now - self._step_mark, 6))
+        self._step_mark = now
 
     def on_llm_start(self, *args, **kwargs):
+        # The span hangs off the agent attempt that is active in this thread
+        span = get_tracer().start_span(
+            "llm", {"agent": self.agent_name, "model": self.model_name}, activate=False
+        ) if current_span() else None
+        self._llm_started[kwargs.get("run_id")] = [time.perf_counter(), span, None]
         self.logger.info(f"{self.agent_name} starting LLM call")
 
+    def on_llm_new_token(self, token: str, *args, **kwargs):
+        started = self._llm_started.get(kwargs.get("run_id"))
+        if started is not None and started[2] is None:
+            started[2] = time.perf_counter()
+
+    def on_llm_end(self, response, *args, **kwargs):
+        started = self._llm_started.pop(kwargs.get("run_id"), None)
+        if started is None:
+            return
+        start, span, first_token = started
+        elapsed = time.perf_counter() - start
+        LLM_CALL_SECONDS.labels(self.agent_name, self.model_name).observe(elapsed)
+        self.usage.llm_calls += 1
+        self.usage.llm_seconds += elapsed
+        if first_token is not None:
+            self._first_token_latencies.append(first_token - start)
+        counts = _token_counts(response)
+        self.usage.prompt_tokens += counts.get("prompt", 0)
+        self.usage.completion_tokens += counts.get("completion", 0)
+        for kind, count in counts.items():
+            LLM_TOKENS.labels(self.agent_name, self.model_name, kind).observe(count)
+            if span is not None:
+                span.set_attribute(f"llm.{kind}_tokens", count)
+        if span is not None:
+            span.end()
+
     def on_llm_error(self, error: Exception, *args, **kwargs):
+        started = self._llm_started.pop(kwargs.get("run_id"), None)
+        if started is not None:
+            start, span, _ = started
+            elapsed = time.perf_counter() - start
+            LLM_CALL_SECONDS.labels(self.agent_name, self.model_name).observe(elapsed)
+            self.usage.llm_calls += 1
+            self.usage.llm_seconds += elapsed
+            if span is not None:
+                span.end(error=error)
         self.logger.error(f"{self.agent_name} LLM error: {str(error)}")
 
+    def on_agent_action(self, action, *args, **kwargs):
+        # One ReAct step: the LLM chose a tool
+        tool = getattr(action, "tool", "unknown")
+        self.usage.tool_calls[tool] = self.usage.tool_calls.get(tool, 0) + 1
+        self._end_step()
+
+    def on_agent_finish(self, finish, *args, **kwargs):
+        self._end_step()
+
     def on_tool_start(self, tool_name: str, *args, **kwargs):
         self.logger.info(f"{self.agent_name} using tool: {tool_name}")
 
     def on_tool_error(self, error: Exception, *args, **kwargs):
         self.logger.error(f"{self.agent_name} tool error: {str(error)}")
 
+REFORMAT_PROMPT = """Rewrite the answer below as a single JSON value that matches this JSON Schema. Keep its content; reply with the JSON only.
+
+JSON Schema: {schema}
+
+Problem with the answer: {error}
+
+Answer:
+{answer}
+"""
+
+FINAL_ANSWER_PROMPT = """You ran out of steps for this task. Using only the work done so far, give your best final answer in the format the task asks for.
+
+Task: {task}
+
+Work so far:
+{work}
+
+Final Answer:"""
+
 class BaseAgent:
+    # JSON Schema of the final answer, checked by run_structured (None: any JSON)
+    output_schema: Optional[Dict[str, Any]] = None
+
     def __init__(self, tools: List, system_prompt: str, model_name: str = "llama3", max_retries: int = 3):
         self.logger = logging.getLogger(f"agent.{self.__class__.__name__}")
         self.tools = tools
         self.prompt = PromptTemplate.from_template(system_prompt)
         self.max_retries = max_retries
-        self.callback_handler = AgentCallbackHandler(self.__class__.__name__)
+        self.callback_handler = AgentCallbackHandler(self.__class__.__name__, model_name)
+        self.budget = AgentBudget.for_agent(self.__class__.__name__, get_settings().AGENT_BUDGETS)
+        # Set by run when the last run hit its budget
+        self.budget_report: Optional[Dict[str, Any]] = None
         
-        # Initialize LLM with retries
         self.llm = self._initialize_llm(model_name)
         
         # Create agent with error handling
@@ -46,28 +174,29 @@ class BaseAgent:
                 agent=agent, 
                 tools=self.tools, 
                 verbose=True,
-                callbacks=[self.callback_handler]
+                callbacks=[self.callback_handler],
+                max_iterations=self.budget.max_steps,
+                max_execution_time=self.budget.max_seconds,
+                early_stopping_method="force",
+                return_intermediate_steps=True
             )
         except Exception as e:
             self.logger.error(f"Failed to initialize agent: {str(e)}")
             raise
 
-    def _initialize_llm(self, model_name: str) -> Optional[Ollama]:
-        for attempt in range(self.max_retries):
-            try:
-                return Ollama(
-                    model=model_name,
-                    callbacks=[self.callback_handler]
-                )
-            except Exception as e:
-                self.logger.warning(f"Attempt {attempt + 1}/{self.max_retries} to initialize LLM failed: {str(e)}")
-                if attempt == self.max_retries - 1:
-                    self.logger.error("All attempts to initialize LLM failed")
-                    raise
+    def _initialize_llm(self, model_name: str) -> Ollama:
+        # Construction does no I/O; each generate call gets the breaker, backoff and retry budget
+        return Ollama(model=model_name, num_predict=self.budget.max_tokens, max_retries=self.max_retries,
+                      callbacks=[self.callback_handler])
 
     def run(self, task: str) -> str:
         """
         Run the agent with error handling and retries.
+
+        Each LLM call goes through the model endpoint's circuit breaker and retry
+        budget (see PooledOllama): overload errors back off exponentially with
+        jitter, and an open circuit fails fast instead of adding load. Other
+        failures re-run the whole task, up to ``max_retries`` attempts.
         
         Args:
             task: The task description or input for the agent
@@ -75,19 +204,129 @@ class BaseAgent:
         Returns:
             str: The result of the agent's execution
             
+        Steps, generated tokens and wall-clock time are bounded by the agent's
+        budget (Settings.AGENT_BUDGETS); a run cut short sets ``budget_report``.
+        
         Raises:
-            Exception: If all retry attempts fail
+            AgentBudgetExceeded: If the budget ran out mid-call, or with the "error" early-stop policy
+            Exception: If all retry attempts fail or the endpoint's circuit is open
         """
-        last_error = None
-        for attempt in range(self.max_retries):
+        self.callback_handler.begin_run()
+        self.budget_report = None
+        started = time.perf_counter()
+        attempts = 0
+
+        def attempt():
+            nonlocal attempts
+            attempts += 1
+            self.logger.info(f"Attempt {attempts}/{self.max_retries} to run task")
+            remaining = remaining_seconds()
+            if remaining is not None:
+                # Retries only get what is left of the run's deadline
+                self.executor.max_execution_time = max(remaining, 0.0)
+            with get_tracer().span("agent.run", {"agent": self.__class__.__name__, "attempt": attempts}):
+                return self.executor.invoke({"input": task})
+
+        try:
+            with deadline_scope(self.__class__.__name__, self.budget.max_seconds):
+                for attempt_index in range(self.max_retries):
+                    try:
+                        result = attempt()
+                        break
+                    except Exception as e:
+                        self.logger.warning(f"Attempt {attempt_index + 1}/{self.max_retries} failed: {str(e)}")
+                        # The LLM call already retried overload errors; re-running the task would multiply them
+                        if attempt_index == self.max_retries - 1 or is_transient(e) or \
+                                not getattr(e, "retryable", True):
+                            raise
+            result = self._apply_early_stopping(task, result, time.perf_counter() - started)
+        except AgentBudgetExceeded as e:
+            self.budget_report = self.budget_report or e.report()
+            self.logger.error(f"Task stopped by its budget: {str(e)}")
+            record_usage(self.callback_handler.end_run(attempts, time.perf_counter() - started, "budget_exhausted"))
+            raise
+        except Exception:
+            self.logger.error(f"Task failed after {attempts} attempt(s)")
+            record_usage(self.callback_handler.end_run(attempts, time.perf_counter() - started, "failed"))
+            raise
+        status = "budget_exhausted" if self.budget_report else "success"
+        self.logger.info("Task completed successfully" if status == "success" else "Task stopped early by its budget")
+        record_usage(self.callback_handler.end_run(attempts, time.perf_counter() - started, status))
+        return result
+
+    def _apply_early_stopping(self, task: str, result, elapsed: float):
+        """Records a run the executor stopped at its budget and applies the early-stop policy."""
+        if not isinstance(result, dict):
+            return result
+        steps = result.pop("intermediate_steps", None) or []
+        if result.get("output") != STOPPED_OUTPUT:
+            return result
+        agent = self.__class__.__name__
+        reason = "steps" if len(steps) >= self.budget.max_steps else "time"
+        BUDGET_EXHAUSTED.labels(agent, reason).inc()
+        error = AgentBudgetExceeded(agent, reason, len(steps), elapsed)
+        self.budget_report = {**error.report(), "early_stopping": self.budget.early_stopping}
+        self.logger.warning(str(error))
+        if self.budget.early_stopping == "error":
+            raise error
+        if self.budget.early_stopping == "generate":
             try:
-                self.logger.info(f"Attempt {attempt + 1}/{self.max_retries} to run task")
-                result = self.executor.invoke({"input": task})
-                self.logger.info("Task completed successfully")
-                return result
-            except Exception as e:
-                last_error = e
-                self.logger.warning(f"Attempt {attempt + 1}/{self.max_retries} failed: {str(e)}")
-                
-        self.logger.error(f"All {self.max_retries} attempts to run task failed")
-        raise last_error
+                # Runs after the run's own deadline_scope, so it gets a deadline of its own
+                with deadline_scope(agent, self.budget.final_answer_seconds):
+                    result["output"] = self._final_answer(task, steps)
+            except AgentBudgetExceeded as e:
+                self.logger.warning(f"No final answer in time, keeping the stop message: {str(e)}")
+        return result
+
+    def _final_answer(self, task: str, steps: List) -> str:
+        work = "\n".join(
+            f"{getattr(action, 'log', str(action)).strip()}\nObservation: {str(observation)[:2000]}"
+            for action, observation in steps
+        )
+        prompt = FINAL_ANSWER_PROMPT.format(task=task, work=work or "(none)")
+        return self.llm.invoke(prompt)
+
+    def run_structured(self, task: str) -> Any:
+        """
+        Run the agent and return its answer as JSON matching ``output_schema``.
+
+        The JSON is extracted tolerantly from the ReAct answer. If that fails or it
+        does not match the schema, one extra LLM call in the model's JSON mode
+        rewrites the answer, instead of re-running the whole agent.
+
+        Raises:
+            OutputSchemaError: If no valid JSON could be obtained
+        """
+        agent = self.__class__.__name__
+        text = output_text(self.run(task))
+        if text == STOPPED_OUTPUT and self.budget_report:
+            # There is no answer to reformat
+            report = self.budget_report
+            raise AgentBudgetExceeded(agent, report["reason"], report["steps"], report["elapsed_seconds"])
+        try:
+            value = parse_output(text, self.output_schema)
+        except OutputSchemaError as e:
+            if self.output_schema is None:
+                STRUCTURED_OUTPUTS.labels(agent, "failed").inc()
+                raise
+            self.logger.warning(f"Reformatting answer as JSON: {str(e)}")
+            value = self._reformat_output(text, e)
+            STRUCTURED_OUTPUTS.labels(agent, "reformatted").inc()
+            return value
+        try:
+            json.loads(text)
+            STRUCTURED_OUTPUTS.labels(agent, "parsed").inc()
+        except ValueError:
+            STRUCTURED_OUTPUTS.labels(agent, "repaired").inc()
+        return value
+
+    def _reformat_output(self, text: str, error: Exception) -> Any:
+        llm = Ollama(model=self.callback_handler.model_name, format="json", temperature=0,
+                     max_retries=self.max_retries, callbacks=[self.callback_handler])
+        prompt = REFORMAT_PROMPT.format(schema=json.dumps(self.output_schema), error=str(error), answer=text)
+        reformatted = llm.invoke(prompt)
+        try:
+            return parse_output(reformatted, self.output_schema)
+        except OutputSchemaError:
+            STRUCTURED_OUTPUTS.labels(self.__class__.__name__, "failed").inc()
+            raise
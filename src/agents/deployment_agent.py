@@ -19,6 +19,16 @@ Begin now. The project is ready for deployment. {input}
 """
 
 class DeploymentAgent(BaseAgent):
+    output_schema = {
+        "type": "object",
+        "required": ["status", "message"],
+        "properties": {
+            "status": {"enum": ["success", "failure"]},
+            "message": {"type": "string"},
+            "deployment_url": {"type": ["string", "null"]},
+        },
+    }
+
     def __init__(self):
         tools = [
             # In a real scenario, this would interact with cloud APIs
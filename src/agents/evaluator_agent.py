@@ -52,6 +52,8 @@ Begin now. The design proposals are: {input}
 """
 
 class EvaluatorAgent(BaseAgent):
+    output_schema = {"type": "array", "items": {"type": "object"}}
+
     def __init__(self):
         tools = [] # Evaluator agent primarily reasons over input, no external tools needed for this simulated evaluation
         # Ideal model: A model strong in analytical reasoning, trade-off analysis, and understanding system properties.
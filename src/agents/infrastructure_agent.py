@@ -14,6 +14,15 @@ Begin now. The selected architectural design is: {input}
 """
 
 class InfrastructureAgent(BaseAgent):
+    output_schema = {
+        "type": "object",
+        "required": ["iac_code", "explanation"],
+        "properties": {
+            "iac_code": {"type": "string"},
+            "explanation": {"type": "string"},
+        },
+    }
+
     def __init__(self):
         tools = [] # This agent primarily reasons over the input context
         # Ideal model: A model strong in understanding cloud infrastructure, IaC syntax, and security best practices.
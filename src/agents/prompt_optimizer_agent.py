@@ -18,6 +18,15 @@ Begin now. The retrospection report is: {input}
 """
 
 class PromptOptimizerAgent(BaseAgent):
+    output_schema = {
+        "type": "object",
+        "required": ["optimized_prompts"],
+        "properties": {
+            "optimized_prompts": {"type": "object"},
+            "explanation": {"type": "string"},
+        },
+    }
+
     def __init__(self):
         tools = [] # This agent primarily reasons over the input context
         # Ideal model: A model strong in meta-learning, understanding prompt engineering, and identifying reasoning failures.
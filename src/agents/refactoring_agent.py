@@ -22,6 +22,16 @@ Begin now. The issue to address is: {input}
 """
 
 class RefactoringAgent(BaseAgent):
+    output_schema = {
+        "type": "object",
+        "required": ["status", "message"],
+        "properties": {
+            "status": {"enum": ["success", "failed"]},
+            "message": {"type": "string"},
+            "changes_made": {"type": "array", "items": {"type": "string"}},
+        },
+    }
+
     def __init__(self):
         tools = [
             ALL_TOOLS["filesystem"],
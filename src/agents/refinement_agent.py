@@ -23,6 +23,17 @@ Begin now. The user's feedback is: {input_feedback}. The current job context is:
 """
 
 class RefinementAgent(BaseAgent):
+    output_schema = {
+        "type": "object",
+        "required": ["action_type", "modifications", "next_state_suggestion"],
+        "properties": {
+            "action_type": {"type": "string"},
+            "modifications": {"type": "object"},
+            "next_state_suggestion": {"type": "string"},
+            "explanation": {"type": "string"},
+        },
+    }
+
     def __init__(self):
         tools = [
             ALL_TOOLS["filesystem"]
@@ -23,6 +23,17 @@ Begin now. The complete job context is: {input}
 """
 
 class RetrospectionAgent(BaseAgent):
+    output_schema = {
+        "type": "object",
+        "required": ["job_outcome", "insights", "agent_specific_feedback"],
+        "properties": {
+            "job_outcome": {"enum": ["success", "failure"]},
+            "failure_reason": {"type": ["string", "null"]},
+            "insights": {"type": "string"},
+            "agent_specific_feedback": {"type": "object"},
+        },
+    }
+
     def __init__(self):
         tools = [] # This agent primarily reasons over the input context
         # Ideal model: A model strong in analytical reasoning, root cause analysis, and identifying patterns in complex data.
@@ -19,6 +19,16 @@ Begin now. The project is located in the 'workspace' directory.
 """
 
 class SentinelAgent(BaseAgent):
+    output_schema = {
+        "type": "object",
+        "required": ["issues_found", "summary"],
+        "properties": {
+            "issues_found": {"type": "boolean"},
+            "report": {"type": "string"},
+            "summary": {"type": "string"},
+        },
+    }
+
     def __init__(self):
         tools = [
             ALL_TOOLS["shell"],
@@ -1,15 +1,28 @@
 import json
+import time
+import hashlib
 import asyncio
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from redis import Redis
-import importlib.util
 import os
 import logging
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 from src.utils.logging_config import setup_logging
 from src.utils.config import get_settings
-from src.tools.tools import ALL_TOOLS
+from src.utils.metrics import (
+    REGISTRY, WORKFLOW_STATE_SECONDS, REDIS_SECONDS, JOBS_IN_FLIGHT, QUEUE_DEPTH, THREAD_POOL_THREADS
+)
+from src.utils.tracing import get_tracer, current_span, new_trace_id
+from src.utils.usage import configure_usage_store, usage_scope, set_usage_state
+from src.utils.registry import LazyRegistry, load_file_attribute, module_files
+from src.utils.hot_reload import ReloadBroadcaster
+from src.utils.structured_output import OutputSchemaError, output_text, parse_output
+from src.utils.ollama_pool import get_ollama_pool
+from src.tools.registry import ALL_TOOLS, index_dynamic_tools
 from .middleware import auth_middleware, error_handling_middleware, request_logging_middleware
 
 # Set up logging
@@ -22,7 +35,36 @@ settings = get_settings()
 # Import SystemModifier
 from src.system_modifier import SystemModifier
 
+# Worker pool behind asyncio.to_thread; owned here so its usage can be exported as metrics
+worker_pool = ThreadPoolExecutor(max_workers=settings.WORKER_THREADS, thread_name_prefix="worker")
+# Read at scrape time; _work_queue and _threads are the executor's only view of its backlog
+QUEUE_DEPTH.set_function(lambda: worker_pool._work_queue.qsize())
+THREAD_POOL_THREADS.labels("max").set_function(lambda: worker_pool._max_workers)
+THREAD_POOL_THREADS.labels("started").set_function(lambda: len(worker_pool._threads))
+
+# Repository root whose src/ the ARCHITECT_ANALYSIS state modifies
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    asyncio.get_running_loop().set_default_executor(worker_pool)
+    # Once per process, before any job can start a transaction of its own
+    try:
+        await asyncio.to_thread(SystemModifier.recover_interrupted, BASE_PATH)
+    except OSError as e:
+        logger.warning("Interrupted modifications not recovered: %s", str(e))
+    try:
+        registry_reloader.start()
+    except Exception as e:
+        logger.warning("Registry reload listener not started: %s", str(e))
+    ollama_pool = get_ollama_pool()
+    ollama_pool.start()
+    yield
+    ollama_pool.stop()
+    registry_reloader.stop()
+
 app = FastAPI(
+    lifespan=lifespan,
     title="Multi-Agent GenAI Development System",
     description="A sophisticated multi-agent system for automated software development",
     version="1.0.0",
@@ -47,10 +89,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class InstrumentedRedis(Redis):
+    """Redis client that records the round-trip time of every command."""
+
+    def execute_command(self, *args, **options):
+        # Only traced when called inside a job's trace; a span per health-check ping is noise
+        span = get_tracer().start_span(f"redis {args[0]}", activate=False) if current_span() else None
+        start = time.perf_counter()
+        error = None
+        try:
+            return super().execute_command(*args, **options)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            REDIS_SECONDS.labels(args[0]).observe(time.perf_counter() - start)
+            if span is not None:
+                span.end(error=error)
+
 # Initialize Redis with configuration
 redis_client = None
 try:
-    redis_client = Redis.from_url(
+    redis_client = InstrumentedRedis.from_url(
         settings.get_redis_url(),
         decode_responses=True,
         socket_timeout=5
@@ -60,48 +120,101 @@ try:
 except Exception as e:
     logger.error("Failed to connect to Redis: %s", str(e))
 
-# Dynamic Agent Loading
-AGENT_MAPPING = {}
-
-def load_dynamic_agents():
-    agents_dir = os.path.join(os.path.dirname(__file__), "..", "agents")
-    for filename in os.listdir(agents_dir):
-        if filename.endswith(".py") and filename not in ["__init__.py", "base_agent.py"]:
-            module_name = filename[:-3]
-            file_path = os.path.join(agents_dir, filename)
-            spec = importlib.util.spec_from_file_location(module_name, file_path)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            
-            # Assuming agent class name is CamelCase version of module name
-            class_name = ''.join(word.capitalize() for word in module_name.split('_'))
-            agent_class = getattr(module, class_name)
-            AGENT_MAPPING[module_name.replace("_agent", "")] = agent_class
-            logger.info("Loaded agent: %s", class_name)
-
-# Load dynamic agents when the server starts
+# Resolved per record so the store always uses the current client
+usage_store = configure_usage_store(lambda: redis_client)
+
+# Dynamic Agent Loading: agents are indexed by file name and only executed on first lookup
+AGENTS_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "agents"))
+AGENT_MAPPING = LazyRegistry("agent")
+
+def load_dynamic_agents() -> Dict[str, List[str]]:
+    """
+    Indexes the agents in src/agents. Re-indexing re-imports only agents whose file
+    content changed and swaps the new snapshot in atomically; returns the added,
+    changed and removed agent names.
+    """
+    specs = {}
+    for module_name in module_files(AGENTS_DIR, ["__init__.py", "base_agent.py"]):
+        # Assuming agent class name is CamelCase version of module name
+        class_name = ''.join(word.capitalize() for word in module_name.split('_'))
+        file_path = os.path.join(AGENTS_DIR, module_name + ".py")
+        specs[module_name.replace("_agent", "")] = (
+            load_file_attribute(module_name, file_path, class_name),
+            {"module": module_name, "source": file_path, "symbol": class_name}
+        )
+    return AGENT_MAPPING.sync("dynamic", specs)
+
+def reload_registries() -> Dict[str, Dict[str, List[str]]]:
+    """Picks up added, changed and removed tool and agent files."""
+    changes = {"tools": index_dynamic_tools(), "agents": load_dynamic_agents()}
+    if any(names for kind in changes.values() for names in kind.values()):
+        logger.info("Reloaded registries: %s", changes)
+    return changes
+
+# Other server processes re-index when this one reloads after a self-modification
+registry_reloader = ReloadBroadcaster(lambda: redis_client, reload_registries)
+
+# Index dynamic agents when the server starts
 load_dynamic_agents()
 
+def record_budget_report(job_context: dict, agent_name: str, agent) -> None:
+    """Notes in the job context that the agent's last run was cut short by its budget."""
+    report = getattr(agent, "budget_report", None)
+    if report:
+        job_context.setdefault("budget_exhausted", {})[agent_name] = report
+
 async def run_agent(agent_name: str, job_context: dict) -> dict:
     """Dynamically runs an agent and returns its result."""
+    agent = None
     try:
         logger.info("Running agent: %s", agent_name)
         agent_class = AGENT_MAPPING[agent_name]
         agent = agent_class()
-        result_str = await asyncio.to_thread(agent.run, json.dumps(job_context))
+        if agent.output_schema is not None:
+            return await asyncio.to_thread(agent.run_structured, json.dumps(job_context))
+        result = await asyncio.to_thread(agent.run, json.dumps(job_context))
         try:
-            return json.loads(result_str)
-        except json.JSONDecodeError:
-            return {"output": result_str}
+            return parse_output(result)
+        except OutputSchemaError:
+            return {"output": output_text(result)}
     except Exception as e:
         logger.error("Error running agent %s: %s", agent_name, str(e), exc_info=True)
         raise
+    finally:
+        record_budget_report(job_context, agent_name, agent)
+
+async def run_structured_agent(agent_name: str, job_context: dict, payload: Any = None) -> Any:
+    """Runs an agent on ``payload`` (default: the job context) and returns its schema-checked JSON answer."""
+    agent = AGENT_MAPPING[agent_name]()
+    try:
+        return await asyncio.to_thread(
+            agent.run_structured, json.dumps(job_context if payload is None else payload)
+        )
+    finally:
+        record_budget_report(job_context, agent_name, agent)
+
+def job_trace_id(job_id: str, job_data: Optional[dict] = None) -> str:
+    """Trace id recorded on the job; jobs created before tracing get one derived from their id."""
+    if job_data is None:
+        job_data_str = redis_client.get(job_id)
+        job_data = json.loads(job_data_str) if job_data_str else {}
+    return job_data.get("trace_id") or hashlib.sha256(job_id.encode()).hexdigest()[:32]
 
 async def workflow_manager(job_id: str):
     """Manages the state-driven workflow for a job."""
+    JOBS_IN_FLIGHT.inc()
+    try:
+        # Each resumption of the workflow is one root span in the job's trace
+        with get_tracer().span("workflow", {"job.id": job_id}, trace_id=job_trace_id(job_id)), usage_scope(job_id):
+            await _run_workflow(job_id)
+    finally:
+        JOBS_IN_FLIGHT.dec()
+
+async def _run_workflow(job_id: str):
     logger.info("Starting workflow for job: %s", job_id)
     
     while True:
+        state_span = None
         try:
             job_data_str = redis_client.get(job_id)
             if not job_data_str:
@@ -111,39 +224,25 @@ async def workflow_manager(job_id: str):
             job_data = json.loads(job_data_str)
             state = job_data.get("state")
             logger.info("Processing job %s in state: %s", job_id, state)
+            state_started = time.perf_counter()
+            state_span = get_tracer().start_span(f"state {state}", {"job.state": state})
+            set_usage_state(state)
 
             next_state = None
             if state == "INGESTION":
                 ingestion_tool = ALL_TOOLS["ingestion"]
-                ingested_files = []
-
-                # Ingest files from the dedicated localFiles input
-                for file_info in job_data["context"].get("files_to_ingest", []):
-                    source_path = file_info["source_path"]
-                    destination_filename = file_info["destination_filename"]
-                    ingestion_result = await asyncio.to_thread(
-                        ingestion_tool._run, 
-                        json.dumps({"source_path": source_path, "destination_filename": destination_filename})
-                    )
-                    ingested_files.append({
-                        "source": source_path, 
-                        "destination": destination_filename, 
-                        "result": ingestion_result
-                    })
-                
-                # Ingest PDF if provided via dedicated input
+
+                # Files from the dedicated localFiles input, plus the PDF if provided
+                entries = [
+                    {"source_path": file_info["source_path"], "destination_filename": file_info["destination_filename"]}
+                    for file_info in job_data["context"].get("files_to_ingest", [])
+                ]
                 if job_data["context"].get("pdf_path"):
                     pdf_source_path = job_data["context"]["pdf_path"]
-                    pdf_filename = os.path.basename(pdf_source_path)
-                    pdf_ingestion_result = await asyncio.to_thread(
-                        ingestion_tool._run, 
-                        json.dumps({"source_path": pdf_source_path, "destination_filename": pdf_filename})
-                    )
-                    ingested_files.append({
-                        "source": pdf_source_path, 
-                        "destination": pdf_filename, 
-                        "result": pdf_ingestion_result
-                    })
+                    entries.append({"source_path": pdf_source_path, "destination_filename": os.path.basename(pdf_source_path)})
+
+                # One bulk call copies everything concurrently instead of one thread hop per file
+                ingested_files = await asyncio.to_thread(ingestion_tool.ingest_many, entries) if entries else []
 
                 job_data["context"]["ingested_files"] = ingested_files
                 next_state = "IDEA_GENERATION"
@@ -154,16 +253,24 @@ async def workflow_manager(job_id: str):
                 next_state = "IDEA_SELECTION"
 
             elif state == "ARCHITECT_ANALYSIS":
-                architect = AGENT_MAPPING["architect"]()
-                architect_result_str = await asyncio.to_thread(architect.run, json.dumps(job_data["context"]))
-                architect_result = json.loads(architect_result_str)
+                architect_result = await run_structured_agent("architect", job_data["context"])
                 job_data["context"]["architect_result"] = architect_result
 
                 if architect_result.get("modifications_required"):
-                    system_modifier = SystemModifier(base_path=os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
-                    modification_report = system_modifier.apply_modifications(architect_result["plan"])
+                    system_modifier = SystemModifier(
+                        base_path=BASE_PATH,
+                        sandbox_timeout=settings.SANDBOX_TIMEOUT_SECONDS,
+                        sandbox_memory_mb=settings.SANDBOX_MEMORY_MB,
+                        sandbox_workers=settings.SANDBOX_WORKERS
+                    )
+                    # All-or-nothing, and only if every new component imports in the sandbox
+                    modification_report = await asyncio.to_thread(
+                        system_modifier.apply_modifications, architect_result["plan"], test_imports=True
+                    )
                     job_data["context"]["modification_report"] = modification_report
-                    load_dynamic_agents()  # Reload agents after modifications
+                    # Re-import only what changed, then tell the other processes to do the same
+                    registry_changes = reload_registries()
+                    registry_reloader.publish(registry_changes)
                     next_state = "ANALYZING"
                 else:
                     next_state = "ANALYZING"
@@ -179,12 +286,9 @@ async def workflow_manager(job_id: str):
                 next_state = "DESIGN_EVALUATION"
 
             elif state == "DESIGN_EVALUATION":
-                evaluator = AGENT_MAPPING["evaluator"]()
-                evaluated_designs_str = await asyncio.to_thread(
-                    evaluator.run, 
-                    json.dumps(job_data["context"]["designer_results"])
+                evaluated_designs = await run_structured_agent(
+                    "evaluator", job_data["context"], job_data["context"]["designer_results"]
                 )
-                evaluated_designs = json.loads(evaluated_designs_str)
                 job_data["context"]["evaluated_designs"] = evaluated_designs
                 next_state = "DESIGN_SELECTION"
 
@@ -194,21 +298,16 @@ async def workflow_manager(job_id: str):
                 next_state = "STATIC_ANALYSIS"
 
             elif state == "STATIC_ANALYSIS":
-                sentinel = AGENT_MAPPING["sentinel"]()
-                sentinel_report = await asyncio.to_thread(sentinel.run, json.dumps(job_data["context"]))
-                job_data["context"]["sentinel_report"] = json.loads(sentinel_report)
+                job_data["context"]["sentinel_report"] = await run_structured_agent("sentinel", job_data["context"])
                 if job_data["context"]["sentinel_report"].get("issues_found"):
                     next_state = "REFACTORING"
                 else:
                     next_state = "INTEGRATING"
 
             elif state == "REFACTORING":
-                refactoring_agent = AGENT_MAPPING["refactoring"]()
-                refactoring_result = await asyncio.to_thread(
-                    refactoring_agent.run, 
-                    json.dumps(job_data["context"]["sentinel_report"]["summary"])
+                job_data["context"]["refactoring_result"] = await run_structured_agent(
+                    "refactoring", job_data["context"], job_data["context"]["sentinel_report"]["summary"]
                 )
-                job_data["context"]["refactoring_result"] = json.loads(refactoring_result)
                 if job_data["context"]["refactoring_result"].get("status") == "success":
                     next_state = "STATIC_ANALYSIS"
                 else:
@@ -227,21 +326,13 @@ async def workflow_manager(job_id: str):
                 next_state = "INFRASTRUCTURE_GENERATION"
 
             elif state == "INFRASTRUCTURE_GENERATION":
-                infra_agent = AGENT_MAPPING["infrastructure"]()
-                infra_result = await asyncio.to_thread(
-                    infra_agent.run, 
-                    json.dumps(job_data["context"]["selected_design"])
+                job_data["context"]["infrastructure_result"] = await run_structured_agent(
+                    "infrastructure", job_data["context"], job_data["context"]["selected_design"]
                 )
-                job_data["context"]["infrastructure_result"] = json.loads(infra_result)
                 next_state = "DEPLOYING"
 
             elif state == "DEPLOYING":
-                deployment_agent = AGENT_MAPPING["deployment"]()
-                deployment_result = await asyncio.to_thread(
-                    deployment_agent.run, 
-                    json.dumps(job_data["context"])
-                )
-                job_data["context"]["deployment_result"] = json.loads(deployment_result)
+                job_data["context"]["deployment_result"] = await run_structured_agent("deployment", job_data["context"])
                 if job_data["context"]["deployment_result"].get("status") == "success":
                     next_state = "MONITORING"
                 else:
@@ -251,11 +342,32 @@ async def workflow_manager(job_id: str):
 
             elif state == "MONITORING":
                 runtime_monitor = ALL_TOOLS["runtime_monitor"]
+                monitor_params = {
+                    "application_id": job_id,
+                    "pid": job_data["context"].get("deployment_result", {}).get("pid"),
+                }
+                # Sampling runs on the monitor's own thread; the job only waits on the event loop. Start, report
+                # and stop read /proc and join the sampler, so they run on the worker pool too
                 monitor_report = await asyncio.to_thread(
-                    runtime_monitor._run, 
-                    json.dumps({"application_id": job_id, "duration_minutes": 5})
-                )
-                monitor_report_json = json.loads(monitor_report)
+                    runtime_monitor._run, json.dumps({**monitor_params, "action": "start"}))
+                if monitor_report.startswith("{"):
+                    try:
+                        await asyncio.sleep(settings.MONITOR_OBSERVATION_SECONDS)
+                        monitor_report = await asyncio.to_thread(runtime_monitor._run, json.dumps({
+                            **monitor_params,
+                            "action": "report",
+                            "duration_minutes": settings.MONITOR_OBSERVATION_SECONDS / 60
+                        }))
+                    finally:
+                        # Cancelled or failed jobs must not leave the sampler thread behind
+                        await asyncio.to_thread(runtime_monitor._run, json.dumps({**monitor_params, "action": "stop"}))
+                if monitor_report.startswith("{"):
+                    monitor_report_json = json.loads(monitor_report)
+                else:
+                    # The tool reports failures (e.g. a pid that is not running) as plain text
+                    logger.warning("Job %s: runtime monitoring failed: %s", job_id, monitor_report)
+                    monitor_report_json = {"application_id": job_id, "status": "monitoring_failed",
+                                           "error": monitor_report, "overall_health": "unknown"}
                 job_data["context"]["monitor_report"] = monitor_report_json
 
                 if monitor_report_json.get("overall_health") == "unhealthy":
@@ -269,15 +381,12 @@ async def workflow_manager(job_id: str):
                     next_state = "COMPLETED"
 
             elif state == "PENDING_REFINEMENT":
-                refinement_agent = AGENT_MAPPING["refinement"]()
-                refinement_result = await asyncio.to_thread(
-                    refinement_agent.run, 
-                    json.dumps({
+                job_data["context"]["refinement_result"] = await run_structured_agent(
+                    "refinement", job_data["context"], {
                         "input_feedback": job_data["context"]["human_feedback"], 
                         "input_context": job_data["context"]
-                    })
+                    }
                 )
-                job_data["context"]["refinement_result"] = json.loads(refinement_result)
                 
                 result = job_data["context"]["refinement_result"]
                 if result.get("action_type") == "modify_context":
@@ -298,6 +407,10 @@ async def workflow_manager(job_id: str):
                 if next_state == "ERROR":
                     job_data["error_message"] = "Refinement agent could not determine next step."
 
+            WORKFLOW_STATE_SECONDS.labels(state).observe(time.perf_counter() - state_started)
+            state_span.set_attribute("job.next_state", next_state or "")
+            state_span.end()
+
             if next_state:
                 logger.info("Job %s transitioning from %s to %s", job_id, state, next_state)
                 job_data["state"] = next_state
@@ -306,20 +419,14 @@ async def workflow_manager(job_id: str):
             if state in ["IDEA_SELECTION", "DESIGN_SELECTION", "PENDING_APPROVAL", "COMPLETED", "ERROR"]:
                 if state in ["COMPLETED", "ERROR"]:
                     # Run retrospection
-                    retrospection_agent = AGENT_MAPPING["retrospection"]()
-                    retrospection_result = await asyncio.to_thread(
-                        retrospection_agent.run, 
-                        json.dumps(job_data["context"])
+                    job_data["context"]["retrospection_result"] = await run_structured_agent(
+                        "retrospection", job_data["context"]
                     )
-                    job_data["context"]["retrospection_result"] = json.loads(retrospection_result)
                     
                     # Run prompt optimization
-                    prompt_optimizer_agent = AGENT_MAPPING["prompt_optimizer"]()
-                    optimized_prompts_result = await asyncio.to_thread(
-                        prompt_optimizer_agent.run, 
-                        json.dumps(job_data["context"]["retrospection_result"])
+                    job_data["context"]["optimized_prompts_result"] = await run_structured_agent(
+                        "prompt_optimizer", job_data["context"], job_data["context"]["retrospection_result"]
                     )
-                    job_data["context"]["optimized_prompts_result"] = json.loads(optimized_prompts_result)
                     
                     # Save final state
                     redis_client.set(job_id, json.dumps(job_data))
@@ -327,6 +434,8 @@ async def workflow_manager(job_id: str):
                 break
 
         except Exception as e:
+            if state_span is not None:
+                state_span.end(error=e)
             logger.error("Error in workflow manager for job %s: %s", job_id, str(e), exc_info=True)
             try:
                 job_data["state"] = "ERROR"
@@ -336,6 +445,11 @@ async def workflow_manager(job_id: str):
                 logger.error("Failed to update job state after error", exc_info=True)
             break
 
+@app.get("/metrics", tags=["Status"], response_class=PlainTextResponse)
+async def metrics():
+    """Expose latency histograms and worker gauges in the Prometheus text format."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/start_project", tags=["Projects"])
 async def start_project(
     prompt: str, 
@@ -357,7 +471,7 @@ async def start_project(
             "pdf_path": pdf_path,
             "files_to_ingest": files_to_ingest
         }
-        job_data = {"job_id": job_id, "state": "INGESTION", "context": initial_context}
+        job_data = {"job_id": job_id, "state": "INGESTION", "context": initial_context, "trace_id": new_trace_id()}
         redis_client.set(job_id, json.dumps(job_data))
         background_tasks.add_task(workflow_manager, job_id)
         
@@ -484,4 +598,43 @@ async def get_status(job_id: str):
         raise
     except Exception as e:
         logger.error("Error getting status for job %s: %s", job_id, str(e), exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/jobs/{job_id}/trace", tags=["Status"])
+async def get_trace(job_id: str):
+    """Get the span tree of the job: workflow runs, states, agent attempts, LLM and tool calls."""
+    try:
+        job_data_str = redis_client.get(job_id)
+        if not job_data_str:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+        trace_id = job_trace_id(job_id, json.loads(job_data_str))
+        spans = await asyncio.to_thread(get_tracer().get_trace, trace_id)
+        return {"job_id": job_id, "trace_id": trace_id, "spans": spans}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error getting trace for job %s: %s", job_id, str(e), exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/jobs/{job_id}/usage", tags=["Status"])
+async def get_job_usage(job_id: str):
+    """Get the job's token, latency, retry and tool-call usage, by state and by agent."""
+    try:
+        if not redis_client.exists(job_id):
+            raise HTTPException(status_code=404, detail="Job not found")
+        return usage_store.job_usage(job_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error getting usage for job %s: %s", job_id, str(e), exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/usage", tags=["Status"])
+async def get_usage_rollup():
+    """Get usage rolled up across all jobs, agents ordered by tokens consumed."""
+    try:
+        return usage_store.rollup()
+    except Exception as e:
+        logger.error("Error getting usage roll-up: %s", str(e), exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
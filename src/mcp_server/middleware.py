@@ -3,6 +3,7 @@ from fastapi.responses import JSONResponse
 import logging
 from typing import Callable
 from src.utils.config import get_settings
+from src.utils.metrics import HTTP_REQUEST_SECONDS
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -67,7 +68,7 @@ async def request_logging_middleware(request: Request, call_next: Callable):
     """
     import time
     
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     # Log request
     logger.info(
@@ -80,8 +81,14 @@ async def request_logging_middleware(request: Request, call_next: Callable):
     response = await call_next(request)
     
     # Log response
-    process_time = (time.time() - start_time) * 1000
+    elapsed = time.perf_counter() - start_time
+    process_time = elapsed * 1000
     status_code = response.status_code
+    # Label by route template (/status/{job_id}) so job ids don't explode the series count
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.labels(
+        request.method, getattr(route, "path", "unmatched"), status_code
+    ).observe(elapsed)
     logger.info(
         "Request completed: %s %s - Status: %d - Duration: %.2fms",
         request.method,
@@ -1,10 +1,18 @@
 import os
+import uuid
+import shutil
 import logging
 import json
-import importlib
 import ast
-from typing import Dict, Optional
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+from dataclasses import dataclass, field
+from src.utils.sandbox import ImportSandbox
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
@@ -14,17 +22,223 @@ class ModificationPlan:
     new_agents: Dict[str, str]
     mcp_modifications: list[str]
 
+@dataclass
+class CodeAnalysis:
+    """Everything the validators need from one module, collected in a single AST walk."""
+    class_bases: Dict[str, Set[str]] = field(default_factory=dict)
+    # Function and method names plus class-level attribute names
+    members: Set[str] = field(default_factory=set)
+    # Names assigned anywhere, e.g. module-level prompts
+    assigned: Set[str] = field(default_factory=set)
+
+    def has_subclass_of(self, base_class: str) -> bool:
+        return any(base_class in bases for bases in self.class_bases.values())
+
+def analyze_code(code: str) -> CodeAnalysis:
+    """Parses ``code`` once and walks it once; raises SyntaxError for invalid code."""
+    analysis = CodeAnalysis()
+    for node in ast.walk(ast.parse(code)):
+        if isinstance(node, ast.ClassDef):
+            analysis.class_bases[node.name] = {
+                base.id if isinstance(base, ast.Name) else base.attr
+                for base in node.bases if isinstance(base, (ast.Name, ast.Attribute))
+            }
+            # Class attributes such as a tool's name/description count as members
+            for item in node.body:
+                if isinstance(item, ast.AnnAssign) and isinstance(item.target, ast.Name):
+                    analysis.members.add(item.target.id)
+                elif isinstance(item, ast.Assign):
+                    analysis.members.update(t.id for t in item.targets if isinstance(t, ast.Name))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            analysis.members.add(node.name)
+        elif isinstance(node, ast.Assign):
+            analysis.assigned.update(t.id for t in node.targets if isinstance(t, ast.Name))
+    return analysis
+
+TRANSACTION_PREFIX = ".txn-"
+JOURNAL_FILE = "journal.json"
+LOCK_SUFFIX = ".lock"
+
+def _fsync_directory(path: str) -> None:
+    """Makes renames in ``path`` durable; a no-op where directories cannot be opened (Windows)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+class FileTransaction:
+    """
+    Writes a set of files all-or-nothing.
+
+    Every file is first written and fsynced under a staging directory next to the
+    targets. A journal recording which targets already existed is fsynced before
+    the first target is touched. Each original is hard-linked into the staging
+    directory, then the staged file is renamed over the target, which is atomic,
+    so readers only ever see the old or the complete new module. Any failure, or
+    a crash detected later by ``recover``, restores every original and removes
+    every new file.
+
+    The owner holds an flock on ``<staging directory>.lock`` from before the
+    directory exists until it is removed; the kernel drops the lock when the
+    owner dies, which is how ``recover`` tells a crashed transaction from one
+    still running in another thread or process.
+    """
+
+    def __init__(self, root: str, files: Dict[str, str], max_workers: int = 8):
+        self.root = root
+        self.files = files
+        self.max_workers = max_workers
+        self.path = os.path.join(root, f"{TRANSACTION_PREFIX}{uuid.uuid4().hex}")
+        self._entries: List[Dict] = []
+        self._lock_file = None
+
+    def stage(self) -> Dict[str, str]:
+        """Writes and fsyncs every file under the staging directory; returns target -> staged path."""
+        self._lock_file = _try_lock(f"{self.path}{LOCK_SUFFIX}")
+        os.makedirs(self.path)
+        staged = {}
+        for index, target in enumerate(self.files):
+            folder = os.path.join(self.path, str(index))
+            os.mkdir(folder)
+            staged[target] = os.path.join(folder, os.path.basename(target))
+
+        def write(target: str) -> None:
+            with open(staged[target], "w") as f:
+                f.write(self.files[target])
+                f.flush()
+                os.fsync(f.fileno())
+
+        # fsync releases the GIL, so large plans stage in parallel
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(staged)))) as pool:
+            list(pool.map(write, staged))
+        _fsync_directory(self.path)
+        return staged
+
+    def commit(self, staged: Dict[str, str]) -> None:
+        for index, target in enumerate(staged):
+            backup = os.path.join(self.path, f"{index}.orig") if os.path.exists(target) else None
+            self._entries.append({"target": target, "backup": backup})
+        self._write_journal()
+        for entry, staged_path in zip(self._entries, staged.values()):
+            if entry["backup"]:
+                try:
+                    os.link(entry["target"], entry["backup"])
+                except OSError:
+                    shutil.copy2(entry["target"], entry["backup"])
+            os.replace(staged_path, entry["target"])
+        for directory in {os.path.dirname(entry["target"]) for entry in self._entries}:
+            _fsync_directory(directory)
+
+    def _write_journal(self) -> None:
+        journal_path = os.path.join(self.path, JOURNAL_FILE)
+        with open(journal_path, "w") as f:
+            json.dump(self._entries, f)
+            f.flush()
+            os.fsync(f.fileno())
+        _fsync_directory(self.path)
+
+    def rollback(self) -> None:
+        _rollback_entries(self._entries)
+        self.close()
+
+    def close(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+        _unlock(self._lock_file, f"{self.path}{LOCK_SUFFIX}")
+        self._lock_file = None
+
+    @staticmethod
+    def recover(root: str) -> List[str]:
+        """Rolls back transactions whose owner died; returns the restored targets."""
+        restored = []
+        if not os.path.isdir(root):
+            return restored
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if not (name.startswith(TRANSACTION_PREFIX) and os.path.isdir(path)):
+                continue
+            try:
+                lock_file = _try_lock(f"{path}{LOCK_SUFFIX}", blocking=False)
+            except BlockingIOError:
+                # Another thread or process is still applying it
+                continue
+            try:
+                if not os.path.isdir(path):
+                    # Finished between listdir and taking the lock
+                    continue
+                try:
+                    with open(os.path.join(path, JOURNAL_FILE)) as f:
+                        entries = json.load(f)
+                except (OSError, ValueError):
+                    # Crashed while staging: no target was touched yet
+                    entries = []
+                _rollback_entries(entries)
+                restored.extend(entry["target"] for entry in entries)
+                shutil.rmtree(path, ignore_errors=True)
+                logger.warning("Rolled back interrupted modification %s", name)
+            finally:
+                _unlock(lock_file, f"{path}{LOCK_SUFFIX}")
+        return restored
+
+def _try_lock(lock_path: str, blocking: bool = True):
+    """Opens and flocks ``lock_path``; raises BlockingIOError if non-blocking and held elsewhere."""
+    if fcntl is None:
+        # Without flock every leftover counts as crashed, so recover only at startup
+        return None
+    lock_file = open(lock_path, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BaseException:
+        lock_file.close()
+        raise
+    return lock_file
+
+def _unlock(lock_file, lock_path: str) -> None:
+    if lock_file is None:
+        return
+    # Unlinked while still held, so no one can lock a file that is about to vanish
+    try:
+        os.remove(lock_path)
+    except FileNotFoundError:
+        pass
+    lock_file.close()
+
+def _rollback_entries(entries: List[Dict]) -> None:
+    for entry in reversed(entries):
+        target, backup = entry["target"], entry["backup"]
+        if backup is None:
+            if os.path.exists(target):
+                os.remove(target)
+        elif os.path.exists(backup):
+            # The backup only exists once the original was linked, so this is always the original
+            os.replace(backup, target)
+    for directory in {os.path.dirname(entry["target"]) for entry in entries}:
+        _fsync_directory(directory)
+
 class SystemModifier:
-    def __init__(self, base_path: str):
+    def __init__(self, base_path: str, sandbox_timeout: float = 30.0, sandbox_memory_mb: Optional[int] = 2048,
+                 sandbox_workers: int = 4):
         self.base_path = base_path
         self.tools_dir = os.path.join(base_path, "src", "tools")
         self.agents_dir = os.path.join(base_path, "src", "agents")
+        self.sandbox = ImportSandbox([base_path], timeout=sandbox_timeout, memory_mb=sandbox_memory_mb,
+                                     max_workers=sandbox_workers)
         
         # Ensure directories exist
         for dir_path in [self.tools_dir, self.agents_dir]:
             if not os.path.exists(dir_path):
                 raise ValueError(f"Required directory not found: {dir_path}")
 
+    @staticmethod
+    def recover_interrupted(base_path: str) -> List[str]:
+        """Undoes plans that were half applied when their process died; run once at startup."""
+        return FileTransaction.recover(os.path.join(base_path, "src"))
+
     def validate_python_code(self, code: str) -> bool:
         """
         Validate that the provided code is syntactically correct Python code.
@@ -57,18 +271,18 @@ class SystemModifier:
             bool: True if valid, False otherwise
         """
         try:
-            tree = ast.parse(code)
-            for node in ast.walk(tree):
-                if isinstance(node, ast.ClassDef):
-                    for base in node.bases:
-                        if isinstance(base, ast.Name) and base.id == expected_base_class:
-                            return True
-            logger.error("Code does not contain a class inheriting from %s", expected_base_class)
-            return False
+            return self._check_base_class(analyze_code(code), expected_base_class)
         except Exception as e:
             logger.error("Error validating class structure: %s", str(e))
             raise
 
+    @staticmethod
+    def _check_base_class(analysis: CodeAnalysis, expected_base_class: str) -> bool:
+        if analysis.has_subclass_of(expected_base_class):
+            return True
+        logger.error("Code does not contain a class inheriting from %s", expected_base_class)
+        return False
+
     def safe_write_file(self, file_path: str, content: str) -> None:
         """
         Safely write content to a file with proper error handling.
@@ -103,34 +317,21 @@ class SystemModifier:
     def validate_tool_code(self, code: str) -> bool:
         """Validate that the tool code follows required patterns."""
         try:
-            # Check basic syntax
-            if not self.validate_python_code(code):
-                return False
-
-            # Check inheritance
-            if not self.validate_class_structure(code, "BaseTool"):
+            # Syntax, inheritance and required members all come from one parse
+            analysis = analyze_code(code)
+            if not self._check_base_class(analysis, "BaseTool"):
                 return False
 
-            # Check for required methods
-            tree = ast.parse(code)
-            required_methods = {"_run", "name", "description"}
-            found_methods = set()
-
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    found_methods.add(node.name)
-                elif isinstance(node, ast.ClassDef):
-                    for item in node.body:
-                        if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                            found_methods.add(item.name)
-
-            missing_methods = required_methods - found_methods
-            if missing_methods:
-                logger.error("Tool code missing required methods: %s", missing_methods)
+            missing_members = {"_run", "name", "description"} - analysis.members
+            if missing_members:
+                logger.error("Tool code missing required methods: %s", missing_members)
                 return False
 
             return True
 
+        except SyntaxError as e:
+            logger.error("Syntax error in generated code: %s", str(e))
+            raise
         except Exception as e:
             logger.error("Error validating tool code: %s", str(e))
             raise
@@ -138,43 +339,58 @@ class SystemModifier:
     def validate_agent_code(self, code: str) -> bool:
         """Validate that the agent code follows required patterns."""
         try:
-            # Check basic syntax
-            if not self.validate_python_code(code):
-                return False
-
-            # Check inheritance
-            if not self.validate_class_structure(code, "BaseAgent"):
+            analysis = analyze_code(code)
+            if not self._check_base_class(analysis, "BaseAgent"):
                 return False
 
-            # Check for required attributes/structure
-            tree = ast.parse(code)
-            has_prompt = False
-            has_init = False
-
-            for node in ast.walk(tree):
-                if isinstance(node, ast.Assign):
-                    for target in node.targets:
-                        if isinstance(target, ast.Name) and target.id.endswith("_PROMPT"):
-                            has_prompt = True
-                elif isinstance(node, ast.FunctionDef) and node.name == "__init__":
-                    has_init = True
-
-            if not (has_prompt and has_init):
+            has_prompt = any(name.endswith("_PROMPT") for name in analysis.assigned)
+            if not (has_prompt and "__init__" in analysis.members):
                 logger.error("Agent code missing required components (prompt or __init__)")
                 return False
 
             return True
 
+        except SyntaxError as e:
+            logger.error("Syntax error in generated code: %s", str(e))
+            raise
         except Exception as e:
             logger.error("Error validating agent code: %s", str(e))
             raise
 
-    def apply_modifications(self, plan: Dict) -> str:
+    def validate_plan(self, plan: Dict) -> Dict[str, str]:
+        """
+        Validate every tool and agent in a plan before anything is written.
+        
+        Args:
+            plan: A dictionary containing new_tools and new_agents
+            
+        Returns:
+            Dict[str, str]: Target path of each component mapped to its code
+            
+        Raises:
+            ValueError: If any component is invalid
+        """
+        files = {}
+        for key, directory, validate, kind in (
+            ("new_tools", self.tools_dir, self.validate_tool_code, "tool"),
+            ("new_agents", self.agents_dir, self.validate_agent_code, "agent"),
+        ):
+            for filename, code in plan.get(key, {}).items():
+                if not filename.endswith(".py"):
+                    filename = f"{filename}.py"
+                if not validate(code):
+                    raise ValueError(f"Invalid {kind} code in {filename}")
+                files[os.path.join(directory, filename)] = code
+        return files
+
+    def apply_modifications(self, plan: Dict, test_imports: bool = False) -> str:
         """
-        Apply the system modifications specified in the plan.
+        Apply the system modifications specified in the plan as one transaction:
+        either every file is written or, on any failure, none is.
         
         Args:
             plan: A dictionary containing new_tools, new_agents, and mcp_modifications
+            test_imports: Import-test the staged components in the sandbox before committing
             
         Returns:
             str: A report of the modifications made
@@ -189,29 +405,12 @@ class SystemModifier:
         modification_report = []
 
         try:
-            # Handle new tools
-            for filename, code in plan.get("new_tools", {}).items():
-                if not filename.endswith(".py"):
-                    filename = f"{filename}.py"
-                file_path = os.path.join(self.tools_dir, filename)
-                
-                if self.validate_tool_code(code):
-                    self.safe_write_file(file_path, code)
-                    modification_report.append(f"Added new tool: {filename}")
-                else:
-                    raise ValueError(f"Invalid tool code in {filename}")
-
-            # Handle new agents
-            for filename, code in plan.get("new_agents", {}).items():
-                if not filename.endswith(".py"):
-                    filename = f"{filename}.py"
-                file_path = os.path.join(self.agents_dir, filename)
-                
-                if self.validate_agent_code(code):
-                    self.safe_write_file(file_path, code)
-                    modification_report.append(f"Added new agent: {filename}")
-                else:
-                    raise ValueError(f"Invalid agent code in {filename}")
+            # Validate the whole plan before writing any file
+            files = self.validate_plan(plan)
+            self.write_files(files, test_imports=test_imports)
+            for file_path in files:
+                kind = "tool" if os.path.dirname(file_path) == self.tools_dir else "agent"
+                modification_report.append(f"Added new {kind}: {os.path.basename(file_path)}")
 
             # Record MCP modifications (these are applied by the MCP server)
             for mod in plan.get("mcp_modifications", []):
@@ -225,9 +424,40 @@ class SystemModifier:
             logger.error(error_msg, exc_info=True)
             raise RuntimeError(error_msg)
 
+    def write_files(self, files: Dict[str, str], test_imports: bool = False) -> None:
+        """
+        Write several files all-or-nothing (see FileTransaction).
+        
+        Args:
+            files: Target path mapped to content
+            test_imports: Import-test the staged files before any target is replaced
+            
+        Raises:
+            ValueError: If a staged component fails its import test
+            IOError: If file operations fail; every target is then restored
+        """
+        if not files:
+            return
+        transaction = FileTransaction(os.path.join(self.base_path, "src"), files)
+        try:
+            staged = transaction.stage()
+            if test_imports:
+                results = self.test_new_components(list(staged.values()))
+                # Report the target paths rather than the staging copies
+                errors = [results[path].replace(path, target) for target, path in staged.items() if results[path]]
+                if errors:
+                    raise ValueError("; ".join(errors))
+            transaction.commit(staged)
+        except BaseException:
+            transaction.rollback()
+            logger.error("Rolled back %d file(s)", len(files))
+            raise
+        transaction.close()
+        logger.info("Committed %d file(s)", len(files))
+
     def test_new_component(self, file_path: str) -> Optional[str]:
         """
-        Test a newly added component by attempting to import it.
+        Test a newly added component by importing it in a sandboxed interpreter.
         
         Args:
             file_path: Path to the new component
@@ -235,19 +465,25 @@ class SystemModifier:
         Returns:
             Optional[str]: Error message if import fails, None if successful
         """
-        try:
-            # Get module name from file path
-            module_name = os.path.splitext(os.path.basename(file_path))[0]
-            
-            # Try importing the module
-            spec = importlib.util.spec_from_file_location(module_name, file_path)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            
-            logger.info("Successfully imported new component: %s", module_name)
-            return None
+        return self.test_new_components([file_path])[file_path]
 
-        except Exception as e:
-            error_msg = f"Failed to import {file_path}: {str(e)}"
-            logger.error(error_msg, exc_info=True)
-            return error_msg
\ No newline at end of file
+    def test_new_components(self, file_paths: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Import-test new components in parallel, each in its own time- and
+        memory-limited subprocess, so generated code never runs in the server.
+        
+        Args:
+            file_paths: Paths to the new components
+            
+        Returns:
+            Dict[str, Optional[str]]: Error message per path, None for those that import
+        """
+        results = {}
+        for file_path, error in self.sandbox.check_many(file_paths).items():
+            if error is None:
+                logger.info("Successfully imported new component: %s", os.path.basename(file_path))
+                results[file_path] = None
+            else:
+                results[file_path] = f"Failed to import {file_path}: {error}"
+                logger.error(results[file_path])
+        return results
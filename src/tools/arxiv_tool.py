@@ -1,31 +1,160 @@
 import arxiv
-from typing import ClassVar
+import os
+import re
+import json
+import asyncio
+import threading
+from typing import ClassVar, Dict, List, Optional
 from langchain_community.tools import BaseTool
+from src.utils.text_index import BM25Index
+from src.utils.ttl_cache import TTLCache
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used as the cache key."""
+    return re.sub(r"\s+", " ", query).strip().casefold()
+
+
+class ArxivApiBackend:
+    """Searches the live arXiv API through one shared client (and HTTP session)."""
+
+    name = "api"
+    _client: Optional[arxiv.Client] = None
+    _client_lock = threading.Lock()
+
+    @classmethod
+    def client(cls) -> arxiv.Client:
+        with cls._client_lock:
+            if cls._client is None:
+                cls._client = arxiv.Client()
+            return cls._client
+
+    def search(self, query: str, max_results: int) -> List[Dict]:
+        search = arxiv.Search(query=query, max_results=max_results)
+        return [
+            {
+                "title": paper.title,
+                "authors": [author.name for author in paper.authors],
+                "summary": paper.summary,
+                "pdf_url": paper.pdf_url,
+            }
+            for paper in self.client().results(search)
+        ]
+
+
+class LocalArxivIndex:
+    """
+    Answers queries from a local arXiv metadata snapshot (JSON lines with ``id``,
+    ``title``, ``authors`` and ``abstract``, as in the public Kaggle dump).
+
+    The snapshot is loaded into a BM25 index on first use and reloaded when the
+    file is replaced, so a periodic import job only has to swap the file.
+    """
+
+    name = "local"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime: Optional[float] = None
+        self._papers: List[Dict] = []
+        self._index = BM25Index()
+        self._lock = threading.Lock()
+
+    def _load_if_changed(self) -> None:
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._mtime:
+            return
+        papers, index = [], BM25Index()
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                authors = record.get("authors", [])
+                if isinstance(authors, str):
+                    authors = [a.strip() for a in re.split(r",| and ", authors) if a.strip()]
+                papers.append({
+                    "title": " ".join(record.get("title", "").split()),
+                    "authors": authors,
+                    "summary": " ".join(record.get("abstract", "").split()),
+                    "pdf_url": record.get("pdf_url") or f"https://arxiv.org/pdf/{record.get('id', '')}",
+                })
+                # Title terms count double
+                index.add(f"{record.get('title', '')} {record.get('title', '')} {record.get('abstract', '')}")
+        self._papers, self._index, self._mtime = papers, index, mtime
+
+    def search(self, query: str, max_results: int) -> List[Dict]:
+        with self._lock:
+            self._load_if_changed()
+            papers, index = self._papers, self._index
+        return [papers[doc_id] for doc_id, _ in index.search(query, max_results)]
+
 
 class ArxivTool(BaseTool):
     name: ClassVar[str] = "ArxivTool"
     description: ClassVar[str] = "Search arxiv papers. Input should be a search query string."
 
-    def _run(self, query: str) -> str:
-        client = arxiv.Client()
-        search = arxiv.Search(query=query, max_results=5)
+    max_results: ClassVar[int] = 5
+    _backend: ClassVar[Optional[object]] = None
+    _cache: ClassVar[Optional[TTLCache]] = None
+    _setup_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    @classmethod
+    def configure(cls, backend=None, cache_ttl: Optional[float] = None) -> None:
+        """Selects the backend and cache; by default both come from Settings."""
+        from src.utils.config import get_settings
 
+        with cls._setup_lock:
+            settings = None
+            if backend is None:
+                settings = get_settings()
+                if settings.ARXIV_BACKEND == "local":
+                    if not settings.ARXIV_INDEX_PATH:
+                        raise ValueError("ARXIV_INDEX_PATH must be set to use the local arxiv backend")
+                    backend = LocalArxivIndex(settings.ARXIV_INDEX_PATH)
+                else:
+                    backend = ArxivApiBackend()
+            if cache_ttl is None:
+                cache_ttl = (settings or get_settings()).ARXIV_CACHE_TTL
+            cls._backend = backend
+            cls._cache = TTLCache(ttl=cache_ttl, max_size=2048)
+
+    def _cached(self, query: str):
+        if ArxivTool._backend is None:
+            self.configure()
+        key = (ArxivTool._backend.name, normalize_query(query), self.max_results)
+        return key, ArxivTool._cache.get(key)
+
+    def _run(self, query: str) -> str:
         try:
-            results = list(client.results(search))
+            key, cached = self._cached(query)
+            if cached is not None:
+                return cached
+
+            results = ArxivTool._backend.search(query, self.max_results)
             if not results:
                 return "No papers found matching the query."
 
             output = []
             for paper in results:
-                output.append(f"Title: {paper.title}")
-                output.append(f"Authors: {', '.join(author.name for author in paper.authors)}")
-                output.append(f"Summary: {paper.summary[:300]}...")
-                output.append(f"URL: {paper.pdf_url}")
+                output.append(f"Title: {paper['title']}")
+                output.append(f"Authors: {', '.join(paper['authors'])}")
+                output.append(f"Summary: {paper['summary'][:300]}...")
+                output.append(f"URL: {paper['pdf_url']}")
                 output.append("-" * 80)
 
-            return "\n".join(output)
+            report = "\n".join(output)
+            ArxivTool._cache.set(key, report)
+            return report
         except Exception as e:
             return f"Error searching arxiv: {str(e)}"
 
     async def _arun(self, query: str) -> str:
-        raise NotImplementedError("ArxivTool does not support async")
\ No newline at end of file
+        # Cache hits are answered on the event loop; only misses need a worker thread
+        try:
+            _, cached = self._cached(query)
+        except Exception:
+            cached = None
+        if cached is not None:
+            return cached
+        return await asyncio.to_thread(self._run, query)
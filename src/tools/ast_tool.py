@@ -1,30 +1,304 @@
 import ast
-from typing import ClassVar
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import ClassVar, Dict, List, Optional, Set, Tuple
 from langchain_community.tools import BaseTool
 
+# Below this many files the process pool costs more than it saves.
+PARALLEL_PARSE_THRESHOLD = 32
+SKIPPED_DIRS = {"__pycache__", ".git", ".venv", "venv", "node_modules", ".tox", ".mypy_cache"}
+
+
+def _module_name(rel_path: str) -> str:
+    """Converts a path relative to the project root into a dotted module name."""
+    parts = rel_path[:-3].split(os.sep)
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+def _call_name(func: ast.AST) -> Optional[str]:
+    """Returns the dotted name of a call target (e.g. ``os.path.join``), if it has one."""
+    parts = []
+    while isinstance(func, ast.Attribute):
+        parts.append(func.attr)
+        func = func.value
+    if isinstance(func, ast.Name):
+        parts.append(func.id)
+        return ".".join(reversed(parts))
+    return None
+
+
+def parse_module_file(file_path: str) -> Dict:
+    """
+    Parses a single Python file into the raw facts needed for the project graphs.
+    Runs inside worker processes, so it must stay a picklable top-level function.
+
+    Returns:
+        Dict: ``imports`` as (module, name, level, asname) tuples, ``definitions`` (top-level
+        function/class names), ``calls`` mapping each function qualname to the dotted
+        names it calls, and ``error`` if the file could not be parsed.
+    """
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            tree = ast.parse(f.read(), filename=file_path)
+    except (SyntaxError, ValueError, OSError) as e:
+        return {"imports": [], "definitions": [], "calls": {}, "error": str(e)}
+
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.append((alias.name, None, 0, alias.asname))
+        elif isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                imports.append((node.module or "", alias.name, node.level, alias.asname))
+
+    definitions = [
+        node.name for node in tree.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+    ]
+
+    calls: Dict[str, List[str]] = {}
+
+    def visit(node: ast.AST, scope: List[str]) -> None:
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                inner = scope + [child.name]
+                if not isinstance(child, ast.ClassDef):
+                    calls.setdefault(".".join(inner), [])
+                visit(child, inner)
+            else:
+                if isinstance(child, ast.Call) and scope:
+                    name = _call_name(child.func)
+                    if name and ".".join(scope) in calls:
+                        calls[".".join(scope)].append(name)
+                visit(child, scope)
+
+    visit(tree, [])
+    return {"imports": imports, "definitions": definitions, "calls": calls, "error": None}
+
+
+class ProjectGraph:
+    """
+    Module import graph and function call graph for a whole source tree.
+
+    Module names are dotted paths relative to the project root. Call graph nodes
+    are ``module:qualname`` strings; calls that cannot be resolved to a function in
+    the project are kept under their raw dotted name.
+    """
+
+    def __init__(self, root: str, parsed: Dict[str, Dict]):
+        self.root = root
+        self.parsed = parsed
+        self.modules: Dict[str, str] = {_module_name(p): p for p in parsed}
+        self.imports: Dict[str, Set[str]] = {m: set() for m in self.modules}
+        self.external_imports: Dict[str, Set[str]] = {m: set() for m in self.modules}
+        self.importers: Dict[str, Set[str]] = {m: set() for m in self.modules}
+        self.calls: Dict[str, Set[str]] = {}
+        self.callers: Dict[str, Set[str]] = {}
+        self.errors: Dict[str, str] = {p: r["error"] for p, r in parsed.items() if r["error"]}
+        self._build()
+
+    def _resolve_import(self, module: str, rel_path: str, target: str, name: Optional[str], level: int) -> Tuple[Optional[str], Optional[str]]:
+        """Returns (internal module, imported symbol) for one import statement entry."""
+        if level:
+            package = module.split(".") if rel_path.endswith("__init__.py") else module.split(".")[:-1]
+            if level > 1:
+                package = package[:-(level - 1)] if level - 1 <= len(package) else []
+            target = ".".join(package + ([target] if target else []))
+        if name and f"{target}.{name}" in self.modules:
+            return f"{target}.{name}", None
+        if target in self.modules:
+            return target, name
+        return None, None
+
+    def _build(self) -> None:
+        for module, rel_path in self.modules.items():
+            facts = self.parsed[rel_path]
+            # Local names that refer to project modules or project symbols
+            module_aliases: Dict[str, str] = {}
+            symbol_aliases: Dict[str, str] = {}
+            for target, name, level, asname in facts["imports"]:
+                resolved, symbol = self._resolve_import(module, rel_path, target, name, level)
+                if resolved is None:
+                    self.external_imports[module].add(target if not level else f"{'.' * level}{target}")
+                    continue
+                if resolved != module:
+                    self.imports[module].add(resolved)
+                    self.importers[resolved].add(module)
+                if symbol is None:
+                    if name is None:
+                        # "import a.b" binds "a", "import a.b as c" binds "c"
+                        module_aliases[asname or resolved] = resolved
+                    else:
+                        module_aliases[asname or name] = resolved
+                elif symbol != "*":
+                    symbol_aliases[asname or symbol] = f"{resolved}:{symbol}"
+
+            local = {d: f"{module}:{d}" for d in facts["definitions"]}
+            for qualname, called in facts["calls"].items():
+                caller = f"{module}:{qualname}"
+                edges = self.calls.setdefault(caller, set())
+                for name in called:
+                    callee = self._resolve_call(name, local, module_aliases, symbol_aliases)
+                    edges.add(callee)
+                    self.callers.setdefault(callee, set()).add(caller)
+
+    @staticmethod
+    def _resolve_call(name: str, local: Dict[str, str], module_aliases: Dict[str, str], symbol_aliases: Dict[str, str]) -> str:
+        if name in local:
+            return local[name]
+        if name in symbol_aliases:
+            return symbol_aliases[name]
+        head, _, rest = name.rpartition(".")
+        if head in module_aliases:
+            return f"{module_aliases[head]}:{rest}"
+        return name
+
+    def to_module(self, target: str) -> Optional[str]:
+        """Accepts either a dotted module name or a path relative to the root."""
+        if target in self.modules:
+            return target
+        rel = os.path.normpath(target)
+        if rel.endswith(".py"):
+            name = _module_name(rel)
+            if name in self.modules:
+                return name
+        return None
+
+    def dependents(self, target: str) -> List[str]:
+        """Modules that directly import ``target``."""
+        module = self.to_module(target)
+        return sorted(self.importers.get(module, ())) if module else []
+
+    def affected_modules(self, target: str) -> List[str]:
+        """``target`` plus every module that transitively imports it."""
+        module = self.to_module(target)
+        if module is None:
+            return []
+        seen = {module}
+        stack = [module]
+        while stack:
+            for importer in self.importers[stack.pop()]:
+                if importer not in seen:
+                    seen.add(importer)
+                    stack.append(importer)
+        return sorted(seen)
+
+    def affected_files(self, target: str) -> List[str]:
+        """Files (relative to the root) that may need re-checking when ``target`` changes."""
+        return sorted(self.modules[m] for m in self.affected_modules(target))
+
+    def callers_of(self, symbol: str) -> List[str]:
+        return sorted(self.callers.get(symbol, ()))
+
+    def summary(self) -> Dict:
+        return {
+            "root": self.root,
+            "modules": len(self.modules),
+            "import_edges": sum(len(v) for v in self.imports.values()),
+            "functions": len(self.calls),
+            "call_edges": sum(len(v) for v in self.calls.values()),
+            "parse_errors": self.errors,
+        }
+
+
+_graph_cache: Dict[str, Tuple[Dict[str, Tuple[int, int]], ProjectGraph]] = {}
+_graph_cache_lock = threading.Lock()
+
+
+def _scan_python_files(root: str) -> Dict[str, Tuple[int, int]]:
+    """Maps each .py file below ``root`` (relative path) to its (mtime_ns, size)."""
+    found = {}
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIPPED_DIRS:
+                        stack.append(entry.path)
+                elif entry.name.endswith(".py") and entry.is_file():
+                    stat = entry.stat()
+                    found[os.path.relpath(entry.path, root)] = (stat.st_mtime_ns, stat.st_size)
+    return found
+
+
+def get_project_graph(root: str, max_workers: Optional[int] = None) -> ProjectGraph:
+    """
+    Returns the import/call graph for the tree at ``root``.
+
+    Graphs are cached per root. On a repeat call only files whose mtime or size
+    changed are re-parsed; if nothing changed the cached graph is returned as is.
+    Parsing is spread over a process pool for large trees.
+    """
+    root = os.path.abspath(root)
+    signature = _scan_python_files(root)
+
+    with _graph_cache_lock:
+        cached = _graph_cache.get(root)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    previous = cached[1].parsed if cached else {}
+    previous_sig = cached[0] if cached else {}
+    parsed = {p: previous[p] for p in signature if p in previous and previous_sig.get(p) == signature[p]}
+    stale = [p for p in signature if p not in parsed]
+
+    paths = [os.path.join(root, p) for p in stale]
+    if len(paths) >= PARALLEL_PARSE_THRESHOLD:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(parse_module_file, paths, chunksize=16))
+    else:
+        results = [parse_module_file(p) for p in paths]
+    parsed.update(zip(stale, results))
+
+    graph = ProjectGraph(root, parsed)
+    with _graph_cache_lock:
+        _graph_cache[root] = (signature, graph)
+    return graph
+
+
 class ASTAnalysisTool(BaseTool):
     name: ClassVar[str] = "ASTAnalysisTool"
-    description: ClassVar[str] = "Analyze Python code structure using AST. Input should be Python code as a string."
+    description: ClassVar[str] = (
+        "Analyze Python code structure using AST. Input should be a JSON object with 'action'. "
+        "Snippet actions ('find_functions', 'find_classes', 'find_imports') take 'code'. "
+        "Project actions ('project_summary', 'import_graph', 'call_graph', 'dependents', "
+        "'affected_files', 'callers') take a workspace-relative 'path' and, where needed, a 'target' "
+        "module/file or function ('module:qualname')."
+    )
 
     def _run(self, tool_input: str):
         import json
         try:
             params = json.loads(tool_input)
             action = params.get("action")
+
+            if action in {"project_summary", "import_graph", "call_graph", "dependents", "affected_files", "callers"}:
+                return self._run_project_action(action, params)
+
             code = params.get("code", "")
 
             tree = ast.parse(code)
-            
+
             if action == "find_functions":
-                functions = [node.name for node in ast.walk(tree) if isinstance(node, ast.FunctionDef)]
+                functions = [node.name for node in ast.walk(tree) if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))]
                 return json.dumps(functions)
-            
+
             elif action == "find_classes":
                 classes = [node.name for node in ast.walk(tree) if isinstance(node, ast.ClassDef)]
                 return json.dumps(classes)
 
             elif action == "find_imports":
-                imports = [node.names[0].name for node in ast.walk(tree) if isinstance(node, ast.Import)]
+                imports = []
+                for node in ast.walk(tree):
+                    if isinstance(node, ast.Import):
+                        imports.extend(alias.name for alias in node.names)
+                    elif isinstance(node, ast.ImportFrom):
+                        module = "." * node.level + (node.module or "")
+                        imports.append(module)
                 return json.dumps(imports)
 
             else:
@@ -33,8 +307,35 @@ class ASTAnalysisTool(BaseTool):
         except Exception as e:
             return f"An error occurred during AST analysis: {e}"
 
+    def _run_project_action(self, action: str, params: Dict) -> str:
+        import json
+        workspace_root = os.path.abspath("workspace")
+        root = os.path.abspath(os.path.join(workspace_root, params.get("path", ".")))
+        if root != workspace_root and not root.startswith(workspace_root + os.sep):
+            return "Error: Path is outside the allowed workspace."
+        if not os.path.isdir(root):
+            return f"Error: Directory not found: {params.get('path', '.')}"
+
+        graph = get_project_graph(root)
+        target = params.get("target")
+
+        if action == "project_summary":
+            return json.dumps(graph.summary())
+        elif action == "import_graph":
+            return json.dumps({m: sorted(deps) for m, deps in graph.imports.items()})
+        elif action == "call_graph":
+            return json.dumps({f: sorted(callees) for f, callees in graph.calls.items()})
+
+        if not target:
+            return f"Error: 'target' is required for action '{action}'."
+        if action == "dependents":
+            return json.dumps(graph.dependents(target))
+        elif action == "affected_files":
+            return json.dumps(graph.affected_files(target))
+        return json.dumps(graph.callers_of(target))
+
     async def _arun(self, tool_input: str):
         raise NotImplementedError("ASTAnalysisTool does not support async")
 
 # Instantiate the tool
-ast_tool = ASTAnalysisTool()
\ No newline at end of file
+ast_tool = ASTAnalysisTool()
@@ -1,27 +1,189 @@
-from typing import ClassVar
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from typing import ClassVar, Dict, List, Optional, Tuple
 from langchain_community.tools import BaseTool
+from src.tools.workspace_cache import workspace_cache_dir
+from src.utils.text_index import BM25Index
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KNOWLEDGE_DIR = os.path.join(os.path.dirname(__file__), "domain_knowledge")
+# Cache kind (see workspace_cache_dir) the prebuilt index lives under, outside the knowledge directory
+INDEX_CACHE_DIR = "domain_index"
+INDEX_CACHE_VERSION = 2
+ENTRIES_FILENAME = "entries.json"
+
+
+class DomainKnowledgeBase:
+    """
+    Knowledge base loaded from a directory of documents into a BM25 index.
+
+    Each ``.md``/``.txt`` file is one entry (titled by its first ``#`` heading or
+    its filename); each line of a ``.jsonl`` file is one ``{"title", "content"}``
+    entry, which is how large corpora are shipped. The built index is saved as
+    JSON plus NumPy arrays in a cache directory keyed by the documents' names,
+    sizes and mtimes, so a restart memory-maps it instead of tokenizing, and the
+    directory is re-checked at most every ``reload_interval`` seconds so edited
+    files are picked up live.
+    """
+
+    def __init__(self, directory: str, reload_interval: float = 2.0):
+        self.directory = os.path.abspath(directory)
+        self.reload_interval = reload_interval
+        self.entries: List[Dict[str, str]] = []
+        self.index = BM25Index()
+        self._signature: Optional[Tuple] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _cache_path(self, signature: Tuple) -> str:
+        key = hashlib.sha256(json.dumps([INDEX_CACHE_VERSION, signature]).encode()).hexdigest()[:32]
+        return os.path.join(workspace_cache_dir(self.directory, INDEX_CACHE_DIR), key)
+
+    def _scan(self) -> Tuple:
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith((".md", ".txt", ".jsonl")):
+                stat = entry.stat()
+                files.append((entry.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(files))
+
+    def _read_entries(self, signature: Tuple) -> List[Dict[str, str]]:
+        entries = []
+        for filename, _, _ in signature:
+            path = os.path.join(self.directory, filename)
+            with open(path, "r", encoding="utf-8") as f:
+                if filename.endswith(".jsonl"):
+                    for line in f:
+                        if line.strip():
+                            record = json.loads(line)
+                            entries.append({"title": record["title"], "content": record["content"]})
+                    continue
+                text = f.read().strip()
+            title = os.path.splitext(filename)[0].replace("_", " ")
+            if text.startswith("# "):
+                heading, _, text = text.partition("\n")
+                title = heading[2:].strip()
+            entries.append({"title": title, "content": text.strip()})
+        return entries
+
+    def _load(self, signature: Tuple) -> None:
+        cache_path = self._cache_path(signature)
+        try:
+            with open(os.path.join(cache_path, ENTRIES_FILENAME)) as f:
+                entries = json.load(f)
+            index = BM25Index.load(cache_path)
+            if len(index) != len(entries):
+                raise ValueError(f"{len(entries)} entries but {len(index)} indexed documents")
+            self.entries, self.index = entries, index
+            return
+        except Exception as e:
+            # Missing, truncated, from another version of BM25Index, ... - any bad cache is rebuilt
+            if not isinstance(e, FileNotFoundError):
+                logger.info("Ignoring unusable domain knowledge index cache %s: %s", cache_path, str(e))
+
+        entries = self._read_entries(signature)
+        index = BM25Index()
+        for entry in entries:
+            # Title terms count double
+            index.add(f"{entry['title']} {entry['title']} {entry['content']}")
+        index.freeze()
+        self.entries, self.index = entries, index
+        logger.info("Indexed %d domain knowledge entries from %s", len(entries), self.directory)
+        self._persist(cache_path, entries, index)
+
+    @staticmethod
+    def _persist(cache_path: str, entries: List[Dict[str, str]], index: BM25Index) -> None:
+        """Writes the cache into a temporary directory and renames it into place, dropping stale ones."""
+        tmp_path = f"{cache_path}.tmp-{uuid.uuid4().hex}"
+        try:
+            shutil.rmtree(cache_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+            with open(os.path.join(tmp_path, ENTRIES_FILENAME), "w") as f:
+                json.dump(entries, f)
+            index.save(tmp_path)
+            os.rename(tmp_path, cache_path)
+        except OSError as e:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            # The rename also fails when another process put its identical cache in place first
+            if not os.path.isdir(cache_path):
+                logger.warning("Could not persist domain knowledge index: %s", str(e))
+            return
+        parent = os.path.dirname(cache_path)
+        for name in os.listdir(parent):
+            if name != os.path.basename(cache_path) and ".tmp-" not in name:
+                shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+    def refresh(self, force: bool = False) -> None:
+        """Reloads the index if any document was added, removed or changed."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            signature = self._scan()
+            if signature != self._signature:
+                self._load(signature)
+                self._signature = signature
+
+    def search(self, query: str, top_k: int = 3, min_relative_score: float = 0.5) -> List[Dict]:
+        """
+        Returns up to ``top_k`` entries ranked by BM25 score. Entries scoring below
+        ``min_relative_score`` times the best score are dropped as noise.
+        """
+        self.refresh()
+        # Entries and index are swapped together under the lock by _load
+        with self._lock:
+            entries, index = self.entries, self.index
+        ranked = index.search(query, top_k)
+        if not ranked:
+            return []
+        cutoff = ranked[0][1] * min_relative_score
+        return [dict(entries[doc_id], score=round(score, 4)) for doc_id, score in ranked if score >= cutoff]
+
+
+_knowledge_bases: Dict[str, DomainKnowledgeBase] = {}
+_knowledge_bases_lock = threading.Lock()
+
+
+def get_knowledge_base(directory: Optional[str] = None) -> DomainKnowledgeBase:
+    """Shared knowledge base per directory; defaults to Settings.DOMAIN_KNOWLEDGE_DIR."""
+    if directory is None:
+        from src.utils.config import get_settings
+        directory = get_settings().DOMAIN_KNOWLEDGE_DIR or DEFAULT_KNOWLEDGE_DIR
+    directory = os.path.abspath(directory)
+    with _knowledge_bases_lock:
+        if directory not in _knowledge_bases:
+            _knowledge_bases[directory] = DomainKnowledgeBase(directory)
+        return _knowledge_bases[directory]
+
 
 class DomainExpertTool(BaseTool):
     name: ClassVar[str] = "DomainExpertTool"
     description: ClassVar[str] = "Get domain-specific knowledge and best practices. Input should be a question about a specific domain."
 
+    top_k: ClassVar[int] = 3
+
     def _run(self, query: str):
-        # Simulate a knowledge base lookup
-        knowledge_base = {
-            "FinTech security": "For FinTech applications, prioritize end-to-end encryption, multi-factor authentication, and compliance with regulations like PCI DSS and GDPR. Consider using secure enclaves for sensitive data.",
-            "e-commerce scalability": "E-commerce platforms require robust scalability. Use microservices architecture, CDN for static assets, load balancing, and a highly scalable database solution like Cassandra or sharded PostgreSQL. Implement caching aggressively.",
-            "social media data privacy": "Social media apps must adhere to strict data privacy laws (GDPR, CCPA). Implement data minimization, consent management, and anonymization techniques. Regularly audit data access and storage practices.",
-            "AI/ML model deployment": "Deploying AI/ML models requires MLOps practices: version control for models and data, automated retraining pipelines, model monitoring for drift, and containerization (Docker/Kubernetes) for deployment."
-        }
-        
-        for key, value in knowledge_base.items():
-            if query.lower() in key.lower():
-                return value
-        
-        return "No specific domain knowledge found for this query. Try a more general search."
+        try:
+            results = get_knowledge_base().search(query, top_k=self.top_k)
+        except Exception as e:
+            return f"An error occurred while querying domain knowledge: {e}"
+
+        if not results:
+            return "No specific domain knowledge found for this query. Try a more general search."
+        if len(results) == 1:
+            return results[0]["content"]
+        return "\n\n".join(f"### {r['title']}\n{r['content']}" for r in results)
 
     async def _arun(self, query: str):
         raise NotImplementedError("DomainExpertTool does not support async")
 
 # Instantiate the tool
-domain_expert_tool = DomainExpertTool()
\ No newline at end of file
+domain_expert_tool = DomainExpertTool()
@@ -0,0 +1,208 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+import git
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "GIT_MIRROR_DIR",
+    os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "multi-agent-genai", "git-mirrors")
+)
+# Mirrors fetched more recently than this are considered fresh
+DEFAULT_FETCH_INTERVAL_SECONDS = 60
+# Remote transports a URL may use; anything else (ext::, file://, fd::, ...) is refused
+ALLOWED_SCHEMES = ("https", "ssh", "git")
+
+
+def normalize_url(url: str) -> str:
+    """Maps equivalent spellings of a repository URL to one cache key."""
+    url = url.strip().rstrip("/")
+    if url.endswith(".git"):
+        url = url[:-4]
+    if os.path.isdir(url) or os.path.isdir(f"{url}.git"):
+        return os.path.abspath(url)
+    # git@host:owner/repo -> host/owner/repo
+    url = re.sub(r"^[\w.-]+@([^:/]+):", r"\1/", url)
+    url = re.sub(r"^[a-z+]+://([^@/]+@)?", "", url)
+    return url.lower()
+
+
+def validate_url(url: str, allow_local_paths: bool = False) -> str:
+    """
+    Returns ``url`` if git may be pointed at it, otherwise raises ValueError.
+
+    Only https://, ssh://, git:// and scp-style ``user@host:path`` remotes are
+    accepted (plus existing local directories when ``allow_local_paths`` is set),
+    and nothing that git could parse as a command-line option.
+    """
+    url = url.strip()
+    if not url or url.startswith("-"):
+        raise ValueError(f"Invalid repository URL: {url!r}")
+    if allow_local_paths and os.path.isabs(url) and os.path.isdir(url):
+        return url
+    match = re.match(r"^([a-z][a-z0-9+.-]*)://", url, re.IGNORECASE)
+    if match:
+        if match.group(1).lower() not in ALLOWED_SCHEMES:
+            raise ValueError(f"Unsupported repository URL scheme: {match.group(1)!r}")
+        return url
+    if re.match(r"^[\w.-]+@[\w.-]+:(?!:)[^\s]+$", url):
+        return url
+    raise ValueError(f"Unsupported repository URL: {url!r}")
+
+
+def validate_ref(ref: Optional[str]) -> Optional[str]:
+    if ref is not None and (not ref.strip() or ref.startswith("-")):
+        raise ValueError(f"Invalid git ref: {ref!r}")
+    return ref
+
+
+class GitMirrorCache:
+    """
+    Local cache of bare ``--mirror`` clones keyed by repository URL.
+
+    The first request for a URL pays for a full clone into the cache; later
+    requests only fetch new objects into the mirror and then clone from it locally
+    (objects are hardlinked) or add a worktree to it, so repeat analyses of the
+    same repository never re-download its history.
+
+    URLs come from agents, so they are checked with ``validate_url`` before git
+    sees them; local repository paths are only accepted with ``allow_local_paths``.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, fetch_interval: float = DEFAULT_FETCH_INTERVAL_SECONDS,
+                 allow_local_paths: bool = False):
+        self.cache_dir = os.path.abspath(cache_dir or DEFAULT_CACHE_DIR)
+        self.fetch_interval = fetch_interval
+        self.allow_local_paths = allow_local_paths
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def mirror_path(self, url: str) -> str:
+        key = hashlib.sha256(normalize_url(url).encode()).hexdigest()[:24]
+        return os.path.join(self.cache_dir, f"{key}.git")
+
+    @contextmanager
+    def _lock(self, mirror_path: str):
+        """Serializes work on one mirror across threads and, where flock exists, processes."""
+        with self._locks_guard:
+            lock = self._locks.setdefault(mirror_path, threading.Lock())
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{mirror_path}.lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def ensure_mirror(self, url: str, force_fetch: bool = False) -> str:
+        """
+        Returns the path of an up-to-date bare mirror of ``url``, creating it if needed.
+
+        An existing mirror is only fetched when it is older than ``fetch_interval``
+        (or ``force_fetch`` is set), and then only new objects are transferred.
+        """
+        validate_url(url, self.allow_local_paths)
+        mirror_path = self.mirror_path(url)
+        stamp_path = os.path.join(mirror_path, "FETCH_STAMP")
+        with self._lock(mirror_path):
+            if not os.path.isdir(mirror_path):
+                tmp_path = f"{mirror_path}.tmp-{os.getpid()}"
+                logger.info("Creating git mirror for %s at %s", url, mirror_path)
+                git.Git().clone("--mirror", "--", url, tmp_path)
+                # Lets shallow and partial clones be served from the mirror
+                mirror = git.Git(tmp_path)
+                mirror.config("uploadpack.allowFilter", "true")
+                mirror.config("uploadpack.allowAnySHA1InWant", "true")
+                os.rename(tmp_path, mirror_path)
+            elif force_fetch or not os.path.exists(stamp_path) or \
+                    time.time() - os.path.getmtime(stamp_path) > self.fetch_interval:
+                logger.info("Fetching updates into git mirror %s", mirror_path)
+                git.Git(mirror_path).remote("update", "--prune")
+            else:
+                return mirror_path
+            with open(stamp_path, "w") as f:
+                f.write(url)
+        return mirror_path
+
+    def clone(self, url: str, destination: str, ref: Optional[str] = None, depth: Optional[int] = None,
+              filter_spec: Optional[str] = None, worktree: bool = False) -> str:
+        """
+        Materializes ``url`` at ``destination`` from the local mirror.
+
+        Args:
+            url: Repository URL or local path
+            destination: Directory to create
+            ref: Branch, tag or commit to check out
+            depth: Create a shallow clone with this many commits
+            filter_spec: Partial clone filter, e.g. "blob:none"
+            worktree: Add a detached worktree to the mirror instead of cloning
+
+        Returns:
+            str: The commit checked out at ``destination``
+        """
+        validate_ref(ref)
+        mirror_path = self.ensure_mirror(url)
+
+        if worktree:
+            with self._lock(mirror_path):
+                git.Git(mirror_path).worktree("add", "--detach", destination, ref or "HEAD")
+        else:
+            args = []
+            if depth or filter_spec:
+                # Shallow/partial options are ignored for plain local paths
+                source = f"file://{mirror_path}"
+                if depth:
+                    args += ["--depth", str(depth), "--no-single-branch"]
+                if filter_spec:
+                    args += [f"--filter={filter_spec}"]
+            else:
+                # Plain local clone hardlinks the mirror's object files
+                source = mirror_path
+            if ref and not re.fullmatch(r"[0-9a-f]{7,40}", ref):
+                args += ["--branch", ref]
+            git.Git().clone(*args, "--", source, destination)
+            repo = git.Git(destination)
+            repo.remote("set-url", "origin", url)
+            if ref and re.fullmatch(r"[0-9a-f]{7,40}", ref):
+                repo.checkout(ref)
+
+        return git.Git(destination).rev_parse("HEAD")
+
+    def fetch(self, repo_path: str) -> str:
+        """
+        Refreshes the mirror for the repo's origin, then fetches into the repo from the mirror.
+
+        Shallow clones keep their existing boundary: only commits newer than it are
+        transferred, without deepening or re-truncating the history they already have.
+        """
+        repo = git.Repo(repo_path)
+        url = repo.remotes.origin.url
+        mirror_path = self.ensure_mirror(url, force_fetch=True)
+        repo.git.fetch("--prune", "--tags", f"file://{mirror_path}", "+refs/heads/*:refs/remotes/origin/*")
+        return repo.git.rev_parse("HEAD")
+
+    def checkout(self, repo_path: str, ref: str) -> str:
+        validate_ref(ref)
+        repo = git.Repo(repo_path)
+        try:
+            repo.git.checkout(ref)
+        except git.GitCommandError:
+            # The ref may be newer than the local clone
+            self.fetch(repo_path)
+            repo.git.checkout(ref)
+        return repo.git.rev_parse("HEAD")
@@ -1,45 +1,514 @@
-from typing import ClassVar, Dict, Any
+from typing import ClassVar, Dict, Any, BinaryIO, Iterator, List, Optional, Tuple
 from langchain_community.tools import BaseTool
+from collections import OrderedDict
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import json
 import os
 import shutil
+import tarfile
+import threading
+import time
+import uuid
+import zipfile
+from src.tools.search_index import notify_tree_changed
+from src.tools.workspace_cache import workspace_cache_dir
+from src.utils.tracing import propagate
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Linux ioctl that clones file extents (copy-on-write) on btrfs, xfs, etc.
+FICLONE = 0x40049409
+COPY_CHUNK_BYTES = 1024 * 1024
+# Cache kind (see workspace_cache_dir) the blob store lives under, outside the workspace
+BLOB_DIR = "blobs"
+# Temp files younger than this may belong to an ingest in progress and are never pruned
+PRUNE_GRACE_SECONDS = 3600
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+# A store is pruned early once blobs adding up to this share of its size limit were stored since the last prune
+PRUNE_EARLY_FRACTION = 0.1
+
+
+def _reflink(fsrc: BinaryIO, fdst: BinaryIO) -> bool:
+    """Shares the source's extents with the (empty) destination where the filesystem supports it."""
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except OSError:
+        return False
+
+
+def clone_file(source_path: str, destination_path: str, allow_hardlink: bool = False) -> str:
+    """
+    Copies a file using the cheapest mechanism the filesystem supports.
+
+    Tries a hardlink (only when allowed, since both names then share one inode),
+    then a reflink, then an in-kernel ``copy_file_range`` and finally a buffered
+    copy. ``destination_path`` must not exist yet.
+
+    Returns:
+        str: The mechanism used ("hardlink", "reflink", "copy_file_range" or "copy")
+    """
+    if allow_hardlink:
+        try:
+            os.link(source_path, destination_path)
+            return "hardlink"
+        except OSError:
+            pass
+
+    with open(source_path, "rb") as fsrc, open(destination_path, "wb") as fdst:
+        if _reflink(fsrc, fdst):
+            return "reflink"
+
+        if hasattr(os, "copy_file_range"):
+            try:
+                while os.copy_file_range(fsrc.fileno(), fdst.fileno(), COPY_CHUNK_BYTES * 64):
+                    pass
+                return "copy_file_range"
+            except OSError:
+                # e.g. EXDEV on older kernels; start over with a plain copy
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+
+        shutil.copyfileobj(fsrc, fdst, COPY_CHUNK_BYTES)
+        return "copy"
+
+
+class BlobStore:
+    """
+    Content-addressed store of ingested files, keyed by SHA-256.
+
+    A given input is stored once no matter how many jobs ingest it; each job's
+    workspace copy is then cloned from the blob. Blobs are made read-only so a
+    hardlinked workspace file cannot silently rewrite a shared blob.
+    """
+
+    _digest_cache: ClassVar["OrderedDict[Tuple, str]"] = OrderedDict()
+    _digest_cache_lock: ClassVar[threading.Lock] = threading.Lock()
+    DIGEST_CACHE_SIZE: ClassVar[int] = 4096
+    # root -> [time.monotonic() of the last prune, bytes of the blobs stored since], shared by all stores on a root
+    _prune_state: ClassVar[Dict[str, List[float]]] = {}
+    _prune_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        # Directories known to exist, so per-file ingests skip the makedirs calls
+        self._dirs = {root}
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    @staticmethod
+    def _identity(source_path: str) -> Tuple:
+        stat = os.stat(source_path)
+        return (os.path.abspath(source_path), stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _cached_digest(self, key: Tuple) -> Optional[str]:
+        with self._digest_cache_lock:
+            digest = self._digest_cache.get(key)
+            if digest is not None:
+                self._digest_cache.move_to_end(key)
+            return digest
+
+    def _remember_digest(self, key: Tuple, digest: str) -> None:
+        with self._digest_cache_lock:
+            self._digest_cache[key] = digest
+            if len(self._digest_cache) > self.DIGEST_CACHE_SIZE:
+                self._digest_cache.popitem(last=False)
+
+    def digest_file(self, source_path: str) -> str:
+        """SHA-256 of a file, memoized on its identity and mtime so repeat ingests skip the read."""
+        key = self._identity(source_path)
+        digest = self._cached_digest(key)
+        if digest is None:
+            hasher = hashlib.sha256()
+            with open(source_path, "rb") as f:
+                while chunk := f.read(COPY_CHUNK_BYTES):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()
+            self._remember_digest(key, digest)
+        return digest
+
+    def _touch(self, digest: str) -> bool:
+        """Marks a blob as recently used for pruning; False if it does not exist (any more)."""
+        try:
+            os.utime(self.blob_path(digest))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _commit(self, tmp_path: str, digest: str) -> None:
+        if self._touch(digest):
+            os.remove(tmp_path)
+            return
+        os.chmod(tmp_path, 0o444)
+        size = os.path.getsize(tmp_path)
+        # Atomic, so concurrent jobs storing the same content cannot see a partial blob
+        self._makedirs(os.path.dirname(self.blob_path(digest)))
+        os.replace(tmp_path, self.blob_path(digest))
+        with self._prune_lock:
+            self._prune_state.setdefault(self.root, [float("-inf"), 0])[1] += size
+
+    def _tmp_path(self) -> str:
+        return os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+
+    def _makedirs(self, path: str) -> None:
+        if path not in self._dirs:
+            os.makedirs(path, exist_ok=True)
+            self._dirs.add(path)
+
+    def _store(self, stream: BinaryIO, destination_path: Optional[str] = None, reflink: bool = False) -> str:
+        """
+        Writes ``stream`` to a temp blob while hashing it, then commits it, so the
+        data is read once. With ``destination_path`` the workspace copy is written
+        in the same pass. With ``reflink`` each copy first tries to share the
+        stream's extents, leaving only the read for the hash.
+        """
+        hasher = hashlib.sha256()
+        tmp_path = self._tmp_path()
+        destination_tmp = None
+        try:
+            with ExitStack() as stack:
+                outputs = [stack.enter_context(open(tmp_path, "wb"))]
+                if destination_path is not None:
+                    self._makedirs(os.path.dirname(destination_path))
+                    destination_tmp = f"{destination_path}.ingest-{uuid.uuid4().hex}"
+                    outputs.append(stack.enter_context(open(destination_tmp, "wb")))
+                if reflink:
+                    outputs = [out for out in outputs if not _reflink(stream, out)]
+                while chunk := stream.read(COPY_CHUNK_BYTES):
+                    hasher.update(chunk)
+                    for out in outputs:
+                        out.write(chunk)
+            digest = hasher.hexdigest()
+            self._commit(tmp_path, digest)
+            if destination_tmp is not None:
+                os.replace(destination_tmp, destination_path)
+            return digest
+        except BaseException:
+            for path in (tmp_path, destination_tmp):
+                if path is not None and os.path.exists(path):
+                    os.remove(path)
+            raise
+
+    def put_file(self, source_path: str) -> str:
+        key = self._identity(source_path)
+        digest = self._cached_digest(key)
+        if digest is not None and self._touch(digest):
+            return digest
+        with open(source_path, "rb") as f:
+            digest = self._store(f, reflink=True)
+        self._remember_digest(key, digest)
+        return digest
+
+    def put_stream(self, stream: BinaryIO) -> str:
+        """Stores a stream (e.g. an archive member) while hashing it, in a single pass."""
+        return self._store(stream)
+
+    def ingest_file(self, source_path: str, destination_path: str, allow_hardlink: bool = False) -> str:
+        """
+        Stores a file and places its copy at ``destination_path``. Content already
+        in the store is cloned from its blob; new content is hashed, stored and
+        copied in one pass over the source.
+        """
+        key = self._identity(source_path)
+        digest = self._cached_digest(key)
+        if digest is None or not self._touch(digest):
+            if allow_hardlink:
+                digest = self.put_file(source_path)
+            else:
+                with open(source_path, "rb") as f:
+                    digest = self._store(f, destination_path, reflink=True)
+                self._remember_digest(key, digest)
+                return digest
+        self.materialize(digest, destination_path, allow_hardlink)
+        return digest
+
+    def ingest_stream(self, stream: BinaryIO, destination_path: str, allow_hardlink: bool = False) -> str:
+        """Stores a stream and writes its copy at ``destination_path`` in the same pass."""
+        if allow_hardlink:
+            digest = self.put_stream(stream)
+            self.materialize(digest, destination_path, allow_hardlink)
+            return digest
+        return self._store(stream, destination_path)
+
+    def prune(self, max_bytes: Optional[int] = None, max_age_seconds: Optional[float] = None,
+              grace_seconds: float = PRUNE_GRACE_SECONDS) -> int:
+        """
+        Deletes blobs unused for ``max_age_seconds``, then the least recently used
+        ones until the store fits in ``max_bytes``, plus abandoned temp files.
+        Blobs used within ``grace_seconds`` are kept, as an ingest may be about to
+        clone them; workspace copies never depend on a blob. Returns how many files
+        were removed.
+        """
+        now = time.time()
+        blobs, removed, total = [], 0, 0
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                in_grace = now - stat.st_mtime < grace_seconds
+                if name.startswith(".tmp-"):
+                    if not in_grace:
+                        removed += self._remove(path)
+                    continue
+                total += stat.st_size
+                if not in_grace:
+                    blobs.append((stat.st_mtime, stat.st_size, path))
+
+        blobs.sort()
+        for mtime, size, path in blobs:
+            expired = max_age_seconds is not None and now - mtime > max_age_seconds
+            if not expired and (max_bytes is None or total <= max_bytes):
+                break
+            removed += self._remove(path)
+            total -= size
+        return removed
+
+    def prune_if_due(self, max_bytes: Optional[int] = None, max_age_seconds: Optional[float] = None,
+                     interval: float = 600.0) -> Optional[int]:
+        """
+        Runs ``prune`` unless this store was pruned in the last ``interval`` seconds,
+        or sooner once the blobs stored since the last prune add up to a tenth of
+        ``max_bytes``; returns how many files were removed, or None when skipped.
+        """
+        now = time.monotonic()
+        with self._prune_lock:
+            state = self._prune_state.setdefault(self.root, [float("-inf"), 0])
+            grown = max_bytes is not None and state[1] >= max_bytes * PRUNE_EARLY_FRACTION
+            if now - state[0] < interval and not grown:
+                return None
+            # Claimed before walking, so concurrent ingests do not prune the same store twice
+            state[0], state[1] = now, 0
+        return self.prune(max_bytes, max_age_seconds)
+
+    @staticmethod
+    def _remove(path: str) -> int:
+        try:
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+
+    def materialize(self, digest: str, destination_path: str, allow_hardlink: bool = False) -> str:
+        """Places the blob at ``destination_path``, replacing any existing file atomically."""
+        self._makedirs(os.path.dirname(destination_path))
+        tmp_path = f"{destination_path}.ingest-{uuid.uuid4().hex}"
+        try:
+            method = clone_file(self.blob_path(digest), tmp_path, allow_hardlink)
+            if method != "hardlink":
+                os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, destination_path)
+            return method
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def _is_archive(path: str) -> bool:
+    return path.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _safe_join(root: str, member_name: str) -> Optional[str]:
+    """Joins an archive member name below root, rejecting absolute or escaping names."""
+    target = os.path.abspath(os.path.join(root, member_name))
+    if not target.startswith(root + os.sep):
+        return None
+    return target
+
 
 class IngestionTool(BaseTool):
     name: ClassVar[str] = "IngestionTool"
-    description: ClassVar[str] = "Ingest and process data from various sources. Input should be a JSON object with source type and data."
+    description: ClassVar[str] = (
+        "Ingest and process data from various sources. Input should be a JSON object with 'source_path' "
+        "(an absolute file, directory or archive path) and 'destination_filename' inside the workspace. "
+        "Set 'extract' to true to unpack .zip/.tar archives."
+    )
+
+    MAX_WORKERS: ClassVar[int] = 8
+    # Limits the blob store is pruned to after an ingest, at most once per interval (see BlobStore.prune_if_due)
+    BLOB_STORE_MAX_BYTES: ClassVar[Optional[int]] = 2 * 1024 ** 3
+    BLOB_MAX_AGE_SECONDS: ClassVar[Optional[float]] = 7 * 24 * 3600
+    BLOB_PRUNE_INTERVAL_SECONDS: ClassVar[float] = 600.0
+    # Archives expanding past either limit are refused (zip/tar bombs)
+    ARCHIVE_MAX_BYTES: ClassVar[int] = 4 * 1024 ** 3
+    ARCHIVE_MAX_MEMBERS: ClassVar[int] = 100_000
 
     def _run(self, tool_input: str):
         try:
             params = json.loads(tool_input)
-            source_path = params.get("source_path")
-            destination_filename = params.get("destination_filename")
+            return self.ingest_many([params])[0]["result"]
+        except Exception as e:
+            return f"An error occurred during file ingestion: {e}"
 
-            if not source_path or not destination_filename:
-                return "Error: 'source_path' and 'destination_filename' are required."
+    @staticmethod
+    def _validate(entry: Dict[str, Any], workspace_root: str) -> Tuple[Optional[str], Optional[str]]:
+        """Returns (error message, destination path); exactly one of them is set."""
+        source_path = entry.get("source_path")
+        destination_filename = entry.get("destination_filename")
 
-            if not os.path.isabs(source_path):
-                return "Error: 'source_path' must be an absolute path."
+        if not source_path or not destination_filename:
+            return "Error: 'source_path' and 'destination_filename' are required.", None
 
-            if not os.path.exists(source_path):
-                return f"Error: Source file not found at {source_path}"
+        if not os.path.isabs(source_path):
+            return "Error: 'source_path' must be an absolute path.", None
 
-            workspace_root = os.path.abspath("workspace")
-            os.makedirs(workspace_root, exist_ok=True)
-            
-            destination_path = os.path.join(workspace_root, destination_filename)
-            
-            # Security check: Ensure the destination is within the workspace
-            if not os.path.abspath(destination_path).startswith(workspace_root):
-                return "Error: Attempted to write outside the allowed workspace."
+        if not os.path.exists(source_path):
+            return f"Error: Source file not found at {source_path}", None
 
-            shutil.copy(source_path, destination_path)
-            return f"Successfully copied {source_path} to {destination_path}"
+        destination_path = os.path.abspath(os.path.join(workspace_root, destination_filename))
 
-        except Exception as e:
-            return f"An error occurred during file ingestion: {e}"
+        # Security check: Ensure the destination is within the workspace
+        if not destination_path.startswith(workspace_root + os.sep):
+            return "Error: Attempted to write outside the allowed workspace.", None
+
+        return None, destination_path
+
+    @staticmethod
+    def _walk(source_dir: str, destination_dir: str) -> Iterator[Tuple[str, str]]:
+        """Lazily yields (source, destination) file pairs for a directory tree."""
+        stack = [source_dir]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        rel_path = os.path.relpath(entry.path, source_dir)
+                        yield entry.path, os.path.join(destination_dir, rel_path)
+
+    @staticmethod
+    def _ingest_file(store: BlobStore, source_path: str, destination_path: str, allow_hardlink: bool) -> int:
+        store.ingest_file(source_path, destination_path, allow_hardlink)
+        return 1
+
+    @classmethod
+    def _extract_archive(cls, store: BlobStore, source_path: str, destination_dir: str, allow_hardlink: bool) -> int:
+        """
+        Streams archive members into the blob store one at a time, never unpacking to
+        a temp dir. Member sizes are checked against ARCHIVE_MAX_BYTES and
+        ARCHIVE_MAX_MEMBERS before each member is read; a zip, whose directory is at
+        the front, is refused before anything is written.
+        """
+        count, members, total = 0, 0, 0
+
+        def admit(name: str, size: int) -> None:
+            nonlocal members, total
+            members += 1
+            total += size
+            if members > cls.ARCHIVE_MAX_MEMBERS:
+                raise ValueError(f"Archive {source_path} has more than {cls.ARCHIVE_MAX_MEMBERS} members")
+            if total > cls.ARCHIVE_MAX_BYTES:
+                raise ValueError(f"Archive {source_path} expands to more than {cls.ARCHIVE_MAX_BYTES} bytes "
+                                 f"(at {name})")
+
+        if zipfile.is_zipfile(source_path):
+            with zipfile.ZipFile(source_path) as archive:
+                entries = [(info, _safe_join(destination_dir, info.filename)) for info in archive.infolist()]
+                entries = [(info, target) for info, target in entries if not info.is_dir() and target is not None]
+                # ZipFile never reads past a member's declared size, so these bound the bytes written
+                for info, _ in entries:
+                    admit(info.filename, info.file_size)
+                for info, target in entries:
+                    with archive.open(info) as member:
+                        store.ingest_stream(member, target, allow_hardlink)
+                    count += 1
+        else:
+            with tarfile.open(source_path, "r|*") as archive:
+                for info in archive:
+                    target = _safe_join(destination_dir, info.name)
+                    if not info.isfile() or target is None:
+                        continue
+                    admit(info.name, info.size)
+                    store.ingest_stream(archive.extractfile(info), target, allow_hardlink)
+                    count += 1
+        return count
+
+    def ingest_many(self, entries: List[Dict[str, Any]], workspace_root: Optional[str] = None,
+                    max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Ingests many files, directories or archives into the workspace concurrently.
+
+        Args:
+            entries: Dicts with 'source_path', 'destination_filename' and optional
+                'extract' (unpack archives) and 'hardlink' (allow hardlinking blobs)
+            workspace_root: Destination root. Defaults to ./workspace
+            max_workers: Upper bound on concurrent copies
+
+        Returns:
+            List[Dict]: One {'source', 'destination', 'result'} dict per entry, in order
+        """
+        workspace_root = os.path.abspath(workspace_root or "workspace")
+        os.makedirs(workspace_root, exist_ok=True)
+        store = BlobStore(workspace_cache_dir(workspace_root, BLOB_DIR))
+        max_workers = max_workers or self.MAX_WORKERS
+
+        results = []
+        pending = []
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            # Bound queued work so huge directories are streamed, not listed up front
+            slots = threading.BoundedSemaphore(max_workers * 4)
+
+            def submit(fn, *args):
+                slots.acquire()
+                future = pool.submit(propagate(fn), *args)
+                future.add_done_callback(lambda _: slots.release())
+                return future
+
+            for entry in entries:
+                result = {"source": entry.get("source_path"), "destination": entry.get("destination_filename")}
+                results.append(result)
+                error, destination_path = self._validate(entry, workspace_root)
+                if error:
+                    result["result"] = error
+                    continue
+
+                source_path = entry["source_path"]
+                allow_hardlink = bool(entry.get("hardlink", False))
+                single_file = False
+                if os.path.isdir(source_path):
+                    futures = [submit(self._ingest_file, store, src, dst, allow_hardlink)
+                               for src, dst in self._walk(source_path, destination_path)]
+                elif entry.get("extract") and _is_archive(source_path):
+                    futures = [submit(self._extract_archive, store, source_path, destination_path, allow_hardlink)]
+                else:
+                    single_file = True
+                    futures = [submit(self._ingest_file, store, source_path, destination_path, allow_hardlink)]
+                pending.append((result, source_path, destination_path, single_file, futures))
+
+        for result, source_path, destination_path, single_file, futures in pending:
+            copied, errors = 0, []
+            for future in futures:
+                try:
+                    copied += future.result()
+                except Exception as e:
+                    errors.append(str(e))
+            if errors:
+                result["result"] = (f"An error occurred during file ingestion: ingested {copied} file(s) "
+                                    f"from {source_path}; {len(errors)} failed: {errors[0]}")
+            elif single_file:
+                result["result"] = f"Successfully copied {source_path} to {destination_path}"
+            else:
+                result["result"] = f"Successfully ingested {copied} file(s) from {source_path} to {destination_path}"
+        if pending:
+            notify_tree_changed(workspace_root)
+            store.prune_if_due(self.BLOB_STORE_MAX_BYTES, self.BLOB_MAX_AGE_SECONDS, self.BLOB_PRUNE_INTERVAL_SECONDS)
+        return results
 
     async def _arun(self, tool_input: str):
         raise NotImplementedError("IngestionTool does not support async")
 
 # Instantiate the tool
-ingestion_tool = IngestionTool()
\ No newline at end of file
+ingestion_tool = IngestionTool()
@@ -0,0 +1,78 @@
+import os
+import logging
+from typing import Dict, List
+from src.utils.registry import LazyRegistry, import_attribute, load_file_attribute, module_files
+
+logger = logging.getLogger(__name__)
+
+TOOLS_DIR = os.path.dirname(__file__)
+
+# name -> (module, class); each tool is instantiated on first lookup
+BUILTIN_TOOLS = {
+    "shell": ("langchain_community.tools", "ShellTool"),
+    "git": ("src.tools.tools", "CustomGitTool"),
+    "search": ("langchain_community.tools", "DuckDuckGoSearchRun"),
+    "filesystem": ("src.tools.tools", "FileSystemTool"),
+    "plantuml": ("src.tools.tools", "PlantUMLTool"),
+    "arxiv": ("src.tools.arxiv_tool", "ArxivTool"),
+    "ast": ("src.tools.ast_tool", "ASTAnalysisTool"),
+    "domain_expert": ("src.tools.domain_expert_tool", "DomainExpertTool"),
+    "runtime_monitor": ("src.tools.runtime_monitor_tool", "RuntimeMonitorTool"),
+    "pdf_reader": ("src.tools.pdf_reader_tool", "PDFReaderTool"),
+    "ingestion": ("src.tools.ingestion_tool", "IngestionTool"),
+}
+
+# Modules in src/tools that are not dynamic tools
+NON_TOOL_MODULES = [
+    "__init__.py", "tools.py", "registry.py", "arxiv_tool.py", "ast_tool.py",
+    "domain_expert_tool.py", "runtime_monitor_tool.py",
+    "pdf_reader_tool.py", "ingestion_tool.py", "search_index.py", "git_mirror.py",
+    "workspace_cache.py"
+]
+
+
+def _instrument(tool) -> None:
+    from src.tools.tools import instrument_tool
+    instrument_tool(tool)
+
+
+def _instantiate(module: str, class_name: str):
+    load_class = import_attribute(module, class_name)
+
+    def load():
+        return load_class()()
+    return load
+
+
+def _source(module: str):
+    if not module.startswith("src."):
+        return {}
+    path = os.path.join(TOOLS_DIR, "..", "..", *module.split(".")) + ".py"
+    return {"source": os.path.normpath(path)}
+
+
+ALL_TOOLS = LazyRegistry("tool", on_load=_instrument)
+
+for _name, (_module, _class_name) in BUILTIN_TOOLS.items():
+    ALL_TOOLS.register(_name, _instantiate(_module, _class_name), module=_module, symbol=_class_name,
+                       **_source(_module))
+
+
+def index_dynamic_tools() -> Dict[str, List[str]]:
+    """
+    Registers the tools in src/tools by module name without importing them. Each
+    module is executed on first lookup and must define an instance named after
+    the module. Re-indexing only replaces tools whose file content changed and
+    returns the added, changed and removed names.
+    """
+    specs = {}
+    for module_name in module_files(TOOLS_DIR, NON_TOOL_MODULES):
+        file_path = os.path.join(TOOLS_DIR, module_name + ".py")
+        specs[module_name] = (
+            load_file_attribute(module_name, file_path, module_name),
+            {"module": module_name, "source": file_path, "symbol": module_name}
+        )
+    return ALL_TOOLS.sync("dynamic", specs)
+
+
+index_dynamic_tools()
@@ -1,7 +1,11 @@
 from typing import ClassVar, Dict, List, Optional
 import psutil
 import time
-from dataclasses import dataclass
+import json
+import threading
+from dataclasses import dataclass, asdict, fields
+import numpy as np
+from pydantic import PrivateAttr
 from langchain_community.tools import BaseTool
 
 @dataclass
@@ -9,49 +13,368 @@ class ResourceMetrics:
     cpu_percent: float
     memory_percent: float
     disk_usage_percent: float
-    network_bytes_sent: int
-    network_bytes_recv: int
+    network_bytes_sent: int  # bytes sent since the previous sample
+    network_bytes_recv: int  # bytes received since the previous sample
     timestamp: float
+    process_cpu_percent: float = 0.0
+    process_memory_rss: int = 0
+    process_num_threads: int = 0
+
+METRIC_FIELDS = tuple(f.name for f in fields(ResourceMetrics))
+_COLUMN = {name: i for i, name in enumerate(METRIC_FIELDS)}
+_INT_FIELDS = {"network_bytes_sent", "network_bytes_recv", "process_memory_rss", "process_num_threads"}
+
+
+class MetricsRingBuffer:
+    """
+    Fixed-capacity time series of ResourceMetrics stored in one preallocated
+    NumPy array, so sampling never allocates and window statistics are
+    vectorized over a contiguous (samples x fields) matrix.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.zeros((capacity, len(METRIC_FIELDS)), dtype=np.float64)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, metrics: ResourceMetrics) -> None:
+        self._data[self._next] = [getattr(metrics, name) for name in METRIC_FIELDS]
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def clear(self) -> None:
+        self._next = 0
+        self._count = 0
+
+    def array(self, start_time: Optional[float] = None, end_time: Optional[float] = None) -> np.ndarray:
+        """Samples in chronological order, optionally restricted to [start_time, end_time]."""
+        if self._count < self.capacity:
+            data = self._data[:self._count].copy()
+        else:
+            data = np.concatenate((self._data[self._next:], self._data[:self._next]))
+        if start_time is not None or end_time is not None:
+            timestamps = data[:, _COLUMN["timestamp"]]
+            mask = np.ones(len(data), dtype=bool)
+            if start_time is not None:
+                mask &= timestamps >= start_time
+            if end_time is not None:
+                mask &= timestamps <= end_time
+            data = data[mask]
+        return data
+
+    @staticmethod
+    def to_metrics(row: np.ndarray) -> ResourceMetrics:
+        values = {
+            name: int(row[i]) if name in _INT_FIELDS else float(row[i])
+            for i, name in enumerate(METRIC_FIELDS)
+        }
+        return ResourceMetrics(**values)
+
 
 class RuntimeMonitorTool(BaseTool):
     name: ClassVar[str] = "RuntimeMonitorTool"
-    description: ClassVar[str] = "Monitor system resource usage and performance metrics. Input should be 'start', 'stop', or 'get_metrics'."
+    description: ClassVar[str] = (
+        "Monitor system and application resource usage. Input should be a JSON string with 'action' "
+        "('start', 'stop' or 'report'), 'application_id', and optionally 'pid' (process to watch) "
+        "and 'duration_minutes' (report window). 'report' requires a prior 'start'."
+    )
+
+    history_size: ClassVar[int] = 3600
+    sample_interval: ClassVar[float] = 1.0
+    # Sample counts below this make percentiles and trends meaningless
+    MIN_REPORT_SAMPLES: ClassVar[int] = 3
+    ANOMALY_Z_SCORE: ClassVar[float] = 3.0
+    # Sustained memory growth (percentage points per minute) reported as a possible leak
+    MEMORY_TREND_LIMIT: ClassVar[float] = 2.0
+
+    # Monitors started through _run, one per application id
+    _app_monitors: ClassVar[Dict[str, "RuntimeMonitorTool"]] = {}
+    _app_monitors_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    _buffer: MetricsRingBuffer = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _is_monitoring: bool = PrivateAttr(default=False)
+    _stop_event: threading.Event = PrivateAttr(default_factory=threading.Event)
+    _thread: Optional[threading.Thread] = PrivateAttr(default=None)
+    _process: Optional[psutil.Process] = PrivateAttr(default=None)
+    _process_exited: bool = PrivateAttr(default=False)
+    _last_net: Optional[tuple] = PrivateAttr(default=None)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._buffer = MetricsRingBuffer(self.history_size)
+
+    @property
+    def _metrics_history(self) -> List[ResourceMetrics]:
+        return [MetricsRingBuffer.to_metrics(row) for row in self._buffer.array()]
+
+    @_metrics_history.setter
+    def _metrics_history(self, metrics: List[ResourceMetrics]) -> None:
+        self._buffer.clear()
+        for metric in metrics:
+            self._buffer.append(metric)
+
+    def _sample(self) -> ResourceMetrics:
+        net = psutil.net_io_counters()
+        sent, recv = 0, 0
+        if self._last_net is not None:
+            sent = max(net.bytes_sent - self._last_net[0], 0)
+            recv = max(net.bytes_recv - self._last_net[1], 0)
+        self._last_net = (net.bytes_sent, net.bytes_recv)
+
+        process_cpu, process_rss, process_threads = 0.0, 0, 0
+        if self._process is not None and not self._process_exited:
+            try:
+                with self._process.oneshot():
+                    process_cpu = self._process.cpu_percent(interval=None)
+                    process_rss = self._process.memory_info().rss
+                    process_threads = self._process.num_threads()
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                self._process_exited = True
+
+        return ResourceMetrics(
+            cpu_percent=psutil.cpu_percent(interval=None),
+            memory_percent=psutil.virtual_memory().percent,
+            disk_usage_percent=psutil.disk_usage("/").percent,
+            network_bytes_sent=sent,
+            network_bytes_recv=recv,
+            timestamp=time.time(),
+            process_cpu_percent=process_cpu,
+            process_memory_rss=process_rss,
+            process_num_threads=process_threads,
+        )
+
+    def _sampling_loop(self, interval: float) -> None:
+        while not self._stop_event.is_set():
+            try:
+                metrics = self._sample()
+            except Exception:
+                metrics = None
+            if metrics is not None:
+                with self._lock:
+                    self._buffer.append(metrics)
+            self._stop_event.wait(interval)
+
+    def start_monitoring(self, interval: Optional[float] = None, pid: Optional[int] = None) -> None:
+        """Starts the background sampler; ``pid`` additionally tracks one process."""
+        if self._is_monitoring:
+            return
+        if pid is not None:
+            self._process = psutil.Process(pid)
+            self._process.cpu_percent(interval=None)  # primes the per-process CPU counter
+        psutil.cpu_percent(interval=None)
+        self._stop_event.clear()
+        self._is_monitoring = True
+        self._thread = threading.Thread(
+            target=self._sampling_loop, args=(interval or self.sample_interval,), daemon=True
+        )
+        self._thread.start()
+
+    def stop_monitoring(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._is_monitoring = False
+
+    def get_current_metrics(self) -> Optional[ResourceMetrics]:
+        with self._lock:
+            data = self._buffer.array()
+        return MetricsRingBuffer.to_metrics(data[-1]) if len(data) else None
+
+    def get_metrics_history(self, start_time: Optional[float] = None,
+                            end_time: Optional[float] = None) -> List[ResourceMetrics]:
+        with self._lock:
+            data = self._buffer.array(start_time, end_time)
+        return [MetricsRingBuffer.to_metrics(row) for row in data]
+
+    def get_metrics_summary(self, window_seconds: Optional[float] = None) -> Dict:
+        """
+        Aggregates the samples of the last ``window_seconds`` (all samples if None):
+        means, maxima and p50/p95/p99 per resource, network totals, trends and anomalies.
+        """
+        start_time = time.time() - window_seconds if window_seconds is not None else None
+        with self._lock:
+            data = self._buffer.array(start_time)
+        if not len(data):
+            return {"sample_count": 0}
+
+        summary = {"sample_count": len(data)}
+        for name in ("cpu_percent", "memory_percent", "disk_usage_percent", "process_cpu_percent"):
+            column = data[:, _COLUMN[name]]
+            p50, p95, p99 = np.percentile(column, [50, 95, 99])
+            summary.update({
+                f"avg_{name}": float(column.mean()),
+                f"max_{name}": float(column.max()),
+                f"p50_{name}": float(p50),
+                f"p95_{name}": float(p95),
+                f"p99_{name}": float(p99),
+            })
+        summary["max_process_memory_rss"] = int(data[:, _COLUMN["process_memory_rss"]].max())
+        summary["total_network_bytes_sent"] = int(data[:, _COLUMN["network_bytes_sent"]].sum())
+        summary["total_network_bytes_recv"] = int(data[:, _COLUMN["network_bytes_recv"]].sum())
+        summary["trends_per_minute"] = self._trends(data)
+        summary["anomalies"] = self._anomalies(data)
+        return summary
+
+    @staticmethod
+    def _trends(data: np.ndarray) -> Dict[str, float]:
+        """Least-squares slope of each resource, in units per minute."""
+        if len(data) < 2:
+            return {}
+        minutes = (data[:, _COLUMN["timestamp"]] - data[0, _COLUMN["timestamp"]]) / 60.0
+        if not np.ptp(minutes):
+            return {}
+        columns = [_COLUMN[name] for name in ("cpu_percent", "memory_percent", "process_memory_rss")]
+        # One lstsq solve fits all columns at once
+        design = np.column_stack((minutes, np.ones_like(minutes)))
+        slopes = np.linalg.lstsq(design, data[:, columns], rcond=None)[0][0]
+        return {name: float(slope) for name, slope in
+                zip(("cpu_percent", "memory_percent", "process_memory_rss"), slopes)}
+
+    @classmethod
+    def _anomalies(cls, data: np.ndarray) -> List[Dict]:
+        """Samples whose CPU or memory lies more than ANOMALY_Z_SCORE deviations from the window mean."""
+        if len(data) < cls.MIN_REPORT_SAMPLES:
+            return []
+        anomalies = []
+        for name in ("cpu_percent", "memory_percent"):
+            column = data[:, _COLUMN[name]]
+            std = column.std()
+            if not std:
+                continue
+            outliers = np.flatnonzero(np.abs(column - column.mean()) / std > cls.ANOMALY_Z_SCORE)
+            for i in outliers[-5:]:
+                anomalies.append({"metric": name, "value": float(column[i]),
+                                  "timestamp": float(data[i, _COLUMN["timestamp"]])})
+        return anomalies
+
+    def check_resource_thresholds(self, cpu_threshold: float = 90.0, memory_threshold: float = 90.0,
+                                  disk_threshold: float = 90.0) -> Dict[str, bool]:
+        current = self.get_current_metrics()
+        if current is None:
+            return {"cpu_exceeded": False, "memory_exceeded": False, "disk_exceeded": False}
+        return {
+            "cpu_exceeded": current.cpu_percent > cpu_threshold,
+            "memory_exceeded": current.memory_percent > memory_threshold,
+            "disk_exceeded": current.disk_usage_percent > disk_threshold,
+        }
+
+    def get_performance_report(self) -> Dict:
+        current = self.get_current_metrics()
+        return {
+            "current_metrics": asdict(current) if current else None,
+            "last_minute_summary": self.get_metrics_summary(60),
+            "last_hour_summary": self.get_metrics_summary(3600),
+            "threshold_alerts": self.check_resource_thresholds(),
+            "timestamp": time.time(),
+        }
+
+    def build_health_report(self, application_id: str, duration_minutes: float,
+                            cpu_threshold: float = 90.0, memory_threshold: float = 90.0,
+                            disk_threshold: float = 90.0) -> Dict:
+        """Judges application health from the samples of the last ``duration_minutes``."""
+        summary = self.get_metrics_summary(duration_minutes * 60)
+        report = {
+            "application_id": application_id,
+            "duration_minutes": duration_minutes,
+            "status": "monitoring_complete",
+            "summary": summary,
+            "performance_issues": [],
+            "errors_detected": [],
+            "security_alerts": [],
+        }
+
+        if summary["sample_count"] < self.MIN_REPORT_SAMPLES:
+            report["status"] = "insufficient_data"
+        else:
+            for name, threshold in (("cpu_percent", cpu_threshold), ("memory_percent", memory_threshold),
+                                    ("disk_usage_percent", disk_threshold)):
+                if summary[f"p95_{name}"] > threshold:
+                    report["performance_issues"].append({
+                        "type": f"high_{name.replace('_percent', '')}",
+                        "details": f"p95 {name} is {summary[f'p95_{name}']:.1f}, above {threshold}",
+                    })
+            memory_trend = summary["trends_per_minute"].get("memory_percent", 0.0)
+            if memory_trend > self.MEMORY_TREND_LIMIT:
+                report["performance_issues"].append({
+                    "type": "memory_growth",
+                    "details": f"Memory usage grows by {memory_trend:.2f} points per minute",
+                })
+            for anomaly in summary["anomalies"]:
+                report["performance_issues"].append({"type": "anomaly", **anomaly})
+
+        if self._process_exited:
+            report["errors_detected"].append({
+                "type": "process_exited",
+                "details": f"Monitored process {self._process.pid} is no longer running",
+            })
+
+        unhealthy = report["performance_issues"] or report["errors_detected"] or report["security_alerts"]
+        if unhealthy:
+            report["overall_health"] = "unhealthy"
+        elif report["status"] == "insufficient_data":
+            # Too few samples to vouch for the application either way
+            report["overall_health"] = "unknown"
+        else:
+            report["overall_health"] = "healthy"
+        return report
+
+    @classmethod
+    def monitor_for(cls, application_id: str, pid: Optional[int] = None) -> "RuntimeMonitorTool":
+        """Returns the running monitor of an application, starting one if needed."""
+        with cls._app_monitors_lock:
+            monitor = cls._app_monitors.get(application_id)
+            if monitor is None:
+                monitor = cls()
+                monitor.start_monitoring(pid=pid)
+                cls._app_monitors[application_id] = monitor
+            return monitor
 
     def _run(self, tool_input: str):
         try:
             params = json.loads(tool_input)
+            action = params.get("action", "report")
             app_id = params.get("application_id", "default_app")
-            duration = params.get("duration_minutes", 5)
-
-            report = {
-                "application_id": app_id,
-                "duration_minutes": duration,
-                "status": "monitoring_complete",
-                "performance_issues": [],
-                "errors_detected": [],
-                "security_alerts": []
-            }
-
-            # Simulate some random issues
-            if random.random() < 0.3: # 30% chance of performance issue
-                report["performance_issues"].append({"type": "high_latency", "service": "backend_api", "details": "Average response time increased by 20%"})
-            if random.random() < 0.1: # 10% chance of critical error
-                report["errors_detected"].append({"type": "critical_error", "service": "database", "details": "Database connection pool exhaustion"})
-            if random.random() < 0.05: # 5% chance of security alert
-                report["security_alerts"].append({"type": "xss_attempt", "details": "Potential XSS attack detected on login page"})
-            
-            if not report["performance_issues"] and not report["errors_detected"] and not report["security_alerts"]:
-                report["overall_health"] = "healthy"
-            else:
-                report["overall_health"] = "unhealthy"
-
-            return json.dumps(report)
+
+            if action == "start":
+                self.monitor_for(app_id, params.get("pid"))
+                return json.dumps({"application_id": app_id, "status": "monitoring_started"})
+
+            if action == "stop":
+                with self._app_monitors_lock:
+                    monitor = self._app_monitors.pop(app_id, None)
+                if monitor is None:
+                    return f"Error: Application '{app_id}' is not being monitored."
+                monitor.stop_monitoring()
+                return json.dumps({"application_id": app_id, "status": "monitoring_stopped"})
+
+            if action == "report":
+                # Reports only read an existing monitor; starting one here would leave its sampler running
+                with self._app_monitors_lock:
+                    monitor = self._app_monitors.get(app_id)
+                if monitor is None:
+                    return f"Error: Application '{app_id}' is not being monitored."
+                report = monitor.build_health_report(
+                    app_id,
+                    params.get("duration_minutes", 5),
+                    cpu_threshold=params.get("cpu_threshold", 90.0),
+                    memory_threshold=params.get("memory_threshold", 90.0),
+                    disk_threshold=params.get("disk_threshold", 90.0),
+                )
+                return json.dumps(report)
+
+            return f"Error: Unknown action '{action}'. Use 'start', 'stop' or 'report'."
 
         except Exception as e:
-            return f"An error occurred during runtime monitoring simulation: {e}"
+            return f"An error occurred during runtime monitoring: {e}"
 
     async def _arun(self, tool_input: str):
         raise NotImplementedError("RuntimeMonitorTool does not support async")
 
 # Instantiate the tool
-runtime_monitor_tool = RuntimeMonitorTool()
\ No newline at end of file
+runtime_monitor_tool = RuntimeMonitorTool()
@@ -0,0 +1,317 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import re._parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from src.tools.workspace_cache import workspace_cache_dir
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "search_index.json"
+# Pickled index that older versions kept inside the workspace itself
+LEGACY_INDEX_FILENAME = ".search_index.pkl"
+INDEX_VERSION = 2
+# Searches rescan the tree at most this often; writes through the tools update the index directly
+REFRESH_INTERVAL_SECONDS = 30.0
+# Files larger than this, or that look binary, are not indexed
+MAX_INDEXED_FILE_BYTES = 2 * 1024 * 1024
+SKIPPED_DIRS = {".git", ".blobs", "__pycache__", "node_modules", ".venv", "venv", ".mypy_cache", ".pytest_cache"}
+MAX_LINE_CHARS = 240
+MAX_CONTEXT_LINES = 5
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _required_literals(pattern: str, flags: int = 0) -> List[str]:
+    """
+    Returns literal substrings that every match of ``pattern`` must contain.
+    Only top-level runs of plain characters are used, so the result is always
+    safe to prefilter with (it may just be less selective than possible).
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error:
+        return []
+    literals, current = [], []
+    for op, arg in parsed:
+        if op is sre_parse.LITERAL:
+            current.append(chr(arg))
+        else:
+            if current:
+                literals.append("".join(current))
+            current = []
+    if current:
+        literals.append("".join(current))
+    return literals
+
+
+class TrigramIndex:
+    """
+    Persistent trigram index over the text files of a directory tree.
+
+    Trigrams are taken from the lower-cased file contents, so the index serves as
+    a prefilter for both case-sensitive and case-insensitive queries. Candidate
+    files are then scanned line by line to produce the actual matches.
+    """
+
+    def __init__(self, root: str, index_dir: Optional[str] = None,
+                 refresh_interval: float = REFRESH_INTERVAL_SECONDS):
+        self.root = os.path.abspath(root)
+        self.index_path = os.path.join(index_dir or workspace_cache_dir(self.root, "search"), INDEX_FILENAME)
+        self.refresh_interval = refresh_interval
+        self.files: Dict[str, Tuple[int, int]] = {}
+        self.file_trigrams: Dict[str, Set[str]] = {}
+        self.postings: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+        self._dirty = False
+        # Monotonic time of the last full scan; 0 forces the next search to scan
+        self._scanned_at = 0.0
+        self._remove_legacy_index()
+        self._load()
+
+    def _remove_legacy_index(self) -> None:
+        # Never unpickled: anything in the workspace may have been written by an agent
+        try:
+            os.remove(os.path.join(self.root, LEGACY_INDEX_FILENAME))
+        except OSError:
+            pass
+
+    def _load(self) -> None:
+        """Loads the saved index. It is plain JSON, so a tampered file can only make searches miss."""
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                return
+            files = {rel_path: (int(stat[0]), int(stat[1])) for rel_path, stat in data["files"].items()}
+            # Each file's trigrams are stored concatenated: every 3 characters are one trigram
+            file_trigrams = {
+                rel_path: {grams[i:i + 3] for i in range(0, len(grams), 3)}
+                for rel_path, grams in data["file_trigrams"].items()
+            }
+        except Exception as e:
+            logger.warning("Discarding unreadable search index at %s: %s", self.index_path, str(e))
+            return
+        self.files, self.file_trigrams = files, file_trigrams
+        for rel_path, grams in file_trigrams.items():
+            for gram in grams:
+                self.postings.setdefault(gram, set()).add(rel_path)
+
+    def save(self) -> None:
+        """Writes the index to its cache directory, replacing the old one atomically."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "version": INDEX_VERSION,
+                "files": self.files,
+                "file_trigrams": {rel_path: "".join(grams) for rel_path, grams in self.file_trigrams.items()},
+            }
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        found = {}
+        stack = [self.root]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in SKIPPED_DIRS:
+                                stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            stat = entry.stat()
+                            found[os.path.relpath(entry.path, self.root)] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                continue
+        return found
+
+    @staticmethod
+    def _read_text(file_path: str, size: int) -> Optional[str]:
+        if size > MAX_INDEXED_FILE_BYTES:
+            return None
+        try:
+            with open(file_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if b"\0" in data[:8192]:
+            return None
+        return data.decode("utf-8", errors="replace")
+
+    def _remove(self, rel_path: str) -> None:
+        for gram in self.file_trigrams.pop(rel_path, ()):
+            paths = self.postings.get(gram)
+            if paths is not None:
+                paths.discard(rel_path)
+                if not paths:
+                    del self.postings[gram]
+        if self.files.pop(rel_path, None) is not None:
+            self._dirty = True
+
+    def _add(self, rel_path: str, stat: Tuple[int, int]) -> None:
+        self.files[rel_path] = stat
+        self._dirty = True
+        text = self._read_text(os.path.join(self.root, rel_path), stat[1])
+        if text is None:
+            return
+        grams = _trigrams(text.lower())
+        self.file_trigrams[rel_path] = grams
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(rel_path)
+
+    def update_file(self, file_path: str) -> None:
+        """Re-indexes (or drops) a single file after it was written or deleted."""
+        rel_path = os.path.relpath(os.path.abspath(file_path), self.root)
+        with self._lock:
+            self._remove(rel_path)
+            if os.path.isfile(file_path):
+                stat = os.stat(file_path)
+                self._add(rel_path, (stat.st_mtime_ns, stat.st_size))
+
+    def mark_stale(self) -> None:
+        """Makes the next search rescan the tree, e.g. after files were added other than through update_file."""
+        self._scanned_at = 0.0
+
+    def refresh(self, force: bool = True) -> int:
+        """
+        Brings the index in line with the tree on disk. Returns how many files changed.
+
+        Without ``force`` the scan is skipped (returning 0) if the last one is less
+        than ``refresh_interval`` seconds old.
+        """
+        if not force and self._scanned_at and time.monotonic() - self._scanned_at < self.refresh_interval:
+            # Still persist updates made through update_file since the last save
+            self.save()
+            return 0
+        self._scanned_at = time.monotonic()
+        current = self._scan()
+        with self._lock:
+            changed = [p for p, stat in current.items() if self.files.get(p) != stat]
+            removed = [p for p in self.files if p not in current]
+            for rel_path in removed:
+                self._remove(rel_path)
+            for rel_path in changed:
+                self._remove(rel_path)
+                self._add(rel_path, current[rel_path])
+        # Also persists updates made through update_file since the last save
+        self.save()
+        return len(changed) + len(removed)
+
+    def candidates(self, literals: Iterable[str]) -> List[str]:
+        """Files whose trigram sets contain every trigram of every literal."""
+        grams = set()
+        for literal in literals:
+            grams |= _trigrams(literal.lower())
+        with self._lock:
+            if not grams:
+                return sorted(self.file_trigrams)
+            postings = [self.postings.get(gram, set()) for gram in grams]
+            postings.sort(key=len)
+            result = set(postings[0])
+            for paths in postings[1:]:
+                result &= paths
+                if not result:
+                    break
+            return sorted(result)
+
+    def search(self, query: str, regex: bool = False, case_sensitive: bool = False,
+               path_prefix: Optional[str] = None, context: int = 2, max_results: int = 50) -> Dict:
+        """
+        Finds lines matching ``query`` in indexed files.
+
+        Returns:
+            Dict: ``matches`` (file, 1-based line, text and surrounding context lines),
+            ``truncated`` if ``max_results`` was hit, and the candidate/indexed file counts.
+        """
+        flags = 0 if case_sensitive else re.IGNORECASE
+        pattern = re.compile(query if regex else re.escape(query), flags)
+        literals = _required_literals(query, flags) if regex else [query]
+        context = max(0, min(context, MAX_CONTEXT_LINES))
+
+        self.refresh(force=False)
+        candidates = self.candidates(literals)
+        if path_prefix:
+            prefix = os.path.normpath(path_prefix)
+            candidates = [p for p in candidates if prefix == "." or p == prefix or p.startswith(prefix + os.sep)]
+
+        matches = []
+        truncated = False
+        for rel_path in candidates:
+            file_path = os.path.join(self.root, rel_path)
+            text = self._read_text(file_path, os.path.getsize(file_path)) if os.path.exists(file_path) else None
+            if text is None or not pattern.search(text):
+                continue
+            # Lines end at "\n" only, as FileSystemTool's start_line/end_line count them; splitlines()
+            # would also break at \r, \f, \v, ... and report line numbers that read cannot reach
+            lines = text.replace("\r\n", "\n").split("\n")
+            if lines[-1] == "":
+                lines.pop()
+            for number, line in enumerate(lines):
+                if not pattern.search(line):
+                    continue
+                if len(matches) >= max_results:
+                    truncated = True
+                    break
+                matches.append({
+                    "file": rel_path,
+                    "line": number + 1,
+                    "text": line[:MAX_LINE_CHARS],
+                    "before": [l[:MAX_LINE_CHARS] for l in lines[max(0, number - context):number]],
+                    "after": [l[:MAX_LINE_CHARS] for l in lines[number + 1:number + 1 + context]],
+                })
+            if truncated:
+                break
+
+        return {
+            "matches": matches,
+            "truncated": truncated,
+            "candidate_files": len(candidates),
+            "indexed_files": len(self.file_trigrams),
+        }
+
+
+_indexes: Dict[str, TrigramIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(root: str) -> TrigramIndex:
+    """Returns the shared index for ``root``, loading it from disk on first use."""
+    root = os.path.abspath(root)
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = TrigramIndex(root)
+        return index
+
+
+def notify_file_changed(root: str, file_path: str) -> None:
+    """Keeps an already loaded index current after a write; a no-op otherwise."""
+    with _indexes_lock:
+        index = _indexes.get(os.path.abspath(root))
+    if index is not None:
+        index.update_file(file_path)
+
+
+def notify_tree_changed(root: str) -> None:
+    """Makes an already loaded index rescan on its next search, after files were added in bulk."""
+    with _indexes_lock:
+        index = _indexes.get(os.path.abspath(root))
+    if index is not None:
+        index.mark_stale()
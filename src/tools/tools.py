@@ -1,43 +1,123 @@
 import os
-import subprocess
-import requests
-from typing import ClassVar
-from langchain_community.tools import BaseTool, ShellTool, DuckDuckGoSearchRun
-import importlib.util
-import git
+import time
+import itertools
+import mmap
+from typing import ClassVar, Optional, TYPE_CHECKING
+from langchain_community.tools import BaseTool
+from langchain_core.callbacks import BaseCallbackHandler
 import json
+from src.tools.search_index import get_search_index, notify_file_changed, notify_tree_changed
+from src.tools.registry import ALL_TOOLS, index_dynamic_tools
+from src.utils.metrics import TOOL_CALL_SECONDS
+from src.utils.tracing import get_tracer, current_span
 
-# --- Standard Tools ---
+if TYPE_CHECKING:
+    from src.tools.git_mirror import GitMirrorCache
 
-# 1. Shell Tool to run any shell command
-shell_tool = ShellTool()
+# Tools are instantiated on first lookup in ALL_TOOLS (see src/tools/registry.py);
+# the shell and web search tools come straight from langchain_community.
 
-# 2. Git operations using gitpython
+# Git operations using gitpython, backed by a local mirror cache
 class CustomGitTool(BaseTool):
     name: ClassVar[str] = "GitTool"
-    description: ClassVar[str] = "Interact with git repositories. Input should be a JSON object with 'action' and 'args'."
+    description: ClassVar[str] = (
+        "Interact with git repositories. Input should be a JSON object with 'action' and 'args'. "
+        "Actions: 'clone' (args: url, dest inside the workspace, optional ref, depth, filter e.g. 'blob:none', "
+        "worktree), 'fetch' (args: path), 'checkout' (args: path, ref) and 'status' (args: optional path)."
+    )
+
+    mirror_cache: ClassVar[Optional["GitMirrorCache"]] = None
+
+    @classmethod
+    def _get_mirror_cache(cls) -> "GitMirrorCache":
+        if cls.mirror_cache is None:
+            from src.tools.git_mirror import GitMirrorCache
+            cls.mirror_cache = GitMirrorCache()
+        return cls.mirror_cache
 
     def _run(self, tool_input: str) -> str:
         try:
-            repo = git.Repo(os.getcwd())
-            return f"Git repository at {repo.working_dir}"
+            params = json.loads(tool_input) if tool_input and tool_input.strip().startswith("{") else {}
+            action = params.get("action", "status")
+            args = params.get("args", {})
+
+            workspace_root = os.path.abspath("workspace")
+            for key in ("dest", "path"):
+                if key in args:
+                    target_path = os.path.abspath(os.path.join(workspace_root, args[key]))
+                    if not target_path.startswith(workspace_root + os.sep):
+                        return "Error: Path is outside the allowed workspace."
+                    args[key] = target_path
+
+            cache = self._get_mirror_cache()
+            if action == "clone":
+                dest = args.get("dest")
+                if not dest:
+                    name = os.path.basename(args["url"].rstrip("/")).removesuffix(".git")
+                    dest = os.path.abspath(os.path.join(workspace_root, name))
+                    # A URL ending in "/.." or "/." would otherwise name the workspace or its parent
+                    if name in ("", ".", "..") or not dest.startswith(workspace_root + os.sep):
+                        return "Error: Cannot derive a destination inside the workspace from the URL; pass 'dest'."
+                head = cache.clone(
+                    args["url"], dest,
+                    ref=args.get("ref"),
+                    depth=args.get("depth"),
+                    filter_spec=args.get("filter"),
+                    worktree=bool(args.get("worktree", False))
+                )
+                notify_tree_changed(workspace_root)
+                return json.dumps({"status": "success", "path": dest, "head": head})
+
+            elif action == "fetch":
+                head = cache.fetch(args["path"])
+                notify_tree_changed(workspace_root)
+                return json.dumps({"status": "success", "path": args["path"], "head": head})
+
+            elif action == "checkout":
+                head = cache.checkout(args["path"], args["ref"])
+                notify_tree_changed(workspace_root)
+                return json.dumps({"status": "success", "path": args["path"], "head": head})
+
+            elif action == "status":
+                import git
+                repo = git.Repo(args.get("path", os.getcwd()))
+                return f"Git repository at {repo.working_dir}"
+
+            else:
+                return "Error: Invalid action specified."
         except Exception as e:
             return f"Git error: {str(e)}"
 
     async def _arun(self, tool_input: str) -> str:
         raise NotImplementedError("GitTool does not support async")
 
-# 3. Web Search Tool
-search_tool = DuckDuckGoSearchRun()
-
-# Create instances of tools
-git_tool = CustomGitTool()
-
 # --- Custom Tools ---
 
 class FileSystemTool(BaseTool):
     name: ClassVar[str] = "FileSystemTool"
-    description: ClassVar[str] = "Manages files and directories. Input should be a JSON object with 'action' and 'args'."
+    description: ClassVar[str] = (
+        "Manages files and directories. Input should be a JSON object with 'action' and 'args'. "
+        "Actions: 'read' (args: file_path, optional start_line/end_line or offset/length, max_bytes), "
+        "'read_many' (args: file_paths list, same range options), 'write' (args: file_path, content), "
+        "'write_many' (args: files list of {file_path, content}), 'list' (args: path) and "
+        "'tree' (args: path, optional max_depth, offset, limit) and 'search' (args: query, optional regex, "
+        "case_sensitive, path, context, max_results) which searches workspace text files through an index."
+    )
+
+    # Reads larger than this are cut off with a truncation marker
+    MAX_READ_BYTES: ClassVar[int] = 100_000
+    # Files at least this large are read through mmap instead of buffered IO
+    MMAP_THRESHOLD: ClassVar[int] = 1_048_576
+    TREE_DEFAULT_DEPTH: ClassVar[int] = 3
+    TREE_PAGE_SIZE: ClassVar[int] = 200
+
+    @staticmethod
+    def _resolve(workspace_root: str, path: str) -> Optional[str]:
+        """Returns the absolute path inside the workspace, or None if it escapes it."""
+        target_path = os.path.abspath(os.path.join(workspace_root, path))
+        if target_path != workspace_root and not target_path.startswith(workspace_root + os.sep):
+            return None
+        return target_path
 
     def _run(self, tool_input: str) -> str:
         try:
@@ -49,37 +129,158 @@ class FileSystemTool(BaseTool):
             if not os.path.exists(workspace_root):
                 os.makedirs(workspace_root)
 
-            if "file_path" in args:
-                target_path = os.path.abspath(os.path.join(workspace_root, args["file_path"]))
-                if not target_path.startswith(workspace_root):
-                    return "Error: Path is outside the allowed workspace."
-                args["file_path"] = target_path
-            
-            if "path" in args:
-                target_path = os.path.abspath(os.path.join(workspace_root, args["path"]))
-                if not target_path.startswith(workspace_root):
-                    return "Error: Path is outside the allowed workspace."
-                args["path"] = target_path
+            for key in ("file_path", "path"):
+                if key in args:
+                    target_path = self._resolve(workspace_root, args[key])
+                    if target_path is None:
+                        return "Error: Path is outside the allowed workspace."
+                    args[key] = target_path
 
             if action == "write":
-                os.makedirs(os.path.dirname(args["file_path"]), exist_ok=True)
-                with open(args["file_path"], "w") as f:
-                    f.write(args["content"])
+                self._write(args["file_path"], args["content"])
+                notify_file_changed(workspace_root, args["file_path"])
                 return f"Successfully wrote to {args['file_path']}"
-            
+
             elif action == "read":
-                with open(args["file_path"], "r") as f:
-                    return f.read()
+                return self._read(args["file_path"], args)
+
+            elif action == "read_many":
+                results = {}
+                for rel_path in args["file_paths"]:
+                    file_path = self._resolve(workspace_root, rel_path)
+                    if file_path is None:
+                        results[rel_path] = "Error: Path is outside the allowed workspace."
+                        continue
+                    try:
+                        results[rel_path] = self._read(file_path, args)
+                    except Exception as e:
+                        results[rel_path] = f"Error: {e}"
+                return json.dumps(results)
+
+            elif action == "write_many":
+                results = {}
+                for entry in args["files"]:
+                    rel_path = entry["file_path"]
+                    file_path = self._resolve(workspace_root, rel_path)
+                    if file_path is None:
+                        results[rel_path] = "Error: Path is outside the allowed workspace."
+                        continue
+                    try:
+                        self._write(file_path, entry["content"])
+                        notify_file_changed(workspace_root, file_path)
+                        results[rel_path] = "ok"
+                    except Exception as e:
+                        results[rel_path] = f"Error: {e}"
+                return json.dumps(results)
 
             elif action == "list":
                 return ", ".join(os.listdir(args["path"]))
-            
+
+            elif action == "tree":
+                base = args.get("path", workspace_root)
+                offset = int(args.get("offset", 0))
+                limit = int(args.get("limit", self.TREE_PAGE_SIZE))
+                max_depth = int(args.get("max_depth", self.TREE_DEFAULT_DEPTH))
+                # Pull one extra entry to know whether another page exists
+                page = list(itertools.islice(self._iter_tree(base, base, 1, max_depth), offset, offset + limit + 1))
+                has_more = len(page) > limit
+                return json.dumps({
+                    "entries": page[:limit],
+                    "offset": offset,
+                    "next_offset": offset + limit if has_more else None
+                })
+
+            elif action == "search":
+                path_prefix = os.path.relpath(args["path"], workspace_root) if "path" in args else None
+                result = get_search_index(workspace_root).search(
+                    args["query"],
+                    regex=bool(args.get("regex", False)),
+                    case_sensitive=bool(args.get("case_sensitive", False)),
+                    path_prefix=path_prefix,
+                    context=int(args.get("context", 2)),
+                    max_results=int(args.get("max_results", 50))
+                )
+                return json.dumps(result)
+
             else:
                 return "Error: Invalid action specified."
 
         except Exception as e:
             return f"An error occurred: {e}"
 
+    @staticmethod
+    def _write(file_path: str, content: str) -> None:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w") as f:
+            f.write(content)
+
+    def _read(self, file_path: str, args: dict) -> str:
+        """Reads a whole file, a line range or a byte range, capped at max_bytes."""
+        max_bytes = int(args.get("max_bytes", self.MAX_READ_BYTES))
+        size = os.path.getsize(file_path)
+
+        if "start_line" in args or "end_line" in args:
+            start_line = max(int(args.get("start_line", 1)), 1)
+            end_line = args.get("end_line")
+            data = self._read_lines(file_path, size, start_line, int(end_line) if end_line else None, max_bytes + 1)
+        else:
+            offset = max(int(args.get("offset", 0)), 0)
+            length = args.get("length")
+            length = min(int(length), max_bytes + 1) if length is not None else max_bytes + 1
+            data = self._read_bytes(file_path, size, offset, length)
+
+        if len(data) > max_bytes:
+            text = data[:max_bytes].decode("utf-8", errors="replace")
+            return text + f"\n...[truncated: output capped at {max_bytes} bytes of a {size} byte file; use start_line/end_line or offset/length to read further]"
+        return data.decode("utf-8", errors="replace")
+
+    def _read_bytes(self, file_path: str, size: int, offset: int, length: int) -> bytes:
+        with open(file_path, "rb") as f:
+            if size >= self.MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return mm[offset:offset + length]
+            f.seek(offset)
+            return f.read(length)
+
+    def _read_lines(self, file_path: str, size: int, start_line: int, end_line: Optional[int], limit: int) -> bytes:
+        """Returns lines start_line..end_line (1-based, inclusive), reading at most ``limit`` bytes."""
+        with open(file_path, "rb") as f:
+            if size < self.MMAP_THRESHOLD:
+                return self._slice_lines(f.read(), size, start_line, end_line, limit)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return self._slice_lines(mm, size, start_line, end_line, limit)
+
+    @staticmethod
+    def _slice_lines(buf, size: int, start_line: int, end_line: Optional[int], limit: int) -> bytes:
+        """Line range of ``buf`` (bytes or mmap); lines end at b"\n" only, whatever the file size."""
+        start = 0
+        for _ in range(start_line - 1):
+            start = buf.find(b"\n", start) + 1
+            if start == 0:
+                return b""
+        if end_line is None:
+            return buf[start:start + limit]
+        end = start
+        for _ in range(end_line - start_line + 1):
+            end = buf.find(b"\n", end, start + limit) + 1
+            if end == 0:
+                end = min(size, start + limit)
+                break
+        return buf[start:end]
+
+    def _iter_tree(self, base: str, path: str, depth: int, max_depth: int):
+        """Yields workspace entries depth-first in name order; directories end with '/'."""
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        for entry in entries:
+            rel_path = os.path.relpath(entry.path, base)
+            if entry.is_dir(follow_symlinks=False):
+                yield rel_path + "/"
+                if depth < max_depth:
+                    yield from self._iter_tree(base, entry.path, depth + 1, max_depth)
+            else:
+                yield rel_path
+
     async def _arun(self, tool_input: str) -> str:
         raise NotImplementedError("FileSystemTool does not support async")
 
@@ -100,61 +301,42 @@ class PlantUMLTool(BaseTool):
     async def _arun(self, puml_content: str) -> str:
         raise NotImplementedError("PlantUMLTool does not support async")
 
-# Instantiate custom tools
-filesystem_tool = FileSystemTool()
-plantuml_tool = PlantUMLTool()
-
-# Import other tools
-from src.tools.arxiv_tool import ArxivTool
-arxiv_tool = ArxivTool()
-
-from src.tools.ast_tool import ASTAnalysisTool
-ast_tool = ASTAnalysisTool()
-
-from src.tools.domain_expert_tool import DomainExpertTool
-domain_expert_tool = DomainExpertTool()
-
-from src.tools.runtime_monitor_tool import RuntimeMonitorTool
-runtime_monitor_tool = RuntimeMonitorTool()
-
-from src.tools.pdf_reader_tool import PDFReaderTool
-pdf_reader_tool = PDFReaderTool()
-
-from src.tools.ingestion_tool import IngestionTool
-ingestion_tool = IngestionTool()
-
-# A dictionary to easily access all tools
-ALL_TOOLS = {
-    "shell": shell_tool,
-    "git": git_tool,
-    "search": search_tool,
-    "filesystem": filesystem_tool,
-    "plantuml": plantuml_tool,
-    "arxiv": arxiv_tool,
-    "ast": ast_tool,
-    "domain_expert": domain_expert_tool,
-    "runtime_monitor": runtime_monitor_tool,
-    "pdf_reader": pdf_reader_tool,
-    "ingestion": ingestion_tool
-}
-
-def load_dynamic_tools() -> None:
-    """Loads tools dynamically from the src/tools directory."""
-    tools_dir = os.path.dirname(__file__)
-    for filename in os.listdir(tools_dir):
-        if filename.endswith(".py") and filename not in [
-            "__init__.py", "tools.py", "arxiv_tool.py", "ast_tool.py",
-            "domain_expert_tool.py", "runtime_monitor_tool.py",
-            "pdf_reader_tool.py", "ingestion_tool.py"
-        ]:
-            module_name = filename[:-3]
-            file_path = os.path.join(tools_dir, filename)
-            spec = importlib.util.spec_from_file_location(module_name, file_path)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            
-            tool_instance = getattr(module, module_name)
-            ALL_TOOLS[module_name] = tool_instance
-
-# Load dynamic tools when this module is imported
-load_dynamic_tools()
+class ToolTelemetryHandler(BaseCallbackHandler):
+    """Records latency and a trace span for every tool run started through BaseTool.run."""
+
+    def __init__(self):
+        self._started = {}
+
+    def on_tool_start(self, serialized, input_str, *, run_id=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "unknown"
+        # Not activated: tools run in the agent's thread and must not replace its active span
+        span = get_tracer().start_span(f"tool {name}", {"tool.name": name}, activate=False) \
+            if current_span() else None
+        self._started[run_id] = (name, time.perf_counter(), span)
+
+    def _finish(self, run_id, error=None) -> None:
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            name, start, span = started
+            TOOL_CALL_SECONDS.labels(name).observe(time.perf_counter() - start)
+            if span is not None:
+                span.end(error=error)
+
+    def on_tool_end(self, output, *, run_id=None, **kwargs):
+        self._finish(run_id)
+
+    def on_tool_error(self, error, *, run_id=None, **kwargs):
+        self._finish(run_id, error)
+
+tool_telemetry_handler = ToolTelemetryHandler()
+
+def instrument_tool(tool) -> None:
+    """Attaches the telemetry handler to a tool; called by ALL_TOOLS as each tool is created."""
+    if tool.callbacks is None:
+        tool.callbacks = [tool_telemetry_handler]
+    elif isinstance(tool.callbacks, list) and tool_telemetry_handler not in tool.callbacks:
+        tool.callbacks.append(tool_telemetry_handler)
+
+def load_dynamic_tools():
+    """Re-indexes the dynamic tools in src/tools; kept for callers of the eager loader."""
+    return index_dynamic_tools()
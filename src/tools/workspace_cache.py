@@ -0,0 +1,13 @@
+import os
+
+# Next to (never inside) the workspace: agents cannot reach it through the workspace tools, it does not
+# ship with the generated project, and it stays on the workspace's filesystem so blobs can be hardlinked
+CACHE_DIRNAME = ".workspace_cache"
+
+
+def workspace_cache_dir(workspace_root: str, kind: str) -> str:
+    """Returns (creating it) the directory that caches ``kind`` data derived from ``workspace_root``."""
+    workspace_root = os.path.abspath(workspace_root)
+    path = os.path.join(os.path.dirname(workspace_root), CACHE_DIRNAME, os.path.basename(workspace_root), kind)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,111 @@
+import time
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, fields
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+from src.utils.metrics import REGISTRY
+
+BUDGET_EXHAUSTED = REGISTRY.counter(
+    "agent_budget_exhausted_total", "Agent runs stopped by their budget, per limit hit (steps, time)", ("agent", "reason"))
+
+# What AgentExecutor answers when it stops an agent at max_iterations / max_execution_time
+STOPPED_OUTPUT = "Agent stopped due to iteration limit or time limit."
+
+# force: return the executor's stop message; generate: one last LLM call turns the
+# steps taken so far into a final answer; error: raise AgentBudgetExceeded
+EARLY_STOPPING_POLICIES = ("force", "generate", "error")
+
+
+@dataclass
+class AgentBudget:
+    """Limits of one BaseAgent.run call; None disables a limit."""
+    max_steps: int = 15
+    max_tokens: Optional[int] = 2048
+    max_seconds: Optional[float] = 600.0
+    early_stopping: str = "force"
+    # Wall clock of the extra LLM call the "generate" policy makes after the budget ran out
+    final_answer_seconds: Optional[float] = 60.0
+
+    def __post_init__(self):
+        if self.early_stopping not in EARLY_STOPPING_POLICIES:
+            raise ValueError(f"Invalid early_stopping policy '{self.early_stopping}'. "
+                             f"Must be one of {EARLY_STOPPING_POLICIES}")
+
+    @classmethod
+    def for_agent(cls, agent: str, profiles: Mapping[str, Mapping[str, Any]]) -> "AgentBudget":
+        """The ``default`` profile overlaid with the agent's own (keyed by class name)."""
+        merged = {**profiles.get("default", {}), **profiles.get(agent, {})}
+        known = {f.name for f in fields(cls)}
+        unknown = set(merged) - known
+        if unknown:
+            raise ValueError(f"Unknown budget settings for {agent}: {sorted(unknown)}")
+        return cls(**merged)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class AgentBudgetExceeded(Exception):
+    """An agent ran out of its step or time budget."""
+
+    # Re-running the same task would exhaust the same budget again
+    retryable = False
+
+    def __init__(self, agent: str, reason: str, steps: int = 0, elapsed: float = 0.0):
+        super().__init__(f"{agent} exceeded its {reason} budget after {steps} step(s) and {elapsed:.1f}s")
+        self.agent = agent
+        self.reason = reason
+        self.steps = steps
+        self.elapsed = elapsed
+
+    def report(self) -> Dict[str, Any]:
+        return {"agent": self.agent, "reason": self.reason, "steps": self.steps, "elapsed_seconds": round(self.elapsed, 3)}
+
+
+# (agent, started, deadline) of the agent run in this context; copied into worker threads
+_deadline: contextvars.ContextVar[Optional[Tuple[str, float, float]]] = contextvars.ContextVar(
+    "agent_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(agent: str, max_seconds: Optional[float]) -> Iterator[None]:
+    """Makes ``check_deadline`` raise once ``max_seconds`` have passed (no-op for None)."""
+    if max_seconds is None:
+        yield
+        return
+    now = time.monotonic()
+    token = _deadline.set((agent, now, now + max_seconds))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def without_deadline() -> Iterator[None]:
+    """Runs work shared with other agent runs (e.g. a coalesced LLM call) outside the current run's deadline."""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_seconds() -> Optional[float]:
+    """Seconds left before the current agent run's deadline, or None without one."""
+    current = _deadline.get()
+    return None if current is None else current[2] - time.monotonic()
+
+
+def deadline_error() -> AgentBudgetExceeded:
+    """The (counted) error for the current agent run running out of time; requires a deadline_scope."""
+    agent, started, _ = _deadline.get()
+    BUDGET_EXHAUSTED.labels(agent, "time").inc()
+    return AgentBudgetExceeded(agent, "time", elapsed=time.monotonic() - started)
+
+
+def check_deadline() -> None:
+    """Raises AgentBudgetExceeded if the current agent run is past its deadline."""
+    current = _deadline.get()
+    if current is not None and time.monotonic() >= current[2]:
+        raise deadline_error()
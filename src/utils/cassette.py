@@ -0,0 +1,234 @@
+"""
+LLM cassettes: prompt/completion pairs recorded from a real model and replayed
+deterministically, so whole workflows run without Ollama, a GPU or a network.
+
+A cassette is a JSONL file with one interaction per line (model, prompt, stop
+words, completion text, Ollama's generation info and the recorded latency). On
+replay a prompt gets the completion recorded for the same model, prompt and
+stop words; repeats of that prompt get the next recording for it, and the last
+one repeats. Hand-written interactions may give ``contains`` instead of a
+prompt; they answer any prompt of their model containing that text (e.g. an
+agent's role line). A prompt that was never recorded fails with CassetteMiss,
+unless the cassette opts into ``match="sequence"``: then it (e.g. a prompt that
+embeds a fresh job id) gets the next unused recording of its model in recording
+order. Such fallbacks are logged and counted, since they may pair a prompt with
+another prompt's answer.
+"""
+import os
+import json
+import math
+import time
+import random
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from src.utils.metrics import REGISTRY
+from src.utils.single_flight import request_key
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_FALLBACKS = REGISTRY.counter(
+    "llm_cassette_fallbacks_total", "Replayed prompts without a recording answered by sequence matching", ("model",))
+
+CASSETTE_MODES = ("record", "replay")
+MATCH_MODES = ("exact", "sequence")
+
+
+class CassetteMiss(LookupError):
+    """Replay found no recording for a prompt."""
+
+
+def _normalize_model(model: str) -> str:
+    return model if ":" in model else f"{model}:latest"
+
+
+def interaction_key(model: str, prompt: str, stop: Optional[Sequence[str]] = None) -> str:
+    return request_key(_normalize_model(model), prompt, list(stop or []))
+
+
+class LatencyModel:
+    """
+    Replay latency per call, from a spec string:
+
+    - ``recorded``: the latency measured when recording (``recorded*0.5`` scales it)
+    - ``none``: no delay
+    - ``fixed:S``: S seconds
+    - ``uniform:A:B``: uniform between A and B seconds
+    - ``lognormal:MEDIAN:SIGMA``: log-normal with that median, like real generation times
+    """
+
+    def __init__(self, spec: str = "recorded", seed: Optional[int] = 0):
+        self.spec = spec
+        self._rng = random.Random(seed)
+        name, _, args = spec.partition(":")
+        try:
+            params = [float(arg) for arg in args.split(":")] if args else []
+        except ValueError:
+            raise ValueError(f"Invalid latency spec '{spec}'")
+        if name.startswith("recorded"):
+            _, _, scale = name.partition("*")
+            self._scale = float(scale) if scale else 1.0
+            name = "recorded"
+        arity = {"recorded": 0, "none": 0, "fixed": 1, "uniform": 2, "lognormal": 2}
+        if arity.get(name) != len(params):
+            raise ValueError(f"Invalid latency spec '{spec}'")
+        self._name, self._params = name, params
+        self._lock = threading.Lock()
+
+    def sample(self, recorded: float = 0.0) -> float:
+        with self._lock:
+            if self._name == "recorded":
+                return max(0.0, recorded * self._scale)
+            if self._name == "none":
+                return 0.0
+            if self._name == "fixed":
+                return self._params[0]
+            if self._name == "uniform":
+                return self._rng.uniform(*self._params)
+            median, sigma = self._params
+            return self._rng.lognormvariate(math.log(median), sigma)
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str = "replay", latency: str = "recorded", seed: Optional[int] = 0,
+                 match: str = "exact", sleep: Callable[[float], None] = time.sleep):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Invalid cassette mode '{mode}'. Must be one of {CASSETTE_MODES}")
+        if match not in MATCH_MODES:
+            raise ValueError(f"Invalid cassette match '{match}'. Must be one of {MATCH_MODES}")
+        self.path = path
+        self.mode = mode
+        self.match = match
+        self.latency = LatencyModel(latency, seed)
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.interactions: List[Dict[str, Any]] = []
+        self._by_key: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_model: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_contains: Dict[tuple, List[Dict[str, Any]]] = {}
+        self._key_cursor: Dict[str, int] = {}
+        self._model_cursor: Dict[str, int] = {}
+        self._used: set = set()
+        if mode == "replay":
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        self._index(json.loads(line))
+                    except (ValueError, KeyError) as e:
+                        logger.warning("Skipping malformed cassette line %s:%d: %s", self.path, number, str(e))
+        except FileNotFoundError:
+            raise CassetteMiss(f"Cassette not found: {self.path}")
+
+    def _index(self, interaction: Dict[str, Any]) -> None:
+        interaction["id"] = len(self.interactions)
+        if "contains" in interaction:
+            pattern = (_normalize_model(interaction["model"]), interaction["contains"])
+            self.interactions.append(interaction)
+            self._by_contains.setdefault(pattern, []).append(interaction)
+            return
+        interaction["key"] = interaction.get("key") or interaction_key(
+            interaction["model"], interaction["prompt"], interaction.get("stop"))
+        self.interactions.append(interaction)
+        self._by_key.setdefault(interaction["key"], []).append(interaction)
+        self._by_model.setdefault(_normalize_model(interaction["model"]), []).append(interaction)
+
+    def record(self, model: str, prompt: str, stop: Optional[Sequence[str]], text: str,
+               generation_info: Optional[Dict[str, Any]] = None, latency: float = 0.0) -> None:
+        """Appends one interaction to the cassette file."""
+        interaction = {
+            "key": interaction_key(model, prompt, stop),
+            "model": model,
+            "prompt": prompt,
+            "stop": list(stop or []),
+            "text": text,
+            "generation_info": generation_info or {},
+            "latency": round(latency, 6),
+        }
+        line = json.dumps(interaction) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._index(interaction)
+
+    def lookup(self, model: str, prompt: str, stop: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """The recording to replay for this call (advances the cursors); raises CassetteMiss."""
+        key = interaction_key(model, prompt, stop)
+        with self._lock:
+            recordings = self._by_key.get(key)
+            if not recordings:
+                key, recordings = next(
+                    ((pattern, found) for pattern, found in self._by_contains.items()
+                     if pattern[0] == _normalize_model(model) and pattern[1] in prompt), (key, None))
+            if recordings:
+                cursor = self._key_cursor.get(key, 0)
+                self._key_cursor[key] = cursor + 1
+                interaction = recordings[min(cursor, len(recordings) - 1)]
+            elif self.match == "sequence":
+                interaction = self._next_unused(_normalize_model(model))
+                if interaction is not None:
+                    CASSETTE_FALLBACKS.labels(_normalize_model(model)).inc()
+                    logger.warning("No recording for %s prompt %r; replaying recording %d of %s in sequence",
+                                   model, prompt[:80], interaction["id"], self.path)
+            else:
+                interaction = None
+            if interaction is None:
+                raise CassetteMiss(f"No recording for {model} prompt {prompt[:80]!r} in {self.path}")
+            self._used.add(interaction["id"])
+            return interaction
+
+    def reset(self) -> None:
+        """Rewinds replay to the first recording of every prompt."""
+        with self._lock:
+            self._key_cursor.clear()
+            self._model_cursor.clear()
+            self._used.clear()
+
+    def _next_unused(self, model: str) -> Optional[Dict[str, Any]]:
+        recordings = self._by_model.get(model, [])
+        cursor = self._model_cursor.get(model, 0)
+        while cursor < len(recordings) and recordings[cursor]["id"] in self._used:
+            cursor += 1
+        self._model_cursor[model] = cursor + 1
+        return recordings[cursor] if cursor < len(recordings) else None
+
+    def replay(self, model: str, prompt: str, stop: Optional[Sequence[str]] = None,
+               deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Looks up the recording and waits out its replay latency (at most until
+        ``deadline`` seconds from now, if given).
+        """
+        interaction = self.lookup(model, prompt, stop)
+        delay = self.latency.sample(interaction.get("latency", 0.0))
+        if deadline is not None:
+            delay = min(delay, max(deadline, 0.0))
+        if delay > 0:
+            self._sleep(delay)
+        return interaction
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """The cassette Settings.LLM_BACKEND selects ("record"/"replay"), or None for live Ollama."""
+    global _cassette
+    from src.utils.config import get_settings
+    settings = get_settings()
+    if settings.LLM_BACKEND == "ollama":
+        return None
+    if _cassette is None or _cassette.path != settings.LLM_CASSETTE_PATH or _cassette.mode != settings.LLM_BACKEND:
+        with _cassette_lock:
+            if _cassette is None or _cassette.path != settings.LLM_CASSETTE_PATH \
+                    or _cassette.mode != settings.LLM_BACKEND:
+                _cassette = Cassette(settings.LLM_CASSETTE_PATH, settings.LLM_BACKEND,
+                                     settings.LLM_REPLAY_LATENCY, settings.LLM_REPLAY_SEED,
+                                     settings.LLM_REPLAY_MATCH)
+    return _cassette
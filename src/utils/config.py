@@ -1,5 +1,5 @@
 import os
-from typing import Optional
+from typing import Any, Dict, Optional
 from pydantic import Field, field_validator, ConfigDict
 from pydantic_settings import BaseSettings
 import logging
@@ -15,12 +15,60 @@ class Settings(BaseSettings):
     # Ollama Configuration
     OLLAMA_HOST: str = Field(default="http://localhost:11434", description="Ollama host URL")
     OLLAMA_MODEL: str = Field(default="llama3", description="Ollama model name")
+    OLLAMA_HOSTS: list[str] = Field(default=[], description="Inference hosts to load-balance across, e.g. [\"http://gpu1:11434\", \"http://gpu2:11434\"] (defaults to OLLAMA_HOST)")
+    OLLAMA_HEALTH_INTERVAL: float = Field(default=10.0, description="Seconds between inference host health and model residency checks")
+    OLLAMA_SWAP_PENALTY: float = Field(default=4.0, description="Outstanding requests a host must be ahead by before a request goes to a host that has to load the model")
+    OLLAMA_NUM_PARALLEL: int = Field(default=4, description="LLM calls each inference host serves at once (match the server's OLLAMA_NUM_PARALLEL)")
+    MODEL_BATCH_MAX_WAIT: float = Field(default=5.0, description="Seconds a call may wait for its model's turn before the host switches models (0 disables model batching)")
+    OLLAMA_POOL_MAXSIZE: int = Field(default=32, description="Keep-alive connections kept per inference host")
+    
+    LLM_BACKEND: str = Field(default="ollama", description="Where agent LLM calls go: 'ollama', 'record' (Ollama, saving each call to the cassette) or 'replay' (answers from the cassette, no Ollama)")
+    LLM_CASSETTE_PATH: str = Field(default="cassettes/llm.jsonl", description="Cassette file recorded to or replayed from")
+    LLM_REPLAY_LATENCY: str = Field(default="recorded", description="Replay latency per call: 'recorded', 'recorded*0.5', 'none', 'fixed:S', 'uniform:A:B' or 'lognormal:MEDIAN:SIGMA'")
+    LLM_REPLAY_SEED: int = Field(default=0, description="Seed of the replay latency distribution")
+    LLM_REPLAY_MATCH: str = Field(default="exact", description="Replay of unrecorded prompts: 'exact' fails, 'sequence' (opt-in, logged and counted) uses the model's next unused recording")
+    
+    LLM_RETRY_BASE_DELAY: float = Field(default=0.5, description="Seconds of the first backoff after an overload error; doubles per retry, with full jitter")
+    LLM_RETRY_MAX_DELAY: float = Field(default=30.0, description="Upper bound of a single retry backoff in seconds")
+    RETRY_BUDGET_RATIO: float = Field(default=0.1, description="Retry tokens earned per successful LLM call; retries stop when an endpoint has used up half its bucket")
+    CIRCUIT_FAILURE_THRESHOLD: int = Field(default=5, description="Consecutive overload errors that open a model endpoint's circuit")
+    CIRCUIT_RESET_SECONDS: float = Field(default=30.0, description="Seconds an open circuit fails fast before letting a probe through")
+    
+    AGENT_BUDGETS: Dict[str, Dict[str, Any]] = Field(
+        default={
+            "default": {"max_steps": 15, "max_tokens": 2048, "max_seconds": 600, "early_stopping": "force"},
+            "BuilderAgent": {"max_steps": 25, "max_tokens": 4096, "max_seconds": 900},
+            "RefactoringAgent": {"max_steps": 20, "max_tokens": 4096, "max_seconds": 600},
+        },
+        description='Per-agent run budgets keyed by agent class name, overlaid on "default": max_steps (ReAct iterations), '
+                    'max_tokens (generated per LLM call), max_seconds (wall clock per run), early_stopping '
+                    '("force", "generate" or "error") and final_answer_seconds (wall clock of the "generate" call)'
+    )
+    
+    LLM_TOKEN_PRICES: Dict[str, Dict[str, float]] = Field(
+        default={},
+        description='Per-model price per 1k tokens for usage accounting, e.g. {"llama3": {"prompt": 0.0, "completion": 0.0}}'
+    )
+    
+    # Research Tools Configuration
+    ARXIV_BACKEND: str = Field(default="api", description="ArxivTool backend: 'api' or 'local'")
+    ARXIV_INDEX_PATH: Optional[str] = Field(default=None, description="Path to a JSONL arXiv metadata snapshot for the local backend")
+    ARXIV_CACHE_TTL: int = Field(default=3600, description="Seconds to cache arxiv search results")
+    DOMAIN_KNOWLEDGE_DIR: Optional[str] = Field(default=None, description="Directory of domain knowledge documents (defaults to the bundled set)")
+    
+    # Runtime Monitoring Configuration
+    MONITOR_OBSERVATION_SECONDS: int = Field(default=30, description="Seconds of resource samples collected before judging a deployment's health")
     
     # Application Configuration
     LOG_LEVEL: str = Field(default="INFO", description="Logging level")
     WORKSPACE_DIR: str = Field(default="workspace", description="Workspace directory path")
     MAX_RETRIES: int = Field(default=3, description="Maximum number of retries")
     POLLING_INTERVAL: int = Field(default=2000, description="Polling interval in milliseconds")
+    WORKER_THREADS: int = Field(default=32, description="Threads available to blocking agent and tool calls")
+    SANDBOX_TIMEOUT_SECONDS: float = Field(default=30.0, description="Wall-clock limit for import-testing one generated component")
+    SANDBOX_MEMORY_MB: int = Field(default=2048, description="Address-space limit of each component import-test subprocess")
+    SANDBOX_WORKERS: int = Field(default=4, description="Component import tests run in parallel")
+    TRACE_EXPORT_PATH: Optional[str] = Field(default="logs/traces.otlp.jsonl", description="File that finished trace spans are appended to as OTLP/JSON (unset to keep traces in memory only)")
     
     # API Configuration
     CORS_ORIGINS: list[str] = Field(
@@ -40,6 +88,20 @@ class Settings(BaseSettings):
             raise ValueError(f"Invalid log level. Must be one of {valid_levels}")
         return v.upper()
     
+    @field_validator("LLM_BACKEND")
+    @classmethod
+    def validate_llm_backend(cls, v: str) -> str:
+        if v.lower() not in {"ollama", "record", "replay"}:
+            raise ValueError("Invalid LLM backend. Must be 'ollama', 'record' or 'replay'")
+        return v.lower()
+    
+    @field_validator("ARXIV_BACKEND")
+    @classmethod
+    def validate_arxiv_backend(cls, v: str) -> str:
+        if v.lower() not in {"api", "local"}:
+            raise ValueError("Invalid arxiv backend. Must be 'api' or 'local'")
+        return v.lower()
+    
     @field_validator("CORS_ORIGINS", mode="before")
     @classmethod
     def parse_cors_origins(cls, v):
@@ -0,0 +1,196 @@
+"""
+In-process stand-in for an Ollama server, for tests, benchmarks and local runs
+without a GPU:
+
+    python -m src.utils.fake_ollama --port 11434 --load-seconds 2
+
+It serves /api/generate (streamed NDJSON like Ollama), /api/tags and /api/ps. It
+models the costs that matter for scheduling: at most ``max_loaded_models`` models
+are resident, loading another one evicts the least recently used one and takes
+``load_seconds``, and each token takes ``token_seconds``.
+
+Given a cassette (``--cassette``), it answers each prompt with the recorded
+completion after the cassette's replay latency, so a workflow recorded once
+can be replayed over HTTP through the whole client stack.
+"""
+import json
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Sequence
+
+
+def _normalize(model: str) -> str:
+    return model if ":" in model else f"{model}:latest"
+
+
+class FakeOllamaServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, models: Sequence[str] = ("llama3", "codellama"),
+                 max_loaded_models: int = 1, load_seconds: float = 0.0, token_seconds: float = 0.0,
+                 response_text: str = "Thought: I know the answer\nFinal Answer: done", num_parallel: int = 4,
+                 cassette: Optional[Any] = None):
+        self.models = [_normalize(m) for m in models]
+        self.cassette = cassette
+        self.max_loaded_models = max_loaded_models
+        self.load_seconds = load_seconds
+        self.token_seconds = token_seconds
+        self.response_text = response_text
+        # Set to an HTTP status (e.g. 503) to make every generate request fail
+        self.fail_status: Optional[int] = None
+        self.loaded: "OrderedDict[str, float]" = OrderedDict()
+        self.stats: Dict[str, int] = {"requests": 0, "loads": 0, "active": 0, "max_active": 0}
+        self.requests_by_model: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(num_parallel)
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _ensure_loaded(self, model: str) -> None:
+        # One load at a time, like a single GPU; resident models are only touched
+        with self._load_lock:
+            with self._lock:
+                if model in self.loaded:
+                    self.loaded.move_to_end(model)
+                    return
+            time.sleep(self.load_seconds)
+            with self._lock:
+                while len(self.loaded) >= self.max_loaded_models:
+                    self.loaded.popitem(last=False)
+                self.loaded[model] = time.time()
+                self.stats["loads"] += 1
+
+    def _generate(self, body: Dict, text: str, delay: float = 0.0):
+        model = _normalize(body.get("model", ""))
+        with self._slots:
+            with self._lock:
+                self.stats["requests"] += 1
+                self.stats["active"] += 1
+                self.stats["max_active"] = max(self.stats["max_active"], self.stats["active"])
+                self.requests_by_model[model] = self.requests_by_model.get(model, 0) + 1
+            try:
+                self._ensure_loaded(model)
+                time.sleep(delay)
+                tokens = text.split(" ")
+                for i, token in enumerate(tokens):
+                    time.sleep(self.token_seconds)
+                    yield {"model": model, "response": token + (" " if i < len(tokens) - 1 else ""), "done": False}
+                yield {
+                    "model": model, "response": "", "done": True,
+                    "prompt_eval_count": len(str(body.get("prompt", "")).split()),
+                    "eval_count": len(tokens),
+                }
+            finally:
+                with self._lock:
+                    self.stats["active"] -= 1
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _json(self, status: int, payload: Dict) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._json(200, {"models": [{"name": m, "model": m} for m in server.models]})
+                elif self.path == "/api/ps":
+                    with server._lock:
+                        loaded = list(server.loaded)
+                    self._json(200, {"models": [{"name": m, "model": m} for m in loaded]})
+                else:
+                    self._json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path != "/api/generate":
+                    self._json(404, {"error": "not found"})
+                    return
+                if server.fail_status is not None:
+                    self._json(server.fail_status, {"error": "server overloaded"})
+                    return
+                if server.cassette is None and _normalize(body.get("model", "")) not in server.models:
+                    self._json(404, {"error": f"model '{body.get('model')}' not found"})
+                    return
+                text, delay = server.response_text, 0.0
+                if server.cassette is not None:
+                    stop = (body.get("options") or {}).get("stop")
+                    try:
+                        interaction = server.cassette.lookup(body.get("model", ""), str(body.get("prompt", "")), stop)
+                    except LookupError as e:
+                        self._json(404, {"error": str(e)})
+                        return
+                    text, delay = interaction["text"], server.cassette.latency.sample(interaction.get("latency", 0.0))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for chunk in server._generate(body, text, delay):
+                    line = (json.dumps(chunk) + "\n").encode()
+                    self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--models", default="llama3,codellama")
+    parser.add_argument("--max-loaded-models", type=int, default=1)
+    parser.add_argument("--load-seconds", type=float, default=0.0)
+    parser.add_argument("--token-seconds", type=float, default=0.0)
+    parser.add_argument("--cassette", help="Replay completions from this cassette file")
+    parser.add_argument("--latency", default="recorded", help="Replay latency spec (see LatencyModel)")
+    args = parser.parse_args()
+    cassette = None
+    if args.cassette:
+        from src.utils.cassette import Cassette
+        cassette = Cassette(args.cassette, "replay", args.latency)
+    server = FakeOllamaServer(args.host, args.port, args.models.split(","), args.max_loaded_models,
+                              args.load_seconds, args.token_seconds, cassette=cassette)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os
+import json
+import socket
+import secrets
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+RELOAD_CHANNEL = "registry:reload"
+
+
+class ReloadBroadcaster:
+    """
+    Keeps the tool and agent registries of every server process in step. The
+    process that modified the code base publishes its reload on a Redis pub/sub
+    channel; every other process re-indexes its own registries when it hears it.
+    Reloads are incremental, so a process that is already up to date does no work.
+    """
+
+    def __init__(self, client_getter: Callable, reload: Callable[[], Dict[str, Any]],
+                 channel: str = RELOAD_CHANNEL):
+        self._client_getter = client_getter
+        self._reload = reload
+        self.channel = channel
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self, changes: Dict[str, Any]) -> None:
+        """Announces a local reload to the other processes; never raises."""
+        client = self._client_getter()
+        if client is None:
+            return
+        try:
+            client.publish(self.channel, json.dumps({"origin": self.origin, "changes": changes}))
+        except Exception as e:
+            logger.warning("Failed to broadcast registry reload: %s", str(e))
+
+    def handle(self, data) -> Optional[Dict[str, Any]]:
+        """Applies a reload announced by another process; returns this process's changes."""
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            logger.warning("Ignoring malformed registry reload message: %r", data)
+            return None
+        if message.get("origin") == self.origin:
+            return None
+        changes = self._reload()
+        logger.info("Applied registry reload from %s", message.get("origin"))
+        return changes
+
+    def start(self) -> None:
+        client = self._client_getter()
+        if client is None or self._thread is not None:
+            return
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, args=(pubsub,), name="registry-reload", daemon=True)
+        self._thread.start()
+
+    def _listen(self, pubsub) -> None:
+        try:
+            while not self._stop.is_set():
+                try:
+                    message = pubsub.get_message(timeout=1.0)
+                except Exception as e:
+                    logger.warning("Registry reload listener error: %s", str(e))
+                    self._stop.wait(1.0)
+                    continue
+                if message and message.get("type") == "message":
+                    try:
+                        self.handle(message["data"])
+                    except Exception as e:
+                        logger.error("Registry reload failed: %s", str(e))
+        finally:
+            pubsub.close()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -1,17 +1,37 @@
 import logging
 import logging.config
+import logging.handlers
 import os
+import re
+import sys
 import json
-from typing import Optional
+import time
+import queue
+import atexit
+import threading
+from typing import List, Optional
 from datetime import datetime
 
-def setup_logging(log_dir: Optional[str] = None) -> None:
+try:
+    import orjson
+except ImportError:  # optional, speeds up JsonFormatter
+    orjson = None
+
+# Records handed to the background writer per batch; handlers flush once per batch
+LOG_BATCH_SIZE = 256
+REDACTED = '***REDACTED***'
+
+_listener: Optional["BatchingQueueListener"] = None
+_listener_lock = threading.Lock()
+
+def setup_logging(log_dir: Optional[str] = None, use_queue: bool = True) -> None:
     """
     Set up logging configuration for the application.
     Creates log directory if it doesn't exist.
     
     Args:
         log_dir: Optional directory for log files. Defaults to 'logs' in current directory.
+        use_queue: Format and write records on a background thread; callers only enqueue them.
     """
     if not log_dir:
         log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'logs')
@@ -30,9 +50,11 @@ def setup_logging(log_dir: Optional[str] = None) -> None:
         'disable_existing_loggers': False,
         'formatters': {
             'standard': {
+                'class': 'src.utils.logging_config.FastFormatter',
                 'format': '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
             },
             'detailed': {
+                'class': 'src.utils.logging_config.FastFormatter',
                 'format': '%(asctime)s [%(levelname)s] %(name)s (%(filename)s:%(lineno)d): %(message)s'
             },
             'json': {
@@ -42,13 +64,13 @@ def setup_logging(log_dir: Optional[str] = None) -> None:
         },
         'handlers': {
             'console': {
-                'class': 'logging.StreamHandler',
+                'class': 'src.utils.logging_config.BatchStreamHandler',
                 'level': 'INFO',
                 'formatter': 'standard',
                 'stream': 'ext://sys.stdout'
             },
             'file': {
-                'class': 'logging.handlers.RotatingFileHandler',
+                'class': 'src.utils.logging_config.BatchRotatingFileHandler',
                 'level': 'DEBUG',
                 'formatter': 'detailed',
                 'filename': general_log,
@@ -56,7 +78,7 @@ def setup_logging(log_dir: Optional[str] = None) -> None:
                 'backupCount': 5
             },
             'error_file': {
-                'class': 'logging.handlers.RotatingFileHandler',
+                'class': 'src.utils.logging_config.BatchRotatingFileHandler',
                 'level': 'ERROR',
                 'formatter': 'detailed',
                 'filename': error_log,
@@ -64,7 +86,7 @@ def setup_logging(log_dir: Optional[str] = None) -> None:
                 'backupCount': 5
             },
             'json_file': {
-                'class': 'logging.handlers.RotatingFileHandler',
+                'class': 'src.utils.logging_config.BatchRotatingFileHandler',
                 'level': 'INFO',
                 'formatter': 'json',
                 'filename': os.path.join(log_dir, f'json_{timestamp}.log'),
@@ -97,7 +119,10 @@ def setup_logging(log_dir: Optional[str] = None) -> None:
     
     # Apply configuration
     try:
+        stop_log_listener()
         logging.config.dictConfig(config)
+        if use_queue:
+            _install_queue([logging.getLogger()] + [logging.getLogger(name) for name in config['loggers']])
         logging.info("Logging configuration loaded successfully")
     except Exception as e:
         # Fallback to basic configuration if loading fails
@@ -120,7 +145,213 @@ def get_logger(name: str) -> logging.Logger:
     """
     return logging.getLogger(name)
 
-class JsonFormatter(logging.Formatter):
+class _BatchFlushMixin:
+    """
+    Lets the background listener write a whole batch of records before flushing,
+    instead of StreamHandler's flush after every record.
+    """
+    _in_batch = False
+
+    def begin_batch(self) -> None:
+        self._in_batch = True
+
+    def end_batch(self) -> None:
+        self._in_batch = False
+        try:
+            self.flush()
+        except (OSError, ValueError):
+            # The stream was closed under us (e.g. at interpreter exit); logging.shutdown ignores these too
+            pass
+        except Exception:
+            # Same policy as emit(): a broken stream must not take the writer thread down
+            if logging.raiseExceptions:
+                sys.stderr.write(f"--- Logging error flushing {self!r} ---\n")
+
+    def flush(self) -> None:
+        if not self._in_batch:
+            super().flush()
+
+class BatchStreamHandler(_BatchFlushMixin, logging.StreamHandler):
+    pass
+
+class BatchRotatingFileHandler(_BatchFlushMixin, logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler that formats each record once (the stock shouldRollover
+    formats it a second time) and tracks the file size itself instead of
+    stat-ing the file and seeking, which would also defeat batched flushing.
+    """
+    _size: Optional[int] = None
+    _last_record = None
+    _last_text = ''
+
+    def format(self, record: logging.LogRecord) -> str:
+        if record is not self._last_record:
+            self._last_text = super().format(record)
+            self._last_record = record
+        return self._last_text
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.maxBytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        if self._size is None:
+            self._size = self.stream.tell()
+        return self._size + len(self.format(record)) + 1 >= self.maxBytes
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self._size = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        super().emit(record)
+        if self._size is not None:
+            self._size += len(self.format(record)) + 1
+
+class FastFormatter(logging.Formatter):
+    """Formatter that reuses the formatted timestamp for records logged within the same second."""
+    _time_cache = (None, '')
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        if datefmt:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        cached_second, cached_text = self._time_cache
+        if second != cached_second:
+            cached_text = time.strftime(self.default_time_format, self.converter(record.created))
+            self._time_cache = (second, cached_text)
+        return self.default_msec_format % (cached_text, record.msecs)
+
+class FastQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records with the minimum of work on the caller's thread: only the
+    message is merged (its arguments could change after the call returns).
+    Formatting, including tracebacks, happens on the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+class _FlushMarker:
+    def __init__(self):
+        self.done = threading.Event()
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """QueueListener that drains up to LOG_BATCH_SIZE records at a time and flushes handlers once per batch."""
+
+    def _monitor(self) -> None:
+        q = self.queue
+        while True:
+            record = q.get()
+            batch = [record]
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+
+            markers = []
+            stop = False
+            for handler in self.handlers:
+                if isinstance(handler, _BatchFlushMixin):
+                    handler.begin_batch()
+            try:
+                for record in batch:
+                    if record is self._sentinel:
+                        stop = True
+                    elif isinstance(record, _FlushMarker):
+                        markers.append(record)
+                    else:
+                        self.handle(record)
+            finally:
+                for handler in self.handlers:
+                    if isinstance(handler, _BatchFlushMixin):
+                        handler.end_batch()
+            for marker in markers:
+                marker.done.set()
+            if stop:
+                return
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Blocks until every record enqueued before the call has been written."""
+        marker = _FlushMarker()
+        self.queue.put_nowait(marker)
+        return marker.done.wait(timeout)
+
+def _install_queue(loggers: List[logging.Logger]) -> None:
+    """Moves the configured handlers of ``loggers`` behind one queue and background listener."""
+    global _listener
+    sinks = []
+    for logger in loggers:
+        for handler in logger.handlers:
+            if handler not in sinks:
+                sinks.append(handler)
+    log_queue = queue.SimpleQueue()
+    queue_handler = FastQueueHandler(log_queue)
+    for logger in loggers:
+        logger.handlers = [queue_handler]
+    with _listener_lock:
+        _listener = BatchingQueueListener(log_queue, *sinks, respect_handler_level=True)
+        _listener.start()
+
+def flush_logging(timeout: float = 5.0) -> None:
+    """Waits until the background listener has written every record logged so far."""
+    listener = _listener
+    if listener is not None and listener._thread is not None:
+        listener.flush(timeout)
+
+def stop_log_listener() -> None:
+    """Writes out queued records and stops the background listener."""
+    global _listener
+    with _listener_lock:
+        listener, _listener = _listener, None
+    if listener is not None and listener._thread is not None:
+        listener.stop()
+
+atexit.register(stop_log_listener)
+
+# Key names whose values are secrets ("key" only on its own, e.g. {"api": {"key": ...}})
+SENSITIVE_KEY_RE = re.compile(r'password|passwd|token|api[_-]?key|secret|auth|credential|^key$', re.IGNORECASE)
+SENSITIVE_WORD_RE = re.compile(r'password|passwd|token|api[_-]?key|secret|auth|credential', re.IGNORECASE)
+# One pass over a message: "<sensitive key>=<value>", "<sensitive key>: <value>" and bearer tokens.
+# Matches are anchored on the keyword and use possessive quantifiers, so huge messages stay linear.
+SENSITIVE_MESSAGE_RE = re.compile(
+    r'(?P<key>(?:password|passwd|token|api[_-]?key|secret|credential)[\w.-]*+["\']?\s*+[=:]\s*+)'
+    r'(?P<value>"[^"]*"|\'[^\']*\'|[^\s,;&]+)'
+    r'|(?P<scheme>\bbearer\s+)(?P<bearer>[\w.~+/-]+=*)',
+    re.IGNORECASE
+)
+# Attributes every LogRecord has; anything else came from ``extra``
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+def _redact_message_match(match: re.Match) -> str:
+    if match.group('key') is not None:
+        return match.group('key') + REDACTED
+    return match.group('scheme') + REDACTED
+
+def redact_message(message: str) -> str:
+    return SENSITIVE_MESSAGE_RE.sub(_redact_message_match, message)
+
+def _redact_value(value):
+    if isinstance(value, dict):
+        return {
+            k: REDACTED if isinstance(k, str) and SENSITIVE_KEY_RE.search(k) else _redact_value(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [_redact_value(v) for v in value]
+    if isinstance(value, str) and SENSITIVE_WORD_RE.search(value):
+        return REDACTED
+    return value
+
+def _dumps(log_entry: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(log_entry, default=str).decode()
+    return json.dumps(log_entry, default=str, ensure_ascii=False, separators=(',', ':'))
+
+class JsonFormatter(FastFormatter):
     """Custom JSON formatter for structured logging."""
     
     def format(self, record: logging.LogRecord) -> str:
@@ -138,7 +369,7 @@ class JsonFormatter(logging.Formatter):
             'timestamp': self.formatTime(record),
             'name': record.name,
             'level': record.levelname,
-            'message': record.getMessage(),
+            'message': redact_message(record.getMessage()),
             'pathname': record.pathname,
             'lineno': record.lineno,
             'function': record.funcName,
@@ -148,66 +379,20 @@ class JsonFormatter(logging.Formatter):
         }
         
         # Add exception info if present
-        if record.exc_info:
-            exc_type, exc_value, exc_tb = record.exc_info
-            formatted_exception = self.formatException(record.exc_info)
+        exc_info = record.exc_info
+        if exc_info is True:
+            exc_info = sys.exc_info()
+        if exc_info and exc_info[0] is not None:
+            exc_type, exc_value, _ = exc_info
             log_entry['exception'] = {
-                'type': exc_type.__name__ if exc_type else None,
+                'type': exc_type.__name__,
                 'message': str(exc_value) if exc_value else None,
-                'traceback': formatted_exception
+                'traceback': self.formatException(exc_info)
             }
         
-        # Add custom fields from the extra parameter
-        if hasattr(record, 'job_id'):
-            log_entry['job_id'] = record.job_id
-        if hasattr(record, 'agent'):
-            log_entry['agent'] = record.agent
-        if hasattr(record, 'tool'):
-            log_entry['tool'] = record.tool
-        if hasattr(record, 'state'):
-            log_entry['state'] = record.state
-        if hasattr(record, 'duration'):
-            log_entry['duration'] = record.duration
-            
-        # Filter out sensitive data
-        self._filter_sensitive_data(log_entry)
-        
-        return json.dumps(log_entry)
-    
-    def _filter_sensitive_data(self, log_entry: dict) -> None:
-        """
-        Filter out sensitive data from the log entry.
-        Modifies the log_entry dict in place.
-        
-        Args:
-            log_entry: The log entry to filter
-        """
-        sensitive_keys = {
-            'password', 'token', 'api_key', 'secret', 'auth',
-            'authorization', 'redis_password'
-        }
-        
-        def redact_value(value):
-            if isinstance(value, dict):
-                return {k: redact_value(v) if not any(key in k.lower() for key in sensitive_keys) 
-                       else '***REDACTED***' for k, v in value.items()}
-            elif isinstance(value, str):
-                return '***REDACTED***' if any(key in str(value).lower() for key in sensitive_keys) else value
-            return value
-        
-        # Filter message field
-        if 'message' in log_entry:
-            message = log_entry['message']
-            for key in sensitive_keys:
-                if key in message.lower():
-                    parts = message.split()
-                    filtered_parts = [
-                        '***REDACTED***' if key in part.lower() else part 
-                        for part in parts
-                    ]
-                    log_entry['message'] = ' '.join(filtered_parts)
+        # Add custom fields from the extra parameter (job_id, agent, tool, state, duration, ...)
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                log_entry[key] = REDACTED if SENSITIVE_KEY_RE.search(key) else _redact_value(value)
         
-        # Filter other fields
-        for key, value in log_entry.items():
-            if isinstance(value, (dict, str)):
-                log_entry[key] = redact_value(value)
\ No newline at end of file
+        return _dumps(log_entry)
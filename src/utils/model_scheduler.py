@@ -0,0 +1,145 @@
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+from src.utils.metrics import REGISTRY
+from src.utils.single_flight import CallAbandoned
+
+logger = logging.getLogger(__name__)
+
+MODEL_SWAPS = REGISTRY.counter(
+    "model_swaps_total", "Times an inference host switched to serving another model", ("host", "model"))
+SCHEDULER_QUEUED = REGISTRY.gauge(
+    "model_scheduler_queued_requests", "LLM calls waiting for their model's turn per host", ("host", "model"))
+SCHEDULER_WAIT = REGISTRY.histogram(
+    "model_scheduler_wait_seconds", "Time LLM calls waited for a slot on their host", ("host", "model"))
+
+# How often a waiting call re-checks whether it should give up
+ABANDON_POLL_SECONDS = 0.1
+
+
+class _Ticket:
+    __slots__ = ("model", "enqueued")
+
+    def __init__(self, model: str, enqueued: float):
+        self.model = model
+        self.enqueued = enqueued
+
+
+class ModelAffinityScheduler:
+    """
+    Admits LLM calls to one inference host in runs of the same model.
+
+    Up to ``concurrency`` calls for the current model run at once, and queued
+    calls for that model keep being admitted while others wait. The host switches
+    model only when no call for the current one is waiting, or once the oldest
+    call for another model has waited ``max_wait`` seconds; it then stops
+    admitting the current model, drains it, and serves the model whose oldest call
+    has waited longest. So switches (and model loads) happen once per run instead
+    of once per interleaved call, and no call waits much longer than ``max_wait``
+    plus one run's drain time. A waiting call whose ``should_abandon`` turns true
+    (or raises) leaves the queue without ever being admitted.
+    """
+
+    def __init__(self, name: str, concurrency: int = 4, max_wait: float = 5.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_wait = max_wait
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._queues: Dict[str, Deque[_Ticket]] = {}
+        self.current_model: Optional[str] = None
+        self.active = 0
+        self.swaps = 0
+
+    def _oldest_other(self) -> Optional[_Ticket]:
+        heads = [queue[0] for model, queue in self._queues.items() if queue and model != self.current_model]
+        return min(heads, key=lambda ticket: ticket.enqueued) if heads else None
+
+    def _may_run(self, ticket: _Ticket, now: float) -> bool:
+        if self.active >= self.concurrency or self._queues[ticket.model][0] is not ticket:
+            return False
+        other = self._oldest_other()
+        starving = other is not None and now - other.enqueued >= self.max_wait
+        if ticket.model == self.current_model:
+            return not starving
+        if self.active:
+            return False
+        # The host is idle: keep the current model while it has work and nobody starves
+        if self.current_model is not None and self._queues.get(self.current_model) and not starving:
+            return False
+        return other is ticket
+
+    def _wait_timeout(self, now: float) -> Optional[float]:
+        # Wake up when the oldest waiting call of another model starts starving
+        other = self._oldest_other()
+        if other is None:
+            return None
+        return max(0.001, other.enqueued + self.max_wait - now)
+
+    def acquire(self, model: str, should_abandon: Optional[Callable[[], bool]] = None) -> None:
+        """
+        Blocks until a call for ``model`` may run on this host.
+
+        Raises:
+            CallAbandoned: If ``should_abandon`` returned True while waiting (anything it raises propagates)
+        """
+        ticket = _Ticket(model, self._clock())
+        with self._cond:
+            queue = self._queues.setdefault(model, deque())
+            queue.append(ticket)
+            SCHEDULER_QUEUED.labels(self.name, model).set(len(queue))
+            try:
+                while True:
+                    now = self._clock()
+                    if self._may_run(ticket, now):
+                        break
+                    if should_abandon is not None and should_abandon():
+                        raise CallAbandoned(f"Stopped waiting for a {model} slot on {self.name}")
+                    timeout = self._wait_timeout(now)
+                    if should_abandon is not None:
+                        timeout = min(timeout, ABANDON_POLL_SECONDS) if timeout is not None else ABANDON_POLL_SECONDS
+                    self._cond.wait(timeout)
+            except BaseException:
+                queue.remove(ticket)
+                SCHEDULER_QUEUED.labels(self.name, model).set(len(queue))
+                # The calls queued behind this one may be at the head of their queue now
+                self._cond.notify_all()
+                raise
+            queue.popleft()
+            SCHEDULER_QUEUED.labels(self.name, model).set(len(queue))
+            if model != self.current_model:
+                if self.current_model is not None:
+                    self.swaps += 1
+                    MODEL_SWAPS.labels(self.name, model).inc()
+                    logger.debug("Host %s switching from %s to %s", self.name, self.current_model, model)
+                self.current_model = model
+            self.active += 1
+            # Other calls of the same model may now be at the head of their queue
+            self._cond.notify_all()
+        SCHEDULER_WAIT.labels(self.name, model).observe(self._clock() - ticket.enqueued)
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, model: str, should_abandon: Optional[Callable[[], bool]] = None) -> Iterator[None]:
+        self.acquire(model, should_abandon)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "current_model": self.current_model,
+                "active": self.active,
+                "swaps": self.swaps,
+                "queued": {model: len(queue) for model, queue in self._queues.items() if queue},
+            }
@@ -0,0 +1,246 @@
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+import requests
+from requests.adapters import HTTPAdapter
+from src.utils.metrics import REGISTRY
+from src.utils.resilience import OPEN, CircuitBreaker, get_circuit_breaker, is_transient
+from src.utils.model_scheduler import ModelAffinityScheduler
+
+logger = logging.getLogger(__name__)
+
+HOST_OUTSTANDING = REGISTRY.gauge(
+    "ollama_host_outstanding_requests", "Requests in flight per inference host", ("host",))
+HOST_HEALTHY = REGISTRY.gauge(
+    "ollama_host_healthy", "Whether the last health check of an inference host succeeded", ("host",))
+HOST_REQUESTS = REGISTRY.counter(
+    "ollama_host_requests_total", "Requests routed per inference host and model", ("host", "model", "outcome"))
+
+
+def normalize_model(model: str) -> str:
+    """Ollama reports ``llama3`` as ``llama3:latest``."""
+    return model if ":" in model else f"{model}:latest"
+
+
+class OllamaHost:
+    __slots__ = ("url", "healthy", "outstanding", "loaded_models", "available_models", "retry_at", "last_checked",
+                 "scheduler")
+
+    def __init__(self, url: str, scheduler: Optional[ModelAffinityScheduler] = None):
+        self.url = url.rstrip("/")
+        self.healthy = True
+        self.outstanding = 0
+        self.loaded_models: set = set()
+        self.available_models: Optional[set] = None
+        # An unhealthy host becomes routable again at this time, as a probe
+        self.retry_at = 0.0
+        self.last_checked: Optional[float] = None
+        self.scheduler = scheduler
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "loaded_models": sorted(self.loaded_models),
+            "available_models": sorted(self.available_models) if self.available_models is not None else None,
+            "last_checked": self.last_checked,
+            "scheduler": self.scheduler.to_dict() if self.scheduler is not None else None,
+        }
+
+
+class OllamaHostPool:
+    """
+    Routes inference requests across Ollama hosts.
+
+    Each request goes to the routable host with the lowest score: its outstanding
+    requests, plus ``swap_penalty`` if the model is not resident there (loading it
+    costs seconds), plus twice that if the host does not have the model at all. A
+    background thread polls /api/ps and /api/tags for residency and health. A host
+    that fails with a connection or overload error is skipped until its next
+    check. All hosts share one requests.Session, so connections are kept alive.
+
+    Every request also passes the circuit breaker of its model on the chosen host
+    (endpoint ``model@host.url``); hosts whose circuit is open are not chosen while
+    another host is available.
+
+    Unless ``batch_max_wait`` is None, each host admits requests through a
+    ModelAffinityScheduler, ``num_parallel`` at a time in same-model runs.
+    """
+
+    def __init__(self, urls: Sequence[str], health_interval: float = 10.0, swap_penalty: float = 4.0,
+                 timeout: float = 5.0, pool_maxsize: int = 32, session: Optional[requests.Session] = None,
+                 num_parallel: int = 4, batch_max_wait: Optional[float] = 5.0):
+        if not urls:
+            raise ValueError("At least one Ollama host is required")
+        self.hosts = [
+            OllamaHost(url, ModelAffinityScheduler(url.rstrip("/"), num_parallel, batch_max_wait)
+                       if batch_max_wait is not None else None)
+            for url in dict.fromkeys(urls)
+        ]
+        self.health_interval = health_interval
+        self.swap_penalty = swap_penalty
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.hosts), pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        for host in self.hosts:
+            HOST_HEALTHY.labels(host.url).set(1)
+            HOST_OUTSTANDING.labels(host.url).set(0)
+
+    def _score(self, host: OllamaHost, model: str) -> float:
+        score = float(host.outstanding)
+        if model not in host.loaded_models:
+            score += self.swap_penalty
+            if host.available_models is not None and model not in host.available_models:
+                score += 2 * self.swap_penalty
+        return score
+
+    @staticmethod
+    def breaker(host: OllamaHost, model: str) -> CircuitBreaker:
+        return get_circuit_breaker(f"{normalize_model(model)}@{host.url}")
+
+    def choose(self, model: str) -> OllamaHost:
+        """The host the next request for ``model`` should go to (does not reserve it)."""
+        model = normalize_model(model)
+        now = time.monotonic()
+        with self._lock:
+            candidates = [h for h in self.hosts if h.healthy or now >= h.retry_at] or self.hosts
+            candidates = [h for h in candidates if self.breaker(h, model).state != OPEN] or candidates
+            best = min(self._score(h, model) for h in candidates)
+            return random.choice([h for h in candidates if self._score(h, model) == best])
+
+    @contextmanager
+    def acquire(self, model: str, should_abandon: Optional[Callable[[], bool]] = None) -> Iterator[OllamaHost]:
+        """
+        Reserves a host for one request; failures mark it unhealthy until the next check.
+
+        ``should_abandon`` is polled while the request queues for the host's scheduler;
+        a request that gives up there never reaches the host.
+
+        Raises:
+            CircuitOpenError: If the circuit of the model on every host is open
+            CallAbandoned: If ``should_abandon`` returned True before the request was admitted
+        """
+        model = normalize_model(model)
+        host = self.choose(model)
+        breaker = self.breaker(host, model)
+        with self._lock:
+            host.outstanding += 1
+            HOST_OUTSTANDING.labels(host.url).set(host.outstanding)
+        try:
+            # Admitted first, so a request that gives up in the queue never takes a half-open probe
+            with host.scheduler.slot(model, should_abandon) if host.scheduler is not None else nullcontext():
+                breaker.allow()
+                try:
+                    yield host
+                except BaseException as e:
+                    if isinstance(e, Exception) and is_transient(e):
+                        self._mark_unhealthy(host, e)
+                        breaker.record_failure()
+                    else:
+                        # The host answered; the request itself failed or was abandoned
+                        breaker.record_success()
+                    HOST_REQUESTS.labels(host.url, model, "error").inc()
+                    raise
+                breaker.record_success()
+                with self._lock:
+                    # Ollama keeps a model loaded after serving it
+                    host.loaded_models.add(model)
+                    if not host.healthy:
+                        host.healthy = True
+                        HOST_HEALTHY.labels(host.url).set(1)
+                HOST_REQUESTS.labels(host.url, model, "success").inc()
+        finally:
+            with self._lock:
+                host.outstanding -= 1
+                HOST_OUTSTANDING.labels(host.url).set(host.outstanding)
+
+    def _mark_unhealthy(self, host: OllamaHost, error: BaseException) -> None:
+        with self._lock:
+            if host.healthy:
+                logger.warning("Inference host %s marked unhealthy: %s", host.url, str(error))
+            host.healthy = False
+            host.retry_at = time.monotonic() + self.health_interval
+            HOST_HEALTHY.labels(host.url).set(0)
+
+    def check_host(self, host: OllamaHost) -> bool:
+        """Refreshes a host's health and the models it has loaded and available."""
+        try:
+            loaded = self.session.get(f"{host.url}/api/ps", timeout=self.timeout)
+            loaded.raise_for_status()
+            tags = self.session.get(f"{host.url}/api/tags", timeout=self.timeout)
+            tags.raise_for_status()
+        except Exception as e:
+            self._mark_unhealthy(host, e)
+            host.last_checked = time.time()
+            return False
+        with self._lock:
+            host.loaded_models = {normalize_model(m.get("name") or m.get("model", ""))
+                                  for m in loaded.json().get("models", [])}
+            host.available_models = {normalize_model(m.get("name") or m.get("model", ""))
+                                     for m in tags.json().get("models", [])}
+            host.healthy = True
+            host.last_checked = time.time()
+        HOST_HEALTHY.labels(host.url).set(1)
+        return True
+
+    def check_all(self) -> None:
+        for host in self.hosts:
+            self.check_host(host)
+
+    def start(self) -> None:
+        """Starts the background health checks (idempotent)."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_checks, name="ollama-health", daemon=True)
+        self._thread.start()
+
+    def _run_checks(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.check_all()
+            except Exception as e:
+                logger.error("Inference host health check failed: %s", str(e))
+            self._stop.wait(self.health_interval)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [host.to_dict() for host in self.hosts]
+
+
+_pool: Optional[OllamaHostPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_ollama_pool() -> OllamaHostPool:
+    """Process-wide pool over Settings.OLLAMA_HOSTS (or OLLAMA_HOST alone)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from src.utils.config import get_settings
+                settings = get_settings()
+                _pool = OllamaHostPool(
+                    settings.OLLAMA_HOSTS or [settings.OLLAMA_HOST],
+                    health_interval=settings.OLLAMA_HEALTH_INTERVAL,
+                    swap_penalty=settings.OLLAMA_SWAP_PENALTY,
+                    pool_maxsize=settings.OLLAMA_POOL_MAXSIZE,
+                    num_parallel=settings.OLLAMA_NUM_PARALLEL,
+                    batch_max_wait=settings.MODEL_BATCH_MAX_WAIT if settings.MODEL_BATCH_MAX_WAIT > 0 else None,
+                )
+    return _pool
@@ -0,0 +1,189 @@
+import time
+import asyncio
+import logging
+from typing import Any, Iterator, List, Optional
+import requests
+from langchain_community.llms import Ollama
+from langchain_core.outputs import GenerationChunk, LLMResult
+from src.utils.ollama_pool import OllamaHostPool, get_ollama_pool
+from src.utils.single_flight import CallAbandoned, SingleFlight, WaitTimeout, abandoned, request_key
+from src.utils.budget import check_deadline, deadline_error, remaining_seconds, without_deadline
+from src.utils.cassette import get_cassette
+from src.utils.resilience import call_with_resilience
+
+logger = logging.getLogger(__name__)
+
+# Identical generate requests in flight in this process share one response
+LLM_SINGLE_FLIGHT = SingleFlight("llm")
+
+
+def _wait_timeout() -> Optional[float]:
+    """How long the caller may wait for a coalesced generation: what is left of its deadline."""
+    check_deadline()
+    remaining = remaining_seconds()
+    return None if remaining is None else max(remaining, 0.0)
+
+
+def _stop_waiting() -> bool:
+    """Polled while a call queues for a host: raises once its deadline passed, true once nobody waits for it."""
+    check_deadline()
+    return abandoned()
+
+
+def _shared_generation(chunk: GenerationChunk) -> GenerationChunk:
+    # Callers that joined another call's generation did not spend its tokens
+    info = {k: v for k, v in (chunk.generation_info or {}).items() if k not in ("prompt_eval_count", "eval_count")}
+    return GenerationChunk(text=chunk.text, generation_info={**info, "coalesced": True})
+
+
+class PooledOllama(Ollama):
+    """
+    Ollama LLM whose generate calls are routed through an OllamaHostPool: each call
+    picks a host for this model and streams over the pool's keep-alive session.
+    The host stays reserved until the response stream has been consumed.
+
+    With ``coalesce`` set, a prompt whose model, stop words and parameters match
+    a generation already in flight waits for that generation instead of sending
+    its own (see SingleFlight). Each caller's deadline bounds its own wait; the
+    shared generation runs outside all of them and stops once nobody waits.
+
+    With a cassette (``cassette``, or the one Settings.LLM_BACKEND selects) each
+    generation is recorded to it, or replayed from it without contacting Ollama.
+
+    Each generation sent to Ollama is attempted up to ``max_retries`` times, with
+    jittered backoff and the model's retry budget (call_with_resilience); the
+    pool applies the circuit breaker of the host each attempt goes to.
+    """
+
+    pool: Optional[Any] = None
+    base_url: str = "pool"
+    coalesce: bool = True
+    cassette: Optional[Any] = None
+    max_retries: int = 1
+
+    @property
+    def endpoint(self) -> str:
+        """Retry budget key; retries may go to any host of the pool."""
+        return f"{self.model}@{self.base_url}"
+
+    def _get_pool(self) -> OllamaHostPool:
+        return self.pool if self.pool is not None else get_ollama_pool()
+
+    def _flight_key(self, prompt: str, stop: Optional[List[str]], images: Optional[List[str]],
+                    kwargs: dict) -> str:
+        return request_key(self._default_params, self.stop if self.stop is not None else stop, prompt, images, kwargs)
+
+    def _generate_one(self, prompt: str, stop: Optional[List[str]], images: Optional[List[str]],
+                      run_manager: Any, kwargs: dict) -> GenerationChunk:
+        cassette = self.cassette if self.cassette is not None else get_cassette()
+        if cassette is None:
+            return self._stream_resilient(prompt, stop, images, run_manager, kwargs)
+        stop_words = self.stop if self.stop is not None else stop
+        if cassette.mode == "replay":
+            interaction = cassette.replay(self.model, prompt, stop_words, deadline=remaining_seconds())
+            check_deadline()
+            return GenerationChunk(text=interaction["text"], generation_info=interaction.get("generation_info"))
+        started = time.perf_counter()
+        chunk = self._stream_resilient(prompt, stop, images, run_manager, kwargs)
+        cassette.record(self.model, prompt, stop_words, chunk.text, chunk.generation_info,
+                        time.perf_counter() - started)
+        return chunk
+
+    def _generate_shared(self, prompt: str, stop: Optional[List[str]], images: Optional[List[str]],
+                         run_manager: Any, kwargs: dict) -> GenerationChunk:
+        with without_deadline():
+            return self._generate_one(prompt, stop, images, run_manager, kwargs)
+
+    def _stream_resilient(self, prompt: str, stop: Optional[List[str]], images: Optional[List[str]],
+                          run_manager: Any, kwargs: dict) -> GenerationChunk:
+        def stream() -> GenerationChunk:
+            return self._stream_with_aggregation(prompt, stop=stop, images=images, run_manager=run_manager,
+                                                 verbose=self.verbose, **kwargs)
+
+        def log_failure(attempt: int, error: BaseException) -> None:
+            logger.warning("Generation attempt %d/%d on %s failed: %s",
+                           attempt + 1, self.max_retries, self.endpoint, str(error))
+
+        return call_with_resilience(stream, self.endpoint, self.max_retries, on_retry=log_failure,
+                                    use_breaker=False)
+
+    def _generate(self, prompts: List[str], stop: Optional[List[str]] = None, images: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> LLMResult:
+        generations = []
+        for prompt in prompts:
+            if not self.coalesce:
+                generations.append([self._generate_one(prompt, stop, images, run_manager, kwargs)])
+                continue
+
+            def generate() -> GenerationChunk:
+                return self._generate_shared(prompt, stop, images, run_manager, kwargs)
+            try:
+                chunk, shared = LLM_SINGLE_FLIGHT.do(self._flight_key(prompt, stop, images, kwargs), generate,
+                                                     timeout=_wait_timeout())
+            except WaitTimeout:
+                raise deadline_error() from None
+            generations.append([_shared_generation(chunk) if shared else chunk])
+        return LLMResult(generations=generations)
+
+    async def _agenerate(self, prompts: List[str], stop: Optional[List[str]] = None,
+                         images: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> LLMResult:
+        # The pool is synchronous; generate in a worker thread (async callbacks get no per-token events)
+        generations = []
+        for prompt in prompts:
+            if not self.coalesce:
+                generations.append([await asyncio.to_thread(self._generate_one, prompt, stop, images, None, kwargs)])
+                continue
+
+            def generate():
+                return asyncio.to_thread(self._generate_shared, prompt, stop, images, None, kwargs)
+            try:
+                chunk, shared = await LLM_SINGLE_FLIGHT.ado(self._flight_key(prompt, stop, images, kwargs), generate,
+                                                            timeout=_wait_timeout())
+            except WaitTimeout:
+                raise deadline_error() from None
+            generations.append([_shared_generation(chunk) if shared else chunk])
+        return LLMResult(generations=generations)
+
+    def _create_generate_stream(self, prompt: str, stop: Optional[List[str]] = None,
+                                images: Optional[List[str]] = None, **kwargs: Any) -> Iterator[str]:
+        pool = self._get_pool()
+        with pool.acquire(self.model, should_abandon=_stop_waiting) as host:
+            yield from self._create_stream(
+                payload={"prompt": prompt, "images": images}, stop=stop,
+                api_url=f"{host.url}/api/generate", session=pool.session, **kwargs
+            )
+
+    def _create_stream(self, api_url: str, payload: Any, stop: Optional[List[str]] = None,
+                       session: Optional[requests.Session] = None, **kwargs: Any) -> Iterator[str]:
+        # Same request as Ollama._create_stream, sent over the pool's session
+        if self.stop is not None and stop is not None:
+            raise ValueError("`stop` found in both the input and default params.")
+        stop = self.stop if self.stop is not None else stop
+        params = self._default_params
+        for key in self._default_params:
+            if key in kwargs:
+                params[key] = kwargs[key]
+        params["options"] = kwargs["options"] if "options" in kwargs else {
+            **params["options"], "stop": stop,
+            **{k: v for k, v in kwargs.items() if k not in self._default_params},
+        }
+        request_payload = {"prompt": payload.get("prompt"), "images": payload.get("images") or [], **params}
+        # An agent run's wall-clock budget also bounds its own (not coalesced) LLM calls
+        check_deadline()
+        timeout, remaining = self.timeout, remaining_seconds()
+        if remaining is not None:
+            timeout = min(timeout, remaining) if timeout is not None else remaining
+        response = (session or requests).post(
+            url=api_url,
+            headers={"Content-Type": "application/json", **(self.headers if isinstance(self.headers, dict) else {})},
+            auth=self.auth, json=request_payload, stream=True, timeout=timeout,
+        )
+        response.encoding = "utf-8"
+        if response.status_code != 200:
+            raise ValueError(f"Ollama call failed with status code {response.status_code}. Details: {response.text}")
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                check_deadline()
+                if abandoned():
+                    raise CallAbandoned("Every caller stopped waiting for this generation")
+                yield line
@@ -0,0 +1,225 @@
+import os
+import ast
+import hashlib
+import logging
+import threading
+import importlib
+import importlib.util
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_UNLOADED = object()
+
+
+class _Entry:
+    __slots__ = ("loader", "metadata", "value", "scanned", "group")
+
+    def __init__(self, loader: Optional[Callable[[], Any]], metadata: Dict[str, Any], value: Any = _UNLOADED,
+                 group: Optional[str] = None):
+        self.loader = loader
+        self.metadata = metadata
+        self.value = value
+        self.scanned = "source" not in metadata
+        self.group = group
+
+
+def file_fingerprint(path: str, previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    mtime, size and SHA-256 of a file. The file is only re-hashed when its mtime or
+    size differ from ``previous``, so an unchanged tree costs one stat per file.
+    """
+    stat = os.stat(path)
+    if previous and previous["mtime_ns"] == stat.st_mtime_ns and previous["size"] == stat.st_size:
+        return previous
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": digest}
+
+
+class LazyRegistry(MutableMapping):
+    """
+    Name to object mapping whose entries are registered as loaders plus metadata
+    and only imported or instantiated the first time they are looked up.
+
+    Membership, iteration and ``metadata`` never load anything; ``values()`` and
+    ``items()`` load every entry. ``on_load`` is called once with each object as
+    it is created. Entries registered with a ``source`` file and ``symbol`` get
+    that class's ``description`` and docstring summary added to their metadata,
+    read from the source on the first ``metadata`` call.
+
+    Lookups read one snapshot of the entries; ``sync`` builds the next snapshot
+    and swaps it in with a single assignment, so readers never see a registry
+    that is half updated.
+    """
+
+    def __init__(self, kind: str, on_load: Optional[Callable[[Any], None]] = None):
+        self.kind = kind
+        self.on_load = on_load
+        self._entries: Dict[str, _Entry] = {}
+        self._scans: Dict[tuple, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, loader: Callable[[], Any], **metadata) -> None:
+        """Registers (or replaces) ``name``; ``loader`` runs on first access."""
+        with self._lock:
+            self._entries[name] = _Entry(loader, metadata)
+
+    def __getitem__(self, name: str) -> Any:
+        entry = self._entries[name]
+        if entry.value is _UNLOADED:
+            with self._lock:
+                if entry.value is _UNLOADED:
+                    value = entry.loader()
+                    if self.on_load is not None:
+                        self.on_load(value)
+                    entry.value = value
+                    logger.debug("Loaded %s: %s", self.kind, name)
+        return entry.value
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        with self._lock:
+            self._entries[name] = _Entry(None, {}, value)
+
+    def __delitem__(self, name: str) -> None:
+        with self._lock:
+            del self._entries[name]
+
+    def sync(self, group: str, specs: Dict[str, Tuple[Callable[[], Any], Dict[str, Any]]]) -> Dict[str, List[str]]:
+        """
+        Makes the entries of ``group`` exactly ``specs`` ({name: (loader, metadata)}).
+
+        Entries whose ``source`` file has the same content hash as before are kept,
+        together with anything already loaded from them; only added or changed
+        sources get fresh entries. Returns the added, changed and removed names.
+        """
+        with self._lock:
+            current = self._entries
+            entries = {name: entry for name, entry in current.items() if entry.group != group}
+            changes = {"added": [], "changed": [], "removed": []}
+            for name, (loader, metadata) in specs.items():
+                old = current.get(name)
+                if old is not None and old.group != group:
+                    old = None
+                if "source" in metadata:
+                    previous = old.metadata.get("fingerprint") if old is not None else None
+                    try:
+                        metadata["fingerprint"] = file_fingerprint(metadata["source"], previous)
+                    except OSError as e:
+                        logger.warning("Skipping %s %s: %s", self.kind, name, str(e))
+                        continue
+                    if old is not None and previous is not None and \
+                            previous["sha256"] == metadata["fingerprint"]["sha256"]:
+                        old.metadata["fingerprint"] = metadata["fingerprint"]
+                        entries[name] = old
+                        continue
+                entries[name] = _Entry(loader, metadata, group=group)
+                changes["changed" if old is not None else "added"].append(name)
+            changes["removed"] = [name for name, entry in current.items()
+                                  if entry.group == group and name not in entries]
+            self._entries = entries
+        return changes
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_loaded(self, name: str) -> bool:
+        return self._entries[name].value is not _UNLOADED
+
+    def metadata(self, name: str) -> Dict[str, Any]:
+        entry = self._entries[name]
+        if not entry.scanned:
+            self._scan(entry)
+        return dict(entry.metadata, name=name, loaded=entry.value is not _UNLOADED)
+
+    def _scan(self, entry: _Entry) -> None:
+        source, symbol = entry.metadata["source"], entry.metadata.get("symbol")
+        # Keyed by content hash so a rewritten file is scanned again
+        key = (source, (entry.metadata.get("fingerprint") or {}).get("sha256"))
+        with self._lock:
+            scan = self._scans.get(key)
+            if scan is None:
+                try:
+                    scan = self._scans[key] = scan_module(source)
+                except (OSError, SyntaxError) as e:
+                    logger.warning("Could not read %s metadata from %s: %s", self.kind, source, str(e))
+                    scan = {"classes": {}, "instances": {}}
+            class_name = scan["instances"].get(symbol, symbol)
+            info = scan["classes"].get(class_name, {})
+            entry.metadata.update({k: info[k] for k in ("description", "doc") if info.get(k)})
+            entry.metadata.setdefault("class", class_name)
+            entry.scanned = True
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Metadata of every entry, sorted by name, without loading any of them."""
+        return [self.metadata(name) for name in sorted(self._entries)]
+
+
+def import_attribute(module: str, attribute: str) -> Callable[[], Any]:
+    """Loader returning ``module.attribute``, importing the module when called."""
+    def load():
+        return getattr(importlib.import_module(module), attribute)
+    return load
+
+
+def load_file_attribute(module_name: str, file_path: str, attribute: str) -> Callable[[], Any]:
+    """Loader executing ``file_path`` as a fresh module and returning one of its attributes."""
+    def load():
+        spec = importlib.util.spec_from_file_location(module_name, file_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return getattr(module, attribute)
+    return load
+
+
+def _constant(node: Optional[ast.AST]) -> Any:
+    if isinstance(node, ast.Constant):
+        return node.value
+    return None
+
+
+def scan_module(file_path: str) -> Dict[str, Any]:
+    """
+    Reads class and instance metadata from a module's source without importing it.
+
+    Returns ``{"classes": {name: {"bases", "doc", "name", "description"}},
+    "instances": {variable: class name}}``; ``name``/``description`` are the
+    class's string-literal attributes of that name, if any.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=file_path)
+    classes, instances = {}, {}
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            info = {
+                "bases": [ast.unparse(base) for base in node.bases],
+                "doc": (ast.get_docstring(node) or "").strip().split("\n")[0] or None,
+            }
+            for item in node.body:
+                if isinstance(item, ast.AnnAssign) and isinstance(item.target, ast.Name):
+                    target, value = item.target.id, item.value
+                elif isinstance(item, ast.Assign) and len(item.targets) == 1 and isinstance(item.targets[0], ast.Name):
+                    target, value = item.targets[0].id, item.value
+                else:
+                    continue
+                if target in ("name", "description") and isinstance(_constant(value), str):
+                    info[target] = _constant(value)
+            classes[node.name] = info
+        elif (isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)
+              and isinstance(node.value, ast.Call) and isinstance(node.value.func, ast.Name)):
+            instances[node.targets[0].id] = node.value.func.id
+    return {"classes": classes, "instances": instances}
+
+
+def module_files(directory: str, exclude: List[str]) -> Iterator[str]:
+    """Module names of the ``.py`` files in ``directory``, in name order."""
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".py") and filename not in exclude:
+            yield filename[:-3]
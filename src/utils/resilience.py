@@ -0,0 +1,256 @@
+import re
+import time
+import random
+import logging
+import threading
+from typing import Callable, Dict, Optional, TypeVar
+import requests
+from src.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CIRCUIT_STATE = REGISTRY.gauge(
+    "circuit_breaker_state", "Circuit breaker state per model endpoint (0 closed, 1 half-open, 2 open)", ("endpoint",))
+CIRCUIT_TRANSITIONS = REGISTRY.counter(
+    "circuit_breaker_transitions_total", "Circuit breaker state changes", ("endpoint", "state"))
+RETRY_EVENTS = REGISTRY.counter(
+    "llm_retry_events_total", "Retry decisions per model endpoint (retried, budget_exhausted, rejected)",
+    ("endpoint", "outcome"))
+RETRY_BUDGET_TOKENS = REGISTRY.gauge(
+    "llm_retry_budget_tokens", "Retry tokens left per model endpoint", ("endpoint",))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# HTTP statuses that mean "overloaded or temporarily unavailable, try again later"
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+_STATUS_RE = re.compile(r"status(?: code)?[:= ]+(\d{3})", re.IGNORECASE)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit is open."""
+
+    # Retrying immediately would only be rejected again
+    retryable = False
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(f"Circuit open for {endpoint}; retry in {retry_after:.1f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether ``error`` says the endpoint is unreachable or overloaded (connection
+    errors, timeouts, HTTP 408/429/5xx) rather than that the request itself failed.
+    Other OSErrors (a missing file, a permission error) are not about the endpoint.
+    Ollama's non-200 responses only carry the status in the message.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+        return True
+    response = getattr(error, "response", None)
+    if isinstance(getattr(response, "status_code", None), int):
+        return response.status_code in TRANSIENT_STATUS_CODES
+    match = _STATUS_RE.search(str(error))
+    return bool(match) and int(match.group(1)) in TRANSIENT_STATUS_CODES
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: attempt n sleeps uniform(0, min(cap, base * multiplier**n))."""
+
+    def __init__(self, base_delay: float = 0.5, max_delay: float = 30.0, multiplier: float = 2.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** attempt))
+
+
+class RetryBudget:
+    """
+    Token bucket that caps retries to a fraction of successful calls, as in gRPC's
+    retry throttling: a failure costs one token, a success refunds ``ratio`` tokens,
+    and retries are only allowed while more than half the bucket is left. When an
+    endpoint keeps failing, callers stop multiplying its load by ``max_retries``.
+    """
+
+    def __init__(self, endpoint: str, max_tokens: float = 10.0, ratio: float = 0.1):
+        self.endpoint = endpoint
+        self.max_tokens = max_tokens
+        self.ratio = ratio
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+        RETRY_BUDGET_TOKENS.labels(endpoint).set(self.tokens)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+            RETRY_BUDGET_TOKENS.labels(self.endpoint).set(self.tokens)
+
+    def try_retry(self) -> bool:
+        """Charges a failure; returns whether a retry is still within budget."""
+        with self._lock:
+            self.tokens = max(0.0, self.tokens - 1)
+            RETRY_BUDGET_TOKENS.labels(self.endpoint).set(self.tokens)
+            return self.tokens > self.max_tokens / 2
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint breaker. ``failure_threshold`` consecutive failures open it; while
+    open, ``allow`` fails fast. After ``reset_timeout`` it goes half-open and lets
+    ``half_open_max_calls`` probes through: a success closes it, a failure opens it
+    again for another ``reset_timeout``.
+    """
+
+    def __init__(self, endpoint: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 half_open_max_calls: int = 1, clock: Callable[[], float] = time.monotonic):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(endpoint).set(_STATE_VALUES[CLOSED])
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _transition(self, state: str) -> None:
+        if state == self._state:
+            return
+        logger.warning("Circuit for %s is now %s", self.endpoint, state)
+        self._state = state
+        if state == OPEN:
+            self._opened_at = self._clock()
+        self._probes = 0
+        CIRCUIT_STATE.labels(self.endpoint).set(_STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(self.endpoint, state).inc()
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+
+    def allow(self) -> None:
+        """Raises CircuitOpenError unless a call may go to the endpoint now."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return
+            retry_after = max(0.0, self.reset_timeout - (self._clock() - self._opened_at)) \
+                if self._state == OPEN else self.reset_timeout
+        RETRY_EVENTS.labels(self.endpoint, "rejected").inc()
+        raise CircuitOpenError(self.endpoint, retry_after)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._transition(OPEN)
+                # A re-opened circuit waits a full timeout again
+                self._opened_at = self._clock()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_budgets: Dict[str, RetryBudget] = {}
+_registry_lock = threading.Lock()
+
+
+def get_circuit_breaker(endpoint: str) -> CircuitBreaker:
+    """Process-wide breaker for ``endpoint``, configured from Settings on first use."""
+    breaker = _breakers.get(endpoint)
+    if breaker is None:
+        from src.utils.config import get_settings
+        settings = get_settings()
+        with _registry_lock:
+            breaker = _breakers.get(endpoint)
+            if breaker is None:
+                breaker = _breakers[endpoint] = CircuitBreaker(
+                    endpoint, settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS)
+    return breaker
+
+
+def get_retry_budget(endpoint: str) -> RetryBudget:
+    budget = _budgets.get(endpoint)
+    if budget is None:
+        from src.utils.config import get_settings
+        ratio = get_settings().RETRY_BUDGET_RATIO
+        with _registry_lock:
+            budget = _budgets.get(endpoint)
+            if budget is None:
+                budget = _budgets[endpoint] = RetryBudget(endpoint, ratio=ratio)
+    return budget
+
+
+def default_retry_policy() -> RetryPolicy:
+    from src.utils.config import get_settings
+    settings = get_settings()
+    return RetryPolicy(settings.LLM_RETRY_BASE_DELAY, settings.LLM_RETRY_MAX_DELAY)
+
+
+def call_with_resilience(fn: Callable[[], T], endpoint: str, max_attempts: int,
+                         policy: Optional[RetryPolicy] = None,
+                         on_retry: Optional[Callable[[int, BaseException], None]] = None,
+                         sleep: Callable[[float], None] = time.sleep, use_breaker: bool = True) -> T:
+    """
+    Calls ``fn`` up to ``max_attempts`` times through the endpoint's circuit breaker.
+
+    Transient errors count against the breaker and the retry budget and are retried
+    after a jittered exponential backoff; other errors are retried immediately
+    since the endpoint itself answered. An open circuit or an exhausted budget
+    ends the retries early with the last error. Callers that pick a host per
+    attempt and track breakers per host pass ``use_breaker=False``.
+    """
+    policy = policy or default_retry_policy()
+    breaker = get_circuit_breaker(endpoint) if use_breaker else None
+    budget = get_retry_budget(endpoint)
+    for attempt in range(max_attempts):
+        if breaker is not None:
+            breaker.allow()
+        try:
+            result = fn()
+        except Exception as e:
+            transient = is_transient(e)
+            if breaker is not None and transient:
+                breaker.record_failure()
+            elif breaker is not None:
+                breaker.record_success()
+            if on_retry is not None:
+                on_retry(attempt, e)
+            # Errors can opt out of retries with a false ``retryable`` attribute
+            if attempt == max_attempts - 1 or not getattr(e, "retryable", True):
+                raise
+            if transient:
+                if not budget.try_retry():
+                    RETRY_EVENTS.labels(endpoint, "budget_exhausted").inc()
+                    logger.warning("Retry budget for %s exhausted; not retrying", endpoint)
+                    raise
+                delay = policy.delay(attempt)
+                logger.info("Retrying %s in %.2fs after: %s", endpoint, delay, str(e))
+                sleep(delay)
+            RETRY_EVENTS.labels(endpoint, "retried").inc()
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        budget.record_success()
+        return result
@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import math
+import logging
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; limits then rely on the timeout alone
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Runs in the child: executes one module file and reports the outcome as JSON on stdout
+_IMPORT_CHECK = """
+import os, sys, json, importlib.util
+path = sys.argv[1]
+name = os.path.splitext(os.path.basename(path))[0]
+try:
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+except BaseException as e:
+    print(json.dumps({"error": str(e) or type(e).__name__}))
+    sys.exit(1)
+print(json.dumps({"error": None}))
+"""
+
+
+class ImportSandbox:
+    """
+    Import-tests module files in separate interpreters so that generated code
+    never runs inside the server. Each child gets a wall-clock timeout, a CPU
+    time limit and an address-space limit, runs from a scratch directory, and
+    up to ``max_workers`` children run at once.
+    """
+
+    def __init__(self, search_paths: Sequence[str] = (), timeout: float = 30.0,
+                 memory_mb: Optional[int] = 2048, max_workers: int = 4):
+        self.search_paths = [os.path.abspath(p) for p in search_paths]
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.max_workers = max_workers
+
+    def _limit_child(self) -> None:
+        cpu_seconds = math.ceil(self.timeout)
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        if self.memory_mb:
+            limit = self.memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    def check(self, file_path: str) -> Optional[str]:
+        """Imports ``file_path`` in a child interpreter; returns the error, or None on success."""
+        paths = self.search_paths + [REPO_ROOT]
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(dict.fromkeys(paths)), PYTHONDONTWRITEBYTECODE="1")
+        with tempfile.TemporaryDirectory(prefix="sandbox_") as cwd:
+            try:
+                proc = subprocess.run(
+                    [sys.executable, "-c", _IMPORT_CHECK, os.path.abspath(file_path)],
+                    cwd=cwd, env=env, capture_output=True, text=True, timeout=self.timeout,
+                    preexec_fn=self._limit_child if resource is not None else None
+                )
+            except subprocess.TimeoutExpired:
+                return f"timed out after {self.timeout:g}s"
+        lines = proc.stdout.strip().splitlines()
+        if lines:
+            try:
+                return json.loads(lines[-1])["error"]
+            except (ValueError, KeyError, TypeError):
+                pass
+        if proc.returncode < 0:
+            return f"killed by signal {-proc.returncode} (time or memory limit exceeded)"
+        stderr = proc.stderr.strip().splitlines()
+        return stderr[-1] if stderr else f"exited with status {proc.returncode}"
+
+    def check_many(self, file_paths: List[str]) -> Dict[str, Optional[str]]:
+        """Import-tests files in parallel; maps each path to its error, or None."""
+        if not file_paths:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(file_paths)),
+                                thread_name_prefix="sandbox") as pool:
+            return dict(zip(file_paths, pool.map(self.check, file_paths)))
@@ -0,0 +1,186 @@
+import json
+import asyncio
+import hashlib
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple, TypeVar
+from src.utils.metrics import REGISTRY
+
+T = TypeVar("T")
+
+SINGLE_FLIGHT_CALLS = REGISTRY.counter(
+    "single_flight_calls_total", "Calls that ran (leader) or shared an identical in-flight call (coalesced)",
+    ("group", "outcome"))
+SINGLE_FLIGHT_IN_FLIGHT = REGISTRY.gauge(
+    "single_flight_in_flight", "Distinct calls in flight per single-flight group", ("group",))
+
+
+# Set inside calls that run detached from their callers (see SingleFlight.do)
+_abandoned: contextvars.ContextVar[Optional[Callable[[], bool]]] = contextvars.ContextVar(
+    "single_flight_abandoned", default=None)
+
+
+class WaitTimeout(Exception):
+    """A caller stopped waiting for a call after its ``timeout``; the call itself carries on."""
+
+
+class CallAbandoned(Exception):
+    """Raised inside a detached call to stop it once no caller waits for its result."""
+
+    # Nobody is left to retry for
+    retryable = False
+
+
+def abandoned() -> bool:
+    """Whether every caller of the detached single-flight call running in this context has stopped waiting."""
+    check = _abandoned.get()
+    return check is not None and check()
+
+
+def request_key(*parts: Any) -> str:
+    """Stable hash of JSON-able request parts (dict order does not matter)."""
+    data = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class _Call(Future):
+    """The shared result of one call, plus how many callers are still waiting for it."""
+
+    def __init__(self):
+        super().__init__()
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a call for ``key`` is in flight,
+    later callers with the same key wait for it and get its result (or its
+    exception) instead of running their own. Nothing is cached once it completes.
+
+    The shared result is a concurrent.futures.Future, so threads and coroutines on
+    any event loop can wait on the same call.
+
+    Callers may bound their own wait with ``timeout``. The shared call is then
+    not tied to any one caller: the leader runs it detached (on the group's pool
+    of at most ``max_workers`` threads, or as a task for ``ado``) in a copy of its
+    context, and it keeps running for the other callers when one gives up.
+    ``abandoned()`` turns true inside it once none is left.
+    """
+
+    def __init__(self, group: str, max_workers: int = 32):
+        self.group = group
+        self.max_workers = max_workers
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _detach(self, key: str, call: _Call, fn: Callable[[], T]) -> None:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix=f"single-flight-{self.group}")
+        context = contextvars.copy_context()
+        self._executor.submit(context.run, self._run_detached, key, call, fn)
+
+    def _join(self, key: str) -> Tuple[_Call, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                SINGLE_FLIGHT_CALLS.labels(self.group, "coalesced").inc()
+                return call, False
+            call = self._calls[key] = _Call()
+            call.waiters = 1
+            SINGLE_FLIGHT_IN_FLIGHT.labels(self.group).set(len(self._calls))
+        SINGLE_FLIGHT_CALLS.labels(self.group, "leader").inc()
+        return call, True
+
+    def _leave(self, call: _Call) -> None:
+        with self._lock:
+            call.waiters -= 1
+
+    def _finish(self, key: str) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+            SINGLE_FLIGHT_IN_FLIGHT.labels(self.group).set(len(self._calls))
+
+    def _run(self, key: str, call: _Call, fn: Callable[[], T]) -> T:
+        try:
+            result = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            self._finish(key)
+
+    def _run_detached(self, key: str, call: _Call, fn: Callable[[], T]) -> None:
+        _abandoned.set(lambda: call.waiters == 0)
+        try:
+            self._run(key, call, fn)
+        except BaseException:
+            pass  # delivered to the callers through the call
+
+    def do(self, key: str, fn: Callable[[], T], timeout: Optional[float] = None) -> Tuple[T, bool]:
+        """
+        Runs ``fn`` unless an identical call is in flight; returns (result, shared).
+
+        Raises:
+            WaitTimeout: If the call did not complete within ``timeout`` seconds
+        """
+        call, leader = self._join(key)
+        try:
+            if leader and timeout is None:
+                return self._run(key, call, fn), False
+            if leader:
+                self._detach(key, call, fn)
+            if not wait_futures([call], timeout).done:
+                raise WaitTimeout(f"Stopped waiting for a {self.group} call after {timeout:.1f}s")
+            return call.result(), not leader
+        finally:
+            self._leave(call)
+
+    async def _arun_detached(self, key: str, call: _Call, fn: Callable[[], Awaitable[T]]) -> None:
+        _abandoned.set(lambda: call.waiters == 0)
+        try:
+            await self._arun(key, call, fn)
+        except BaseException:
+            pass  # delivered to the callers through the call
+
+    async def _arun(self, key: str, call: _Call, fn: Callable[[], Awaitable[T]]) -> T:
+        try:
+            result = await fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            self._finish(key)
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[T]], timeout: Optional[float] = None) -> Tuple[T, bool]:
+        """Async variant of ``do``; ``fn`` returns the awaitable to run when leading."""
+        call, leader = self._join(key)
+        try:
+            if leader and timeout is None:
+                return await self._arun(key, call, fn), False
+            if leader:
+                task = asyncio.ensure_future(self._arun_detached(key, call, fn))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            try:
+                # Shielded: one caller giving up (or being cancelled) must not cancel the call for the others
+                return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(call)), timeout), not leader
+            except asyncio.TimeoutError:
+                raise WaitTimeout(f"Stopped waiting for a {self.group} call after {timeout:.1f}s") from None
+        finally:
+            self._leave(call)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,186 @@
+"""
+Turns free-form agent answers into validated JSON.
+
+``extract_json`` pulls the first JSON value out of a ReAct answer and repairs
+the usual slips of a language model: code fences, prose around the value, a
+``Final Answer:`` prefix, trailing commas, comments, smart quotes, Python
+literals and unclosed brackets from truncated output. ``validate_schema``
+checks the result against the subset of JSON Schema that agents declare (type,
+properties, required, items, enum).
+"""
+import re
+import ast
+import json
+from typing import Any, Dict, Iterator, List, Optional
+from src.utils.metrics import REGISTRY
+
+STRUCTURED_OUTPUTS = REGISTRY.counter(
+    "agent_structured_outputs_total",
+    "Agent answers by how their JSON was obtained (parsed, repaired, reformatted, failed)", ("agent", "outcome"))
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*\n?(.*?)```", re.DOTALL)
+_FINAL_ANSWER_RE = re.compile(r"Final Answer\s*:\s*", re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_LINE_COMMENT_RE = re.compile(r"^\s*//.*$", re.MULTILINE)
+_BLOCK_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "integer": int,
+    "number": (int, float),
+    "null": type(None),
+}
+
+
+class OutputSchemaError(ValueError):
+    """An agent answer that holds no JSON, or JSON that does not match the agent's schema."""
+
+
+def output_text(result: Any) -> str:
+    """The answer text of an AgentExecutor result (its ``output``), or the result itself."""
+    if isinstance(result, dict) and "output" in result:
+        result = result["output"]
+    return result if isinstance(result, str) else json.dumps(result)
+
+
+def _json_spans(text: str) -> Iterator[str]:
+    """Balanced {...} / [...] spans, left to right and not nested in each other; an unclosed one is closed."""
+    start = 0
+    while True:
+        starts = [i for i in (text.find("{", start), text.find("[", start)) if i != -1]
+        if not starts:
+            return
+        begin = min(starts)
+        stack: List[str] = []
+        in_string, escaped, end = False, False, None
+        for i in range(begin, len(text)):
+            char = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in "{[":
+                stack.append("}" if char == "{" else "]")
+            elif char in "}]":
+                if not stack or stack.pop() != char:
+                    break
+                if not stack:
+                    end = i + 1
+                    break
+        if end is not None:
+            yield text[begin:end]
+            # Resumed only when the span was no use; rescanning its inside from every bracket is quadratic
+            start = end
+        elif stack:
+            # Truncated output: close what is open
+            yield text[begin:].rstrip().rstrip(",") + ('"' if in_string else "") + "".join(reversed(stack))
+            # Every later span starts inside this one and is unclosed too
+            return
+        else:
+            # A closing bracket of the wrong kind ended the scan: spans may still start inside
+            start = begin + 1
+
+
+def _candidates(text: str) -> Iterator[str]:
+    yield text
+    for match in _FENCE_RE.finditer(text):
+        yield match.group(1)
+    final = _FINAL_ANSWER_RE.split(text)
+    if len(final) > 1:
+        yield final[-1]
+    yield from _json_spans(text)
+
+
+def _parse(candidate: str) -> Any:
+    candidate = candidate.strip()
+    if not candidate:
+        raise ValueError("empty")
+    try:
+        return json.loads(candidate)
+    except ValueError:
+        pass
+    repaired = _TRAILING_COMMA_RE.sub(r"\1", _BLOCK_COMMENT_RE.sub("", _LINE_COMMENT_RE.sub("", candidate)))
+    repaired = repaired.translate(_SMART_QUOTES)
+    try:
+        return json.loads(repaired)
+    except ValueError:
+        pass
+    # Single quotes and True/False/None
+    value = ast.literal_eval(repaired)
+    if not isinstance(value, (dict, list)):
+        raise ValueError("not a JSON object or array")
+    return json.loads(json.dumps(value))
+
+
+def extract_json(text: str, schema: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    The first JSON object or array in ``text`` (the first matching ``schema``, if
+    one does), repairing common malformations.
+
+    Raises OutputSchemaError if there is none.
+    """
+    first = None
+    for candidate in _candidates(text):
+        try:
+            value = _parse(candidate)
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            continue
+        if not isinstance(value, (dict, list)):
+            continue
+        if schema is None or not schema_errors(value, schema):
+            return value
+        if first is None:
+            first = value
+    if first is not None:
+        return first
+    raise OutputSchemaError(f"No JSON found in agent output: {text[:200]!r}")
+
+
+def schema_errors(value: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """Where ``value`` breaks ``schema``; empty if it matches."""
+    errors = []
+    expected = schema.get("type")
+    if expected is not None:
+        names = expected if isinstance(expected, list) else [expected]
+        matches = any(
+            isinstance(value, _TYPES[name]) and not (isinstance(value, bool) and name in ("integer", "number"))
+            for name in names
+        )
+        if not matches:
+            return [f"{path}: expected {' or '.join(names)}, got {type(value).__name__}"]
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path}: {value!r} is not one of {schema['enum']}")
+    if isinstance(value, dict):
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{path}: missing required key '{key}'")
+        for key, subschema in schema.get("properties", {}).items():
+            if key in value:
+                errors.extend(schema_errors(value[key], subschema, f"{path}.{key}"))
+    if isinstance(value, list) and "items" in schema:
+        for i, item in enumerate(value):
+            errors.extend(schema_errors(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+
+def validate_schema(value: Any, schema: Optional[Dict[str, Any]]) -> Any:
+    """Returns ``value`` if it matches ``schema`` (None accepts anything); raises OutputSchemaError otherwise."""
+    if schema is not None:
+        errors = schema_errors(value, schema)
+        if errors:
+            raise OutputSchemaError("Output does not match schema: " + "; ".join(errors[:5]))
+    return value
+
+
+def parse_output(result: Any, schema: Optional[Dict[str, Any]] = None) -> Any:
+    """Extracts and validates the JSON answer of an agent run."""
+    return validate_schema(extract_json(output_text(result), schema), schema)
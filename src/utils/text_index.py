@@ -0,0 +1,149 @@
+import os
+import re
+import json
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "that", "the", "to", "what", "when", "which", "with"
+})
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cases and splits text into alphanumeric tokens, dropping stopwords."""
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 ranking.
+
+    Documents are added with ``add`` and identified by their insertion position.
+    Per-term BM25 weights are computed once into NumPy arrays, so a query is a
+    handful of vectorized adds over the postings of its terms plus a top-k
+    partition, which keeps lookups well under a millisecond at tens of
+    thousands of documents.
+
+    A frozen index can be written with ``save`` and memory-mapped back with
+    ``load``; a loaded index is read-only.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.doc_lengths: List[int] = []
+        self._total_length = 0
+        # term -> precomputed (doc ids, BM25 weights) arrays; cleared whenever documents change
+        self._weights: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._lengths: Optional[np.ndarray] = None
+        self._read_only = False
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.postings or term in self._weights
+
+    def add(self, text: str) -> int:
+        """Indexes ``text`` and returns its document id."""
+        if self._read_only:
+            raise ValueError("A loaded index is read-only; build a new one to add documents")
+        doc_id = len(self.doc_lengths)
+        tokens = tokenize(text)
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            self.postings.setdefault(token, []).append((doc_id, tf))
+        self.doc_lengths.append(len(tokens))
+        self._total_length += len(tokens)
+        self._weights.clear()
+        self._lengths = None
+        return doc_id
+
+    def add_many(self, texts: Iterable[str]) -> None:
+        for text in texts:
+            self.add(text)
+
+    def _term_weights(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        weights = self._weights.get(term)
+        if weights is None:
+            postings = self.postings.get(term, [])
+            n_docs = len(self.doc_lengths)
+            avg_length = self._total_length / n_docs or 1.0
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            doc_ids = np.fromiter((doc_id for doc_id, _ in postings), dtype=np.int32, count=len(postings))
+            tfs = np.fromiter((tf for _, tf in postings), dtype=np.float64, count=len(postings))
+            if self._lengths is None:
+                self._lengths = np.asarray(self.doc_lengths, dtype=np.float64)
+            lengths = self._lengths[doc_ids]
+            norms = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+            weights = (doc_ids, idf * tfs * (self.k1 + 1) / (tfs + norms))
+            self._weights[term] = weights
+        return weights
+
+    def freeze(self) -> "BM25Index":
+        """Precomputes the weights of every term so the first queries are as fast as later ones."""
+        for term in self.postings:
+            self._term_weights(term)
+        return self
+
+    def save(self, directory: str) -> None:
+        """Writes the frozen per-term weights as ``index.json`` plus flat ``.npy`` arrays."""
+        self.freeze()
+        terms = list(self._weights)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(self._weights[term][0]) for term in terms], out=offsets[1:])
+        arrays = {
+            "offsets": offsets,
+            "doc_ids": np.concatenate([self._weights[term][0] for term in terms] or [np.zeros(0, dtype=np.int32)]),
+            "weights": np.concatenate([self._weights[term][1] for term in terms] or [np.zeros(0)]),
+            "doc_lengths": np.asarray(self.doc_lengths, dtype=np.int64),
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), array, allow_pickle=False)
+        with open(os.path.join(directory, "index.json"), "w") as f:
+            json.dump({"k1": self.k1, "b": self.b, "terms": terms}, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "BM25Index":
+        """Memory-maps an index written by ``save``; raises OSError or ValueError if it is unusable."""
+        with open(os.path.join(directory, "index.json")) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+                  for name in ("offsets", "doc_ids", "weights", "doc_lengths")}
+        terms, offsets = meta["terms"], arrays["offsets"]
+        doc_ids = arrays["doc_ids"]
+        if len(offsets) != len(terms) + 1 or offsets[-1] != len(doc_ids) or len(doc_ids) != len(arrays["weights"]) \
+                or (len(doc_ids) and (doc_ids.min() < 0 or doc_ids.max() >= len(arrays["doc_lengths"]))):
+            raise ValueError(f"Inconsistent index in {directory}")
+        index = cls(k1=meta["k1"], b=meta["b"])
+        index.doc_lengths = arrays["doc_lengths"]
+        index._total_length = int(arrays["doc_lengths"].sum())
+        index._weights = {
+            term: (arrays["doc_ids"][start:end], arrays["weights"][start:end])
+            for term, start, end in zip(terms, offsets[:-1].tolist(), offsets[1:].tolist())
+        }
+        index._read_only = True
+        return index
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """Returns up to ``top_k`` (doc id, score) pairs, best first."""
+        terms = [term for term in set(tokenize(query)) if term in self]
+        if not terms or top_k <= 0:
+            return []
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float64)
+        for term in terms:
+            doc_ids, weights = self._term_weights(term)
+            # Doc ids are unique within one term's postings, so fancy-index add is safe
+            scores[doc_ids] += weights
+        # Partitioning only the matched documents is far cheaper than the whole (mostly zero) array
+        matched = np.flatnonzero(scores)
+        if top_k < len(matched):
+            matched = matched[np.argpartition(scores[matched], -top_k)[-top_k:]]
+        top = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in top]
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import secrets
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "multi-agent-genai"
+# Finished spans are written once this many have accumulated, or when a trace's root span ends
+EXPORT_BATCH_SIZE = 64
+MAX_TRACES_IN_MEMORY = 256
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+def new_trace_id() -> str:
+    return secrets.token_hex(16)
+
+
+class Span:
+    """One timed operation within a trace; timestamps are Unix nanoseconds as in OTLP."""
+
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_span_id", "name", "attributes",
+                 "start_time", "end_time", "status", "error", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_span_id: Optional[str],
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+        self.status = "unset"
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.end_time is not None:
+            return
+        self.end_time = time.time_ns()
+        if error is not None:
+            self.status, self.error = "error", f"{type(error).__name__}: {error}"
+        elif self.status == "unset":
+            self.status = "ok"
+        if self._token is not None:
+            try:
+                _current_span.reset(self._token)
+            except ValueError:
+                # Ended from a different context than it was activated in
+                _current_span.set(None)
+            self._token = None
+        self.tracer._on_end(self)
+
+    def to_otlp(self) -> Dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_time),
+            "endTimeUnixNano": str(self.end_time or time.time_ns()),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": {"unset": 0, "ok": 1, "error": 2}[self.status]},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.error:
+            span["status"]["message"] = self.error
+        return span
+
+    def to_dict(self) -> Dict:
+        end_time = self.end_time
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time": self.start_time / 1e9,
+            "end_time": end_time / 1e9 if end_time else None,
+            "duration_ms": round((end_time - self.start_time) / 1e6, 3) if end_time else None,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def _from_otlp_attribute(attribute: Dict) -> Any:
+    value = attribute.get("value", {})
+    if "intValue" in value:
+        return int(value["intValue"])
+    for kind in ("boolValue", "doubleValue", "stringValue"):
+        if kind in value:
+            return value[kind]
+    return None
+
+
+class OTLPFileExporter:
+    """
+    Appends batches of spans to a file, one OTLP/JSON ``ExportTraceServiceRequest``
+    per line, the format the OpenTelemetry collector's file receiver reads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        if not spans:
+            return
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": [span.to_otlp() for span in spans]}],
+        }]}
+        line = json.dumps(request, separators=(",", ":"))
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def read_trace(self, trace_id: str) -> List[Dict]:
+        """Span dicts of ``trace_id`` recorded in the export file, for traces no longer in memory."""
+        if not os.path.exists(self.path):
+            return []
+        spans = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if trace_id not in line:
+                    continue
+                for resource in json.loads(line).get("resourceSpans", []):
+                    for scope in resource.get("scopeSpans", []):
+                        for span in scope.get("spans", []):
+                            if span.get("traceId") != trace_id:
+                                continue
+                            start, end = int(span["startTimeUnixNano"]), int(span["endTimeUnixNano"])
+                            status = span.get("status", {})
+                            spans.append({
+                                "name": span["name"],
+                                "span_id": span["spanId"],
+                                "parent_span_id": span.get("parentSpanId"),
+                                "start_time": start / 1e9,
+                                "end_time": end / 1e9,
+                                "duration_ms": round((end - start) / 1e6, 3),
+                                "status": {0: "unset", 1: "ok", 2: "error"}.get(status.get("code", 0)),
+                                "error": status.get("message"),
+                                "attributes": {a["key"]: _from_otlp_attribute(a) for a in span.get("attributes", [])},
+                            })
+        return spans
+
+
+class Tracer:
+    """
+    Creates spans, tracks the active one in a context variable and hands finished
+    spans to the exporter in batches.
+
+    The active span follows ``asyncio`` tasks and ``asyncio.to_thread`` calls
+    automatically (both copy the context); work submitted to other thread pools
+    must be wrapped with ``propagate`` to stay in the same trace.
+    """
+
+    def __init__(self, exporter: Optional[OTLPFileExporter] = None):
+        self.exporter = exporter
+        self._pending: List[Span] = []
+        self._traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None, trace_id: Optional[str] = None,
+                   parent: Optional[Span] = None, activate: bool = True) -> Span:
+        """
+        Starts a span under ``parent`` (default: the active span). Without a parent a
+        new trace is started, reusing ``trace_id`` if given. An activated span becomes
+        the active span until it ends.
+        """
+        parent = parent if parent is not None else _current_span.get()
+        if parent is not None:
+            span = Span(self, name, parent.trace_id, parent.span_id, attributes)
+        else:
+            span = Span(self, name, trace_id or new_trace_id(), None, attributes)
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = self._traces[span.trace_id] = []
+                while len(self._traces) > MAX_TRACES_IN_MEMORY:
+                    self._traces.popitem(last=False)
+            else:
+                self._traces.move_to_end(span.trace_id)
+            spans.append(span)
+        if activate:
+            span._token = _current_span.set(span)
+        return span
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None, trace_id: Optional[str] = None):
+        span = self.start_span(name, attributes, trace_id=trace_id)
+        try:
+            yield span
+        except BaseException as e:
+            span.end(error=e)
+            raise
+        span.end()
+
+    def _on_end(self, span: Span) -> None:
+        if self.exporter is None:
+            return
+        with self._lock:
+            self._pending.append(span)
+            if span.parent_span_id is not None and len(self._pending) < EXPORT_BATCH_SIZE:
+                return
+            batch, self._pending = self._pending, []
+        try:
+            self.exporter.export(batch)
+        except OSError as e:
+            logger.warning("Could not export %d spans: %s", len(batch), str(e))
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if self.exporter is not None:
+            self.exporter.export(batch)
+
+    def get_trace(self, trace_id: str) -> List[Dict]:
+        """Spans of a trace as a tree: root spans with nested ``children``, ordered by start time."""
+        with self._lock:
+            spans = [span.to_dict() for span in self._traces.get(trace_id, [])]
+        if not spans and self.exporter is not None:
+            spans = self.exporter.read_trace(trace_id)
+        nodes = {span["span_id"]: dict(span, children=[]) for span in spans}
+        roots = []
+        for node in sorted(nodes.values(), key=lambda n: n["start_time"]):
+            parent = nodes.get(node["parent_span_id"])
+            (parent["children"] if parent is not None else roots).append(node)
+        return roots
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def propagate(fn: Callable) -> Callable:
+    """Binds ``fn`` to a copy of the caller's context, so spans it starts nest under the active span."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so each call gets its own copy
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Process-wide tracer exporting to Settings.TRACE_EXPORT_PATH (in-memory only if unset)."""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                from src.utils.config import get_settings
+                path = get_settings().TRACE_EXPORT_PATH
+                _tracer = Tracer(OTLPFileExporter(path) if path else None)
+    return _tracer
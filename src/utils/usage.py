@@ -0,0 +1,196 @@
+import json
+import logging
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Raw records kept per job for drill-down; aggregates are kept for every record
+MAX_RECORDS_PER_JOB = 500
+GLOBAL_USAGE_KEY = "usage:global"
+COUNTER_METRICS = ("agent_runs", "llm_calls", "prompt_tokens", "completion_tokens", "llm_seconds",
+                   "duration_seconds", "retries", "steps", "tool_calls", "errors", "cost")
+
+
+@dataclass
+class UsageRecord:
+    """Usage of one BaseAgent.run call, summed over its attempts."""
+    agent: str
+    model: str
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    llm_seconds: float = 0.0
+    time_to_first_token: Optional[float] = None
+    duration_seconds: float = 0.0
+    attempts: int = 0
+    step_seconds: List[float] = field(default_factory=list)
+    tool_calls: Dict[str, int] = field(default_factory=dict)
+    status: str = "success"
+    cost: float = 0.0
+    job_id: Optional[str] = None
+    state: Optional[str] = None
+
+    def counters(self) -> Dict[str, float]:
+        counters = {
+            "agent_runs": 1,
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "llm_seconds": self.llm_seconds,
+            "duration_seconds": self.duration_seconds,
+            "retries": max(self.attempts - 1, 0),
+            "steps": len(self.step_seconds),
+            "tool_calls": sum(self.tool_calls.values()),
+            "errors": 0 if self.status == "success" else 1,
+            "cost": self.cost,
+        }
+        for tool, count in self.tool_calls.items():
+            counters[f"tool:{tool}"] = count
+        return counters
+
+
+@dataclass
+class UsageScope:
+    """Job and workflow state that usage recorded in this context is attributed to."""
+    job_id: str
+    state: Optional[str] = None
+
+
+_usage_scope: contextvars.ContextVar[Optional[UsageScope]] = contextvars.ContextVar("usage_scope", default=None)
+
+
+@contextmanager
+def usage_scope(job_id: str):
+    scope = UsageScope(job_id)
+    token = _usage_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _usage_scope.reset(token)
+
+
+def set_usage_state(state: str) -> None:
+    scope = _usage_scope.get()
+    if scope is not None:
+        scope.state = state
+
+
+def token_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Cost from Settings.LLM_TOKEN_PRICES ({model: {"prompt": x, "completion": y}} per 1k tokens)."""
+    from src.utils.config import get_settings
+    prices = get_settings().LLM_TOKEN_PRICES.get(model)
+    if not prices:
+        return 0.0
+    return (prompt_tokens * prices.get("prompt", 0.0) + completion_tokens * prices.get("completion", 0.0)) / 1000
+
+
+def _number(value) -> float:
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 6)
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class UsageStore:
+    """
+    Aggregates usage records in Redis hashes: one per job (broken down by state
+    and by agent/model) and one global roll-up across jobs. Each record is a
+    single pipelined round trip of HINCRBYFLOAT updates.
+    """
+
+    def __init__(self, client_getter: Callable):
+        self._client_getter = client_getter
+
+    @staticmethod
+    def job_key(job_id: str) -> str:
+        return f"usage:job:{job_id}"
+
+    def record(self, record: UsageRecord) -> None:
+        client = self._client_getter()
+        if client is None:
+            return
+        counters = record.counters()
+        pipe = client.pipeline(transaction=False)
+        prefixes = [(GLOBAL_USAGE_KEY, f"agent|{record.agent}|{record.model}|"), (GLOBAL_USAGE_KEY, "total|")]
+        if record.job_id:
+            job_key = self.job_key(record.job_id)
+            prefixes += [(job_key, f"agent|{record.agent}|{record.model}|"), (job_key, "total|")]
+            if record.state:
+                prefixes.append((job_key, f"state|{record.state}|"))
+            pipe.rpush(f"{job_key}:records", json.dumps(asdict(record)))
+            pipe.ltrim(f"{job_key}:records", -MAX_RECORDS_PER_JOB, -1)
+        for key, prefix in prefixes:
+            for metric, value in counters.items():
+                if value:
+                    pipe.hincrbyfloat(key, prefix + metric, value)
+        pipe.execute()
+
+    @staticmethod
+    def _parse(fields: Dict) -> Dict:
+        usage = {"total": {}, "by_state": {}, "by_agent": {}}
+        for raw_field, raw_value in fields.items():
+            parts = _decode(raw_field).split("|")
+            value = _number(_decode(raw_value))
+            if parts[0] == "total":
+                target = usage["total"]
+            elif parts[0] == "state":
+                target = usage["by_state"].setdefault(parts[1], {})
+            else:
+                target = usage["by_agent"].setdefault((parts[1], parts[2]), {"agent": parts[1], "model": parts[2]})
+            metric = parts[-1]
+            if metric.startswith("tool:"):
+                target.setdefault("tools", {})[metric[len("tool:"):]] = value
+            else:
+                target[metric] = value
+        # Biggest token consumers first
+        usage["by_agent"] = sorted(
+            usage["by_agent"].values(),
+            key=lambda a: a.get("prompt_tokens", 0) + a.get("completion_tokens", 0),
+            reverse=True
+        )
+        return usage
+
+    def job_usage(self, job_id: str, include_records: bool = True) -> Dict:
+        client = self._client_getter()
+        usage = self._parse(client.hgetall(self.job_key(job_id)))
+        usage["job_id"] = job_id
+        if include_records:
+            usage["records"] = [json.loads(_decode(r)) for r in client.lrange(f"{self.job_key(job_id)}:records", 0, -1)]
+        return usage
+
+    def rollup(self) -> Dict:
+        usage = self._parse(self._client_getter().hgetall(GLOBAL_USAGE_KEY))
+        del usage["by_state"]
+        return usage
+
+
+_store: Optional[UsageStore] = None
+
+
+def configure_usage_store(client_getter: Callable) -> UsageStore:
+    """Sets the Redis client (resolved per call) that usage records are aggregated into."""
+    global _store
+    _store = UsageStore(client_getter)
+    return _store
+
+
+def get_usage_store() -> Optional[UsageStore]:
+    return _store
+
+
+def record_usage(record: UsageRecord) -> None:
+    """Attributes ``record`` to the current job/state and aggregates it; never raises."""
+    scope = _usage_scope.get()
+    if scope is not None:
+        record.job_id, record.state = scope.job_id, scope.state
+    if _store is None:
+        return
+    try:
+        _store.record(record)
+    except Exception as e:
+        logger.warning("Failed to record usage for %s: %s", record.agent, str(e))
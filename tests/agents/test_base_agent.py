@@ -1,3 +1,4 @@
+import time
 import pytest
 from unittest.mock import MagicMock, patch
 from src.agents.base_agent import BaseAgent, AgentCallbackHandler
@@ -25,13 +26,14 @@ def test_agent_initialization(base_agent, mock_tools):
     assert base_agent.callback_handler is not None
     assert isinstance(base_agent.callback_handler, AgentCallbackHandler)
 
-def test_llm_initialization_retry_success(mock_tools):
+def test_llm_construction_is_not_retried(mock_tools):
     with patch('src.agents.base_agent.Ollama') as mock_ollama:
-        # Make the first attempt fail, second succeed
-        mock_ollama.side_effect = [Exception("Connection error"), MagicMock()]
-        
-        agent = BaseAgent(mock_tools, "Test prompt", max_retries=3)
-        assert agent.llm is not None  # Should succeed on second attempt
+        # Building the client does no I/O, so a failure is not worth retrying
+        mock_ollama.side_effect = [Exception("Invalid model"), MagicMock()]
+
+        with pytest.raises(Exception, match="Invalid model"):
+            BaseAgent(mock_tools, "Test prompt", max_retries=3)
+        assert mock_ollama.call_count == 1
 
 def test_llm_initialization_retry_failure(mock_tools):
     with patch('src.agents.base_agent.Ollama') as mock_ollama:
@@ -96,4 +98,167 @@ def test_callback_handler_logging():
 @pytest.mark.asyncio
 async def test_async_not_implemented(base_agent):
     with pytest.raises(NotImplementedError):
-        await base_agent._arun("test")
\ No newline at end of file
+        await base_agent._arun("test")
+
+def test_callback_handler_records_llm_metrics():
+    from langchain_core.outputs import LLMResult, Generation
+    from src.utils.metrics import REGISTRY
+
+    handler = AgentCallbackHandler("MetricsAgent", "test_model")
+    handler.on_llm_start({}, ["prompt"], run_id="run-1")
+    handler.on_llm_end(
+        LLMResult(generations=[[Generation(text="ok", generation_info={"prompt_eval_count": 12, "eval_count": 30})]]),
+        run_id="run-1"
+    )
+
+    output = REGISTRY.render()
+    assert 'llm_call_duration_seconds_count{agent="MetricsAgent",model="test_model"} 1' in output
+    assert 'llm_tokens_sum{agent="MetricsAgent",model="test_model",kind="prompt"} 12' in output
+    assert 'llm_tokens_sum{agent="MetricsAgent",model="test_model",kind="completion"} 30' in output
+
+def test_callback_handler_collects_usage():
+    from types import SimpleNamespace
+    from langchain_core.outputs import LLMResult, Generation
+
+    handler = AgentCallbackHandler("UsageAgent", "test_model")
+    handler.begin_run()
+    handler.on_llm_start({}, ["prompt"], run_id="run-1")
+    handler.on_llm_new_token("Hel", run_id="run-1")
+    handler.on_llm_end(
+        LLMResult(generations=[[Generation(text="ok", generation_info={"prompt_eval_count": 7, "eval_count": 3})]]),
+        run_id="run-1"
+    )
+    handler.on_agent_action(SimpleNamespace(tool="FileSystemTool"))
+    handler.on_agent_finish(None)
+
+    usage = handler.end_run(attempts=2, duration=1.0, status="success")
+    assert (usage.llm_calls, usage.prompt_tokens, usage.completion_tokens) == (1, 7, 3)
+    assert usage.tool_calls == {"FileSystemTool": 1}
+    assert len(usage.step_seconds) == 2
+    assert usage.time_to_first_token is not None
+    assert usage.counters()["retries"] == 1
+
+def _structured_agent(output, schema):
+    agent = BaseAgent.__new__(BaseAgent)
+    agent.logger = logging.getLogger("agent.test")
+    agent.max_retries = 2
+    agent.callback_handler = AgentCallbackHandler("StructuredAgent", "test_model")
+    agent.llm = None
+    agent.output_schema = schema
+    agent.run = MagicMock(return_value={"input": "task", "output": output})
+    return agent
+
+def test_run_structured_repairs_without_llm_calls():
+    agent = _structured_agent('Final Answer: {"status": "success",}', {"required": ["status"]})
+    with patch('src.agents.base_agent.Ollama') as mock_ollama:
+        assert agent.run_structured("task") == {"status": "success"}
+        mock_ollama.assert_not_called()
+    agent.run.assert_called_once_with("task")
+
+def test_run_structured_reformats_in_json_mode():
+    agent = _structured_agent("The deployment worked.", {"required": ["status"]})
+    with patch('src.agents.base_agent.Ollama') as mock_ollama:
+        mock_ollama.return_value.invoke.return_value = '{"status": "success"}'
+        assert agent.run_structured("task") == {"status": "success"}
+        assert mock_ollama.call_args.kwargs["format"] == "json"
+        assert '"required": ["status"]' in mock_ollama.return_value.invoke.call_args.args[0]
+    agent.run.assert_called_once()
+
+def test_run_structured_fails_when_reformatting_does_not_help():
+    from src.utils.structured_output import OutputSchemaError
+    agent = _structured_agent("No idea.", {"required": ["status"]})
+    with patch('src.agents.base_agent.Ollama') as mock_ollama:
+        mock_ollama.return_value.invoke.return_value = '{"other": 1}'
+        with pytest.raises(OutputSchemaError, match="missing required key 'status'"):
+            agent.run_structured("task")
+
+REACT_PROMPT = """Answer using the tools {tool_names}:
+{tools}
+
+Question: {input}
+{agent_scratchpad}"""
+
+def _budget_agent(server, monkeypatch, **budget):
+    from langchain_core.tools import Tool
+    from src.utils.ollama_pool import OllamaHostPool
+    from src.utils.config import get_settings
+    pool = OllamaHostPool([server.url])
+    monkeypatch.setattr('src.utils.pooled_ollama.get_ollama_pool', lambda: pool)
+    monkeypatch.setitem(get_settings().AGENT_BUDGETS, "BaseAgent", budget)
+    lookup = Tool(name="lookup", func=lambda query: "nothing found", description="Looks things up")
+    return BaseAgent([lookup], REACT_PROMPT, model_name="llama3", max_retries=2)
+
+LOOPING_ANSWER = "Thought: I should look again\nAction: lookup\nAction Input: more"
+
+def test_step_budget_stops_a_looping_agent(monkeypatch):
+    from src.utils.fake_ollama import FakeOllamaServer
+    with FakeOllamaServer(response_text=LOOPING_ANSWER) as server:
+        agent = _budget_agent(server, monkeypatch, max_steps=3, early_stopping="force")
+        result = agent.run("find it")
+    assert result["output"] == "Agent stopped due to iteration limit or time limit."
+    assert "intermediate_steps" not in result
+    assert agent.budget_report["reason"] == "steps" and agent.budget_report["steps"] == 3
+    assert server.stats["requests"] == 3
+
+def test_generate_policy_asks_for_a_final_answer(monkeypatch):
+    from src.utils.fake_ollama import FakeOllamaServer
+    with FakeOllamaServer(response_text=LOOPING_ANSWER) as server:
+        agent = _budget_agent(server, monkeypatch, max_steps=2, early_stopping="generate")
+        result = agent._apply_early_stopping("find it", {
+            "output": "Agent stopped due to iteration limit or time limit.",
+            "intermediate_steps": [],
+        }, 1.0)
+    assert result["output"] == LOOPING_ANSWER
+    assert agent.budget_report["early_stopping"] == "generate"
+
+def test_generated_final_answer_has_its_own_deadline(monkeypatch):
+    from src.utils.fake_ollama import FakeOllamaServer
+    with FakeOllamaServer(response_text=" ".join(["word"] * 100), token_seconds=0.02) as server:
+        agent = _budget_agent(server, monkeypatch, max_steps=2, early_stopping="generate",
+                              final_answer_seconds=0.2)
+        started = time.perf_counter()
+        result = agent._apply_early_stopping("find it", {
+            "output": "Agent stopped due to iteration limit or time limit.",
+            "intermediate_steps": [],
+        }, 1.0)
+    assert time.perf_counter() - started < 1.5
+    assert result["output"] == "Agent stopped due to iteration limit or time limit."
+
+def test_error_policy_and_structured_runs_raise(monkeypatch):
+    from src.utils.fake_ollama import FakeOllamaServer
+    from src.utils.budget import AgentBudgetExceeded
+    with FakeOllamaServer(response_text=LOOPING_ANSWER) as server:
+        agent = _budget_agent(server, monkeypatch, max_steps=2, early_stopping="error")
+        with pytest.raises(AgentBudgetExceeded, match="steps budget after 2 step"):
+            agent.run("find it")
+        assert server.stats["requests"] == 2
+        agent.budget.early_stopping = "force"
+        agent.output_schema = {"type": "object"}
+        with pytest.raises(AgentBudgetExceeded):
+            agent.run_structured("find it again")
+    assert agent.budget_report["reason"] == "steps"
+
+def test_wall_clock_budget_aborts_a_slow_call(monkeypatch):
+    from src.utils.fake_ollama import FakeOllamaServer
+    from src.utils.budget import AgentBudgetExceeded
+    with FakeOllamaServer(response_text=" ".join(["word"] * 100), token_seconds=0.02) as server:
+        agent = _budget_agent(server, monkeypatch, max_seconds=0.3)
+        started = time.perf_counter()
+        with pytest.raises(AgentBudgetExceeded, match="time budget"):
+            agent.run("slow task")
+    assert time.perf_counter() - started < 1.5
+    assert agent.budget_report["reason"] == "time"
+
+def test_llm_overload_is_retried_by_the_call_not_the_task():
+    import requests
+    from langchain_core.tools import Tool
+    lookup = Tool(name="lookup", func=lambda query: "nothing found", description="Looks things up")
+    agent = BaseAgent([lookup], REACT_PROMPT, model_name="llama3", max_retries=3)
+    assert agent.llm.max_retries == 3
+
+    agent.executor = MagicMock()
+    agent.executor.invoke.side_effect = requests.ConnectionError("connection refused")
+    # The LLM call already retried with backoff; re-running the task would multiply the load
+    with pytest.raises(requests.ConnectionError):
+        agent.run("find it")
+    assert agent.executor.invoke.call_count == 1
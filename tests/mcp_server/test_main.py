@@ -98,6 +98,50 @@ def test_request_logging(client, mock_redis, caplog):
         assert any("Request started: GET /status/123" in record.message for record in caplog.records)
         assert any("Request completed: GET /status/123" in record.message for record in caplog.records)
 
+def test_metrics_endpoint(client, mock_redis):
+    client.get("/status/123", headers={"X-API-Key": "test-key"})
+    response = client.get("/metrics", headers={"X-API-Key": "test-key"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/status/{job_id}",status="404"}' in response.text
+    assert "# TYPE workflow_state_duration_seconds histogram" in response.text
+    assert "worker_queue_depth 0" in response.text
+
+def test_get_trace(client, mock_redis):
+    from src.utils.tracing import get_tracer
+    trace_id = "e" * 32
+    mock_redis.set("job_trace", json.dumps({"job_id": "job_trace", "state": "BUILDING", "trace_id": trace_id}))
+    with get_tracer().span("workflow", {"job.id": "job_trace"}, trace_id=trace_id):
+        with get_tracer().span("state BUILDING"):
+            pass
+
+    response = client.get("/jobs/job_trace/trace", headers={"X-API-Key": "test-key"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["trace_id"] == trace_id
+    assert body["spans"][0]["name"] == "workflow"
+    assert body["spans"][0]["children"][0]["name"] == "state BUILDING"
+
+    assert client.get("/jobs/missing/trace", headers={"X-API-Key": "test-key"}).status_code == 404
+
+def test_get_job_usage(client, mock_redis):
+    from src.utils.usage import UsageRecord, usage_scope, set_usage_state, record_usage
+    mock_redis.set("job_usage", json.dumps({"job_id": "job_usage", "state": "BUILDING"}))
+    with patch('src.mcp_server.main.redis_client', mock_redis), usage_scope("job_usage"):
+        set_usage_state("BUILDING")
+        record_usage(UsageRecord(agent="BuilderAgent", model="llama3", llm_calls=2, prompt_tokens=30, attempts=1))
+
+    response = client.get("/jobs/job_usage/usage", headers={"X-API-Key": "test-key"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["by_state"]["BUILDING"]["prompt_tokens"] == 30
+    assert body["by_agent"][0]["agent"] == "BuilderAgent"
+
+    rollup = client.get("/usage", headers={"X-API-Key": "test-key"}).json()
+    assert rollup["total"]["llm_calls"] >= 2
+    assert client.get("/jobs/missing/usage", headers={"X-API-Key": "test-key"}).status_code == 404
+
 def test_error_handling(client, mock_redis):
     # Simulate a server error
     mock_redis.get.side_effect = Exception("Redis error")
@@ -217,4 +261,24 @@ def test_sensitive_data_logging(client, mock_redis, caplog):
         )
         
         # Verify sensitive data is not logged
-        assert not any("test-key" in record.message for record in caplog.records)
\ No newline at end of file
+        assert not any("test-key" in record.message for record in caplog.records)
+@pytest.mark.asyncio
+async def test_monitoring_calls_run_off_the_event_loop(mock_redis):
+    import threading
+    loop_thread = threading.current_thread()
+    calls = []
+
+    class FakeMonitor:
+        def _run(self, tool_input):
+            calls.append((json.loads(tool_input)["action"], threading.current_thread() is loop_thread))
+            return json.dumps({"application_id": "monitor_job", "overall_health": "healthy"})
+
+    mock_redis.set("monitor_job", json.dumps({"job_id": "monitor_job", "state": "MONITORING", "context": {}}))
+    with patch('src.mcp_server.main.ALL_TOOLS', {"runtime_monitor": FakeMonitor()}), \
+         patch('src.mcp_server.main.settings.MONITOR_OBSERVATION_SECONDS', 0), \
+         patch('src.mcp_server.main.run_structured_agent', return_value={}):
+        from src.mcp_server.main import workflow_manager
+        await workflow_manager("monitor_job")
+
+    assert calls == [("start", False), ("report", False), ("stop", False)]
+    assert json.loads(mock_redis.get("monitor_job"))["state"] == "COMPLETED"
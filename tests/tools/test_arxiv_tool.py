@@ -0,0 +1,76 @@
+import pytest
+import json
+import asyncio
+from unittest.mock import MagicMock
+from src.tools.arxiv_tool import ArxivTool, ArxivApiBackend, LocalArxivIndex, normalize_query
+
+PAPERS = [
+    {"id": "1706.03762", "title": "Attention Is All You Need",
+     "authors": "Ashish Vaswani, Noam Shazeer and Niki Parmar",
+     "abstract": "The dominant sequence transduction models are based on recurrent networks. We propose the Transformer."},
+    {"id": "1512.03385", "title": "Deep Residual Learning for Image Recognition",
+     "authors": "Kaiming He, Xiangyu Zhang",
+     "abstract": "Deeper neural networks are more difficult to train. We present a residual learning framework."},
+]
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = tmp_path / "arxiv-metadata.jsonl"
+    path.write_text("\n".join(json.dumps(p) for p in PAPERS) + "\n")
+    return path
+
+@pytest.fixture
+def tool():
+    yield ArxivTool()
+    ArxivTool._backend = None
+    ArxivTool._cache = None
+
+def test_normalize_query():
+    assert normalize_query("  Graph   Neural\tNetworks ") == "graph neural networks"
+
+def test_local_index_ranks_matching_papers(snapshot):
+    index = LocalArxivIndex(str(snapshot))
+    results = index.search("transformer attention", 5)
+    assert results[0]["title"] == "Attention Is All You Need"
+    assert results[0]["authors"] == ["Ashish Vaswani", "Noam Shazeer", "Niki Parmar"]
+    assert results[0]["pdf_url"] == "https://arxiv.org/pdf/1706.03762"
+
+def test_local_index_reloads_replaced_snapshot(snapshot):
+    index = LocalArxivIndex(str(snapshot))
+    assert index.search("diffusion", 5) == []
+    extra = {"id": "2006.11239", "title": "Denoising Diffusion Probabilistic Models", "authors": "Jonathan Ho", "abstract": "Diffusion models."}
+    snapshot.write_text(snapshot.read_text() + json.dumps(extra) + "\n")
+    import os
+    os.utime(snapshot, (1, 1))
+    assert index.search("diffusion", 5)[0]["title"] == "Denoising Diffusion Probabilistic Models"
+
+def test_tool_formats_results_and_caches_normalized_queries(tool, snapshot):
+    backend = LocalArxivIndex(str(snapshot))
+    backend.search = MagicMock(wraps=backend.search)
+    ArxivTool.configure(backend=backend, cache_ttl=60)
+
+    first = tool._run("Residual Learning")
+    assert "Title: Deep Residual Learning for Image Recognition" in first
+    assert "URL: https://arxiv.org/pdf/1512.03385" in first
+
+    assert tool._run("  residual   learning ") == first
+    backend.search.assert_called_once()
+
+def test_tool_does_not_cache_errors(tool):
+    backend = MagicMock()
+    backend.name = "api"
+    backend.search.side_effect = [Exception("timeout"), []]
+    ArxivTool.configure(backend=backend, cache_ttl=60)
+
+    assert "Error searching arxiv: timeout" in tool._run("query")
+    assert tool._run("query") == "No papers found matching the query."
+
+def test_async_path_uses_cache(tool, snapshot):
+    backend = LocalArxivIndex(str(snapshot))
+    ArxivTool.configure(backend=backend, cache_ttl=60)
+    first = asyncio.run(tool._arun("transformer"))
+    backend.search = MagicMock(side_effect=AssertionError("should be cached"))
+    assert asyncio.run(tool._arun("Transformer")) == first
+
+def test_api_backend_shares_one_client():
+    assert ArxivApiBackend.client() is ArxivApiBackend.client()
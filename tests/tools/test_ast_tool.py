@@ -0,0 +1,110 @@
+import pytest
+import os
+import json
+from src.tools import ast_tool as ast_tool_module
+from src.tools.ast_tool import ASTAnalysisTool, get_project_graph
+
+@pytest.fixture
+def tool():
+    return ASTAnalysisTool()
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    # Tool paths are resolved against ./workspace
+    monkeypatch.chdir(tmp_path)
+    root = tmp_path / "workspace" / "proj"
+    pkg = root / "pkg"
+    pkg.mkdir(parents=True)
+    (pkg / "__init__.py").write_text("")
+    (pkg / "core.py").write_text(
+        "import os\n"
+        "def helper():\n"
+        "    return os.getcwd()\n"
+    )
+    (pkg / "service.py").write_text(
+        "from .core import helper\n"
+        "class Service:\n"
+        "    def run(self):\n"
+        "        return helper()\n"
+    )
+    (root / "app.py").write_text(
+        "import pkg.service\n"
+        "from pkg import core\n"
+        "def main():\n"
+        "    core.helper()\n"
+        "    return pkg.service.Service()\n"
+    )
+    (root / "standalone.py").write_text("import json\n")
+    return root
+
+def test_find_imports_includes_all_names_and_from_imports(tool):
+    code = "import os, sys\nfrom collections import OrderedDict\nfrom . import sibling\n"
+    result = json.loads(tool._run(json.dumps({"action": "find_imports", "code": code})))
+    assert result == ["os", "sys", "collections", "."]
+
+def test_import_graph_and_dependents(project):
+    graph = get_project_graph(str(project))
+    assert graph.imports["pkg.service"] == {"pkg.core"}
+    assert graph.imports["app"] == {"pkg.service", "pkg.core"}
+    assert graph.external_imports["pkg.core"] == {"os"}
+    assert graph.dependents("pkg.core") == ["app", "pkg.service"]
+    assert graph.dependents("pkg/core.py") == ["app", "pkg.service"]
+
+def test_affected_files_is_transitive(project):
+    graph = get_project_graph(str(project))
+    assert graph.affected_files("pkg/core.py") == [
+        "app.py", os.path.join("pkg", "core.py"), os.path.join("pkg", "service.py")
+    ]
+    assert graph.affected_files("standalone.py") == ["standalone.py"]
+
+def test_call_graph_resolves_project_functions(project):
+    graph = get_project_graph(str(project))
+    assert "pkg.core:helper" in graph.calls["pkg.service:Service.run"]
+    assert "pkg.core:helper" in graph.calls["app:main"]
+    assert graph.callers_of("pkg.core:helper") == ["app:main", "pkg.service:Service.run"]
+
+def test_graph_is_cached_and_incrementally_rebuilt(project):
+    first = get_project_graph(str(project))
+    assert get_project_graph(str(project)) is first
+
+    (project / "pkg" / "extra.py").write_text("from pkg.core import helper\n")
+    second = get_project_graph(str(project))
+    assert second is not first
+    assert "pkg.extra" in second.dependents("pkg.core")
+    # Unchanged files reuse the parse results of the previous build
+    assert second.parsed["app.py"] is first.parsed["app.py"]
+
+def test_parallel_parse_matches_serial(project, monkeypatch):
+    serial = get_project_graph(str(project))
+    ast_tool_module._graph_cache.clear()
+    monkeypatch.setattr(ast_tool_module, "PARALLEL_PARSE_THRESHOLD", 1)
+    parallel = get_project_graph(str(project), max_workers=2)
+    assert parallel.imports == serial.imports
+    assert parallel.calls == serial.calls
+
+def test_parse_errors_are_reported(project):
+    (project / "broken.py").write_text("def oops(:\n")
+    graph = get_project_graph(str(project))
+    assert "broken.py" in graph.summary()["parse_errors"]
+
+def test_project_actions_through_tool(tool, project):
+    result = json.loads(tool._run(json.dumps({"action": "affected_files", "path": "proj", "target": "pkg.service"})))
+    assert result == ["app.py", os.path.join("pkg", "service.py")]
+
+    summary = json.loads(tool._run(json.dumps({"action": "project_summary", "path": "proj"})))
+    assert summary["modules"] == 5
+
+def test_project_action_rejects_paths_outside_workspace(tool, project):
+    result = tool._run(json.dumps({"action": "import_graph", "path": "../.."}))
+    assert "outside the allowed workspace" in result
+
+    # A sibling directory sharing the workspace's name as a prefix is outside it too
+    sibling = project.parent.parent / "workspace2"
+    sibling.mkdir()
+    (sibling / "secret.py").write_text("import os\n")
+    result = tool._run(json.dumps({"action": "import_graph", "path": "../workspace2"}))
+    assert "outside the allowed workspace" in result
+
+def test_project_action_requires_target(tool, project):
+    result = tool._run(json.dumps({"action": "dependents", "path": "proj"}))
+    assert "'target' is required" in result
@@ -0,0 +1,95 @@
+import pytest
+import os
+import json
+import numpy as np
+from src.tools.domain_expert_tool import DomainExpertTool, DomainKnowledgeBase, DEFAULT_KNOWLEDGE_DIR
+from src.utils.text_index import BM25Index
+
+@pytest.fixture
+def knowledge_dir(tmp_path):
+    directory = tmp_path / "knowledge"
+    directory.mkdir()
+    (directory / "payments.md").write_text("# Payment Security\nUse PCI DSS compliant tokenization for card data.")
+    (directory / "caching.md").write_text("# Caching\nPut a CDN and Redis cache in front of product catalog reads.")
+    return directory
+
+def test_bm25_ranks_matching_document_first():
+    index = BM25Index()
+    index.add_many(["redis cache layer", "payment card tokenization", "cache invalidation with redis and cdn"])
+    ranked = index.search("redis cache", top_k=2)
+    assert [doc_id for doc_id, _ in ranked] == [0, 2]
+    assert ranked[0][1] >= ranked[1][1]
+    assert index.search("unrelated words", top_k=2) == []
+
+def test_saved_bm25_index_loads_with_identical_ranking(tmp_path):
+    index = BM25Index()
+    index.add_many(["redis cache layer", "payment card tokenization", "cache invalidation with redis and cdn"])
+    index.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    assert len(loaded) == 3
+    assert loaded.search("redis cache", top_k=3) == index.search("redis cache", top_k=3)
+    assert loaded.search("unrelated words") == []
+    with pytest.raises(ValueError):
+        loaded.add("more text")
+
+def test_search_returns_best_entry(knowledge_dir):
+    kb = DomainKnowledgeBase(str(knowledge_dir))
+    results = kb.search("how do I secure card payments")
+    assert results[0]["title"] == "Payment Security"
+    assert results[0]["score"] > 0
+
+def test_jsonl_entries_are_indexed(knowledge_dir):
+    with open(knowledge_dir / "bulk.jsonl", "w") as f:
+        f.write(json.dumps({"title": "Sharding", "content": "Shard the orders table by customer id."}) + "\n")
+    kb = DomainKnowledgeBase(str(knowledge_dir))
+    assert kb.search("sharding orders")[0]["title"] == "Sharding"
+
+def test_changed_files_are_reloaded(knowledge_dir):
+    kb = DomainKnowledgeBase(str(knowledge_dir), reload_interval=0)
+    assert kb.search("kubernetes") == []
+    (knowledge_dir / "deploy.md").write_text("# Deployment\nRoll out models on Kubernetes with canaries.")
+    assert kb.search("kubernetes")[0]["title"] == "Deployment"
+
+def test_prebuilt_index_is_reused(knowledge_dir, monkeypatch):
+    kb = DomainKnowledgeBase(str(knowledge_dir))
+    kb.refresh(force=True)
+    assert os.path.isfile(os.path.join(kb._cache_path(kb._scan()), "index.json"))
+    # Kept out of the knowledge directory, which may be shared or read-only
+    assert sorted(os.listdir(knowledge_dir)) == ["caching.md", "payments.md"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("documents should not be re-read")
+    monkeypatch.setattr(DomainKnowledgeBase, "_read_entries", fail)
+    kb = DomainKnowledgeBase(str(knowledge_dir))
+    assert kb.search("redis cache")[0]["title"] == "Caching"
+
+@pytest.mark.parametrize("filename, payload", [
+    ("index.json", b"not json"),
+    ("entries.json", b"[]"),
+    ("doc_ids.npy", b"truncated"),
+    ("weights.npy", None),
+])
+def test_unusable_index_cache_is_rebuilt_without_unpickling(knowledge_dir, filename, payload, tmp_path):
+    DomainKnowledgeBase(str(knowledge_dir)).refresh(force=True)
+    kb = DomainKnowledgeBase(str(knowledge_dir))
+    cache_path = kb._cache_path(kb._scan())
+    marker = tmp_path / "unpickled"
+    if payload is None:
+        # An object array whose pickle would create the marker file if it were ever loaded
+        class Exploit:
+            def __reduce__(self):
+                return (open, (str(marker), "w"))
+        np.save(os.path.join(cache_path, filename), np.array([Exploit()], dtype=object), allow_pickle=True)
+    else:
+        with open(os.path.join(cache_path, filename), "wb") as f:
+            f.write(payload)
+
+    assert kb.search("redis cache")[0]["title"] == "Caching"
+    assert not marker.exists()
+    assert BM25Index.load(cache_path).search("redis cache")
+def test_tool_answers_from_default_knowledge(monkeypatch, tmp_path):
+    monkeypatch.setattr("src.tools.domain_expert_tool.get_knowledge_base",
+                        lambda: DomainKnowledgeBase(DEFAULT_KNOWLEDGE_DIR))
+    tool = DomainExpertTool()
+    assert "PCI DSS" in tool._run("fintech security compliance")
+    assert tool._run("zzzz qqqq") == "No specific domain knowledge found for this query. Try a more general search."
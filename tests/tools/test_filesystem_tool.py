@@ -95,4 +95,93 @@ def test_missing_args(filesystem_tool):
 @pytest.mark.asyncio
 async def test_async_not_implemented(filesystem_tool):
     with pytest.raises(NotImplementedError):
-        await filesystem_tool._arun("test")
\ No newline at end of file
+        await filesystem_tool._arun("test")
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    # The tool resolves paths against ./workspace
+    monkeypatch.chdir(tmp_path)
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    (workspace / "lines.txt").write_text("".join(f"line {i}\n" for i in range(1, 11)))
+    return workspace
+
+def test_read_line_range(filesystem_tool, workspace):
+    result = filesystem_tool._run(json.dumps({
+        "action": "read",
+        "args": {"file_path": "lines.txt", "start_line": 3, "end_line": 4}
+    }))
+    assert result == "line 3\nline 4\n"
+
+def test_read_byte_range(filesystem_tool, workspace):
+    result = filesystem_tool._run(json.dumps({
+        "action": "read",
+        "args": {"file_path": "lines.txt", "offset": 7, "length": 6}
+    }))
+    assert result == "line 2"
+
+def test_read_truncates_large_output(filesystem_tool, workspace):
+    (workspace / "big.txt").write_text("x" * 500)
+    result = filesystem_tool._run(json.dumps({
+        "action": "read",
+        "args": {"file_path": "big.txt", "max_bytes": 100}
+    }))
+    assert result.startswith("x" * 100 + "\n...[truncated")
+    assert "500 byte file" in result
+
+def test_mmap_ranges_match_buffered_reads(filesystem_tool, workspace, monkeypatch):
+    args = [
+        {"file_path": "lines.txt", "start_line": 9},
+        {"file_path": "lines.txt", "start_line": 2, "end_line": 3},
+        {"file_path": "lines.txt", "offset": 14, "length": 7},
+    ]
+    buffered = [filesystem_tool._run(json.dumps({"action": "read", "args": dict(a)})) for a in args]
+    monkeypatch.setattr(FileSystemTool, "MMAP_THRESHOLD", 1)
+    mapped = [filesystem_tool._run(json.dumps({"action": "read", "args": dict(a)})) for a in args]
+    assert mapped == buffered
+    assert mapped[0] == "line 9\nline 10\n"
+
+def test_line_ranges_split_on_newline_only(filesystem_tool, workspace, monkeypatch):
+    (workspace / "crlf.txt").write_bytes(b"a\r\nb\rc\x0cd\ne\n")
+    args = {"file_path": "crlf.txt", "start_line": 2, "end_line": 2}
+    buffered = filesystem_tool._run(json.dumps({"action": "read", "args": dict(args)}))
+    monkeypatch.setattr(FileSystemTool, "MMAP_THRESHOLD", 1)
+    mapped = filesystem_tool._run(json.dumps({"action": "read", "args": dict(args)}))
+    assert buffered == mapped == "b\rc\x0cd\n"
+
+def test_read_many_and_write_many(filesystem_tool, workspace):
+    written = json.loads(filesystem_tool._run(json.dumps({
+        "action": "write_many",
+        "args": {"files": [
+            {"file_path": "a/one.txt", "content": "one"},
+            {"file_path": "b/two.txt", "content": "two"},
+            {"file_path": "../escape.txt", "content": "nope"}
+        ]}
+    })))
+    assert written["a/one.txt"] == "ok"
+    assert written["b/two.txt"] == "ok"
+    assert "outside the allowed workspace" in written["../escape.txt"]
+
+    read = json.loads(filesystem_tool._run(json.dumps({
+        "action": "read_many",
+        "args": {"file_paths": ["a/one.txt", "b/two.txt", "missing.txt"]}
+    })))
+    assert read["a/one.txt"] == "one"
+    assert read["b/two.txt"] == "two"
+    assert read["missing.txt"].startswith("Error:")
+
+def test_tree_respects_depth_and_pagination(filesystem_tool, workspace):
+    (workspace / "pkg" / "sub").mkdir(parents=True)
+    (workspace / "pkg" / "mod.py").write_text("")
+    (workspace / "pkg" / "sub" / "deep.py").write_text("")
+
+    shallow = json.loads(filesystem_tool._run(json.dumps({"action": "tree", "args": {"max_depth": 1}})))
+    assert shallow["entries"] == ["lines.txt", "pkg/"]
+    assert shallow["next_offset"] is None
+
+    first = json.loads(filesystem_tool._run(json.dumps({"action": "tree", "args": {"path": ".", "limit": 2}})))
+    assert first["entries"] == ["lines.txt", "pkg/"]
+    assert first["next_offset"] == 2
+
+    rest = json.loads(filesystem_tool._run(json.dumps({"action": "tree", "args": {"path": ".", "offset": 2}})))
+    assert rest["entries"] == ["pkg/mod.py", "pkg/sub/", os.path.join("pkg", "sub", "deep.py")]
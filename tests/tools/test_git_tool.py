@@ -0,0 +1,132 @@
+import pytest
+import os
+import json
+import git
+from src.tools.git_mirror import GitMirrorCache, normalize_url, validate_url
+from src.tools.tools import CustomGitTool
+
+def _commit(repo, filename, content, message):
+    with open(os.path.join(repo.working_dir, filename), "w") as f:
+        f.write(content)
+    repo.index.add([filename])
+    return repo.index.commit(message).hexsha
+
+@pytest.fixture
+def upstream(tmp_path):
+    """A local bare repository with two commits on main."""
+    work = git.Repo.init(tmp_path / "work", initial_branch="main")
+    first = _commit(work, "README.md", "v1\n", "first")
+    second = _commit(work, "README.md", "v2\n", "second")
+    bare_path = str(tmp_path / "upstream.git")
+    work.clone(bare_path, bare=True)
+    return {"url": bare_path, "work": work, "first": first, "second": second}
+
+@pytest.fixture
+def cache(tmp_path):
+    return GitMirrorCache(str(tmp_path / "mirrors"), allow_local_paths=True)
+
+def test_normalize_url():
+    assert normalize_url("https://GitHub.com/Owner/Repo.git/") == "github.com/owner/repo"
+    assert normalize_url("git@github.com:owner/repo.git") == "github.com/owner/repo"
+
+def test_validate_url_only_allows_remote_transports(upstream):
+    for url in ("https://github.com/owner/repo.git", "ssh://git@github.com/owner/repo", "git://host/repo",
+                "git@github.com:owner/repo.git"):
+        assert validate_url(url) == url
+    for url in ("--upload-pack=touch /tmp/x", "-u", "ext::sh -c touch% /tmp/x", "file:///etc",
+                "fd::17", "http://host/repo", upstream["url"], ""):
+        with pytest.raises(ValueError):
+            validate_url(url)
+    assert validate_url(upstream["url"], allow_local_paths=True) == upstream["url"]
+
+def test_clone_rejects_unsafe_url_and_ref(tmp_path, upstream):
+    cache = GitMirrorCache(str(tmp_path / "mirrors"))
+    with pytest.raises(ValueError):
+        cache.clone("--upload-pack=touch x", str(tmp_path / "job"))
+    with pytest.raises(ValueError):
+        cache.clone(upstream["url"], str(tmp_path / "job"))
+    with pytest.raises(ValueError):
+        GitMirrorCache(str(tmp_path / "mirrors"), allow_local_paths=True).clone(
+            upstream["url"], str(tmp_path / "job"), ref="--orphan=x")
+    assert [d for d in os.listdir(tmp_path / "mirrors") if d.endswith(".git")] == []
+
+def test_clone_uses_single_mirror(cache, upstream, tmp_path):
+    head = cache.clone(upstream["url"], str(tmp_path / "job1"))
+    assert head == upstream["second"]
+    cache.clone(upstream["url"], str(tmp_path / "job2"))
+
+    mirrors = [d for d in os.listdir(cache.cache_dir) if d.endswith(".git")]
+    assert len(mirrors) == 1
+    clone = git.Repo(tmp_path / "job2")
+    assert clone.remotes.origin.url == upstream["url"]
+
+def test_shallow_clone_and_ref(cache, upstream, tmp_path):
+    cache.clone(upstream["url"], str(tmp_path / "shallow"), depth=1)
+    shallow = git.Repo(tmp_path / "shallow")
+    assert len(list(shallow.iter_commits())) == 1
+
+    head = cache.clone(upstream["url"], str(tmp_path / "old"), ref=upstream["first"])
+    assert head == upstream["first"]
+
+def test_worktree_clone(cache, upstream, tmp_path):
+    head = cache.clone(upstream["url"], str(tmp_path / "wt"), worktree=True)
+    assert head == upstream["second"]
+    assert (tmp_path / "wt" / "README.md").read_text() == "v2\n"
+
+def test_fetch_only_pulls_new_commits_through_mirror(cache, upstream, tmp_path):
+    cache.clone(upstream["url"], str(tmp_path / "job"))
+    third = _commit(upstream["work"], "README.md", "v3\n", "third")
+    upstream["work"].git.push(upstream["url"], "main")
+
+    cache.fetch(str(tmp_path / "job"))
+    assert cache.checkout(str(tmp_path / "job"), "origin/main") == third
+
+    # The mirror itself now has the new commit too
+    assert git.Repo(cache.mirror_path(upstream["url"])).commit("main").hexsha == third
+
+def test_fetch_keeps_shallow_boundary(cache, upstream, tmp_path):
+    cache.clone(upstream["url"], str(tmp_path / "shallow"), depth=1)
+    for n in (3, 4):
+        _commit(upstream["work"], "README.md", f"v{n}\n", f"commit {n}")
+    upstream["work"].git.push(upstream["url"], "main")
+
+    cache.fetch(str(tmp_path / "shallow"))
+    shallow = git.Repo(tmp_path / "shallow")
+    # Both new commits arrive and the original shallow commit is still there
+    assert len(list(shallow.iter_commits("origin/main"))) == 3
+
+def test_fresh_mirror_is_not_refetched(cache, upstream, tmp_path, monkeypatch):
+    cache.ensure_mirror(upstream["url"])
+    calls = []
+    monkeypatch.setattr(git.Git, "remote", lambda self, *args: calls.append(args), raising=False)
+    cache.ensure_mirror(upstream["url"])
+    assert calls == []
+    cache.ensure_mirror(upstream["url"], force_fetch=True)
+    assert calls == [("update", "--prune")]
+
+def test_git_tool_clone_action(upstream, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(CustomGitTool, "mirror_cache", GitMirrorCache(str(tmp_path / "mirrors"), allow_local_paths=True))
+    tool = CustomGitTool()
+
+    result = json.loads(tool._run(json.dumps({"action": "clone", "args": {"url": upstream["url"], "dest": "repo"}})))
+    assert result["status"] == "success"
+    assert result["head"] == upstream["second"]
+    assert (tmp_path / "workspace" / "repo" / "README.md").read_text() == "v2\n"
+
+    outside = tool._run(json.dumps({"action": "clone", "args": {"url": upstream["url"], "dest": "../x"}}))
+    assert "outside the allowed workspace" in outside
+
+def test_git_tool_default_clone_dest_stays_in_workspace(upstream, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(CustomGitTool, "mirror_cache", GitMirrorCache(str(tmp_path / "mirrors"), allow_local_paths=True))
+    tool = CustomGitTool()
+
+    for url in (f"{upstream['url']}/..", f"{upstream['url']}/.", f"{upstream['url']}/./"):
+        result = tool._run(json.dumps({"action": "clone", "args": {"url": url}}))
+        assert "Cannot derive a destination inside the workspace" in result
+    assert not (tmp_path / "workspace").exists() or os.listdir(tmp_path / "workspace") == []
+
+    result = json.loads(tool._run(json.dumps({"action": "clone", "args": {"url": upstream["url"]}})))
+    assert result["path"] == str(tmp_path / "workspace" / "upstream")
+    assert (tmp_path / "workspace" / "upstream" / "README.md").read_text() == "v2\n"
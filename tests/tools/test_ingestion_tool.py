@@ -0,0 +1,196 @@
+import pytest
+import os
+import io
+import json
+import tarfile
+import zipfile
+import time
+from src.tools.ingestion_tool import IngestionTool, BlobStore, clone_file, BLOB_DIR
+from src.tools.workspace_cache import workspace_cache_dir
+
+@pytest.fixture
+def tool():
+    return IngestionTool()
+
+@pytest.fixture
+def workspace(tmp_path):
+    return str(tmp_path / "workspace")
+
+@pytest.fixture
+def source_dir(tmp_path):
+    source = tmp_path / "inputs"
+    (source / "nested").mkdir(parents=True)
+    (source / "spec.txt").write_text("requirements")
+    (source / "nested" / "data.csv").write_text("a,b\n1,2\n")
+    return source
+
+def _blobs(workspace):
+    root = workspace_cache_dir(workspace, BLOB_DIR)
+    return sorted(
+        name for _, _, files in os.walk(root) for name in files if not name.startswith(".tmp-")
+    )
+
+def test_run_copies_single_file(tool, source_dir, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = str(source_dir / "spec.txt")
+    result = tool._run(json.dumps({"source_path": source, "destination_filename": "spec.txt"}))
+    assert result.startswith("Successfully copied")
+    assert (tmp_path / "workspace" / "spec.txt").read_text() == "requirements"
+
+def test_run_validation_errors(tool, source_dir, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert "are required" in tool._run(json.dumps({"source_path": "/x"}))
+    assert "must be an absolute path" in tool._run(json.dumps({"source_path": "rel.txt", "destination_filename": "a"}))
+    assert "not found" in tool._run(json.dumps({"source_path": "/does/not/exist", "destination_filename": "a"}))
+    outside = tool._run(json.dumps({"source_path": str(source_dir / "spec.txt"), "destination_filename": "../x"}))
+    assert "outside the allowed workspace" in outside
+
+def test_ingest_many_deduplicates_identical_content(tool, workspace, source_dir, tmp_path):
+    copy = tmp_path / "copy_of_spec.txt"
+    copy.write_text("requirements")
+    results = tool.ingest_many([
+        {"source_path": str(source_dir / "spec.txt"), "destination_filename": "job1/spec.txt"},
+        {"source_path": str(copy), "destination_filename": "job2/spec.txt"},
+    ], workspace_root=workspace)
+
+    assert all(r["result"].startswith("Successfully copied") for r in results)
+    assert [r["destination"] for r in results] == ["job1/spec.txt", "job2/spec.txt"]
+    assert len(_blobs(workspace)) == 1
+    with open(os.path.join(workspace, "job2", "spec.txt")) as f:
+        assert f.read() == "requirements"
+
+def test_ingested_copies_are_independent_of_blobs(tool, workspace, source_dir):
+    tool.ingest_many([{"source_path": str(source_dir / "spec.txt"), "destination_filename": "spec.txt"}],
+                     workspace_root=workspace)
+    with open(os.path.join(workspace, "spec.txt"), "w") as f:
+        f.write("edited by an agent")
+
+    tool.ingest_many([{"source_path": str(source_dir / "spec.txt"), "destination_filename": "again.txt"}],
+                     workspace_root=workspace)
+    with open(os.path.join(workspace, "again.txt")) as f:
+        assert f.read() == "requirements"
+
+def test_ingest_directory(tool, workspace, source_dir):
+    [result] = tool.ingest_many([{"source_path": str(source_dir), "destination_filename": "inputs"}],
+                                workspace_root=workspace, max_workers=2)
+    assert "ingested 2 file(s)" in result["result"]
+    with open(os.path.join(workspace, "inputs", "nested", "data.csv")) as f:
+        assert f.read() == "a,b\n1,2\n"
+
+def test_extract_tar_and_zip_archives(tool, workspace, tmp_path):
+    tar_path = tmp_path / "bundle.tar.gz"
+    with tarfile.open(tar_path, "w:gz") as tar:
+        for name, data in [("src/main.py", b"print('hi')\n"), ("../evil.txt", b"nope")]:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+    zip_path = tmp_path / "bundle.zip"
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.writestr("docs/readme.md", "# Readme\n")
+
+    results = tool.ingest_many([
+        {"source_path": str(tar_path), "destination_filename": "from_tar", "extract": True},
+        {"source_path": str(zip_path), "destination_filename": "from_zip", "extract": True},
+    ], workspace_root=workspace)
+
+    assert "ingested 1 file(s)" in results[0]["result"]
+    assert "ingested 1 file(s)" in results[1]["result"]
+    with open(os.path.join(workspace, "from_tar", "src", "main.py")) as f:
+        assert f.read() == "print('hi')\n"
+    assert not os.path.exists(os.path.join(workspace, "evil.txt"))
+    with open(os.path.join(workspace, "from_zip", "docs", "readme.md")) as f:
+        assert f.read() == "# Readme\n"
+
+def test_clone_file_hardlink_is_opt_in(tmp_path):
+    source = tmp_path / "source.bin"
+    source.write_bytes(b"x" * 4096)
+
+    assert clone_file(str(source), str(tmp_path / "copy.bin")) != "hardlink"
+    assert os.stat(tmp_path / "copy.bin").st_ino != os.stat(source).st_ino
+
+    assert clone_file(str(source), str(tmp_path / "link.bin"), allow_hardlink=True) == "hardlink"
+    assert os.stat(tmp_path / "link.bin").st_ino == os.stat(source).st_ino
+
+def test_digest_is_memoized(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path / "blobs"))
+    source = tmp_path / "input.txt"
+    source.write_text("content")
+    digest = store.digest_file(str(source))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file should not be re-hashed")
+    monkeypatch.setattr("src.tools.ingestion_tool.hashlib.sha256", fail)
+    assert store.digest_file(str(source)) == digest
+
+def test_blob_store_lives_outside_workspace(tool, workspace, source_dir):
+    tool.ingest_many([{"source_path": str(source_dir), "destination_filename": "inputs"}], workspace_root=workspace)
+    assert sorted(os.listdir(workspace)) == ["inputs"]
+    assert len(_blobs(workspace)) == 2
+
+def test_put_file_hashes_while_copying(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path / "blobs"))
+    source = tmp_path / "input.txt"
+    source.write_text("content")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file should be hashed while it is copied")
+    monkeypatch.setattr(BlobStore, "digest_file", fail)
+    digest = store.put_file(str(source))
+    with open(store.blob_path(digest)) as f:
+        assert f.read() == "content"
+
+def test_prune_drops_expired_then_least_recently_used_blobs(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    digests = []
+    for i, age in enumerate([30 * 86400, 3 * 3600, 2 * 3600, 60]):
+        source = tmp_path / f"input{i}.txt"
+        source.write_text("x" * 100 + str(i))
+        digests.append(store.put_file(str(source)))
+        used = time.time() - age
+        os.utime(store.blob_path(digests[-1]), (used, used))
+
+    assert store.prune(max_bytes=250, max_age_seconds=7 * 86400) == 2
+    remaining = [os.path.exists(store.blob_path(d)) for d in digests]
+    # The expired one, then the oldest until the store fits; the recently used one is in its grace period
+    assert remaining == [False, False, True, True]
+
+def test_prune_runs_at_most_once_per_interval_unless_the_store_grew(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path / "blobs"))
+    walks = []
+    monkeypatch.setattr(BlobStore, "prune", lambda self, *args: walks.append(args) or 0)
+    assert store.prune_if_due(max_bytes=1000, interval=600) == 0
+    assert store.prune_if_due(max_bytes=1000, interval=600) is None
+    # Another store on the same root shares the schedule
+    assert BlobStore(store.root).prune_if_due(max_bytes=1000, interval=600) is None
+
+    source = tmp_path / "big.txt"
+    source.write_text("x" * 150)
+    store.put_file(str(source))
+    assert store.prune_if_due(max_bytes=1000, interval=600) == 0
+    assert len(walks) == 2
+
+def test_archive_expanding_past_the_limits_is_refused(tool, workspace, tmp_path, monkeypatch):
+    zip_path = tmp_path / "bomb.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("a.txt", "0" * 4096)
+        archive.writestr("b.txt", "0" * 4096)
+    tar_path = tmp_path / "many.tar.gz"
+    with tarfile.open(tar_path, "w:gz") as archive:
+        for i in range(5):
+            info = tarfile.TarInfo(f"f{i}.txt")
+            info.size = 1
+            archive.addfile(info, io.BytesIO(b"x"))
+    monkeypatch.setattr(IngestionTool, "ARCHIVE_MAX_BYTES", 6000)
+    monkeypatch.setattr(IngestionTool, "ARCHIVE_MAX_MEMBERS", 3)
+
+    results = tool.ingest_many([
+        {"source_path": str(zip_path), "destination_filename": "from_zip", "extract": True},
+        {"source_path": str(tar_path), "destination_filename": "from_tar", "extract": True},
+    ], workspace_root=workspace)
+
+    assert "expands to more than 6000 bytes" in results[0]["result"]
+    # Nothing of a zip is written once its directory is over the limit
+    assert not os.path.exists(os.path.join(workspace, "from_zip"))
+    assert "has more than 3 members" in results[1]["result"]
+    assert len(os.listdir(os.path.join(workspace, "from_tar"))) == 3
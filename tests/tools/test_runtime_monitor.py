@@ -1,7 +1,8 @@
 import unittest
 import time
 from unittest.mock import patch, MagicMock
-from src.tools.runtime_monitor_tool import RuntimeMonitorTool, ResourceMetrics
+import json
+from src.tools.runtime_monitor_tool import RuntimeMonitorTool, ResourceMetrics, MetricsRingBuffer
 
 class TestRuntimeMonitor(unittest.TestCase):
     def setUp(self):
@@ -111,5 +112,65 @@ class TestRuntimeMonitor(unittest.TestCase):
         self.assertIn('threshold_alerts', report)
         self.assertIn('timestamp', report)
 
+    def test_ring_buffer_keeps_latest_samples_in_order(self):
+        buffer = MetricsRingBuffer(capacity=3)
+        for i in range(5):
+            buffer.append(ResourceMetrics(float(i), 0.0, 0.0, 0, 0, float(i)))
+
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(list(buffer.array()[:, 0]), [2.0, 3.0, 4.0])
+        self.assertEqual(list(buffer.array(start_time=3.0)[:, 0]), [3.0, 4.0])
+
+    def test_summary_percentiles_and_trends(self):
+        now = time.time()
+        test_metrics = [
+            ResourceMetrics(float(i), 50.0 + i, 10.0, 0, 0, now - 100 + i * 60 / 100)
+            for i in range(100)
+        ]
+        with self.monitor._lock:
+            self.monitor._metrics_history = test_metrics
+
+        summary = self.monitor.get_metrics_summary()
+        self.assertAlmostEqual(summary['p50_cpu_percent'], 49.5)
+        self.assertAlmostEqual(summary['p99_cpu_percent'], 98.01)
+        self.assertAlmostEqual(summary['trends_per_minute']['memory_percent'], 100.0, places=3)
+
+    def test_health_report_flags_high_usage_and_memory_growth(self):
+        now = time.time()
+        test_metrics = [
+            ResourceMetrics(95.0, 40.0 + i * 5, 10.0, 0, 0, now - 50 + i * 10)
+            for i in range(6)
+        ]
+        with self.monitor._lock:
+            self.monitor._metrics_history = test_metrics
+
+        report = self.monitor.build_health_report("app", duration_minutes=5)
+        issue_types = {issue['type'] for issue in report['performance_issues']}
+        self.assertEqual(report['overall_health'], 'unhealthy')
+        self.assertIn('high_cpu', issue_types)
+        self.assertIn('memory_growth', issue_types)
+
+    def test_health_report_needs_enough_samples(self):
+        report = self.monitor.build_health_report("app", duration_minutes=5)
+        self.assertEqual(report['status'], 'insufficient_data')
+        self.assertEqual(report['overall_health'], 'unknown')
+
+    def test_run_start_report_stop(self):
+        started = json.loads(self.monitor._run(json.dumps({"action": "start", "application_id": "job-1"})))
+        self.assertEqual(started['status'], 'monitoring_started')
+        try:
+            report = json.loads(self.monitor._run(json.dumps({"application_id": "job-1", "duration_minutes": 1})))
+            self.assertEqual(report['application_id'], 'job-1')
+            self.assertIn(report['overall_health'], ('healthy', 'unhealthy', 'unknown'))
+        finally:
+            stopped = json.loads(self.monitor._run(json.dumps({"action": "stop", "application_id": "job-1"})))
+        self.assertEqual(stopped['status'], 'monitoring_stopped')
+        self.assertIn("not being monitored", self.monitor._run(json.dumps({"action": "stop", "application_id": "job-1"})))
+
+    def test_report_for_unknown_application_does_not_start_monitor(self):
+        result = self.monitor._run(json.dumps({"action": "report", "application_id": "never-started"}))
+        self.assertIn("not being monitored", result)
+        self.assertNotIn("never-started", RuntimeMonitorTool._app_monitors)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,111 @@
+import pytest
+import os
+import json
+from src.tools import search_index
+from src.tools.search_index import TrigramIndex, get_search_index, _required_literals
+from src.tools.tools import FileSystemTool
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    # FileSystemTool resolves paths against ./workspace
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(search_index, "_indexes", {})
+    workspace = tmp_path / "workspace"
+    (workspace / "src").mkdir(parents=True)
+    (workspace / "src" / "app.py").write_text(
+        "import os\n\ndef handle_request(req):\n    return process(req)\n\ndef process(req):\n    return req\n"
+    )
+    (workspace / "README.md").write_text("Call handle_request to start.\n")
+    (workspace / "image.bin").write_bytes(b"\0\1handle_request")
+    return workspace
+
+def test_required_literals():
+    assert _required_literals(r"def \w+_request") == ["def ", "_request"]
+    assert _required_literals(r"(foo|bar)baz") == ["baz"]
+    assert _required_literals(r"[") == []
+
+def test_literal_search_with_context(workspace):
+    result = get_search_index(str(workspace)).search("handle_request", context=1)
+    files = [(m["file"], m["line"]) for m in result["matches"]]
+    assert files == [("README.md", 1), (os.path.join("src", "app.py"), 3)]
+    app_match = result["matches"][1]
+    assert app_match["before"] == [""]
+    assert app_match["after"] == ["    return process(req)"]
+    # Binary files are never indexed
+    assert result["indexed_files"] == 2
+
+def test_line_numbers_match_filesystem_tool_reads(workspace):
+    (workspace / "form_feed.txt").write_bytes(b"page one\x0cstill line one\r\nold\rmac handle_request\nlast\n")
+    result = get_search_index(str(workspace)).search("handle_request", path_prefix="form_feed.txt", context=1)
+    [match] = result["matches"]
+    assert match["line"] == 2
+    assert match["text"] == "old\rmac handle_request"
+    assert match["before"] == ["page one\x0cstill line one"] and match["after"] == ["last"]
+
+    tool = FileSystemTool()
+    read = tool._run(json.dumps({"action": "read", "args": {"file_path": "form_feed.txt", "start_line": 2, "end_line": 2}}))
+    assert "mac handle_request" in read
+
+def test_regex_search_uses_prefilter(workspace):
+    index = get_search_index(str(workspace))
+    result = index.search(r"def \w+\(req\)", regex=True)
+    assert [m["line"] for m in result["matches"]] == [3, 6]
+    assert result["candidate_files"] == 1
+
+def test_case_sensitive_search(workspace):
+    index = get_search_index(str(workspace))
+    assert index.search("CALL")["matches"]
+    assert not index.search("CALL", case_sensitive=True)["matches"]
+
+def test_max_results_truncates(workspace):
+    result = get_search_index(str(workspace)).search("req", max_results=2)
+    assert len(result["matches"]) == 2
+    assert result["truncated"]
+
+def test_index_persists_and_picks_up_external_changes(workspace):
+    index = get_search_index(str(workspace))
+    index.search("anything")
+    assert not index.index_path.startswith(str(workspace) + os.sep)
+    with open(index.index_path) as f:
+        assert json.load(f)["version"] == search_index.INDEX_VERSION
+    assert search_index.INDEX_FILENAME not in os.listdir(workspace)
+
+    (workspace / "src" / "app.py").unlink()
+    (workspace / "notes.txt").write_text("handle_request later\n")
+    reloaded = TrigramIndex(str(workspace))
+    assert os.path.join("src", "app.py") in reloaded.files
+    result = reloaded.search("handle_request")
+    assert sorted({m["file"] for m in result["matches"]}) == ["README.md", "notes.txt"]
+
+def test_filesystem_tool_search_and_incremental_write(workspace):
+    tool = FileSystemTool()
+    first = json.loads(tool._run(json.dumps({"action": "search", "args": {"query": "new_symbol"}})))
+    assert first["matches"] == []
+
+    tool._run(json.dumps({"action": "write", "args": {"file_path": "src/new.py", "content": "new_symbol = 1\n"}}))
+    index = get_search_index(str(workspace))
+    assert os.path.join("src", "new.py") in index.candidates(["new_symbol"])
+
+    result = json.loads(tool._run(json.dumps({
+        "action": "search",
+        "args": {"query": "new_symbol", "path": "src"}
+    })))
+    assert [(m["file"], m["line"]) for m in result["matches"]] == [(os.path.join("src", "new.py"), 1)]
+
+def test_legacy_pickle_in_workspace_is_never_loaded(workspace, tmp_path):
+    marker = tmp_path / "pwned"
+    # A protocol-0 pickle that would create the marker file when unpickled
+    payload = f"cos\nsystem\n(S'touch {marker}'\ntR.".encode()
+    (workspace / search_index.LEGACY_INDEX_FILENAME).write_bytes(payload)
+    TrigramIndex(str(workspace)).search("handle_request")
+    assert not marker.exists()
+    assert not (workspace / search_index.LEGACY_INDEX_FILENAME).exists()
+
+def test_searches_rescan_only_after_interval_or_when_stale(workspace):
+    index = get_search_index(str(workspace))
+    index.search("anything")
+    (workspace / "late.txt").write_text("late_symbol\n")
+    assert index.search("late_symbol")["matches"] == []
+
+    search_index.notify_tree_changed(str(workspace))
+    assert [m["file"] for m in index.search("late_symbol")["matches"]] == ["late.txt"]
@@ -244,4 +244,138 @@ class MathAgent(BaseAgent):
     ) is None
     assert system_modifier.test_new_component(
         os.path.join(system_modifier.agents_dir, "math_agent.py")
-    ) is None
\ No newline at end of file
+    ) is None
+
+def test_validate_plan_checks_everything_before_writing(system_modifier):
+    plan = {
+        "new_tools": {"test_tool": VALID_TOOL_CODE},
+        "new_agents": {"broken_agent.py": INVALID_AGENT_CODE},
+    }
+    with pytest.raises(ValueError, match="Invalid agent code in broken_agent.py"):
+        system_modifier.validate_plan(plan)
+    assert not os.path.exists(os.path.join(system_modifier.tools_dir, "test_tool.py"))
+
+    del plan["new_agents"]
+    assert system_modifier.validate_plan(plan) == {
+        os.path.join(system_modifier.tools_dir, "test_tool.py"): VALID_TOOL_CODE
+    }
+
+def test_new_components_are_imported_in_limited_subprocesses(test_dirs, tmp_path):
+    modifier = SystemModifier(test_dirs["base"], sandbox_timeout=3, sandbox_memory_mb=512)
+    marker = tmp_path / "pid"
+    components = {
+        "ok.py": f"import os\nopen({str(marker)!r}, 'w').write(str(os.getpid()))\n",
+        "spin.py": "while True:\n    pass\n",
+        "hog.py": "data = bytearray(4 * 1024 ** 3)\n",
+        "fails.py": "raise RuntimeError('boom')\n",
+    }
+    paths = []
+    for filename, code in components.items():
+        paths.append(os.path.join(test_dirs["tools"], filename))
+        with open(paths[-1], "w") as f:
+            f.write(code)
+
+    results = modifier.test_new_components(paths)
+
+    ok, spin, hog, fails = (results[path] for path in paths)
+    assert ok is None
+    assert int(marker.read_text()) != os.getpid()
+    assert "timed out" in spin or "limit" in spin
+    assert hog is not None
+    assert fails.endswith("boom")
+
+def test_failed_apply_rolls_back_the_whole_plan(system_modifier, monkeypatch):
+    existing = os.path.join(system_modifier.tools_dir, "test_tool.py")
+    with open(existing, "w") as f:
+        f.write("# original\n")
+    plan = {
+        "new_tools": {"test_tool.py": VALID_TOOL_CODE},
+        "new_agents": {"test_agent.py": VALID_AGENT_CODE},
+    }
+    real_replace = os.replace
+    calls = []
+
+    def failing_replace(src, dst):
+        calls.append(dst)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+    with pytest.raises(RuntimeError, match="disk full"):
+        system_modifier.apply_modifications(plan)
+    monkeypatch.setattr(os, "replace", real_replace)
+
+    with open(existing) as f:
+        assert f.read() == "# original\n"
+    assert not os.path.exists(os.path.join(system_modifier.agents_dir, "test_agent.py"))
+    src_dir = os.path.join(system_modifier.base_path, "src")
+    assert not [name for name in os.listdir(src_dir) if name.startswith(".txn-")]
+    assert not [name for name in os.listdir(system_modifier.tools_dir) if name.endswith(".bak")]
+
+def test_interrupted_apply_is_rolled_back_on_next_start(system_modifier, test_dirs):
+    from src.system_modifier import FileTransaction
+    existing = os.path.join(test_dirs["agents"], "old_agent.py")
+    with open(existing, "w") as f:
+        f.write("# original\n")
+    new_file = os.path.join(test_dirs["tools"], "new_tool.py")
+    transaction = FileTransaction(os.path.join(test_dirs["base"], "src"), {existing: "# new\n", new_file: "# new\n"})
+    # Simulate a crash after the targets were replaced but before the transaction was closed
+    transaction.commit(transaction.stage())
+    with open(existing) as f:
+        assert f.read() == "# new\n"
+    # Dying releases the owner's lock
+    transaction._lock_file.close()
+
+    SystemModifier.recover_interrupted(test_dirs["base"])
+
+    with open(existing) as f:
+        assert f.read() == "# original\n"
+    assert not os.path.exists(new_file)
+
+def test_recovery_leaves_live_transactions_alone(system_modifier, test_dirs):
+    from src.system_modifier import FileTransaction
+    existing = os.path.join(test_dirs["agents"], "old_agent.py")
+    with open(existing, "w") as f:
+        f.write("# original\n")
+    new_file = os.path.join(test_dirs["tools"], "new_tool.py")
+    transaction = FileTransaction(os.path.join(test_dirs["base"], "src"), {existing: "# new\n", new_file: "# new\n"})
+    staged = transaction.stage()
+
+    # Another job, thread or process starts up while this one is mid-apply
+    SystemModifier(test_dirs["base"])
+    assert SystemModifier.recover_interrupted(test_dirs["base"]) == []
+    transaction.commit(staged)
+    assert SystemModifier.recover_interrupted(test_dirs["base"]) == []
+    transaction.close()
+
+    with open(existing) as f:
+        assert f.read() == "# new\n"
+    with open(new_file) as f:
+        assert f.read() == "# new\n"
+    assert not [name for name in os.listdir(os.path.join(test_dirs["base"], "src")) if name.startswith(".txn-")]
+
+def test_recovery_from_another_process_skips_live_transactions(system_modifier, test_dirs):
+    import subprocess
+    import sys
+    from src.system_modifier import FileTransaction
+    target = os.path.join(test_dirs["tools"], "new_tool.py")
+    transaction = FileTransaction(os.path.join(test_dirs["base"], "src"), {target: "# new\n"})
+    staged = transaction.stage()
+
+    script = "import sys; from src.system_modifier import SystemModifier; print(SystemModifier.recover_interrupted(sys.argv[1]))"
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    result = subprocess.run([sys.executable, "-c", script, test_dirs["base"]], cwd=repo_root,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+    transaction.commit(staged)
+    transaction.close()
+    with open(target) as f:
+        assert f.read() == "# new\n"
+
+def test_components_failing_their_import_test_are_not_written(system_modifier):
+    plan = {"new_tools": {"test_tool.py": VALID_TOOL_CODE + "\nraise ImportError('missing dependency')\n"}}
+    with pytest.raises(RuntimeError, match="Failed to import .*/src/tools/test_tool.py"):
+        system_modifier.apply_modifications(plan, test_imports=True)
+    assert os.listdir(system_modifier.tools_dir) == []
@@ -0,0 +1,56 @@
+import time
+import pytest
+from src.utils.budget import (
+    AgentBudget, AgentBudgetExceeded, check_deadline, deadline_scope, remaining_seconds, without_deadline
+)
+from src.utils.resilience import call_with_resilience
+
+PROFILES = {
+    "default": {"max_steps": 10, "max_seconds": 60},
+    "BuilderAgent": {"max_steps": 30, "early_stopping": "generate"},
+}
+
+def test_profiles_overlay_the_default():
+    builder = AgentBudget.for_agent("BuilderAgent", PROFILES)
+    assert (builder.max_steps, builder.max_seconds, builder.early_stopping) == (30, 60, "generate")
+    assert AgentBudget.for_agent("OtherAgent", PROFILES).max_steps == 10
+    assert AgentBudget.for_agent("OtherAgent", {}) == AgentBudget()
+
+def test_invalid_profiles_are_rejected():
+    with pytest.raises(ValueError, match="Unknown budget settings"):
+        AgentBudget.for_agent("BuilderAgent", {"BuilderAgent": {"max_stepz": 3}})
+    with pytest.raises(ValueError, match="Invalid early_stopping policy"):
+        AgentBudget(early_stopping="later")
+
+def test_deadline_scope():
+    assert remaining_seconds() is None
+    check_deadline()
+    with deadline_scope("TestAgent", 0.05):
+        assert 0 < remaining_seconds() <= 0.05
+        check_deadline()
+        time.sleep(0.06)
+        with pytest.raises(AgentBudgetExceeded, match="TestAgent exceeded its time budget"):
+            check_deadline()
+    check_deadline()
+    with deadline_scope("TestAgent", None):
+        assert remaining_seconds() is None
+
+def test_shared_work_runs_without_the_deadline():
+    with deadline_scope("TestAgent", 0.01):
+        time.sleep(0.02)
+        with without_deadline():
+            assert remaining_seconds() is None
+            check_deadline()
+        with pytest.raises(AgentBudgetExceeded):
+            check_deadline()
+
+def test_budget_errors_are_not_retried():
+    calls = []
+
+    def exhausted():
+        calls.append(1)
+        raise AgentBudgetExceeded("TestAgent", "time")
+
+    with pytest.raises(AgentBudgetExceeded):
+        call_with_resilience(exhausted, "test-budget-retry", 3, sleep=lambda s: None)
+    assert calls == [1]
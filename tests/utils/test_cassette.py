@@ -0,0 +1,96 @@
+import json
+import pytest
+from src.utils.cassette import Cassette, CassetteMiss, LatencyModel, get_cassette
+from src.utils.fake_ollama import FakeOllamaServer
+from src.utils.metrics import REGISTRY
+from src.utils.ollama_pool import OllamaHostPool
+from src.utils.pooled_ollama import PooledOllama
+
+def _record(path, prompts):
+    with FakeOllamaServer() as server:
+        pool = OllamaHostPool([server.url])
+        recorder = Cassette(path, "record")
+        for prompt, text in prompts:
+            server.response_text = text
+            PooledOllama(model="llama3", pool=pool, cassette=recorder).invoke(prompt)
+    return recorder
+
+def test_recorded_calls_replay_without_ollama(tmp_path):
+    path = str(tmp_path / "cassettes" / "llm.jsonl")
+    _record(path, [("plan it", "first plan"), ("plan it", "second plan"), ("build it", "built")])
+    lines = [json.loads(line) for line in open(path)]
+    assert [line["text"] for line in lines] == ["first plan", "second plan", "built"]
+    assert lines[0]["generation_info"]["eval_count"] == 2
+
+    # Nothing listens on this pool: every answer must come from the cassette
+    offline = OllamaHostPool(["http://127.0.0.1:9"])
+    llm = PooledOllama(model="llama3", pool=offline, cassette=Cassette(path, "replay", latency="none"))
+    assert [llm.invoke(p) for p in ("plan it", "build it", "plan it", "plan it")] == \
+        ["first plan", "built", "second plan", "second plan"]
+
+def test_unrecorded_prompts(tmp_path):
+    path = str(tmp_path / "llm.jsonl")
+    _record(path, [("job 1: plan", "plan"), ("job 1: build", "build")])
+    sequence = Cassette(path, "replay", latency="none", match="sequence")
+    assert sequence.lookup("llama3", "job 1: plan")["text"] == "plan"
+    assert sequence.lookup("llama3", "job 2: plan")["text"] == "build"
+    assert 'llm_cassette_fallbacks_total{model="llama3:latest"}' in REGISTRY.render()
+    with pytest.raises(CassetteMiss):
+        sequence.lookup("llama3", "job 2: build")
+    with pytest.raises(CassetteMiss):
+        sequence.lookup("codellama", "job 1: plan")
+    exact = Cassette(path, "replay")
+    assert exact.match == "exact"
+    with pytest.raises(CassetteMiss, match="No recording for llama3"):
+        exact.lookup("llama3", "job 2: plan")
+
+def test_hand_written_interactions_match_by_substring(tmp_path):
+    path = tmp_path / "synthetic.jsonl"
+    path.write_text("\n".join(json.dumps(line) for line in [
+        {"model": "llama3", "contains": "You are the Architect Agent", "text": '{"modifications_required": false}'},
+        {"model": "codellama", "contains": "Builder", "text": "Final Answer: built"},
+    ]) + "\n")
+    cassette = Cassette(str(path), "replay")
+    assert cassette.lookup("llama3", "You are the Architect Agent. Job 42")["text"] == '{"modifications_required": false}'
+    assert cassette.lookup("codellama:latest", "You are the Builder")["text"] == "Final Answer: built"
+
+def test_latency_models():
+    assert LatencyModel("recorded").sample(0.4) == 0.4
+    assert LatencyModel("recorded*0.5").sample(0.4) == 0.2
+    assert LatencyModel("none").sample(3) == 0
+    assert LatencyModel("fixed:0.25").sample() == 0.25
+    samples = [LatencyModel("uniform:1:2", seed=3).sample() for _ in range(2)]
+    assert samples[0] == samples[1] and 1 <= samples[0] <= 2
+    lognormal = LatencyModel("lognormal:0.5:0.3", seed=1)
+    assert all(s > 0 for s in (lognormal.sample() for _ in range(50)))
+    for spec in ("fixed", "uniform:1", "gamma:1:2", "fixed:x"):
+        with pytest.raises(ValueError, match="Invalid latency spec"):
+            LatencyModel(spec)
+
+def test_replay_sleeps_the_sampled_latency(tmp_path):
+    path = str(tmp_path / "llm.jsonl")
+    _record(path, [("hi", "hello")])
+    sleeps = []
+    cassette = Cassette(path, "replay", latency="fixed:1.5", sleep=sleeps.append)
+    cassette.replay("llama3", "hi")
+    cassette.replay("llama3", "hi", deadline=0.5)
+    assert sleeps == [1.5, 0.5]
+
+def test_fake_server_serves_a_cassette(tmp_path):
+    path = str(tmp_path / "llm.jsonl")
+    _record(path, [("hi", "hello from the cassette")])
+    with FakeOllamaServer(cassette=Cassette(path, "replay", latency="none")) as server:
+        llm = PooledOllama(model="llama3", pool=OllamaHostPool([server.url]), cassette=None)
+        assert llm.invoke("hi") == "hello from the cassette"
+        with pytest.raises(ValueError, match="status code 404"):
+            PooledOllama(model="mistral", pool=OllamaHostPool([server.url])).invoke("hi")
+
+def test_backend_comes_from_settings(tmp_path, monkeypatch):
+    from src.utils.config import get_settings
+    settings = get_settings()
+    assert settings.LLM_BACKEND == "ollama" and get_cassette() is None
+    monkeypatch.setattr(settings, "LLM_BACKEND", "record")
+    monkeypatch.setattr(settings, "LLM_CASSETTE_PATH", str(tmp_path / "llm.jsonl"))
+    cassette = get_cassette()
+    assert cassette.mode == "record" and get_cassette() is cassette
+    assert cassette.match == "exact"
@@ -135,4 +135,11 @@ def test_settings_sensitive_data_logging(caplog):
         
         assert settings_log is not None
         assert "REDIS_PASSWORD" not in settings_log
-        assert "API_KEY" not in settings_log
\ No newline at end of file
+        assert "API_KEY" not in settings_log
+
+def test_validate_arxiv_backend():
+    with pytest.raises(ValueError, match="Invalid arxiv backend"):
+        Settings(ARXIV_BACKEND="scholar")
+
+    settings = Settings(ARXIV_BACKEND="LOCAL", ARXIV_INDEX_PATH="/data/arxiv.jsonl")
+    assert settings.ARXIV_BACKEND == "local"
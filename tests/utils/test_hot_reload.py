@@ -0,0 +1,44 @@
+import json
+import time
+import fakeredis
+from src.utils.hot_reload import ReloadBroadcaster
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+def test_reload_is_applied_by_other_processes_only():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    reloads = {"local": 0, "remote": 0}
+
+    def reloader(name):
+        def reload():
+            reloads[name] += 1
+            return {}
+        return ReloadBroadcaster(lambda: client, reload)
+
+    local, remote = reloader("local"), reloader("remote")
+    local.start()
+    remote.start()
+    try:
+        # Give both listeners time to subscribe before publishing
+        time.sleep(0.1)
+        local.publish({"agents": {"added": ["math"], "changed": [], "removed": []}})
+        assert _wait_for(lambda: reloads["remote"] == 1)
+        time.sleep(0.1)
+        assert reloads["local"] == 0
+    finally:
+        local.stop()
+        remote.stop()
+
+def test_malformed_and_own_messages_are_ignored():
+    calls = []
+    broadcaster = ReloadBroadcaster(lambda: None, lambda: calls.append(1) or {})
+    assert broadcaster.handle("not json") is None
+    assert broadcaster.handle(json.dumps({"origin": broadcaster.origin})) is None
+    assert broadcaster.handle(json.dumps({"origin": "other"})) == {}
+    assert calls == [1]
+    # Publishing without Redis is a no-op
+    broadcaster.publish({})
@@ -3,7 +3,7 @@ import logging
 import json
 import os
 from unittest.mock import patch, MagicMock
-from src.utils.logging_config import setup_logging, get_logger, JsonFormatter
+from src.utils.logging_config import setup_logging, get_logger, flush_logging, JsonFormatter
 
 @pytest.fixture
 def temp_log_dir(tmp_path):
@@ -188,6 +188,51 @@ def test_rotating_file_handler_rotation(temp_log_dir):
     large_msg = "x" * 1000000  # 1MB message
     for _ in range(15):  # Should create multiple log files
         logger.info(large_msg)
+    flush_logging()  # records are written by the background listener
     
     log_files = [f for f in os.listdir(temp_log_dir) if f.endswith('.log')]
-    assert len(log_files) > 1  # Should have main log file and at least one backup
\ No newline at end of file
+    assert len(log_files) > 1  # Should have main log file and at least one backup
+
+def test_queued_logging_writes_in_background(temp_log_dir):
+    setup_logging(temp_log_dir)
+    logger = get_logger("mcp_server")
+    assert [type(h).__name__ for h in logger.handlers] == ["FastQueueHandler"]
+
+    logger.info("Job %s moved to %s", "job_1", "BUILDING", extra={"job_id": "job_1"})
+    flush_logging()
+
+    json_log = next(f for f in os.listdir(temp_log_dir) if f.startswith("json_"))
+    with open(os.path.join(temp_log_dir, json_log)) as f:
+        entries = [json.loads(line) for line in f]
+    entry = next(e for e in entries if e.get("job_id") == "job_1")
+    assert entry["message"] == "Job job_1 moved to BUILDING"
+
+def test_setup_logging_without_queue(temp_log_dir):
+    setup_logging(temp_log_dir, use_queue=False)
+    handler_types = {type(h).__name__ for h in get_logger("mcp_server").handlers}
+    assert "FastQueueHandler" not in handler_types
+    assert "BatchRotatingFileHandler" in handler_types
+    setup_logging(temp_log_dir)
+
+@pytest.mark.parametrize("message,secret", [
+    ("redis_password='s3cr3t' host=localhost", "s3cr3t"),
+    ("Authorization: Bearer abc.def.ghi", "abc.def.ghi"),
+    ('{"api_key": "k-123"}', "k-123"),
+    ("token=t1, next", "t1"),
+])
+def test_message_redaction_patterns(json_formatter, message, secret):
+    record = logging.LogRecord("test_logger", logging.INFO, "test.py", 1, message, (), None)
+    parsed = json.loads(json_formatter.format(record))
+    assert secret not in parsed["message"]
+    assert "***REDACTED***" in parsed["message"]
+
+
+def test_batch_flush_ignores_closed_stream(capsys):
+    import io
+    from src.utils.logging_config import BatchStreamHandler
+    stream = io.StringIO()
+    handler = BatchStreamHandler(stream)
+    stream.close()
+    handler.begin_batch()
+    handler.end_batch()
+    assert "Logging error" not in capsys.readouterr().err
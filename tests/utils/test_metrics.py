@@ -0,0 +1,53 @@
+import pytest
+from src.utils.metrics import MetricsRegistry
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+def test_histogram_renders_cumulative_buckets(registry):
+    histogram = registry.histogram("call_seconds", "Call latency", ("tool",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.labels("search").observe(value)
+
+    output = registry.render()
+    assert "# TYPE call_seconds histogram" in output
+    assert 'call_seconds_bucket{tool="search",le="0.1"} 1' in output
+    assert 'call_seconds_bucket{tool="search",le="1"} 3' in output
+    assert 'call_seconds_bucket{tool="search",le="+Inf"} 4' in output
+    assert 'call_seconds_count{tool="search"} 4' in output
+    assert 'call_seconds_sum{tool="search"} 4.25' in output
+
+def test_histogram_timer_observes_duration(registry):
+    histogram = registry.histogram("block_seconds", "Block latency")
+    with histogram.time():
+        pass
+    assert "block_seconds_count 1" in registry.render()
+
+def test_counter_and_gauges(registry):
+    counter = registry.counter("requests_total", "Requests", ("method",))
+    counter.labels("GET").inc()
+    counter.labels("GET").inc(2)
+    gauge = registry.gauge("in_flight", "Jobs in flight")
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    queue = registry.gauge("queue_depth", "Queue depth")
+    queue.set_function(lambda: 7)
+
+    output = registry.render()
+    assert 'requests_total{method="GET"} 3' in output
+    assert "in_flight 1" in output
+    assert "queue_depth 7" in output
+
+def test_label_values_are_escaped(registry):
+    registry.counter("errors_total", "Errors", ("message",)).labels('bad "quote"\n').inc()
+    assert 'errors_total{message="bad \\"quote\\"\\n"} 1' in registry.render()
+
+def test_label_count_and_reregistration_are_checked(registry):
+    histogram = registry.histogram("state_seconds", "State latency", ("state",))
+    with pytest.raises(ValueError):
+        histogram.labels("BUILDING", "extra")
+    assert registry.histogram("state_seconds", "State latency", ("state",)) is histogram
+    with pytest.raises(ValueError):
+        registry.gauge("state_seconds", "Clashing type")
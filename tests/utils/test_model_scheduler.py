@@ -0,0 +1,121 @@
+import time
+import threading
+import pytest
+from src.utils.model_scheduler import ModelAffinityScheduler
+from src.utils.single_flight import CallAbandoned
+from src.utils.metrics import REGISTRY
+
+def _start(scheduler, model, order, hold=0.0):
+    def run():
+        with scheduler.slot(model):
+            order.append(model)
+            time.sleep(hold)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def _wait_queued(scheduler, count):
+    deadline = time.time() + 5
+    while sum(scheduler.to_dict()["queued"].values()) < count and time.time() < deadline:
+        time.sleep(0.01)
+
+def test_same_model_calls_run_before_switching():
+    scheduler = ModelAffinityScheduler("test-affinity", concurrency=1, max_wait=10)
+    order = []
+    scheduler.acquire("llama3")
+    threads = [_start(scheduler, "codellama", order)]
+    _wait_queued(scheduler, 1)
+    threads += [_start(scheduler, "llama3", order) for _ in range(3)]
+    _wait_queued(scheduler, 4)
+    scheduler.release()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["llama3", "llama3", "llama3", "codellama"]
+    assert scheduler.swaps == 1
+    assert 'model_swaps_total{host="test-affinity",model="codellama"} 1' in REGISTRY.render()
+
+def test_waiting_model_is_not_starved():
+    scheduler = ModelAffinityScheduler("test-starvation", concurrency=1, max_wait=0.2)
+    order = []
+    stop = threading.Event()
+
+    def busy_llama():
+        while not stop.is_set():
+            with scheduler.slot("llama3"):
+                order.append("llama3")
+                time.sleep(0.01)
+
+    workers = [threading.Thread(target=busy_llama) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    scheduler.acquire("codellama")
+    waited = time.monotonic() - start
+    scheduler.release()
+    stop.set()
+    for worker in workers:
+        worker.join(5)
+    assert 0.15 <= waited < 1.0
+    assert scheduler.swaps >= 1
+
+def test_concurrency_is_bounded_per_host():
+    scheduler = ModelAffinityScheduler("test-concurrency", concurrency=2, max_wait=1)
+    peak, lock, active = [0], threading.Lock(), [0]
+
+    def call():
+        with scheduler.slot("llama3"):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert peak[0] == 2
+    assert scheduler.to_dict()["active"] == 0
+
+def test_abandoned_waiter_leaves_the_queue():
+    scheduler = ModelAffinityScheduler("test-abandon", concurrency=1, max_wait=10)
+    order = []
+    scheduler.acquire("llama3")
+    give_up = threading.Event()
+    abandoned = []
+
+    def impatient():
+        try:
+            scheduler.acquire("codellama", should_abandon=give_up.is_set)
+        except CallAbandoned:
+            abandoned.append(True)
+        else:
+            order.append("codellama")
+            scheduler.release()
+
+    waiter = threading.Thread(target=impatient)
+    waiter.start()
+    _wait_queued(scheduler, 1)
+    give_up.set()
+    waiter.join(5)
+    assert abandoned == [True]
+    assert scheduler.to_dict()["queued"] == {}
+
+    later = _start(scheduler, "llama3", order)
+    scheduler.release()
+    later.join(5)
+    assert order == ["llama3"] and scheduler.active == 0 and scheduler.swaps == 0
+
+def test_waiter_stops_when_its_check_raises():
+    scheduler = ModelAffinityScheduler("test-abandon-raise", concurrency=1, max_wait=10)
+    scheduler.acquire("llama3")
+
+    def expired():
+        raise TimeoutError("deadline passed")
+    with pytest.raises(TimeoutError):
+        scheduler.acquire("llama3", should_abandon=expired)
+    assert scheduler.to_dict()["queued"] == {}
+    scheduler.release()
@@ -0,0 +1,171 @@
+import time
+import threading
+import pytest
+from src.utils.fake_ollama import FakeOllamaServer
+from src.utils.ollama_pool import OllamaHostPool
+from src.utils.pooled_ollama import PooledOllama
+
+@pytest.fixture
+def servers():
+    first = FakeOllamaServer(models=["llama3", "codellama"]).start()
+    second = FakeOllamaServer(models=["llama3", "codellama"]).start()
+    yield first, second
+    first.stop()
+    second.stop()
+
+def test_routes_to_host_with_model_resident(servers):
+    first, second = servers
+    pool = OllamaHostPool([first.url, second.url])
+    pool.hosts[1].loaded_models.add("codellama:latest")
+    assert pool.choose("codellama").url == second.url
+
+    # Outstanding requests outweigh residency once they exceed the swap penalty
+    pool.hosts[1].outstanding = 5
+    assert pool.choose("codellama").url == first.url
+
+def test_health_checks_refresh_residency_and_mark_dead_hosts(servers):
+    first, second = servers
+    pool = OllamaHostPool([first.url, second.url], health_interval=60)
+    first.loaded["llama3:latest"] = 0.0
+    second.stop()
+    pool.check_all()
+    assert pool.hosts[0].healthy and pool.hosts[0].loaded_models == {"llama3:latest"}
+    assert not pool.hosts[1].healthy
+    for _ in range(10):
+        assert pool.choose("codellama").url == first.url
+
+def test_pooled_llm_streams_through_the_pool(servers):
+    first, second = servers
+    pool = OllamaHostPool([first.url, second.url])
+    llm = PooledOllama(model="llama3", pool=pool)
+    for _ in range(4):
+        assert llm.invoke("hello") == "Thought: I know the answer\nFinal Answer: done"
+    assert first.stats["requests"] + second.stats["requests"] == 4
+    assert all(host.outstanding == 0 for host in pool.hosts)
+    # After the first call the model is resident on one host, which keeps getting it
+    assert sorted([first.stats["loads"], second.stats["loads"]]) == [0, 1]
+
+def test_overloaded_host_is_skipped(servers):
+    first, second = servers
+    first.fail_status = 503
+    pool = OllamaHostPool([first.url, second.url], health_interval=60)
+    pool.hosts[0].loaded_models.add("llama3:latest")
+    llm = PooledOllama(model="llama3", pool=pool)
+    with pytest.raises(ValueError, match="503"):
+        llm.invoke("hello")
+    assert not pool.hosts[0].healthy
+    assert llm.invoke("hello").endswith("done")
+    assert second.stats["requests"] == 1
+
+def test_pooled_llm_retries_overload_on_another_host(servers, monkeypatch):
+    from src.utils.config import get_settings
+    monkeypatch.setattr(get_settings(), "LLM_RETRY_BASE_DELAY", 0.0)
+    first, second = servers
+    first.fail_status = 503
+    pool = OllamaHostPool([first.url, second.url], health_interval=60)
+    pool.hosts[0].loaded_models.add("llama3:latest")
+    llm = PooledOllama(model="llama3", pool=pool, max_retries=2)
+    assert llm.invoke("hello").endswith("done")
+    assert not pool.hosts[0].healthy
+    assert second.stats["requests"] == 1
+
+def test_breakers_are_per_model_and_host(servers):
+    from src.utils.resilience import CircuitOpenError
+    first, second = servers
+    first.fail_status = 503
+    pool = OllamaHostPool([first.url, second.url], health_interval=0)
+    pool.hosts[0].loaded_models.add("llama3:latest")
+    llm = PooledOllama(model="llama3", pool=pool)
+    with pytest.raises(ValueError, match="503"):
+        llm.invoke("hello")
+    first_breaker = pool.breaker(pool.hosts[0], "llama3")
+    assert first_breaker.endpoint == f"llama3:latest@{first.url}"
+    assert first_breaker._failures == 1
+    assert pool.breaker(pool.hosts[1], "llama3")._failures == 0
+
+    # A host whose circuit is open is skipped even once it is routable again
+    for _ in range(first_breaker.failure_threshold):
+        first_breaker.record_failure()
+    for _ in range(5):
+        assert pool.choose("llama3").url == second.url
+    assert pool.breaker(pool.hosts[0], "codellama").state == "closed"
+
+    second_breaker = pool.breaker(pool.hosts[1], "llama3")
+    for _ in range(second_breaker.failure_threshold):
+        second_breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        llm.invoke("hello")
+
+def test_pool_batches_mixed_models_on_one_host():
+    with FakeOllamaServer(models=["llama3", "codellama"], max_loaded_models=1, load_seconds=0.05) as server:
+        pool = OllamaHostPool([server.url], num_parallel=2, batch_max_wait=5)
+        llms = [PooledOllama(model=model, pool=pool) for model in ("llama3", "codellama") * 4]
+        threads = [threading.Thread(target=llm.invoke, args=(f"task {i}",)) for i, llm in enumerate(llms)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        assert server.stats["requests"] == 8
+        assert server.stats["loads"] <= 3
+        assert pool.snapshot()[0]["scheduler"]["swaps"] == server.stats["loads"] - 1
+
+def test_identical_prompts_in_flight_are_sent_once():
+    with FakeOllamaServer(token_seconds=0.05) as server:
+        pool = OllamaHostPool([server.url])
+        results = []
+        llms = [PooledOllama(model="llama3", pool=pool) for _ in range(4)]
+        threads = [threading.Thread(target=lambda llm=llm: results.append(llm.generate(["same prompt"])))
+                   for llm in llms]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        assert server.stats["requests"] == 1
+        texts = {result.generations[0][0].text for result in results}
+        assert texts == {"Thought: I know the answer\nFinal Answer: done"}
+        infos = [result.generations[0][0].generation_info for result in results]
+        assert sum(1 for info in infos if "eval_count" in info) == 1
+        assert sum(1 for info in infos if info.get("coalesced")) == 3
+
+        PooledOllama(model="llama3", pool=pool, coalesce=False).invoke("same prompt")
+        assert server.stats["requests"] == 2
+
+def test_each_caller_bounds_its_wait_for_a_shared_generation():
+    from src.utils.budget import AgentBudgetExceeded, deadline_scope
+    with FakeOllamaServer(token_seconds=0.05) as server:
+        pool = OllamaHostPool([server.url])
+        results = []
+
+        def patient():
+            with deadline_scope("PatientAgent", 10):
+                results.append(PooledOllama(model="llama3", pool=pool).invoke("same prompt"))
+
+        thread = threading.Thread(target=patient)
+        thread.start()
+        time.sleep(0.05)
+        with deadline_scope("HurriedAgent", 0.1):
+            with pytest.raises(AgentBudgetExceeded, match="HurriedAgent exceeded its time budget"):
+                PooledOllama(model="llama3", pool=pool).invoke("same prompt")
+        thread.join(10)
+        # The hurried caller's deadline did not cut the generation short for the patient one
+        assert results == ["Thought: I know the answer\nFinal Answer: done"]
+        assert server.stats["requests"] == 1
+
+def test_abandoned_generation_never_reaches_the_host():
+    from src.utils.budget import AgentBudgetExceeded, deadline_scope
+    with FakeOllamaServer() as server:
+        pool = OllamaHostPool([server.url], num_parallel=1)
+        scheduler = pool.hosts[0].scheduler
+        # Another call holds the host's only slot
+        scheduler.acquire("llama3:latest")
+        with deadline_scope("HurriedAgent", 0.1):
+            with pytest.raises(AgentBudgetExceeded):
+                PooledOllama(model="llama3", pool=pool).invoke("queued prompt")
+        deadline = time.time() + 5
+        while scheduler.to_dict()["queued"] and time.time() < deadline:
+            time.sleep(0.01)
+        scheduler.release()
+        time.sleep(0.2)
+        assert scheduler.to_dict()["queued"] == {} and scheduler.active == 0
+        assert server.stats["requests"] == 0
+        assert pool.hosts[0].outstanding == 0
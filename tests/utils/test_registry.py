@@ -0,0 +1,97 @@
+import os
+import sys
+import json
+import subprocess
+from src.utils.registry import LazyRegistry, load_file_attribute
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+TOOL_SOURCE = '''
+class WordCountTool:
+    """Counts words."""
+    name = "WordCountTool"
+    description = "Counts the words in the input."
+
+word_count_tool = WordCountTool()
+'''
+
+def test_entries_load_once_on_first_lookup():
+    calls, loaded = [], []
+    registry = LazyRegistry("tool", on_load=loaded.append)
+    registry.register("thing", lambda: calls.append(1) or object(), module="things")
+
+    assert "thing" in registry and list(registry) == ["thing"]
+    assert not registry.is_loaded("thing") and calls == []
+
+    first = registry["thing"]
+    assert registry["thing"] is first
+    assert calls == [1] and loaded == [first]
+    assert registry.metadata("thing") == {"module": "things", "name": "thing", "loaded": True}
+
+def test_metadata_is_read_from_source_without_importing(tmp_path):
+    source = tmp_path / "word_count_tool.py"
+    source.write_text(TOOL_SOURCE)
+    registry = LazyRegistry("tool")
+    registry.register("word_count_tool", load_file_attribute("word_count_tool", str(source), "word_count_tool"),
+                      source=str(source), symbol="word_count_tool")
+
+    [meta] = registry.describe()
+    assert meta["class"] == "WordCountTool"
+    assert meta["description"] == "Counts the words in the input."
+    assert meta["doc"] == "Counts words."
+    assert meta["loaded"] is False
+    assert "word_count_tool" not in sys.modules
+    assert registry["word_count_tool"].name == "WordCountTool"
+
+def test_assigned_entries_behave_like_a_dict():
+    registry = LazyRegistry("tool")
+    registry["mock"] = "instance"
+    assert registry["mock"] == "instance" and registry.is_loaded("mock")
+    del registry["mock"]
+    assert len(registry) == 0
+
+def test_server_import_does_not_load_tools_or_agents(tmp_path):
+    script = (
+        "import sys, json, src.mcp_server.main as m\n"
+        "heavy = ['langchain_core', 'langchain', 'git', 'arxiv', 'PyPDF2', 'psutil']\n"
+        "print(json.dumps({'imported': [n for n in heavy if n in sys.modules],\n"
+        "                  'tools': sorted(m.ALL_TOOLS), 'agents': sorted(m.AGENT_MAPPING)}))\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, capture_output=True, text=True,
+                          env=dict(os.environ, PYTHONPATH=REPO_ROOT))
+    assert proc.returncode == 0, proc.stderr
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    assert result["imported"] == []
+    assert {"shell", "git", "filesystem", "ingestion", "runtime_monitor"} <= set(result["tools"])
+    assert {"architect", "analyzer", "evaluator", "prompt_optimizer"} <= set(result["agents"])
+
+def _specs(directory):
+    return {
+        path.stem: (load_file_attribute(path.stem, str(path), path.stem),
+                    {"source": str(path), "symbol": path.stem})
+        for path in sorted(directory.glob("*.py"))
+    }
+
+def test_sync_reloads_only_changed_sources(tmp_path):
+    (tmp_path / "word_count_tool.py").write_text(TOOL_SOURCE)
+    (tmp_path / "echo_tool.py").write_text("echo_tool = object()\n")
+    registry = LazyRegistry("tool")
+    registry["builtin"] = "kept"
+
+    assert registry.sync("dynamic", _specs(tmp_path)) == {
+        "added": ["echo_tool", "word_count_tool"], "changed": [], "removed": []}
+    echo, word_count = registry["echo_tool"], registry["word_count_tool"]
+
+    # Touching a file without changing it is not a change
+    os.utime(tmp_path / "echo_tool.py", ns=(1, 1))
+    (tmp_path / "word_count_tool.py").write_text(TOOL_SOURCE.replace("Counts the words", "Counts all of the words"))
+    (tmp_path / "new_tool.py").write_text("new_tool = 'new'\n")
+    assert registry.sync("dynamic", _specs(tmp_path)) == {
+        "added": ["new_tool"], "changed": ["word_count_tool"], "removed": []}
+    assert registry["echo_tool"] is echo
+    assert registry["word_count_tool"] is not word_count
+    assert registry.metadata("word_count_tool")["description"] == "Counts all of the words in the input."
+
+    (tmp_path / "echo_tool.py").unlink()
+    assert registry.sync("dynamic", _specs(tmp_path))["removed"] == ["echo_tool"]
+    assert sorted(registry) == ["builtin", "new_tool", "word_count_tool"]
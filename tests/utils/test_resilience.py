@@ -0,0 +1,105 @@
+import pytest
+import requests
+from src.utils.metrics import REGISTRY
+from src.utils.resilience import (
+    CircuitBreaker, CircuitOpenError, RetryBudget, RetryPolicy, call_with_resilience,
+    get_circuit_breaker, is_transient, CLOSED, HALF_OPEN, OPEN
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_transient_errors_are_recognised():
+    assert is_transient(ConnectionError("refused"))
+    assert is_transient(TimeoutError())
+    assert is_transient(ValueError("Ollama call failed with status code 503. Details: overloaded"))
+    assert not is_transient(ValueError("Ollama call failed with status code 404. Details: model not found"))
+    assert not is_transient(ValueError("Could not parse LLM output"))
+    assert not is_transient(CircuitOpenError("m@h", 1.0))
+
+def test_only_endpoint_errors_are_transient():
+    assert is_transient(requests.ConnectionError("refused"))
+    assert is_transient(requests.ReadTimeout("read timed out"))
+    assert not is_transient(FileNotFoundError("missing.txt"))
+    assert not is_transient(PermissionError("denied"))
+
+    def http_error(status):
+        response = requests.Response()
+        response.status_code = status
+        return requests.HTTPError(f"{status} error", response=response)
+    assert is_transient(http_error(429)) and is_transient(http_error(502))
+    assert not is_transient(http_error(400))
+
+def test_breaker_opens_fails_fast_and_probes_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test-breaker", failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.allow()
+    assert exc_info.value.retry_after == 10
+
+    clock.now = 10
+    assert breaker.state == HALF_OPEN
+    breaker.allow()  # the probe
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()  # only one probe at a time
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now = 20
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.allow()
+
+    output = REGISTRY.render()
+    assert 'circuit_breaker_state{endpoint="test-breaker"} 0' in output
+    assert 'circuit_breaker_transitions_total{endpoint="test-breaker",state="open"} 2' in output
+
+def test_retry_budget_stops_retry_storms():
+    budget = RetryBudget("test-budget", max_tokens=4, ratio=1)
+    assert budget.try_retry()  # 3 left
+    assert not budget.try_retry()  # 2 left: not more than half
+    budget.record_success()
+    budget.record_success()
+    assert budget.try_retry()
+
+def test_transient_errors_back_off_with_jitter():
+    sleeps, calls = [], []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("connection refused")
+        return "ok"
+
+    result = call_with_resilience(flaky, "test-backoff", 3, RetryPolicy(base_delay=1, max_delay=1.5),
+                                  sleep=sleeps.append)
+    assert result == "ok" and len(calls) == 3
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 1 and 0 <= sleeps[1] <= 1.5
+
+def test_other_errors_are_retried_immediately():
+    sleeps = []
+    with pytest.raises(ValueError):
+        call_with_resilience(lambda: (_ for _ in ()).throw(ValueError("bad output")), "test-immediate", 3,
+                             sleep=sleeps.append)
+    assert sleeps == []
+    assert get_circuit_breaker("test-immediate").state == CLOSED
+
+def test_open_circuit_fails_fast_without_calling():
+    breaker = get_circuit_breaker("test-open")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        call_with_resilience(lambda: calls.append(1), "test-open", 3, sleep=lambda s: None)
+    assert calls == []
+    assert 'llm_retry_events_total{endpoint="test-open",outcome="rejected"} 1' in REGISTRY.render()
@@ -0,0 +1,161 @@
+import time
+import asyncio
+import threading
+import pytest
+from src.utils.metrics import REGISTRY
+from src.utils.single_flight import SingleFlight, WaitTimeout, abandoned, request_key
+
+def test_request_key_ignores_dict_order():
+    assert request_key({"a": 1, "b": 2}, "p") == request_key({"b": 2, "a": 1}, "p")
+    assert request_key({"a": 1}, "p") != request_key({"a": 1}, "q")
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight("test-threads")
+    calls, results = [], []
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while REGISTRY.render().count('single_flight_calls_total{group="test-threads"') < 2:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert sorted(results) == [("answer", False)] + [("answer", True)] * 4
+    assert 'single_flight_calls_total{group="test-threads",outcome="coalesced"} 4' in REGISTRY.render()
+    # Completed calls are not cached
+    assert flight.do("k", lambda: "again") == ("again", False)
+
+def test_errors_are_shared_and_not_cached():
+    flight = SingleFlight("test-errors")
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError("boom")
+
+    def call():
+        try:
+            flight.do("k", failing)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert errors == ["boom", "boom"]
+    assert flight.in_flight() == 0
+
+def test_async_callers_share_a_call_with_threads():
+    flight = SingleFlight("test-async")
+    calls = []
+
+    async def leader_call():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return 42
+
+    async def main():
+        thread_result = []
+        first = asyncio.ensure_future(flight.ado("k", leader_call))
+        await asyncio.sleep(0.01)
+        thread = threading.Thread(target=lambda: thread_result.append(flight.do("k", lambda: pytest.fail("ran twice"))))
+        thread.start()
+        second = await flight.ado("k", leader_call)
+        await asyncio.to_thread(thread.join, 5)
+        return await first, second, thread_result
+
+    first, second, from_thread = asyncio.run(main())
+    assert first == (42, False) and second == (42, True) and from_thread == [(42, True)]
+    assert calls == [1]
+
+def test_callers_time_out_without_cancelling_the_call():
+    flight = SingleFlight("test-timeout")
+    release, finished = threading.Event(), threading.Event()
+    seen_abandoned = []
+
+    def slow():
+        release.wait(5)
+        seen_abandoned.append(abandoned())
+        finished.set()
+        return "answer"
+
+    results = []
+    patient = threading.Thread(target=lambda: results.append(flight.do("k", slow, timeout=5)))
+    patient.start()
+    while not flight.in_flight():
+        time.sleep(0.01)
+    with pytest.raises(WaitTimeout):
+        flight.do("k", lambda: pytest.fail("ran twice"), timeout=0.05)
+    release.set()
+    patient.join(5)
+    # The leader's wait was bounded too, yet the call finished for the follower
+    assert results == [("answer", False)]
+    assert finished.wait(5) and seen_abandoned == [False]
+
+def test_call_sees_when_every_caller_gave_up():
+    flight = SingleFlight("test-abandoned")
+    release, checked = threading.Event(), threading.Event()
+    seen_abandoned = []
+
+    def slow():
+        release.wait(5)
+        seen_abandoned.append(abandoned())
+        checked.set()
+        return "late"
+
+    with pytest.raises(WaitTimeout):
+        flight.do("k", slow, timeout=0.05)
+    release.set()
+    assert checked.wait(5) and seen_abandoned == [True]
+    assert not abandoned()
+
+def test_detached_calls_run_on_a_bounded_named_pool():
+    flight = SingleFlight("test-pool", max_workers=2)
+    threads = set()
+
+    def record():
+        threads.add(threading.current_thread())
+        time.sleep(0.02)
+        return "done"
+
+    callers = [threading.Thread(target=lambda i=i: flight.do(f"k{i}", record, timeout=5)) for i in range(6)]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join(5)
+    assert flight.do("again", record, timeout=5) == ("done", False)
+    assert 1 <= len(threads) <= 2
+    assert all(thread.name.startswith("single-flight-test-pool") for thread in threads)
+
+def test_async_callers_time_out_without_cancelling_the_call():
+    flight = SingleFlight("test-async-timeout")
+
+    async def slow():
+        await asyncio.sleep(0.2)
+        return 7
+
+    async def main():
+        patient = asyncio.ensure_future(flight.ado("k", slow, timeout=5))
+        await asyncio.sleep(0.01)
+        with pytest.raises(WaitTimeout):
+            await flight.ado("k", slow, timeout=0.05)
+        return await patient
+
+    assert asyncio.run(main()) == (7, False)
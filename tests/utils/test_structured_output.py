@@ -0,0 +1,65 @@
+import pytest
+from src.utils.structured_output import (
+    OutputSchemaError, extract_json, output_text, parse_output, schema_errors
+)
+
+SCHEMA = {
+    "type": "object",
+    "required": ["status", "message"],
+    "properties": {
+        "status": {"enum": ["success", "failed"]},
+        "message": {"type": "string"},
+        "changes_made": {"type": "array", "items": {"type": "string"}},
+    },
+}
+
+@pytest.mark.parametrize("text", [
+    '{"status": "success", "message": "ok"}',
+    'Final Answer: {"status": "success", "message": "ok"}',
+    'Here is the result:\n```json\n{"status": "success", "message": "ok"}\n```\nLet me know!',
+    'I fixed it. {"status": "success", "message": "ok",} Done.',
+    "{'status': 'success', 'message': 'ok'}",
+    '{\n  // outcome\n  "status": "success", "message": "ok"\n}',
+    '{“status”: “success”, “message”: “ok”}',
+    '{"status": "success", "message": "ok"',
+])
+def test_common_malformations_are_repaired(text):
+    assert extract_json(text) == {"status": "success", "message": "ok"}
+
+def test_python_literals_and_truncated_strings():
+    assert extract_json("{'issues_found': False, 'report': None}") == {"issues_found": False, "report": None}
+    assert extract_json('{"summary": "cut off mid') == {"summary": "cut off mid"}
+
+def test_schema_picks_the_matching_value():
+    text = 'Step [1] done. Final: {"status": "failed", "message": "no fix", "changes_made": []}'
+    assert extract_json(text) == [1]
+    assert extract_json(text, SCHEMA)["status"] == "failed"
+
+def test_no_json_raises():
+    with pytest.raises(OutputSchemaError, match="No JSON found"):
+        extract_json("I could not complete the task.")
+
+def test_schema_errors_report_paths():
+    errors = schema_errors({"status": "maybe", "changes_made": ["a", 1], "message": True}, SCHEMA)
+    assert errors == [
+        "$.status: 'maybe' is not one of ['success', 'failed']",
+        "$.message: expected string, got bool",
+        "$.changes_made[1]: expected string, got int",
+    ]
+    assert schema_errors({"count": True}, {"properties": {"count": {"type": "integer"}}})
+    with pytest.raises(OutputSchemaError, match="missing required key 'message'"):
+        parse_output('{"status": "success"}', SCHEMA)
+
+def test_executor_results_are_unwrapped():
+    assert output_text({"input": "task", "output": '{"a": 1}'}) == '{"a": 1}'
+    assert parse_output({"input": "task", "output": 'Final Answer: [1, 2]'}) == [1, 2]
+
+def test_deeply_nested_brackets_are_scanned_once():
+    import time
+    start = time.perf_counter()
+    with pytest.raises(OutputSchemaError):
+        extract_json("[" * 4000 + "x" + "]" * 4000)
+    with pytest.raises(OutputSchemaError):
+        extract_json("Step [" * 2000 + "done" + "]" * 2000)
+    assert time.perf_counter() - start < 0.5
+    assert extract_json('[see notes] then {"status": "success", "message": "ok"}', SCHEMA)["status"] == "success"
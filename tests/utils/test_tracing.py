@@ -0,0 +1,68 @@
+import pytest
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.tracing import Tracer, OTLPFileExporter, current_span, propagate
+
+@pytest.fixture
+def export_path(tmp_path):
+    return str(tmp_path / "traces.jsonl")
+
+@pytest.fixture
+def tracer(export_path):
+    return Tracer(OTLPFileExporter(export_path))
+
+def test_nested_spans_form_a_tree(tracer):
+    with tracer.span("workflow", trace_id="a" * 32) as root:
+        with tracer.span("state BUILDING") as state:
+            assert current_span() is state
+            tracer.start_span("llm", activate=False).end()
+        assert current_span() is root
+    assert current_span() is None
+
+    [tree] = tracer.get_trace("a" * 32)
+    assert tree["name"] == "workflow"
+    assert [child["name"] for child in tree["children"]] == ["state BUILDING"]
+    assert tree["children"][0]["children"][0]["name"] == "llm"
+    assert tree["duration_ms"] >= tree["children"][0]["duration_ms"]
+
+def test_failed_span_records_error(tracer):
+    with pytest.raises(ValueError):
+        with tracer.span("agent.run", trace_id="b" * 32):
+            raise ValueError("boom")
+    [tree] = tracer.get_trace("b" * 32)
+    assert tree["status"] == "error"
+    assert tree["error"] == "ValueError: boom"
+
+async def test_context_follows_to_thread_and_worker_pools(tracer):
+    def child(name):
+        with tracer.span(name) as span:
+            return span.parent_span_id
+
+    with tracer.span("workflow") as root:
+        assert await asyncio.to_thread(child, "to_thread") == root.span_id
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            parents = list(pool.map(propagate(child), ["worker-1", "worker-2"]))
+    assert parents == [root.span_id, root.span_id]
+
+def test_root_end_exports_otlp_json(tracer, export_path):
+    with tracer.span("workflow", {"job.id": "job_1"}, trace_id="c" * 32):
+        with tracer.span("state INGESTION"):
+            pass
+
+    with open(export_path) as f:
+        [line] = f.readlines()
+    request = json.loads(line)
+    spans = request["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [span["name"] for span in spans] == ["state INGESTION", "workflow"]
+    assert spans[0]["parentSpanId"] == spans[1]["spanId"]
+    assert {"key": "job.id", "value": {"stringValue": "job_1"}} in spans[1]["attributes"]
+
+def test_trace_is_read_back_from_export_file(tracer, export_path):
+    with tracer.span("workflow", trace_id="d" * 32):
+        with tracer.span("state DEPLOYING"):
+            pass
+
+    [tree] = Tracer(OTLPFileExporter(export_path)).get_trace("d" * 32)
+    assert tree["name"] == "workflow"
+    assert tree["children"][0]["name"] == "state DEPLOYING"
@@ -0,0 +1,61 @@
+import pytest
+import fakeredis
+from src.utils import usage as usage_module
+from src.utils.usage import UsageRecord, UsageStore, usage_scope, set_usage_state, record_usage, token_cost
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeStrictRedis()
+
+@pytest.fixture
+def store(redis_client, monkeypatch):
+    store = UsageStore(lambda: redis_client)
+    monkeypatch.setattr(usage_module, "_store", store)
+    return store
+
+def _record(agent, prompt, completion, **kwargs):
+    kwargs.setdefault("attempts", 1)
+    return UsageRecord(agent=agent, model="llama3", llm_calls=1, prompt_tokens=prompt,
+                       completion_tokens=completion, llm_seconds=1.5, duration_seconds=2.0, **kwargs)
+
+def test_usage_is_aggregated_per_state_and_agent(store):
+    with usage_scope("job_1"):
+        set_usage_state("BUILDING")
+        record_usage(_record("BuilderAgent", 100, 50, tool_calls={"shell": 2}, step_seconds=[0.5, 0.5, 1.0]))
+        record_usage(_record("BuilderAgent", 10, 5, attempts=2, status="failed"))
+        set_usage_state("DOC_WRITING")
+        record_usage(_record("DocWriterAgent", 500, 400))
+
+    usage = store.job_usage("job_1")
+    assert usage["total"]["prompt_tokens"] == 610
+    assert usage["total"]["agent_runs"] == 3
+    assert usage["by_state"]["BUILDING"]["completion_tokens"] == 55
+    assert usage["by_state"]["BUILDING"]["retries"] == 1
+    assert usage["by_state"]["BUILDING"]["errors"] == 1
+    assert usage["by_state"]["BUILDING"]["tools"] == {"shell": 2}
+    assert [a["agent"] for a in usage["by_agent"]] == ["DocWriterAgent", "BuilderAgent"]
+    assert usage["by_agent"][1]["llm_seconds"] == 3
+    assert [r["state"] for r in usage["records"]] == ["BUILDING", "BUILDING", "DOC_WRITING"]
+
+def test_rollup_spans_jobs(store):
+    for job_id in ("job_1", "job_2"):
+        with usage_scope(job_id):
+            record_usage(_record("ArchitectAgent", 200, 100))
+    record_usage(_record("ArchitectAgent", 1, 1))  # outside any job
+
+    rollup = store.rollup()
+    assert rollup["total"]["prompt_tokens"] == 401
+    assert rollup["by_agent"][0]["agent_runs"] == 3
+    assert "by_state" not in rollup
+
+def test_recording_errors_are_swallowed(monkeypatch):
+    def broken_client():
+        raise ConnectionError("redis down")
+    monkeypatch.setattr(usage_module, "_store", UsageStore(broken_client))
+    record_usage(_record("BuilderAgent", 1, 1))
+
+def test_token_cost_uses_configured_prices(monkeypatch):
+    from src.utils.config import get_settings
+    monkeypatch.setattr(get_settings(), "LLM_TOKEN_PRICES", {"gpt": {"prompt": 1.0, "completion": 2.0}})
+    assert token_cost("gpt", 1000, 500) == 2.0
+    assert token_cost("llama3", 1000, 500) == 0.0